@@ -13,6 +13,7 @@ from flask import Flask, send_from_directory
 from flask_migrate import Migrate
 from werkzeug.middleware.proxy_fix import ProxyFix
 
+from cli import registrar_comandos
 from config import Config
 from extensions import db, login_manager
 from models import Ministro
@@ -37,6 +38,8 @@ from routes.publico_routes import publico_bp
 from routes.superadmin_routes import superadmin_bp
 from services.firebase_service import iniciar_firebase
 from services.agendamento_service import registrar_agendamentos
+from services.job_run_service import registrar_listener_jobs
+from services.scheduler_lider_service import iniciar_scheduler_com_lider
 from routes.push_routes import push_bp
 from routes.notificacoes_routes import notificacao_bp
 from routes.observacoes_lembrete_routes import observacoes_lembrete_bp
@@ -90,14 +93,21 @@ def _registrar_blueprints(app):
         app.register_blueprint(blueprint)
 
 
-if Config.CLOUDINARY_URL:
-    cloudinary.config(cloudinary_url=Config.CLOUDINARY_URL)
-else:
-    cloudinary.config(
-        cloud_name=Config.CLOUDINARY_CLOUD_NAME,
-        api_key=Config.CLOUDINARY_API_KEY,
-        api_secret=Config.CLOUDINARY_API_SECRET,
-    )
+# "completo": um processo faz tudo (padrao).
+# "web": so atende requisicoes; sem scheduler, Firebase e Cloudinary no boot.
+# "worker": roda os jobs agendados e a outbox (ver worker.py); sem o Dash.
+PAPEIS = ("completo", "web", "worker")
+
+
+def _configurar_cloudinary(app):
+    if app.config.get("CLOUDINARY_URL"):
+        cloudinary.config(cloudinary_url=app.config["CLOUDINARY_URL"])
+    else:
+        cloudinary.config(
+            cloud_name=app.config.get("CLOUDINARY_CLOUD_NAME"),
+            api_key=app.config.get("CLOUDINARY_API_KEY"),
+            api_secret=app.config.get("CLOUDINARY_API_SECRET"),
+        )
 
 
 def _registrar_rotas_internas(app):
@@ -125,10 +135,14 @@ def _configurar_login():
 
 
 def _iniciar_scheduler(app):
-    registrar_agendamentos(scheduler, app)
+    # O listener fica no scheduler do processo; registrar_agendamentos roda de
+    # novo a cada lideranca reassumida e nao deve somar outro.
+    registrar_listener_jobs(scheduler, app)
+    # So o processo que ganhar a trava roda os jobs; os outros ficam de reserva.
+    iniciar_scheduler_com_lider(scheduler, app, registrar_agendamentos)
 
         
-def create_app(config_override=None):
+def create_app(config_override=None, papel=None):
     app = Flask(__name__)
     app.config.from_object(Config)
 
@@ -160,6 +174,13 @@ def create_app(config_override=None):
 
     if config_override:
         app.config.update(config_override)
+
+    papel = papel or app.config.get("SGME_PAPEL") or "completo"
+    if papel not in PAPEIS:
+        raise ValueError(f"SGME_PAPEL invalido: {papel!r} (use {', '.join(PAPEIS)})")
+    app.config["SGME_PAPEL"] = papel
+    servicos_de_fundo = papel != "web" and not app.config.get("TESTING")
+
     app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_port=1)
 
     db.init_app(app)
@@ -167,13 +188,16 @@ def create_app(config_override=None):
     login_manager.init_app(app)
     _configurar_login()
 
-    if not app.config.get("TESTING"):
+    if servicos_de_fundo:
         iniciar_firebase()
+        _configurar_cloudinary(app)
     _registrar_rotas_internas(app)
     _registrar_blueprints(app)
-    init_financeiro_dash(app)
+    registrar_comandos(app)
+    if papel != "worker":
+        init_financeiro_dash(app)
 
-    if not app.config.get("TESTING"):
+    if servicos_de_fundo:
         _iniciar_scheduler(app)
 
     return app
@@ -0,0 +1,10 @@
+"""
+Benchmarks da geracao de escalas.
+
+Uso (a partir da raiz do projeto)::
+
+    python -m benchmarks --saida bench.json
+    python -m benchmarks --banco sqlite:///:memory: --banco postgresql://localhost/sgme_bench
+
+As tabelas do banco informado sao recriadas: use sempre um banco descartavel.
+"""
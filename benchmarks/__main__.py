@@ -0,0 +1,8 @@
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from benchmarks.executar import main
+
+
+main()
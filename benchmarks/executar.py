@@ -0,0 +1,249 @@
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import date, datetime
+
+from flask import current_app
+from flask_login import login_user
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from benchmarks.paroquia_sintetica import PARAMETROS_PADRAO, gerar_paroquia_sintetica, somar_meses
+from extensions import db
+from models import Ministro, Missa
+from services.escala_equilibrada_service import copiar_escala_mes
+from services.escala_inteligente_service import selecionar_ministros
+from services.escala_planejamento_service import gerar_escala_mes
+from utils.periodo_utils import intervalo_mes
+
+
+BANCO_PADRAO = "sqlite:///:memory:"
+
+
+# --------------------------------------------------
+# CASOS
+# --------------------------------------------------
+# Cada caso recebe o contexto da paroquia e devolve a funcao medida; a
+# preparacao fica fora da medicao. Os casos rodam na ordem abaixo: os que
+# gravam (geracao e copia) ficam por ultimo.
+def _caso_selecionar_ministros(ctx):
+    inicio, fim = intervalo_mes(ctx["mes"], ctx["ano"])
+    missa_ids = [
+        missa_id
+        for (missa_id,) in db.session.query(Missa.id).filter(
+            Missa.id_paroquia == ctx["id_paroquia"],
+            Missa.data >= inicio,
+            Missa.data < fim,
+        ).order_by(Missa.data.asc(), Missa.horario.asc(), Missa.id.asc())
+    ]
+
+    def executar():
+        for missa_id in missa_ids:
+            missa = db.session.get(Missa, missa_id)
+            selecionar_ministros(missa.qtd_ministros, ctx["id_paroquia"], missa)
+        db.session.rollback()
+
+    return executar
+
+
+def _caso_mapa_disponibilidade(ctx):
+    app = current_app._get_current_object()
+    view = app.view_functions["indisponibilidade.mapa_disponibilidade"]
+
+    def executar():
+        with app.test_request_context("/mapa_disponibilidade"):
+            login_user(db.session.get(Ministro, ctx["admin_id"]))
+            view()
+        db.session.rollback()
+
+    return executar
+
+
+def _caso_gerar_escala_mes(ctx):
+    def executar():
+        gerar_escala_mes(
+            ctx["id_paroquia"],
+            ctx["mes"],
+            ctx["ano"],
+            rng=random.Random(ctx["semente"]),
+        )
+
+    return executar
+
+
+def _caso_copiar_escala_mes(ctx):
+    mes_novo, ano_novo = somar_meses(ctx["mes"], ctx["ano"], 1)
+
+    def executar():
+        copiar_escala_mes(ctx["mes"], ctx["ano"], mes_novo, ano_novo, ctx["id_paroquia"])
+
+    return executar
+
+
+CASOS = {
+    "selecionar_ministros": _caso_selecionar_ministros,
+    "mapa_disponibilidade": _caso_mapa_disponibilidade,
+    "gerar_escala_mes": _caso_gerar_escala_mes,
+    "copiar_escala_mes": _caso_copiar_escala_mes,
+}
+
+
+# --------------------------------------------------
+# MEDICAO
+# --------------------------------------------------
+def _medir(executar, engine, memoria=False):
+    consultas = 0
+
+    def _contar(*_):
+        nonlocal consultas
+        consultas += 1
+
+    event.listen(engine, "before_cursor_execute", _contar)
+    if memoria:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    try:
+        executar()
+    finally:
+        segundos = time.perf_counter() - inicio
+        pico = tracemalloc.get_traced_memory()[1] if memoria else None
+        if memoria:
+            tracemalloc.stop()
+        event.remove(engine, "before_cursor_execute", _contar)
+
+    return {
+        "segundos": segundos,
+        "consultas": consultas,
+        "memoria_pico_kb": round(pico / 1024, 1) if pico is not None else None,
+    }
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def executar_benchmarks(bancos=None, mes=None, ano=None, parametros=None, repeticoes=3, casos=None):
+    """
+    Roda os casos de ``CASOS`` contra cada banco e retorna o relatorio.
+
+    Para cada banco as tabelas sao recriadas e a paroquia sintetica e gerada
+    do zero. Tempo e numero de consultas vem de ``repeticoes`` execucoes sem
+    tracemalloc; o pico de memoria vem de uma execucao extra com tracemalloc
+    ligado, para nao distorcer o tempo.
+    """
+    from app import create_app
+
+    bancos = bancos or [BANCO_PADRAO]
+    if mes is None or ano is None:
+        # Mes seguinte: o mapa de disponibilidade so mostra missas futuras.
+        hoje = date.today()
+        mes, ano = somar_meses(hoje.month, hoje.year, 1)
+    parametros = {**PARAMETROS_PADRAO, **(parametros or {})}
+    nomes = casos or list(CASOS)
+    desconhecidos = set(nomes) - set(CASOS)
+    if desconhecidos:
+        raise ValueError(f"Casos desconhecidos: {', '.join(sorted(desconhecidos))}")
+
+    resultados = []
+    for url in bancos:
+        app = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": url})
+        banco = make_url(url).render_as_string(hide_password=True)
+
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+
+            inicio = time.perf_counter()
+            id_paroquia = gerar_paroquia_sintetica(mes, ano, **parametros)
+            carga = round(time.perf_counter() - inicio, 3)
+
+            admin_id = db.session.query(Ministro.id).filter(
+                Ministro.id_paroquia == id_paroquia,
+                Ministro.tipo == "admin",
+            ).scalar()
+            ctx = {
+                "id_paroquia": id_paroquia,
+                "admin_id": admin_id,
+                "mes": mes,
+                "ano": ano,
+                "semente": parametros["semente"],
+            }
+
+            for nome in nomes:
+                executar = CASOS[nome](ctx)
+                medicoes = [_medir(executar, db.engine) for _ in range(repeticoes)]
+                memoria = _medir(executar, db.engine, memoria=True)
+                tempos = [medicao["segundos"] for medicao in medicoes]
+
+                resultados.append({
+                    "banco": banco,
+                    "carga_segundos": carga,
+                    "caso": nome,
+                    "repeticoes": repeticoes,
+                    "segundos": {
+                        "min": round(min(tempos), 4),
+                        "mediana": round(statistics.median(tempos), 4),
+                        "max": round(max(tempos), 4),
+                    },
+                    "consultas": max(medicao["consultas"] for medicao in medicoes),
+                    "memoria_pico_kb": memoria["memoria_pico_kb"],
+                })
+
+            db.session.remove()
+            db.engine.dispose()
+
+    return {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit_atual(),
+        "python": platform.python_version(),
+        "mes": mes,
+        "ano": ano,
+        "parametros": parametros,
+        "resultados": resultados,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmarks da geracao de escalas.")
+    parser.add_argument("--banco", action="append", help=f"URL do banco (repetivel). Padrao: {BANCO_PADRAO}")
+    parser.add_argument("--saida", default="bench.json", help="Arquivo JSON de resultado.")
+    parser.add_argument("--mes", type=int, default=None)
+    parser.add_argument("--ano", type=int, default=None)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--caso", action="append", choices=list(CASOS), help="Roda apenas este caso (repetivel).")
+    for chave, padrao in PARAMETROS_PADRAO.items():
+        parser.add_argument(f"--{chave.replace('_', '-')}", dest=chave, type=int, default=padrao)
+    args = parser.parse_args(argv)
+
+    relatorio = executar_benchmarks(
+        bancos=args.banco,
+        mes=args.mes,
+        ano=args.ano,
+        parametros={chave: getattr(args, chave) for chave in PARAMETROS_PADRAO},
+        repeticoes=max(1, args.repeticoes),
+        casos=args.caso,
+    )
+
+    with open(args.saida, "w", encoding="utf-8") as arquivo:
+        json.dump(relatorio, arquivo, indent=2, ensure_ascii=False)
+
+    print(f"{'BANCO':<30} {'CASO':<22} {'MEDIANA(s)':>10} {'CONSULTAS':>9} {'MEM(KB)':>9}")
+    for r in relatorio["resultados"]:
+        print(
+            f"{r['banco'][:30]:<30} {r['caso']:<22} {r['segundos']['mediana']:>10.4f} "
+            f"{r['consultas']:>9} {r['memoria_pico_kb']:>9}"
+        )
+    print(f"Resultado gravado em {args.saida}")
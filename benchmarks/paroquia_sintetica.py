@@ -0,0 +1,165 @@
+import random
+import uuid
+from datetime import date
+
+from sqlalchemy import insert
+
+from extensions import db
+from models import (
+    CasalMinisterio,
+    Disponibilidade,
+    DisponibilidadeFixa,
+    Escala,
+    Indisponibilidade,
+    IndisponibilidadeFixa,
+    Ministro,
+    Missa,
+    Paroquia,
+)
+from utils.periodo_utils import intervalo_mes
+
+
+PARAMETROS_PADRAO = {
+    "ministros": 80,
+    "missas_mes": 40,
+    "casais": 10,
+    "regras_fixas": 40,
+    "regras_data": 60,
+    "anos_historico": 2,
+    "semente": 2026,
+}
+
+COMUNIDADES = ["Matriz", "Capela Sao Jose", "Capela Santa Rita"]
+
+# Horarios candidatos por dia da semana: 0=segunda ... 6=domingo.
+HORARIOS_DIA = {
+    5: ["17:00"],
+    6: ["07:00", "09:00", "19:00"],
+}
+HORARIOS_SEMANA = ["19:00"]
+
+
+def somar_meses(mes, ano, delta):
+    indice = ano * 12 + (mes - 1) + delta
+    return indice % 12 + 1, indice // 12
+
+
+def _slots_do_mes(mes, ano):
+    inicio, fim = intervalo_mes(mes, ano)
+    slots = []
+    for dia in range(1, (fim - inicio).days + 1):
+        data = date(ano, mes, dia)
+        for horario in HORARIOS_DIA.get(data.weekday(), HORARIOS_SEMANA):
+            for comunidade in COMUNIDADES:
+                slots.append((data, horario, comunidade))
+    return slots
+
+
+def _missas_do_mes(rng, id_paroquia, mes, ano, quantidade):
+    slots = _slots_do_mes(mes, ano)
+    # Domingos primeiro: toda paroquia real cobre o domingo antes da semana.
+    domingos = [slot for slot in slots if slot[0].weekday() == 6]
+    demais = [slot for slot in slots if slot[0].weekday() != 6]
+    escolhidos = rng.sample(domingos, min(quantidade, len(domingos)))
+    if len(escolhidos) < quantidade:
+        escolhidos += rng.sample(demais, min(quantidade - len(escolhidos), len(demais)))
+
+    return [
+        Missa(
+            data=data,
+            horario=horario,
+            comunidade=comunidade,
+            qtd_ministros=rng.randint(2, 4),
+            id_paroquia=id_paroquia,
+        )
+        for data, horario, comunidade in sorted(escolhidos)
+    ]
+
+
+def gerar_paroquia_sintetica(mes, ano, **parametros):
+    """
+    Cria uma paroquia sintetica deterministica para os benchmarks.
+
+    Gera ministros, casais, regras fixas e por data, ``anos_historico`` anos
+    de missas ja escaladas antes de ``mes/ano`` e as missas (sem escala) de
+    ``mes/ano`` e do mes seguinte. A mesma ``semente`` gera sempre os mesmos
+    dados. Faz commit e retorna o id da paroquia.
+    """
+    opcoes = {**PARAMETROS_PADRAO, **parametros}
+    desconhecidos = set(opcoes) - set(PARAMETROS_PADRAO)
+    if desconhecidos:
+        raise ValueError(f"Parametros desconhecidos: {', '.join(sorted(desconhecidos))}")
+
+    rng = random.Random(opcoes["semente"])
+
+    paroquia = Paroquia(nome=f"Paroquia Sintetica {opcoes['semente']}")
+    db.session.add(paroquia)
+    db.session.flush()
+
+    ministros = [
+        Ministro(
+            nome=f"Ministro {indice:04d}",
+            id_paroquia=paroquia.id,
+            comunidade=rng.choice(COMUNIDADES),
+        )
+        for indice in range(opcoes["ministros"])
+    ]
+    admin = Ministro(nome="Admin Sintetico", tipo="admin", id_paroquia=paroquia.id)
+    db.session.add_all(ministros + [admin])
+    db.session.flush()
+    ids = [ministro.id for ministro in ministros]
+
+    embaralhados = rng.sample(ids, min(len(ids), 2 * opcoes["casais"]))
+    db.session.add_all([
+        CasalMinisterio(id_ministro_1=embaralhados[i], id_ministro_2=embaralhados[i + 1], id_paroquia=paroquia.id)
+        for i in range(0, len(embaralhados) - 1, 2)
+    ])
+
+    horarios = sorted({h for lista in HORARIOS_DIA.values() for h in lista} | set(HORARIOS_SEMANA))
+    for indice in range(opcoes["regras_fixas"]):
+        modelo = IndisponibilidadeFixa if indice % 2 == 0 else DisponibilidadeFixa
+        db.session.add(modelo(
+            id_ministro=rng.choice(ids),
+            id_paroquia=paroquia.id,
+            semana=rng.choice([None, 1, 2, 3, 4]),
+            dia_semana=rng.choice([None, 2, 4, 5, 6]),
+            horario=rng.choice([None] + horarios),
+        ))
+
+    periodos = [somar_meses(mes, ano, delta) for delta in range(-12 * opcoes["anos_historico"], 2)]
+    missas_por_periodo = []
+    for mes_ref, ano_ref in periodos:
+        missas = _missas_do_mes(rng, paroquia.id, mes_ref, ano_ref, opcoes["missas_mes"])
+        missas_por_periodo.append(missas)
+        db.session.add_all(missas)
+
+    inicio_futuro = date(ano, mes, 1)
+    _, fim_futuro = intervalo_mes(*somar_meses(mes, ano, 1))
+    dias_futuros = (fim_futuro - inicio_futuro).days
+    for indice in range(opcoes["regras_data"]):
+        modelo = Indisponibilidade if indice % 3 else Disponibilidade
+        db.session.add(modelo(
+            id_ministro=rng.choice(ids),
+            id_paroquia=paroquia.id,
+            data=date.fromordinal(inicio_futuro.toordinal() + rng.randrange(dias_futuros)),
+            horario=rng.choice([None] + horarios),
+        ))
+
+    db.session.flush()
+
+    escalas = []
+    for missas in missas_por_periodo[:-2]:
+        for missa in missas:
+            for id_ministro in rng.sample(ids, min(missa.qtd_ministros, len(ids))):
+                escalas.append({
+                    "id_missa": missa.id,
+                    "id_ministro": id_ministro,
+                    "id_paroquia": paroquia.id,
+                    "confirmado": rng.random() < 0.8,
+                    "token": str(uuid.uuid4()),
+                })
+    if escalas:
+        db.session.execute(insert(Escala), escalas)
+
+    db.session.commit()
+    return paroquia.id
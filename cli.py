@@ -0,0 +1,141 @@
+import click
+from flask.cli import AppGroup
+
+from extensions import db
+
+
+metricas_cli = AppGroup("metricas", help="Modelo de leitura ministro_metricas.")
+escala_cli = AppGroup("escala", help="Geracao de escalas.")
+notificacoes_cli = AppGroup("notificacoes", help="Outbox de notificacoes push e central de notificacoes.")
+lembretes_cli = AppGroup("lembretes", help="Lembretes de missa por push.")
+jobs_cli = AppGroup("jobs", help="Historico de execucoes dos jobs (job_runs).")
+rifas_cli = AppGroup("rifas", help="Estoque das campanhas de rifa.")
+
+
+@metricas_cli.command("reconstruir")
+@click.option("--paroquia", "id_paroquia", type=int, default=None, help="Reconstroi apenas esta paroquia.")
+def reconstruir_metricas_comando(id_paroquia):
+    """Recalcula ministro_metricas a partir de todas as escalas."""
+    from services.ministro_metricas_service import reconstruir_metricas
+
+    linhas = reconstruir_metricas(id_paroquia)
+    db.session.commit()
+    click.echo(f"ministro_metricas reconstruida: {linhas} linha(s).")
+
+
+def _lista_ids(valor):
+    if not valor:
+        return None
+    try:
+        return [int(item) for item in valor.replace(";", ",").split(",") if item.strip()]
+    except ValueError:
+        raise click.BadParameter("use ids separados por virgula, ex.: 1,2,5")
+
+
+@escala_cli.command("gerar-lote")
+@click.option("--mes", type=click.IntRange(1, 12), required=True)
+@click.option("--ano", type=int, required=True)
+@click.option("--paroquias", default=None, help="Ids separados por virgula (padrao: todas as ativas).")
+@click.option("--processos", type=int, default=None, help="Tamanho do pool (padrao: ESCALA_LOTE_PROCESSOS).")
+@click.option("--regerar", is_flag=True, help="Reaplica o plano mesmo se o mes ja tiver escalas.")
+@click.option("--sem-historico", is_flag=True, help="Nao considera periodos anteriores no score.")
+def gerar_lote_comando(mes, ano, paroquias, processos, regerar, sem_historico):
+    """Gera a escala inteligente do mes para varias paroquias."""
+    from services.escala_lote_service import gerar_escalas_lote
+
+    resultados = gerar_escalas_lote(
+        mes,
+        ano,
+        paroquia_ids=_lista_ids(paroquias),
+        processos=processos,
+        regerar=regerar,
+        considerar_periodos_anteriores=not sem_historico,
+    )
+
+    click.echo(f"{'ID':>5}  {'PAROQUIA':<30} {'STATUS':<9} {'TEMPO(s)':>8} {'NOVAS':>6} {'MANTIDAS':>8} {'REMOV.':>6} {'VAGAS':>6}")
+    for r in resultados:
+        click.echo(
+            f"{r['id_paroquia']:>5}  {(r['nome'] or '-')[:30]:<30} {r['status']:<9} {r['segundos']:>8.2f} "
+            f"{r['criadas']:>6} {r['mantidas']:>8} {r['removidas']:>6} {r['vagas_em_aberto']:>6}"
+        )
+        if r["erro"]:
+            click.echo(f"       erro: {r['erro']}")
+
+    falhas = sum(1 for r in resultados if r["status"] == "falha")
+    click.echo(f"{len(resultados)} paroquia(s), {falhas} falha(s).")
+    if falhas:
+        raise SystemExit(1)
+
+
+@notificacoes_cli.command("processar")
+@click.option("--max-lotes", type=int, default=None, help="Limite de lotes nesta execucao.")
+def processar_notificacoes_comando(max_lotes):
+    """Envia os pushes pendentes da outbox."""
+    from services.notificacao_outbox_service import drenar_outbox
+
+    resultado = drenar_outbox(max_lotes=max_lotes)
+    click.echo(
+        f"{resultado['lidas']} lida(s): {resultado['enviadas']} enviada(s), "
+        f"{resultado['reagendadas']} reagendada(s), {resultado['falhas']} falha(s)."
+    )
+
+
+@notificacoes_cli.command("limpar")
+@click.option("--dias", type=int, default=None, help="Idade minima das lidas (padrao: NOTIFICACAO_RETENCAO_DIAS).")
+def limpar_notificacoes_comando(dias):
+    """Apaga notificacoes lidas antigas, em lotes."""
+    from services.notification_manager import NotificationManager
+
+    removidas = NotificationManager.limpar_notificacoes_lidas(dias=dias)
+    click.echo(f"{removidas} notificacao(oes) lida(s) removida(s).")
+
+
+@notificacoes_cli.command("recontar")
+def recontar_notificacoes_comando():
+    """Recalcula o contador de nao lidas de cada ministro."""
+    from services.notification_manager import NotificationManager
+
+    ministros = NotificationManager.recontar_nao_lidas()
+    db.session.commit()
+    click.echo(f"Contador de nao lidas recalculado para {ministros} ministro(s).")
+
+
+@lembretes_cli.command("reagendar")
+def reagendar_lembretes_comando():
+    """Recalcula o momento do lembrete das escalas de hoje em diante."""
+    from services.lembrete_missa_service import reagendar_lembretes
+
+    missas = reagendar_lembretes()
+    db.session.commit()
+    click.echo(f"Lembretes reagendados para {missas} missa(s).")
+
+
+@jobs_cli.command("limpar")
+@click.option("--dias", type=int, default=None, help="Mantem os ultimos N dias (padrao: JOB_RUNS_RETENCAO_DIAS).")
+def limpar_jobs_comando(dias):
+    """Apaga execucoes antigas de job_runs."""
+    from services.job_run_service import limpar_execucoes
+
+    removidas = limpar_execucoes(dias)
+    db.session.commit()
+    click.echo(f"{removidas} execucao(oes) removida(s).")
+
+
+@rifas_cli.command("reconciliar-estoque")
+@click.option("--campanha", "campanha_id", default=None, help="Reconcilia apenas esta campanha.")
+def reconciliar_estoque_comando(campanha_id):
+    """Recalcula os contadores de rifas_estoque a partir da tabela rifas."""
+    from rifas.estoque import reconstruir_estoque
+
+    campanhas = reconstruir_estoque(campanha_id)
+    db.session.commit()
+    click.echo(f"Estoque reconciliado para {campanhas} campanha(s).")
+
+
+def registrar_comandos(app):
+    app.cli.add_command(metricas_cli)
+    app.cli.add_command(escala_cli)
+    app.cli.add_command(notificacoes_cli)
+    app.cli.add_command(lembretes_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(rifas_cli)
@@ -93,6 +93,12 @@ class Config:
     RIFA_VALOR_UNITARIO = float(os.environ.get('RIFA_VALOR_UNITARIO', '10'))
     RIFA_TOTAL_NUMEROS = int(os.environ.get('RIFA_TOTAL_NUMEROS', '1000'))
     RIFA_RESERVA_MINUTOS = int(os.environ.get('RIFA_RESERVA_MINUTOS', '60'))
+    # Prazo da reserva enquanto a cobranca PIX e criada no gateway.
+    RIFA_RESERVA_COBRANCA_MINUTOS = int(os.environ.get('RIFA_RESERVA_COBRANCA_MINUTOS', '10'))
+    # Alocacao de numeros por shards e cache do mapa publico de disponibilidade.
+    RIFA_ALOCACAO_SHARDS = int(os.environ.get('RIFA_ALOCACAO_SHARDS', '16'))
+    RIFA_ALOCACAO_SHARD_MINIMO = int(os.environ.get('RIFA_ALOCACAO_SHARD_MINIMO', '50'))
+    RIFA_MAPA_CACHE_SEGUNDOS = int(os.environ.get('RIFA_MAPA_CACHE_SEGUNDOS', '15'))
     RIFA_STORAGE_MODE = os.environ.get('RIFA_STORAGE_MODE', 'local').strip().lower()
     RIFA_PDF_DIR = os.environ.get('RIFA_PDF_DIR', str(Path('instance') / 'rifas')).strip()
     RIFA_SUPABASE_URL = os.environ.get('RIFA_SUPABASE_URL', '').strip()
@@ -107,7 +113,16 @@ class Config:
     WHATSAPP_TEMPLATE_NAME = os.environ.get('WHATSAPP_TEMPLATE_NAME', '').strip()
     WHATSAPP_TEMPLATE_LANGUAGE = os.environ.get('WHATSAPP_TEMPLATE_LANGUAGE', 'pt_BR').strip()
     WHATSAPP_TEMPLATE_BUTTON_URL = os.environ.get('WHATSAPP_TEMPLATE_BUTTON_URL', '').strip()
+    WHATSAPP_CONCORRENCIA = int(os.environ.get('WHATSAPP_CONCORRENCIA', '4'))
+    WHATSAPP_MENSAGENS_POR_SEGUNDO = float(os.environ.get('WHATSAPP_MENSAGENS_POR_SEGUNDO', '20'))
+    WHATSAPP_TIMEOUT_CONEXAO = float(os.environ.get('WHATSAPP_TIMEOUT_CONEXAO', '5'))
+    WHATSAPP_TIMEOUT_LEITURA = float(os.environ.get('WHATSAPP_TIMEOUT_LEITURA', '15'))
     SCHEDULER_TIMEZONE = os.environ.get('SCHEDULER_TIMEZONE', 'America/Sao_Paulo').strip()
+    SGME_PAPEL = os.environ.get('SGME_PAPEL', 'completo').strip().lower()
+    # Chave do pg_advisory_lock que elege o processo do scheduler ("SGME").
+    SCHEDULER_LIDER_CHAVE = int(os.environ.get('SCHEDULER_LIDER_CHAVE', '1397180741'))
+    SCHEDULER_LIDER_INTERVALO = int(os.environ.get('SCHEDULER_LIDER_INTERVALO', '30'))
+    SCHEDULER_LOCK_ARQUIVO = os.environ.get('SCHEDULER_LOCK_ARQUIVO', '').strip()
 
     ESCALA_SCORE_DIAS_SEM_SERVIR_PESO = float(os.environ.get('ESCALA_SCORE_DIAS_SEM_SERVIR_PESO', '2.8'))
     ESCALA_SCORE_CONFIABILIDADE_PESO = float(os.environ.get('ESCALA_SCORE_CONFIABILIDADE_PESO', '10'))
@@ -122,6 +137,33 @@ class Config:
     ESCALA_JANELA_7_DIAS = int(os.environ.get('ESCALA_JANELA_7_DIAS', '7'))
     ESCALA_JANELA_14_DIAS = int(os.environ.get('ESCALA_JANELA_14_DIAS', '14'))
     ESCALA_CASAL_PARES = os.environ.get('ESCALA_CASAL_PARES', '')
+    # Processos (spawn) por simulacao de pesos; 1 roda dentro da requisicao.
+    ESCALA_SIMULACAO_PROCESSOS = int(os.environ.get('ESCALA_SIMULACAO_PROCESSOS', '1'))
+    # Processos (spawn) do comando "flask escala gerar-lote"; 1 roda no proprio processo.
+    ESCALA_LOTE_PROCESSOS = int(os.environ.get('ESCALA_LOTE_PROCESSOS', '1'))
+    ESCALA_OTIMIZADA_TEMPO_LIMITE = float(os.environ.get('ESCALA_OTIMIZADA_TEMPO_LIMITE', '5'))
+    ESCALA_OTIMIZADA_PESO_RODADA = int(os.environ.get('ESCALA_OTIMIZADA_PESO_RODADA', '10000'))
+    ESCALA_OTIMIZADA_PESO_SEMANA = int(os.environ.get('ESCALA_OTIMIZADA_PESO_SEMANA', '3000'))
+    ESCALA_OTIMIZADA_PESO_DOMINGO = int(os.environ.get('ESCALA_OTIMIZADA_PESO_DOMINGO', '5000'))
+    ESCALA_NOTIFICACAO_JANELA_SEGUNDOS = int(os.environ.get('ESCALA_NOTIFICACAO_JANELA_SEGUNDOS', '120'))
+    SUBSTITUICAO_AUTOMATICA_MINUTOS = int(os.environ.get('SUBSTITUICAO_AUTOMATICA_MINUTOS', '10'))
+    SUBSTITUICAO_AUTOMATICA_RETENTATIVA_MINUTOS = int(os.environ.get('SUBSTITUICAO_AUTOMATICA_RETENTATIVA_MINUTOS', '30'))
+    SUBSTITUICAO_AUTOMATICA_LOTE = int(os.environ.get('SUBSTITUICAO_AUTOMATICA_LOTE', '200'))
+    LEMBRETE_MISSA_ANTECEDENCIA_MINUTOS = int(os.environ.get('LEMBRETE_MISSA_ANTECEDENCIA_MINUTOS', '60'))
+    LEMBRETE_MISSA_LOTE = int(os.environ.get('LEMBRETE_MISSA_LOTE', '500'))
+    JOB_RUNS_RETENCAO_DIAS = int(os.environ.get('JOB_RUNS_RETENCAO_DIAS', '30'))
+    JOB_RUNS_JANELA_DIAS = int(os.environ.get('JOB_RUNS_JANELA_DIAS', '7'))
+    # Execucao "executando" mais antiga que isso e tratada como abandonada.
+    JOB_RUNS_SOBREPOSICAO_HORAS = int(os.environ.get('JOB_RUNS_SOBREPOSICAO_HORAS', '6'))
+    NOTIFICACAO_RETENCAO_DIAS = int(os.environ.get('NOTIFICACAO_RETENCAO_DIAS', '90'))
+    NOTIFICACAO_RETENCAO_LOTE = int(os.environ.get('NOTIFICACAO_RETENCAO_LOTE', '1000'))
+    NOTIFICACAO_PAGINA = int(os.environ.get('NOTIFICACAO_PAGINA', '20'))
+    NOTIFICACAO_OUTBOX_INTERVALO = int(os.environ.get('NOTIFICACAO_OUTBOX_INTERVALO', '30'))
+    NOTIFICACAO_OUTBOX_LOTE = int(os.environ.get('NOTIFICACAO_OUTBOX_LOTE', '500'))
+    NOTIFICACAO_OUTBOX_MAX_LOTES = int(os.environ.get('NOTIFICACAO_OUTBOX_MAX_LOTES', '20'))
+    NOTIFICACAO_OUTBOX_MAX_TENTATIVAS = int(os.environ.get('NOTIFICACAO_OUTBOX_MAX_TENTATIVAS', '5'))
+    NOTIFICACAO_OUTBOX_BACKOFF_SEGUNDOS = int(os.environ.get('NOTIFICACAO_OUTBOX_BACKOFF_SEGUNDOS', '30'))
+    NOTIFICACAO_OUTBOX_BACKOFF_MAXIMO = int(os.environ.get('NOTIFICACAO_OUTBOX_BACKOFF_MAXIMO', '3600'))
 
     SQLALCHEMY_ENGINE_OPTIONS = {}
     if SQLALCHEMY_DATABASE_URI.startswith('postgresql://'):
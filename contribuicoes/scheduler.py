@@ -1,7 +1,7 @@
 import logging
 from datetime import datetime
 
-from extensions import db
+from services.job_run_service import execucao_job
 from .services import verificar_contribuicoes_pendentes
 
 
@@ -9,13 +9,10 @@ logger = logging.getLogger(__name__)
 
 
 def executar_verificacao_contribuicoes(app):
-    with app.app_context():
-        try:
-            total = verificar_contribuicoes_pendentes()
-            logger.info("Contribuicoes PIX verificadas em %s. confirmadas=%s", datetime.utcnow(), total)
-        except Exception as exc:
-            db.session.rollback()
-            logger.error("Erro ao verificar contribuicoes PIX: %s", exc)
+    with execucao_job(app, "verificar_pix_contribuicoes") as execucao:
+        total = verificar_contribuicoes_pendentes()
+        execucao.itens = total
+        logger.info("Contribuicoes PIX verificadas em %s. confirmadas=%s", datetime.utcnow(), total)
 
 
 def registrar_agendamentos_contribuicoes(scheduler, app):
@@ -21,6 +21,7 @@ from rifas.payments import (
     get_pix_gateway,
     _gerar_qr_code_base64,
 )
+from utils.periodo_utils import filtro_ano, filtro_mes
 
 
 from .models import CategoriaContribuicao, Contribuicao, Dizimista, ReciboContribuicao
@@ -449,10 +450,12 @@ def consulta_relatorio(args):
         query = query.where(Contribuicao.dizimista_id == int(args["dizimista_id"]))
     if args.get("categoria_id"):
         query = query.where(Contribuicao.categoria_id == int(args["categoria_id"]))
-    if args.get("mes"):
+    if args.get("mes") and args.get("ano"):
+        query = query.where(filtro_mes(Contribuicao.data_pagamento, args["mes"], args["ano"]))
+    elif args.get("ano"):
+        query = query.where(filtro_ano(Contribuicao.data_pagamento, args["ano"]))
+    elif args.get("mes"):
         query = query.where(extract("month", Contribuicao.data_pagamento) == int(args["mes"]))
-    if args.get("ano"):
-        query = query.where(extract("year", Contribuicao.data_pagamento) == int(args["ano"]))
 
     return db.session.execute(query.order_by(Contribuicao.data_pagamento.desc())).scalars().all()
 
@@ -628,7 +631,7 @@ def demonstrativo_anual(dizimista_id: int, ano: int):
         .where(
             Contribuicao.dizimista_id == dizimista.id,
             Contribuicao.status == STATUS_PAGO,
-            extract("year", Contribuicao.data_pagamento) == ano,
+            filtro_ano(Contribuicao.data_pagamento, ano),
         )
         .order_by(Contribuicao.data_pagamento.asc())
     ).scalars().all()
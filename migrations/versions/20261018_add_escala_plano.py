@@ -0,0 +1,43 @@
+"""add escala_plano staging table
+
+Revision ID: 20261018_plano
+Revises: 20261018_metricas
+Create Date: 2026-10-18 00:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20261018_plano"
+down_revision = "20261018_metricas"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "escala_plano",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("id_paroquia", sa.Integer(), nullable=False),
+        sa.Column("ano", sa.Integer(), nullable=False),
+        sa.Column("mes", sa.Integer(), nullable=False),
+        sa.Column("id_missa", sa.Integer(), nullable=False),
+        sa.Column("id_ministro", sa.Integer(), nullable=False),
+        sa.Column("criado_em", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["id_missa"], ["missa.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["id_ministro"], ["ministro.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["id_paroquia"], ["paroquia.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_escala_plano_paroquia_periodo",
+        "escala_plano",
+        ["id_paroquia", "ano", "mes"],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_escala_plano_paroquia_periodo", table_name="escala_plano")
+    op.drop_table("escala_plano")
@@ -0,0 +1,41 @@
+"""add job_runs ledger
+
+Revision ID: 20261018_job_runs
+Revises: 20261018_pedido_vence
+Create Date: 2026-10-18 01:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20261018_job_runs"
+down_revision = "20261018_pedido_vence"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "job_runs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("job", sa.String(length=100), nullable=False),
+        sa.Column("processo", sa.String(length=100), nullable=True),
+        sa.Column("iniciado_em", sa.DateTime(), nullable=False),
+        sa.Column("finalizado_em", sa.DateTime(), nullable=True),
+        sa.Column("duracao_segundos", sa.Float(), nullable=True),
+        sa.Column("itens", sa.Integer(), nullable=True),
+        sa.Column("status", sa.String(length=20), nullable=False),
+        sa.Column("erro", sa.Text(), nullable=True),
+        sa.Column("sobreposto", sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_job_runs_job_inicio", "job_runs", ["job", "iniciado_em"])
+    op.create_index("ix_job_runs_inicio", "job_runs", ["iniciado_em"])
+
+
+def downgrade():
+    op.drop_index("ix_job_runs_inicio", table_name="job_runs")
+    op.drop_index("ix_job_runs_job_inicio", table_name="job_runs")
+    op.drop_table("job_runs")
@@ -0,0 +1,34 @@
+"""add reminder schedule columns to escala
+
+Revision ID: 20261018_lembrete
+Revises: 20261018_outbox_agrup
+Create Date: 2026-10-18 01:00:00.000000
+
+Escalas ja existentes ficam com lembrete_em nulo; rode
+``flask lembretes reagendar`` depois do upgrade para agendar as futuras.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20261018_lembrete"
+down_revision = "20261018_outbox_agrup"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("escala", sa.Column("lembrete_em", sa.DateTime(), nullable=True))
+    op.add_column(
+        "escala",
+        sa.Column("lembrete_enviado", sa.Boolean(), nullable=False, server_default=sa.false()),
+    )
+    op.alter_column("escala", "lembrete_enviado", server_default=None)
+    op.create_index("ix_escala_lembrete_fila", "escala", ["lembrete_enviado", "lembrete_em"])
+
+
+def downgrade():
+    op.drop_index("ix_escala_lembrete_fila", table_name="escala")
+    op.drop_column("escala", "lembrete_enviado")
+    op.drop_column("escala", "lembrete_em")
@@ -0,0 +1,70 @@
+"""add ministro_metricas
+
+Revision ID: 20261018_metricas
+Revises: 20260616_contrib
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20261018_metricas"
+down_revision = "20260616_contrib"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "ministro_metricas",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("id_paroquia", sa.Integer(), nullable=False),
+        sa.Column("id_ministro", sa.Integer(), nullable=False),
+        sa.Column("ano", sa.Integer(), nullable=False),
+        sa.Column("mes", sa.Integer(), nullable=False),
+        sa.Column("escalas", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("confirmadas", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("domingos", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("ultima_data", sa.Date(), nullable=True),
+        sa.Column("atualizado_em", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["id_ministro"], ["ministro.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["id_paroquia"], ["paroquia.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("id_paroquia", "id_ministro", "ano", "mes", name="uq_ministro_metricas_mes"),
+    )
+    op.create_index(
+        "ix_ministro_metricas_paroquia_periodo",
+        "ministro_metricas",
+        ["id_paroquia", "ano", "mes"],
+    )
+
+    # Popula a tabela com o historico ja existente.
+    op.execute("""
+        INSERT INTO ministro_metricas
+            (id_paroquia, id_ministro, ano, mes, escalas, confirmadas, domingos, ultima_data, atualizado_em)
+        SELECT
+            e.id_paroquia,
+            e.id_ministro,
+            CAST(EXTRACT(YEAR FROM m.data) AS INTEGER),
+            CAST(EXTRACT(MONTH FROM m.data) AS INTEGER),
+            COUNT(e.id),
+            SUM(CASE WHEN e.confirmado THEN 1 ELSE 0 END),
+            SUM(CASE WHEN EXTRACT(DOW FROM m.data) = 0 THEN 1 ELSE 0 END),
+            MAX(m.data),
+            NOW()
+        FROM escala e
+        JOIN missa m ON m.id = e.id_missa
+        WHERE e.id_paroquia IS NOT NULL AND e.id_ministro IS NOT NULL
+        GROUP BY
+            e.id_paroquia,
+            e.id_ministro,
+            CAST(EXTRACT(YEAR FROM m.data) AS INTEGER),
+            CAST(EXTRACT(MONTH FROM m.data) AS INTEGER)
+    """)
+
+
+def downgrade():
+    op.drop_index("ix_ministro_metricas_paroquia_periodo", table_name="ministro_metricas")
+    op.drop_table("ministro_metricas")
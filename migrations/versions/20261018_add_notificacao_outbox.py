@@ -0,0 +1,47 @@
+"""add notificacao_outbox
+
+Revision ID: 20261018_outbox
+Revises: 20261018_periodo
+Create Date: 2026-10-18 00:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20261018_outbox"
+down_revision = "20261018_periodo"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "notificacao_outbox",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("canal", sa.String(length=20), nullable=False, server_default="push"),
+        sa.Column("destino", sa.String(length=500), nullable=False),
+        sa.Column("usuario_id", sa.Integer(), nullable=True),
+        sa.Column("titulo", sa.String(length=200), nullable=True),
+        sa.Column("mensagem", sa.Text(), nullable=True),
+        sa.Column("url", sa.String(length=500), nullable=True),
+        sa.Column("status", sa.String(length=20), nullable=False, server_default="pendente"),
+        sa.Column("tentativas", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("proxima_tentativa_em", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("ultimo_erro", sa.Text(), nullable=True),
+        sa.Column("criada_em", sa.DateTime(), nullable=True),
+        sa.Column("enviada_em", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["usuario_id"], ["ministro.id"], ondelete="SET NULL"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_notificacao_outbox_fila",
+        "notificacao_outbox",
+        ["status", "proxima_tentativa_em"],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_notificacao_outbox_fila", table_name="notificacao_outbox")
+    op.drop_table("notificacao_outbox")
@@ -0,0 +1,32 @@
+"""add digest grouping columns to notificacao_outbox
+
+Revision ID: 20261018_outbox_agrup
+Revises: 20261018_outbox
+Create Date: 2026-10-18 00:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20261018_outbox_agrup"
+down_revision = "20261018_outbox"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("notificacao_outbox", sa.Column("chave_agrupamento", sa.String(length=100), nullable=True))
+    op.add_column("notificacao_outbox", sa.Column("itens", sa.JSON(), nullable=True))
+    op.create_index(
+        "ix_notificacao_outbox_agrupamento",
+        "notificacao_outbox",
+        ["chave_agrupamento", "status"],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_notificacao_outbox_agrupamento", table_name="notificacao_outbox")
+    op.drop_column("notificacao_outbox", "itens")
+    op.drop_column("notificacao_outbox", "chave_agrupamento")
@@ -0,0 +1,44 @@
+"""add unread counter to ministro and notificacoes indexes
+
+Revision ID: 20261018_notif_contador
+Revises: 20261018_job_runs
+Create Date: 2026-10-18 02:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20261018_notif_contador"
+down_revision = "20261018_job_runs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "ministro",
+        sa.Column("notificacoes_nao_lidas", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.execute(
+        """
+        UPDATE ministro SET notificacoes_nao_lidas = (
+            SELECT COUNT(*) FROM notificacoes
+            WHERE notificacoes.usuario_id = ministro.id
+              AND notificacoes.lida = false
+        )
+        """
+    )
+    op.create_index(
+        "ix_notificacoes_usuario_criada",
+        "notificacoes",
+        ["usuario_id", "criada_em", "id"],
+    )
+    op.create_index("ix_notificacoes_lida_criada", "notificacoes", ["lida", "criada_em"])
+
+
+def downgrade():
+    op.drop_index("ix_notificacoes_lida_criada", table_name="notificacoes")
+    op.drop_index("ix_notificacoes_usuario_criada", table_name="notificacoes")
+    op.drop_column("ministro", "notificacoes_nao_lidas")
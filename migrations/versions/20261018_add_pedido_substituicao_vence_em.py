@@ -0,0 +1,33 @@
+"""add due time to pedido_substituicao
+
+Revision ID: 20261018_pedido_vence
+Revises: 20261018_lembrete
+Create Date: 2026-10-18 01:20:00.000000
+
+Pedidos abertos existentes vencem em ``criado_em``: os que passaram dos 10
+minutos entram na proxima rodada, como antes.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20261018_pedido_vence"
+down_revision = "20261018_lembrete"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("pedido_substituicao", sa.Column("vence_em", sa.DateTime(), nullable=True))
+    op.execute("UPDATE pedido_substituicao SET vence_em = criado_em WHERE status = 'aberto'")
+    op.create_index(
+        "ix_pedido_substituicao_vencimento",
+        "pedido_substituicao",
+        ["status", "vence_em"],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_pedido_substituicao_vencimento", table_name="pedido_substituicao")
+    op.drop_column("pedido_substituicao", "vence_em")
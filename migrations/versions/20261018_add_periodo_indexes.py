@@ -0,0 +1,25 @@
+"""add composite indexes for period filters
+
+Revision ID: 20261018_periodo
+Revises: 20261018_plano
+Create Date: 2026-10-18 00:20:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "20261018_periodo"
+down_revision = "20261018_plano"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_missa_paroquia_data", "missa", ["id_paroquia", "data"])
+    op.create_index("ix_escala_paroquia_missa", "escala", ["id_paroquia", "id_missa"])
+
+
+def downgrade():
+    op.drop_index("ix_escala_paroquia_missa", table_name="escala")
+    op.drop_index("ix_missa_paroquia_data", table_name="missa")
@@ -0,0 +1,28 @@
+"""add reservation columns to rifas
+
+Revision ID: 20261018_rifa_reserva
+Revises: 20261018_notif_contador
+Create Date: 2026-10-18 02:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20261018_rifa_reserva"
+down_revision = "20261018_notif_contador"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("rifas", sa.Column("reserva_id", sa.String(length=36), nullable=True))
+    op.add_column("rifas", sa.Column("reservado_ate", sa.DateTime(), nullable=True))
+    op.create_index(op.f("ix_rifas_reserva_id"), "rifas", ["reserva_id"], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f("ix_rifas_reserva_id"), table_name="rifas")
+    op.drop_column("rifas", "reservado_ate")
+    op.drop_column("rifas", "reserva_id")
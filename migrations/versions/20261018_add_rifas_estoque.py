@@ -0,0 +1,52 @@
+"""add rifas_estoque counters per campaign
+
+Revision ID: 20261018_rifas_estoque
+Revises: 20261018_rifa_reserva
+Create Date: 2026-10-18 03:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20261018_rifas_estoque"
+down_revision = "20261018_rifa_reserva"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "rifas_estoque",
+        sa.Column("campanha_id", sa.String(length=36), nullable=False),
+        sa.Column("criados", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("livres", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("reservados", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("pagos", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("proximo_numero", sa.Integer(), nullable=False),
+        sa.Column("atualizado_em", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["campanha_id"], ["rifas_campanhas.id"]),
+        sa.PrimaryKeyConstraint("campanha_id"),
+    )
+
+    # Campanha sem rifas continua a numeracao global, como o estoque fazia.
+    op.execute(
+        """
+        INSERT INTO rifas_estoque (campanha_id, criados, livres, reservados, pagos, proximo_numero, atualizado_em)
+        SELECT c.id,
+               COUNT(r.id),
+               SUM(CASE WHEN r.status = 'disponivel' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN r.status = 'reservado' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN r.status = 'pago' THEN 1 ELSE 0 END),
+               COALESCE(MAX(r.numero), (SELECT COALESCE(MAX(numero), 60000) FROM rifas)) + 1,
+               CURRENT_TIMESTAMP
+        FROM rifas_campanhas c
+        LEFT JOIN rifas r ON r.campanha_id = c.id
+        GROUP BY c.id
+        """
+    )
+
+
+def downgrade():
+    op.drop_table("rifas_estoque")
@@ -0,0 +1,28 @@
+"""add campaign/status/number index for shard allocation
+
+Revision ID: 20261018_rifas_alocacao
+Revises: 20261018_rifas_estoque
+Create Date: 2026-10-18 03:30:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "20261018_rifas_alocacao"
+down_revision = "20261018_rifas_estoque"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_rifas_campanha_status_numero",
+        "rifas",
+        ["campanha_id", "status", "numero"],
+        unique=False,
+    )
+
+
+def downgrade():
+    op.drop_index("ix_rifas_campanha_status_numero", table_name="rifas")
@@ -49,6 +49,8 @@ class Ministro(UserMixin, db.Model):
     comunidade_bairro = db.Column(db.String(120))
     firebase_token = db.Column(db.String(255))
     notificacoes_ativas = db.Column(db.Boolean, default=True)
+    # Mantido por NotificationManager a cada notificacao criada ou lida.
+    notificacoes_nao_lidas = db.Column(db.Integer, default=0, nullable=False, server_default="0")
 
     # 🔐 CAMPOS DE LOGIN
     senha_hash = db.Column(db.String(200), nullable=True)
@@ -89,6 +91,10 @@ class Missa(db.Model):
     latitude = db.Column(db.String(50))
     longitude = db.Column(db.String(50))  
 
+    __table_args__ = (
+        db.Index("ix_missa_paroquia_data", "id_paroquia", "data"),
+    )
+
 class EscalaFixa(db.Model):
     id = db.Column(db.Integer, primary_key=True)
 
@@ -114,6 +120,9 @@ class Escala(db.Model):
     confirmado = db.Column(db.Boolean, default=False)
     presente = db.Column(db.Boolean, default=False)
     notificacao_enviada = db.Column(db.Boolean, default=False, nullable=False, index=True)
+    # Momento (UTC) do push de lembrete, calculado quando a escala ou a missa muda.
+    lembrete_em = db.Column(db.DateTime, nullable=True)
+    lembrete_enviado = db.Column(db.Boolean, default=False, nullable=False)
 
     id_paroquia = db.Column(db.Integer, db.ForeignKey('paroquia.id'))
 
@@ -126,6 +135,63 @@ class Escala(db.Model):
         default=lambda: str(uuid.uuid4())
     )
 
+    __table_args__ = (
+        db.Index("ix_escala_paroquia_missa", "id_paroquia", "id_missa"),
+        db.Index("ix_escala_lembrete_fila", "lembrete_enviado", "lembrete_em"),
+    )
+
+
+class MinistroMetricas(db.Model):
+    """Contadores de escalas de um ministro em um mes (modelo de leitura)."""
+
+    __tablename__ = "ministro_metricas"
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    id_paroquia = db.Column(db.Integer, db.ForeignKey("paroquia.id"), nullable=False)
+    id_ministro = db.Column(
+        db.Integer,
+        db.ForeignKey("ministro.id", ondelete="CASCADE"),
+        nullable=False
+    )
+
+    ano = db.Column(db.Integer, nullable=False)
+    mes = db.Column(db.Integer, nullable=False)
+
+    escalas = db.Column(db.Integer, nullable=False, default=0)
+    confirmadas = db.Column(db.Integer, nullable=False, default=0)
+    domingos = db.Column(db.Integer, nullable=False, default=0)
+    ultima_data = db.Column(db.Date)
+
+    atualizado_em = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint("id_paroquia", "id_ministro", "ano", "mes", name="uq_ministro_metricas_mes"),
+        db.Index("ix_ministro_metricas_paroquia_periodo", "id_paroquia", "ano", "mes"),
+    )
+
+
+class EscalaPlano(db.Model):
+    """Atribuicao planejada (staging) de uma geracao mensal ainda nao aplicada."""
+
+    __tablename__ = "escala_plano"
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    id_paroquia = db.Column(db.Integer, db.ForeignKey("paroquia.id"), nullable=False)
+    ano = db.Column(db.Integer, nullable=False)
+    mes = db.Column(db.Integer, nullable=False)
+
+    id_missa = db.Column(db.Integer, db.ForeignKey("missa.id", ondelete="CASCADE"), nullable=False)
+    id_ministro = db.Column(db.Integer, db.ForeignKey("ministro.id", ondelete="CASCADE"), nullable=False)
+
+    criado_em = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index("ix_escala_plano_paroquia_periodo", "id_paroquia", "ano", "mes"),
+    )
+
+
 class Indisponibilidade(db.Model):
     id = db.Column(db.Integer, primary_key=True)
 
@@ -397,11 +463,17 @@ class PedidoSubstituicao(db.Model):
     status = db.Column(db.String(20), default="aberto", nullable=False, index=True)
     criado_em = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     respondido_em = db.Column(db.DateTime, nullable=True)
+    # Quando a substituicao automatica pode agir (e a proxima tentativa).
+    vence_em = db.Column(db.DateTime, nullable=True)
 
     escala = db.relationship("Escala", foreign_keys=[id_escala])
     solicitante = db.relationship("Ministro", foreign_keys=[id_ministro_solicitante])
     aceite = db.relationship("Ministro", foreign_keys=[id_ministro_aceite])
 
+    __table_args__ = (
+        db.Index("ix_pedido_substituicao_vencimento", "status", "vence_em"),
+    )
+
 class Substituicao(db.Model):
     __tablename__ = "substituicoes"
 
@@ -551,6 +623,72 @@ class Notificacao(db.Model):
 
     ministro = db.relationship("Ministro")
 
+    __table_args__ = (
+        db.Index("ix_notificacoes_usuario_criada", "usuario_id", "criada_em", "id"),
+        db.Index("ix_notificacoes_lida_criada", "lida", "criada_em"),
+    )
+
+
+class NotificacaoOutbox(db.Model):
+    """Push pendente, gravado na mesma transacao da alteracao que o gerou."""
+
+    __tablename__ = "notificacao_outbox"
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    canal = db.Column(db.String(20), nullable=False, default="push")
+    destino = db.Column(db.String(500), nullable=False)
+    usuario_id = db.Column(db.Integer, db.ForeignKey("ministro.id", ondelete="SET NULL"))
+
+    titulo = db.Column(db.String(200))
+    mensagem = db.Column(db.Text)
+    url = db.Column(db.String(500))
+
+    # Pushes com a mesma chave pendentes na janela viram um resumo de ``itens``.
+    chave_agrupamento = db.Column(db.String(100))
+    itens = db.Column(db.JSON)
+
+    # pendente -> enviada | falha (esgotou as tentativas ou destino invalido)
+    status = db.Column(db.String(20), nullable=False, default="pendente")
+    tentativas = db.Column(db.Integer, nullable=False, default=0)
+    proxima_tentativa_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    ultimo_erro = db.Column(db.Text)
+
+    criada_em = db.Column(db.DateTime, default=datetime.utcnow)
+    enviada_em = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index("ix_notificacao_outbox_fila", "status", "proxima_tentativa_em"),
+        db.Index("ix_notificacao_outbox_agrupamento", "chave_agrupamento", "status"),
+    )
+
+
+class ExecucaoJob(db.Model):
+    """Uma execucao (ou execucao pulada) de um job do scheduler."""
+
+    __tablename__ = "job_runs"
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    job = db.Column(db.String(100), nullable=False)
+    processo = db.Column(db.String(100))
+
+    iniciado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finalizado_em = db.Column(db.DateTime)
+    duracao_segundos = db.Column(db.Float)
+    itens = db.Column(db.Integer)
+
+    # executando -> sucesso | erro; ignorado quando o scheduler nao rodou o job
+    status = db.Column(db.String(20), nullable=False, default="executando")
+    erro = db.Column(db.Text)
+    # Comecou (ou foi pulado) com outra execucao do mesmo job em andamento.
+    sobreposto = db.Column(db.Boolean, nullable=False, default=False)
+
+    __table_args__ = (
+        db.Index("ix_job_runs_job_inicio", "job", "iniciado_em"),
+        db.Index("ix_job_runs_inicio", "iniciado_em"),
+    )
+
 
 class ContaCorrente(db.Model):
     __tablename__ = "contas_correntes"
@@ -969,14 +1107,35 @@ class Rifa(db.Model):
     cliente_id = db.Column(db.String(36), db.ForeignKey("clientes.id"), index=True)
     pagamento_id = db.Column(db.String(36), db.ForeignKey("pagamentos.id"), index=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    # Reserva feita antes da cobranca PIX existir; limpa quando o pagamento e anexado.
+    reserva_id = db.Column(db.String(36), index=True)
+    reservado_ate = db.Column(db.DateTime)
 
     __table_args__ = (
         db.UniqueConstraint('campanha_id', 'numero', name='uq_rifa_campanha_numero'),
+        # Busca de livres por faixa de numeros (alocacao por shards).
+        db.Index('ix_rifas_campanha_status_numero', 'campanha_id', 'status', 'numero'),
     )
     campanha = db.relationship("RifaCampanha", back_populates="rifas", lazy="joined")
     cliente = db.relationship("ClienteRifa", back_populates="rifas", lazy="joined")
     pagamento = db.relationship("PagamentoRifa", back_populates="rifas", lazy="joined")
 
+
+class RifaEstoque(db.Model):
+    """Contadores da campanha, mantidos junto com as mudancas de ``Rifa.status``."""
+
+    __tablename__ = "rifas_estoque"
+
+    campanha_id = db.Column(db.String(36), db.ForeignKey("rifas_campanhas.id"), primary_key=True)
+    criados = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    livres = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    reservados = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    pagos = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # Numero seguinte ao ultimo criado para a campanha. Informativo: numeros
+    # novos sempre vem de ``proximo_numero_global``.
+    proximo_numero = db.Column(db.Integer, nullable=False)
+    atualizado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 from extensions import db
 
 class Comunidade(db.Model):
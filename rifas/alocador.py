@@ -0,0 +1,167 @@
+"""
+Alocacao de numeros livres por shards e mapa de disponibilidade.
+
+A faixa de numeros da campanha e dividida em ``RIFA_ALOCACAO_SHARDS`` partes.
+Cada compra comeca por um shard sorteado e so passa ao seguinte quando ele
+nao tem numeros livres suficientes, entao compradores simultaneos raramente
+disputam as mesmas linhas em ``SKIP LOCKED``. Campanhas pequenas (shards com
+menos de ``RIFA_ALOCACAO_SHARD_MINIMO`` numeros) usam menos shards.
+
+O mapa de disponibilidade e um par de bitmaps (livres e vendidos) da faixa
+da campanha, montado so com ``numero`` e ``status`` e guardado em memoria.
+A versao vem da linha de ``rifas_estoque``: depois de
+``RIFA_MAPA_CACHE_SEGUNDOS`` o mapa so e remontado se ela mudou.
+"""
+import base64
+import hashlib
+import math
+import random
+import time
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from extensions import db
+from models import Rifa
+from rifas.estoque import obter_estoque
+
+
+STATUS_DISPONIVEL = "disponivel"
+STATUS_PAGO = "pago"
+
+# campanha_id -> {"expira_em", "versao", "mapa"}
+_mapas_cache = {}
+
+
+def _cfg(chave, padrao):
+    return current_app.config.get(chave, padrao)
+
+
+def faixa_numeros(campanha_id, session=None):
+    """Menor e maior numero da campanha (pelo indice de campanha/numero)."""
+    session = session or db.session
+    return session.execute(
+        select(func.min(Rifa.numero), func.max(Rifa.numero)).where(Rifa.campanha_id == campanha_id)
+    ).one()
+
+
+def dividir_em_shards(inicio, fim):
+    """Lista de faixas ``(de, ate)`` inclusivas que cobrem ``inicio..fim``."""
+    total = fim - inicio + 1
+    shards = max(1, min(_cfg("RIFA_ALOCACAO_SHARDS", 16), total // _cfg("RIFA_ALOCACAO_SHARD_MINIMO", 50)))
+    largura = math.ceil(total / shards)
+    return [
+        (de, min(de + largura - 1, fim))
+        for de in range(inicio, fim + 1, largura)
+    ]
+
+
+def alocar_numeros(campanha_id, quantidade, session=None):
+    """
+    Seleciona ``quantidade`` rifas livres a partir de um shard sorteado.
+
+    Fora do SQLite as linhas ficam travadas com ``FOR UPDATE SKIP LOCKED``
+    ate o fim da transacao. Retorna linhas ``(id, numero)`` ordenadas pelo
+    numero; menos que ``quantidade`` se a campanha nao tiver livres.
+    """
+    session = session or db.session
+    inicio, fim = faixa_numeros(campanha_id, session=session)
+    if inicio is None:
+        return []
+
+    shards = dividir_em_shards(inicio, fim)
+    primeiro = random.randrange(len(shards))
+    travar = session.bind is not None and session.bind.dialect.name != "sqlite"
+
+    escolhidas = []
+    for passo in range(len(shards)):
+        de, ate = shards[(primeiro + passo) % len(shards)]
+        query = (
+            select(Rifa.id, Rifa.numero)
+            .where(
+                Rifa.campanha_id == campanha_id,
+                Rifa.status == STATUS_DISPONIVEL,
+                Rifa.numero.between(de, ate),
+            )
+            .order_by(Rifa.numero.asc())
+            .limit(quantidade - len(escolhidas))
+        )
+        if travar:
+            query = query.with_for_update(skip_locked=True)
+
+        escolhidas.extend(session.execute(query).all())
+        if len(escolhidas) >= quantidade:
+            break
+
+    return sorted(escolhidas, key=lambda linha: linha.numero)
+
+
+# MAPA DE DISPONIBILIDADE
+# --------------------------------------------------
+def _versao(estoque):
+    if estoque is None:
+        return "vazio"
+    chave = (
+        f"{estoque.criados}:{estoque.livres}:{estoque.reservados}:{estoque.pagos}:"
+        f"{estoque.atualizado_em.isoformat() if estoque.atualizado_em else ''}"
+    )
+    return hashlib.sha1(chave.encode("utf-8")).hexdigest()[:16]
+
+
+def _bits(deslocamentos, tamanho):
+    # Bit mais significativo primeiro: o bit i corresponde a inicio + i.
+    mapa = bytearray((tamanho + 7) // 8)
+    for deslocamento in deslocamentos:
+        mapa[deslocamento >> 3] |= 0x80 >> (deslocamento & 7)
+    return base64.b64encode(bytes(mapa)).decode("ascii")
+
+
+def montar_mapa(campanha_id, session=None):
+    session = session or db.session
+    versao = _versao(obter_estoque(campanha_id, session=session))
+    inicio, fim = faixa_numeros(campanha_id, session=session)
+    if inicio is None:
+        return {"campanha_id": campanha_id, "versao": versao, "inicio": None, "fim": None,
+                "livres": "", "vendidos": "", "total_livres": 0, "total_vendidos": 0}
+
+    livres, vendidos = [], []
+    for numero, status in session.execute(
+        select(Rifa.numero, Rifa.status).where(
+            Rifa.campanha_id == campanha_id,
+            Rifa.status.in_([STATUS_DISPONIVEL, STATUS_PAGO]),
+        )
+    ):
+        (livres if status == STATUS_DISPONIVEL else vendidos).append(numero - inicio)
+
+    tamanho = fim - inicio + 1
+    return {
+        "campanha_id": campanha_id,
+        "versao": versao,
+        "inicio": inicio,
+        "fim": fim,
+        "livres": _bits(livres, tamanho),
+        "vendidos": _bits(vendidos, tamanho),
+        "total_livres": len(livres),
+        "total_vendidos": len(vendidos),
+    }
+
+
+def mapa_disponibilidade(campanha_id):
+    """Mapa da campanha, do cache do processo enquanto valido."""
+    agora = time.monotonic()
+    em_cache = _mapas_cache.get(campanha_id)
+    if em_cache and agora < em_cache["expira_em"]:
+        return em_cache["mapa"]
+
+    validade = agora + _cfg("RIFA_MAPA_CACHE_SEGUNDOS", 15)
+    if em_cache and em_cache["versao"] == _versao(obter_estoque(campanha_id)):
+        em_cache["expira_em"] = validade
+        return em_cache["mapa"]
+
+    mapa = montar_mapa(campanha_id)
+    _mapas_cache[campanha_id] = {"expira_em": validade, "versao": mapa["versao"], "mapa": mapa}
+    return mapa
+
+
+def limpar_cache_mapas():
+    _mapas_cache.clear()
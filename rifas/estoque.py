@@ -0,0 +1,246 @@
+"""
+Contadores de estoque por campanha (tabela ``rifas_estoque``).
+
+A linha da campanha guarda quantos numeros foram criados, quantos estao
+livres, reservados e pagos, e o proximo numero a criar. Compra e paineis leem
+esses contadores em vez de contar a tabela ``rifas``.
+
+Os contadores andam na mesma transacao que muda ``Rifa.status``:
+
+* alteracoes feitas pelo ORM (``rifa.status = ...``) sao somadas pelos
+  eventos da sessao, com o status anterior lido do banco no ``before_flush``;
+* UPDATEs em lote chamam ``ajustar_estoque`` com a quantidade afetada.
+
+``reconstruir_estoque`` recalcula tudo a partir de ``rifas``
+(``flask rifas reconciliar-estoque``).
+
+A numeracao e global: numeros novos, de qualquer campanha, comecam depois
+do maior ``Rifa.numero`` (``proximo_numero_global``), para que campanhas
+nunca repitam numeros.
+"""
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from sqlalchemy import event, func, inspect, select, text, update
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Rifa, RifaCampanha, RifaEstoque
+
+
+# Numero anterior ao primeiro numero da primeira campanha.
+NUMERO_BASE = 60000
+
+# Chave do pg_advisory_xact_lock que serializa a criacao de numeros.
+CHAVE_NUMERACAO = 60000
+
+# Status de Rifa -> coluna do estoque. Os demais (bloco, comprovante,
+# cancelado) ficam so em ``criados``.
+COLUNAS_POR_STATUS = {
+    "disponivel": "livres",
+    "reservado": "reservados",
+    "pago": "pagos",
+}
+
+# Chave em Session.info com os ajustes do flush corrente.
+_PENDENTES = "rifas_estoque_pendentes"
+
+
+def _com_lock(query, session):
+    if session.bind and session.bind.dialect.name != "sqlite":
+        return query.with_for_update()
+    return query
+
+
+def proximo_numero_global(session=None):
+    """
+    Primeiro numero ainda nao usado por nenhuma campanha. No Postgres trava a
+    numeracao ate o fim da transacao, entao duas campanhas ampliadas ao mesmo
+    tempo nao recebem os mesmos numeros.
+    """
+    session = session or db.session
+    if session.bind and session.bind.dialect.name == "postgresql":
+        session.execute(text("SELECT pg_advisory_xact_lock(:chave)"), {"chave": CHAVE_NUMERACAO})
+    return (session.scalar(select(func.max(Rifa.numero))) or NUMERO_BASE) + 1
+
+
+def obter_estoque(campanha_id, session=None, travar=False):
+    session = session or db.session
+    # Os ajustes sao UPDATEs em lote; o objeto da sessao pode estar defasado.
+    query = select(RifaEstoque).where(RifaEstoque.campanha_id == campanha_id).execution_options(populate_existing=True)
+    if travar:
+        query = _com_lock(query, session)
+    return session.execute(query).scalar_one_or_none()
+
+
+def resumo_estoque(campanha_id=None, session=None):
+    """Soma dos contadores de uma campanha (ou de todas)."""
+    session = session or db.session
+    query = select(
+        func.coalesce(func.sum(RifaEstoque.criados), 0),
+        func.coalesce(func.sum(RifaEstoque.livres), 0),
+        func.coalesce(func.sum(RifaEstoque.reservados), 0),
+        func.coalesce(func.sum(RifaEstoque.pagos), 0),
+    )
+    if campanha_id is not None:
+        query = query.where(RifaEstoque.campanha_id == campanha_id)
+    criados, livres, reservados, pagos = session.execute(query).one()
+    return {"criados": criados, "livres": livres, "reservados": reservados, "pagos": pagos}
+
+
+def ajustar_estoque(campanha_id, session=None, **deltas):
+    """
+    Soma ``deltas`` (ex.: ``livres=-3, reservados=3``) na linha da campanha
+    com um UPDATE atomico. Nao faz commit.
+    """
+    deltas = {coluna: valor for coluna, valor in deltas.items() if valor}
+    if campanha_id is None or not deltas:
+        return 0
+    session = session or db.session
+    valores = {coluna: getattr(RifaEstoque, coluna) + valor for coluna, valor in deltas.items()}
+    return session.execute(
+        update(RifaEstoque)
+        .where(RifaEstoque.campanha_id == campanha_id)
+        .values(atualizado_em=datetime.utcnow(), **valores)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def registrar_transicao(campanha_id, de_status, para_status, quantidade, session=None):
+    """Ajusta o estoque de ``quantidade`` rifas que passaram de um status a outro."""
+    deltas = Counter()
+    if de_status in COLUNAS_POR_STATUS:
+        deltas[COLUNAS_POR_STATUS[de_status]] -= quantidade
+    if para_status in COLUNAS_POR_STATUS:
+        deltas[COLUNAS_POR_STATUS[para_status]] += quantidade
+    return ajustar_estoque(campanha_id, session=session, **deltas)
+
+
+def reconstruir_estoque(campanha_id=None, session=None):
+    """
+    Recalcula os contadores a partir de ``rifas``; cria as linhas que faltam.
+    ``proximo_numero`` nunca recua. Nao faz commit; retorna as campanhas.
+    """
+    session = session or db.session
+
+    campanhas = select(RifaCampanha.id)
+    contagem = select(Rifa.campanha_id, Rifa.status, func.count(Rifa.id), func.max(Rifa.numero)).group_by(
+        Rifa.campanha_id, Rifa.status
+    )
+    if campanha_id is not None:
+        campanhas = campanhas.where(RifaCampanha.id == campanha_id)
+        contagem = contagem.where(Rifa.campanha_id == campanha_id)
+
+    # Trava as linhas antes de contar para nao perder ajustes concorrentes.
+    linhas = _com_lock(select(RifaEstoque), session).execution_options(populate_existing=True)
+    if campanha_id is not None:
+        linhas = linhas.where(RifaEstoque.campanha_id == campanha_id)
+    existentes = {estoque.campanha_id: estoque for estoque in session.execute(linhas).scalars()}
+
+    totais = defaultdict(Counter)
+    maiores = {}
+    for id_campanha, status, quantidade, maior in session.execute(contagem):
+        totais[id_campanha]["criados"] += quantidade
+        if status in COLUNAS_POR_STATUS:
+            totais[id_campanha][COLUNAS_POR_STATUS[status]] += quantidade
+        maiores[id_campanha] = max(maiores.get(id_campanha, maior), maior)
+
+    ids = session.execute(campanhas).scalars().all()
+    maior_global = None
+    for id_campanha in ids:
+        if id_campanha in maiores:
+            proximo = maiores[id_campanha] + 1
+        else:
+            if maior_global is None:
+                maior_global = session.scalar(select(func.max(Rifa.numero))) or NUMERO_BASE
+            proximo = maior_global + 1
+
+        estoque = existentes.get(id_campanha)
+        if estoque is None:
+            estoque = RifaEstoque(campanha_id=id_campanha, proximo_numero=proximo)
+            session.add(estoque)
+        else:
+            estoque.proximo_numero = max(estoque.proximo_numero or 0, proximo)
+
+        contadores = totais.get(id_campanha, Counter())
+        estoque.criados = contadores["criados"]
+        estoque.livres = contadores["livres"]
+        estoque.reservados = contadores["reservados"]
+        estoque.pagos = contadores["pagos"]
+        estoque.atualizado_em = datetime.utcnow()
+
+    session.flush()
+    return len(ids)
+
+
+def garantir_estoque(campanha_id, session=None, travar=False):
+    """Linha de estoque da campanha, criada a partir de ``rifas`` se faltar."""
+    session = session or db.session
+    estoque = obter_estoque(campanha_id, session=session, travar=travar)
+    if estoque is None:
+        reconstruir_estoque(campanha_id, session=session)
+        estoque = obter_estoque(campanha_id, session=session, travar=travar)
+    return estoque
+
+
+# EVENTOS DA SESSAO
+# --------------------------------------------------
+def _status_alterado(obj):
+    estado = inspect(obj)
+    return any(estado.attrs[nome].history.has_changes() for nome in ("status", "campanha_id"))
+
+
+def _somar(deltas, campanha_id, status, sinal):
+    if campanha_id is None:
+        return
+    deltas[campanha_id]["criados"] += sinal
+    coluna = COLUNAS_POR_STATUS.get(status or "disponivel")
+    if coluna:
+        deltas[campanha_id][coluna] += sinal
+
+
+@event.listens_for(Session, "before_flush")
+def _coletar_transicoes(session, flush_context, instances):
+    novas = [obj for obj in session.new if isinstance(obj, Rifa)]
+    removidas = [obj for obj in session.deleted if isinstance(obj, Rifa)]
+    alteradas = [
+        obj for obj in session.dirty
+        if isinstance(obj, Rifa) and obj not in session.new and inspect(obj).key is not None and _status_alterado(obj)
+    ]
+    if not (novas or removidas or alteradas):
+        return
+
+    deltas = session.info.setdefault(_PENDENTES, defaultdict(Counter))
+    for obj in novas:
+        _somar(deltas, obj.campanha_id, obj.status, +1)
+
+    existentes = {obj.id: obj for obj in alteradas + removidas}
+    if not existentes:
+        return
+
+    # O historico do atributo nao traz o valor anterior quando o objeto
+    # estava expirado ou foi mudado por UPDATE em lote; le do banco.
+    with session.no_autoflush:
+        anteriores = session.execute(
+            select(Rifa.id, Rifa.campanha_id, Rifa.status).where(Rifa.id.in_(existentes.keys()))
+        ).all()
+
+    for id_rifa, campanha_id, status in anteriores:
+        _somar(deltas, campanha_id, status, -1)
+        obj = existentes[id_rifa]
+        if obj not in session.deleted:
+            _somar(deltas, obj.campanha_id, obj.status, +1)
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _aplicar_transicoes(session, flush_context):
+    deltas = session.info.pop(_PENDENTES, None)
+    if not deltas:
+        return
+    for campanha_id, colunas in deltas.items():
+        ajustar_estoque(campanha_id, session=session, **colunas)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _descartar_transicoes(session, previous_transaction):
+    session.info.pop(_PENDENTES, None)
@@ -1,3 +1,3 @@
-from models import BlocoRifa, ClienteRifa, Equipe, PagamentoRifa, Rifa, Vendedor
+from models import BlocoRifa, ClienteRifa, Equipe, PagamentoRifa, Rifa, RifaEstoque, Vendedor
 
-__all__ = ["ClienteRifa", "PagamentoRifa", "Rifa", "Equipe", "Vendedor", "BlocoRifa"]
+__all__ = ["ClienteRifa", "PagamentoRifa", "Rifa", "RifaEstoque", "Equipe", "Vendedor", "BlocoRifa"]
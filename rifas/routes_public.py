@@ -1,7 +1,7 @@
 ﻿from extensions import db, login_manager
 from pathlib import Path
 from urllib.parse import quote
-from flask import Blueprint, jsonify, render_template, request, send_file, session
+from flask import Blueprint, current_app, jsonify, render_template, request, send_file, session
 from models import PagamentoRifa, ClienteRifa
 from rifas.services import cancelar_pagamentos_expirados
 from datetime import datetime, timedelta
@@ -10,6 +10,7 @@ from rifas.services import (
     RifaSchemaMissingError,
     generate_vendor_link,
     get_payment,
+    get_public_availability_map,
     get_public_page_data,
     get_vendedor_by_codigo,
     payment_summary,
@@ -122,6 +123,23 @@ def comprar_rifa():
         db.session.rollback()
         return jsonify({"erro": str(exc)}), 400
     
+@rifas_public_bp.route("/rifas/mapa", methods=["GET"])
+def mapa_rifas():
+    # Seletor de numeros: bitmaps em base64, bit i = numero inicio + i.
+    try:
+        mapa = get_public_availability_map()
+    except RifaSchemaMissingError as exc:
+        return jsonify({"erro": str(exc)}), 503
+    if mapa is None:
+        return jsonify({"erro": "Nenhuma campanha de rifa ativa."}), 404
+
+    resposta = jsonify(mapa)
+    resposta.set_etag(mapa["versao"])
+    resposta.cache_control.public = True
+    resposta.cache_control.max_age = current_app.config.get("RIFA_MAPA_CACHE_SEGUNDOS", 15)
+    return resposta.make_conditional(request)
+
+
 @rifas_public_bp.route("/rifas/pagamento/<payment_id>", methods=["GET"])
 def pagamento_publico(payment_id):
     try:
@@ -6,6 +6,7 @@ import hmac
 import logging
 import os
 import uuid
+from collections import Counter
 from dataclasses import asdict, dataclass
 from datetime import datetime, timedelta
 from decimal import Decimal
@@ -18,6 +19,8 @@ from werkzeug.utils import secure_filename
 
 from extensions import db
 from models import BlocoRifa, ClienteRifa, Equipe, PagamentoRifa, Rifa, RifaCampanha, Vendedor
+from rifas.alocador import alocar_numeros, mapa_disponibilidade
+from rifas.estoque import ajustar_estoque, garantir_estoque, obter_estoque, proximo_numero_global, reconstruir_estoque, registrar_transicao, resumo_estoque
 from rifas.payments import get_pix_gateway
 from rifas.pdf_generator import generate_tickets_pdf
 from services.public_url_service import build_public_url
@@ -83,6 +86,7 @@ def rifas_schema_ready() -> bool:
         "equipes",
         "vendedores",
         "blocos_rifas",
+        "rifas_estoque",
     }.issubset(tabelas)
 
 
@@ -157,19 +161,26 @@ def create_or_update_campaign(*, campanha_id: str | None, titulo: str, descricao
     return campanha
 
 def _ensure_inventory(*, campanha: RifaCampanha):
-    existentes = db.session.scalar(
-        db.select(func.count(Rifa.id)).where(Rifa.campanha_id == campanha.id)
-    ) or 0
-    faltantes = int(campanha.quantidade_total) - int(existentes)
+    # Leitura sem trava: no caso comum o estoque ja esta completo.
+    estoque = garantir_estoque(campanha.id)
+    if int(campanha.quantidade_total) <= estoque.criados:
+        return
+
+    estoque = obter_estoque(campanha.id, travar=True)
+    faltantes = int(campanha.quantidade_total) - estoque.criados
     if faltantes <= 0:
         return
 
-    ultimo_numero_global = db.session.scalar(db.select(func.max(Rifa.numero))) or 60000
+    # Numeracao global: continua depois da ultima rifa de qualquer campanha.
+    primeiro = proximo_numero_global()
     novos = [
-        Rifa(campanha_id=campanha.id, numero=ultimo_numero_global + indice, status=STATUS_DISPONIVEL)
-        for indice in range(1, faltantes + 1)
+        Rifa(campanha_id=campanha.id, numero=primeiro + indice, status=STATUS_DISPONIVEL)
+        for indice in range(faltantes)
     ]
+    # bulk_save_objects nao passa pelos eventos da sessao; o estoque e ajustado aqui.
     db.session.bulk_save_objects(novos)
+    ajustar_estoque(campanha.id, criados=faltantes, livres=faltantes)
+    estoque.proximo_numero = primeiro + faltantes
     db.session.flush()
     logger.info("Estoque da campanha %s inicializado com %s numero(s).", campanha.id, len(novos))
 
@@ -392,12 +403,10 @@ def get_public_page_data() -> dict:
     disponiveis = 0
     vendidos = 0
     if campanha is not None:
-        disponiveis = db.session.scalar(
-            db.select(func.count(Rifa.id)).where(Rifa.campanha_id == campanha.id, Rifa.status == STATUS_DISPONIVEL)
-        ) or 0
-        vendidos = db.session.scalar(
-            db.select(func.count(Rifa.id)).where(Rifa.campanha_id == campanha.id, Rifa.status == STATUS_PAGO)
-        ) or 0
+        estoque = obter_estoque(campanha.id)
+        if estoque is not None:
+            disponiveis = estoque.livres
+            vendidos = estoque.pagos
     return {
         "campanha": campanha,
         "disponiveis": disponiveis,
@@ -405,6 +414,15 @@ def get_public_page_data() -> dict:
     }
 
 
+def get_public_availability_map() -> dict | None:
+    """Bitmaps de livres/vendidos da campanha ativa (ver ``rifas.alocador``)."""
+    ensure_rifas_schema()
+    campanha = get_active_campaign()
+    if campanha is None:
+        return None
+    return mapa_disponibilidade(campanha.id)
+
+
 def purchase_rifas(*, nome: str, telefone: str, email: str, endereco: str, vendedor: str, quantidade_rifas: int, cpf=None):
     ensure_rifas_schema()
     nome = _normalizar_texto(nome).upper()
@@ -467,29 +485,34 @@ def purchase_rifas(*, nome: str, telefone: str, email: str, endereco: str, vende
 
     cliente = _buscar_ou_criar_cliente(nome=nome, telefone=telefone, email=email, endereco=endereco)
 
-    query = (
-        db.select(Rifa)
-        .where(Rifa.campanha_id == campanha.id, Rifa.status == STATUS_DISPONIVEL)
-        .order_by(Rifa.numero.asc())
-        .limit(quantidade_rifas)
+    # 1) Reserva curta: trava os numeros, marca com a reserva e faz commit.
+    # Os valores usados depois sao copiados antes do commit para que nada
+    # abra transacao durante a chamada ao gateway.
+    reserva_id, numeros = _reservar_numeros(
+        campanha_id=campanha.id,
+        cliente_id=cliente.id,
+        quantidade=quantidade_rifas,
     )
+    campanha_id = campanha.id
+    campanha_titulo = campanha.titulo
+    cliente_id = cliente.id
+    cliente_nome = cliente.nome
+    db.session.commit()
 
-    if db.session.bind and db.session.bind.dialect.name != "sqlite":
-        query = query.with_for_update(skip_locked=True)
-
-    rifas = db.session.execute(query).scalars().all()
-
-    if len(rifas) < quantidade_rifas:
-        raise RifaError("Nao ha quantidade suficiente de rifas disponiveis.")
-
-    charge = gateway.create_charge(
-        amount = Decimal(valor_total),
-        payer_name=nome,
-        payer_email=email,
-        description=f"{campanha.titulo} - {quantidade_rifas} rifa(s)",
-        payer_document=cpf,
-    )
-    import uuid
+    # 2) Cobranca sem transacao aberta nem linhas travadas.
+    try:
+        charge = gateway.create_charge(
+            amount = Decimal(valor_total),
+            payer_name=nome,
+            payer_email=email,
+            description=f"{campanha_titulo} - {quantidade_rifas} rifa(s)",
+            payer_document=cpf,
+        )
+    except Exception:
+        logger.exception("Falha ao criar cobranca PIX; liberando reserva %s", reserva_id)
+        db.session.rollback()
+        _liberar_reserva(reserva_id)
+        raise
 
     raw_txid = ''.join(filter(str.isalnum, (charge.external_id or ''))).upper()
 
@@ -498,10 +521,10 @@ def purchase_rifas(*, nome: str, telefone: str, email: str, endereco: str, vende
     else:
         txid = raw_txid[:32]
 
-
+    # 3) Transacao curta: grava o pagamento e anexa os numeros reservados.
     pagamento = PagamentoRifa(
-        campanha_id=campanha.id,
-        cliente_id=cliente.id,
+        campanha_id=campanha_id,
+        cliente_id=cliente_id,
         valor_total=valor_total,
         quantidade_rifas=quantidade_rifas,
         status="pendente",
@@ -518,19 +541,44 @@ def purchase_rifas(*, nome: str, telefone: str, email: str, endereco: str, vende
     db.session.add(pagamento)
     db.session.flush()
 
-    for rifa in rifas:
-        rifa.status = STATUS_RESERVADO
-        rifa.cliente_id = cliente.id
-        rifa.pagamento_id = pagamento.id
+    anexadas = db.session.execute(
+        db.update(Rifa)
+        .where(
+            Rifa.reserva_id == reserva_id,
+            Rifa.status == STATUS_RESERVADO,
+            Rifa.pagamento_id.is_(None),
+        )
+        .values(pagamento_id=pagamento.id, reserva_id=None, reservado_ate=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+    if anexadas != quantidade_rifas:
+        # A reserva expirou enquanto o gateway respondia, mas a cobranca ja
+        # existe: o pagamento fica gravado (o txid continua conhecido) e
+        # recebe outros numeros livres no lugar dos liberados.
+        logger.warning(
+            "Reserva %s expirou antes da cobranca: external_id=%s anexadas=%s quantidade=%s",
+            reserva_id,
+            charge.external_id,
+            anexadas,
+            quantidade_rifas,
+        )
+        if not _completar_numeros(pagamento, quantidade_rifas - anexadas):
+            _cancelar_sem_numeros(pagamento)
+            db.session.commit()
+            raise RifaError("A reserva dos numeros expirou e nao ha rifas disponiveis. Nao pague este Pix.")
+        numeros = db.session.execute(
+            db.select(Rifa.numero).where(Rifa.pagamento_id == pagamento.id).order_by(Rifa.numero.asc())
+        ).scalars().all()
 
     logger.info(
         "Compra iniciada: campanha=%s pagamento=%s txid=%s cliente=%s quantidade=%s numeros=%s",
-        campanha.id,
+        campanha_id,
         pagamento.id,
         pagamento.txid,
-        cliente.email,
+        email,
         quantidade_rifas,
-        [rifa.numero for rifa in rifas],
+        numeros,
     )
     
     db.session.commit()
@@ -540,13 +588,101 @@ def purchase_rifas(*, nome: str, telefone: str, email: str, endereco: str, vende
         qr_code_base64="",
         copia_cola_pix=pagamento.copia_cola_pix or "",
         external_id=pagamento.external_id or "",
-        numeros=[rifa.numero for rifa in rifas],
+        numeros=numeros,
         valor_total=float(valor_total),
-        comprador_nome=cliente.nome,
+        comprador_nome=cliente_nome,
         quantidade_rifas=quantidade_rifas,
         status=pagamento.status,
-        campanha_titulo=campanha.titulo,
+        campanha_titulo=campanha_titulo,
+    )
+
+
+def _completar_numeros(pagamento: PagamentoRifa, faltam: int) -> bool:
+    """Anexa ``faltam`` numeros livres ao pagamento, ja como reservados. Nao faz commit."""
+    livres = alocar_numeros(pagamento.campanha_id, faltam)
+    if len(livres) < faltam:
+        return False
+
+    db.session.execute(
+        db.update(Rifa)
+        .where(Rifa.id.in_([linha.id for linha in livres]))
+        .values(status=STATUS_RESERVADO, cliente_id=pagamento.cliente_id, pagamento_id=pagamento.id)
+        .execution_options(synchronize_session=False)
     )
+    registrar_transicao(pagamento.campanha_id, STATUS_DISPONIVEL, STATUS_RESERVADO, faltam)
+    return True
+
+
+def _cancelar_sem_numeros(pagamento: PagamentoRifa) -> None:
+    """Devolve os numeros ja anexados e deixa o pagamento cancelado, com o txid gravado."""
+    liberadas = db.session.execute(
+        db.update(Rifa)
+        .where(Rifa.pagamento_id == pagamento.id, Rifa.status == STATUS_RESERVADO)
+        .values(status=STATUS_DISPONIVEL, cliente_id=None, pagamento_id=None)
+        .returning(Rifa.campanha_id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    _registrar_liberadas(liberadas)
+
+    pagamento.status = STATUS_CANCELADO
+    pagamento.observacoes_admin = (
+        "Cancelado na criacao: a reserva expirou antes da cobranca e nao havia numeros livres. "
+        f"A cobranca {pagamento.txid} existe no gateway; se for paga, devolver o valor."
+    )
+    logger.error("Pagamento %s cancelado sem numeros; cobranca %s ja criada no gateway", pagamento.id, pagamento.txid)
+
+
+def _reservar_numeros(*, campanha_id: str, cliente_id: str, quantidade: int):
+    """
+    Reserva numeros livres da campanha para o cliente.
+
+    Os numeros vem de ``alocar_numeros`` (shard sorteado, linhas travadas com
+    ``FOR UPDATE SKIP LOCKED`` fora do SQLite); marca ``reserva_id`` e
+    ``reservado_ate`` e devolve ``(reserva_id, numeros)``.
+    Nao faz commit: quem chama encerra a transacao logo em seguida.
+    """
+    livres = alocar_numeros(campanha_id, quantidade)
+
+    if len(livres) < quantidade:
+        raise RifaError("Nao ha quantidade suficiente de rifas disponiveis.")
+
+    reserva_id = str(uuid.uuid4())
+    minutos = int(current_app.config.get("RIFA_RESERVA_COBRANCA_MINUTOS", 10))
+
+    db.session.execute(
+        db.update(Rifa)
+        .where(Rifa.id.in_([linha.id for linha in livres]))
+        .values(
+            status=STATUS_RESERVADO,
+            cliente_id=cliente_id,
+            reserva_id=reserva_id,
+            reservado_ate=_utcnow() + timedelta(minutes=minutos),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    registrar_transicao(campanha_id, STATUS_DISPONIVEL, STATUS_RESERVADO, len(livres))
+
+    return reserva_id, [linha.numero for linha in livres]
+
+
+def _liberar_reserva(reserva_id: str) -> int:
+    """Devolve ao estoque os numeros de uma reserva sem pagamento e faz commit."""
+    liberadas = db.session.execute(
+        db.update(Rifa)
+        .where(Rifa.reserva_id == reserva_id, Rifa.pagamento_id.is_(None), Rifa.status == STATUS_RESERVADO)
+        .values(status=STATUS_DISPONIVEL, cliente_id=None, reserva_id=None, reservado_ate=None)
+        .returning(Rifa.campanha_id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    _registrar_liberadas(liberadas)
+    db.session.commit()
+    return len(liberadas)
+
+
+def _registrar_liberadas(campanha_ids) -> None:
+    for campanha_id, quantidade in Counter(campanha_ids).items():
+        registrar_transicao(campanha_id, STATUS_RESERVADO, STATUS_DISPONIVEL, quantidade)
+
 
 def _secure_compare(left: str, right: str) -> bool:
     return hmac.compare_digest(left or "", right or "")
@@ -923,15 +1059,10 @@ def admin_dashboard_data() -> dict:
     total_pago = db.session.scalar(
         db.select(func.coalesce(func.sum(PagamentoRifa.valor_total), 0)).where(PagamentoRifa.status == STATUS_PAGO)
     ) or 0
-    disponiveis = db.session.scalar(
-        db.select(func.count(Rifa.id)).where(Rifa.status == STATUS_DISPONIVEL)
-    ) or 0
-    reservadas = db.session.scalar(
-        db.select(func.count(Rifa.id)).where(Rifa.status == STATUS_RESERVADO)
-    ) or 0
-    pagas = db.session.scalar(
-        db.select(func.count(Rifa.id)).where(Rifa.status == STATUS_PAGO)
-    ) or 0
+    estoque = resumo_estoque()
+    disponiveis = estoque["livres"]
+    reservadas = estoque["reservados"]
+    pagas = estoque["pagos"]
 
     ranking_rows = db.session.execute(
         db.select(
@@ -1049,9 +1180,29 @@ def cancelar_pagamentos_expirados():
 
         p.status = "cancelado"
 
-    if pagamentos:
+    # Reservas cuja cobranca nunca foi anexada (processo caiu entre as fases).
+    orfas = db.session.execute(
+        db.update(Rifa)
+        .where(
+            Rifa.status == STATUS_RESERVADO,
+            Rifa.pagamento_id.is_(None),
+            Rifa.reservado_ate < agora,
+        )
+        .values(status=STATUS_DISPONIVEL, cliente_id=None, reserva_id=None, reservado_ate=None)
+        .returning(Rifa.campanha_id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    _registrar_liberadas(orfas)
+    orfas = len(orfas)
+
+    if orfas:
+        logger.info("RIFA | %s numero(s) de reservas sem cobranca liberados", orfas)
+
+    if pagamentos or orfas:
         db.session.commit()
 
+    return len(pagamentos) + orfas
+
 
 def limpeza_completa_rifas():
     ensure_rifas_schema()
@@ -1092,6 +1243,9 @@ def limpeza_completa_rifas():
 
     clientes_deletados = result_cli.fetchall()
 
+    # O UPDATE em SQL puro nao passa pelos contadores.
+    reconstruir_estoque()
+
     return {
         "pagamentos": len(pagamentos_deletados),
         "clientes": len(clientes_deletados)
@@ -6,6 +6,7 @@ from flask_login import login_required, current_user
 from models import Escala, Missa
 from utils.auth import admin_required
 from services.whatsapp_service import enviar_lembretes_whatsapp
+from services.escala_simulacao_service import simular_pesos
 
 from flask import Blueprint
 
@@ -60,6 +61,43 @@ def enviar_lembretes_whatsapp_agora():
 
     return jsonify(resultado)
 
+@api_bp.route("/api/escala/simulacao", methods=["POST"])
+@login_required
+@admin_required
+def simular_escala():
+    """
+    Compara conjuntos de pesos da escala inteligente sem gravar escalas.
+
+    Corpo: {"mes", "ano", "conjuntos": [{"nome", "pesos": {...}}],
+    "ordem_geracao", "considerar_periodos_anteriores", "semente"}.
+    """
+    json_body = request.get_json(silent=True) or {}
+
+    try:
+        mes = int(json_body.get("mes"))
+        ano = int(json_body.get("ano"))
+        if not 1 <= mes <= 12:
+            raise ValueError
+    except (TypeError, ValueError):
+        return jsonify({"erro": "Informe mes (1-12) e ano validos."}), 400
+
+    semente = json_body.get("semente")
+
+    try:
+        resultado = simular_pesos(
+            current_user.id_paroquia,
+            mes,
+            ano,
+            json_body.get("conjuntos") or [],
+            considerar_periodos_anteriores=bool(json_body.get("considerar_periodos_anteriores", True)),
+            modo_ordenacao=json_body.get("ordem_geracao") or ["equilibrada"],
+            semente=int(semente) if semente not in (None, "") else None,
+        )
+    except ValueError as exc:
+        return jsonify({"erro": str(exc)}), 400
+
+    return jsonify(resultado)
+
 import json
 import requests
 from flask import current_app
@@ -4,7 +4,7 @@ from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 import logging
 
 from models import db, Ministro, Paroquia
-from services.firebase_service import enviar_push
+from services.notificacao_outbox_service import enfileirar_push
 
 
 auth_bp = Blueprint("auth", __name__)
@@ -191,11 +191,13 @@ def cadastro():
 
         admin = Ministro.query.filter_by(tipo="admin").first()
         if admin and admin.firebase_token:
-            enviar_push(
+            enfileirar_push(
                 admin.firebase_token,
                 "Novo Cadastro",
-                f"{nome} solicitou cadastro no SGME."
+                f"{nome} solicitou cadastro no SGME.",
+                usuario_id=admin.id
             )
+            db.session.commit()
 
         flash("Cadastro realizado com sucesso! Aguarde aprovacao do administrador.")
         return redirect(url_for("auth.login"))
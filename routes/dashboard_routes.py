@@ -4,10 +4,10 @@ from flask import Blueprint, jsonify, flash, redirect, render_template, request,
 from flask_login import current_user, login_required
 from services.relatorio_service import obter_saudacao
 
-from models import Escala, Missa, Ministro, Paroquia, Substituicao
+from models import Escala, Missa, Ministro, Paroquia, Substituicao, db
 from services.dashboard_service import construir_dashboard
 from services.escala_imagem_service import gerar_imagem_escala_missa
-from services.firebase_service import enviar_push
+from services.notificacao_outbox_service import enfileirar_push
 from services.substituicao_dashboard_service import (
     buscar_ministros_disponiveis,
     buscar_ministros_troca,
@@ -102,14 +102,17 @@ def avisar_missa(missa_id):
             continue
 
         mensagem = montar_mensagem_lembrete(ministro, missa, escala=escala)
-        enviar_push(
+        enfileirar_push(
             ministro.firebase_token,
             "Lembrete de Escala",
-            mensagem
+            mensagem,
+            usuario_id=ministro.id
         )
         enviados += 1
         nomes_enviados.append(ministro.nome)
 
+    db.session.commit()
+
     flash(f"Aviso enviado via Firebase para {enviados} ministro(s). {sem_token} sem token ativo.")
     if nomes_enviados:
         flash("Receberam push: " + ", ".join(nomes_enviados))
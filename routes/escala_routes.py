@@ -23,23 +23,35 @@ from models import (
 )
 from datetime import timedelta
 import uuid, urllib.parse, base64, io
+from sqlalchemy.orm import joinedload
 from utils.auth import admin_required
+from utils.periodo_utils import filtro_mes
+from services.notificacao_outbox_service import agrupar_pushes
 from services.notificacao_service import (
+    chave_escala,
     notificar_escala_criada,
     notificar_escala_removida
 )
 from services.disponibilidade_service import (
-    esta_disponivel,
-    esta_indisponivel,
+    AvailabilityIndex,
     listar_ministros_indisponiveis,
 )
+from services.escala_fixa_service import materializar_escala_fixa_mes
+from services.escala_planejamento_service import (
+    gerar_escala_mes,
+    normalizar_opcoes_geracao,
+)
+from services.escala_simulacao_service import (
+    PARAMETROS_SIMULACAO,
+    parametros_atuais,
+    simular_pesos,
+)
 from services.participacao_service import (
     obter_estatisticas_participacao,
     obter_missas_ministro_periodo,
 )
 
 from services.substituicao_service import substituir_ministro
-from services.firebase_service import enviar_push
 from services.pedido_substituicao_service import (
     aceitar_substituicao,
     criar_pedido_substituicao,
@@ -68,6 +80,11 @@ def gerar_escala(missa_id):
         selecionados = request.form.getlist("ministros")
         Escala.query.filter_by(id_missa=missa.id).delete()
         ministros_indisponiveis = []
+        indice = AvailabilityIndex.carregar(
+            current_user.id_paroquia,
+            data_inicio=missa.data,
+            data_fim=missa.data,
+        )
 
         for ministro_id in selecionados:
             ministro = Ministro.query.filter_by(
@@ -76,7 +93,7 @@ def gerar_escala(missa_id):
             ).first()
             if not ministro:
                 continue
-            if esta_indisponivel(ministro.id, missa, current_user.id_paroquia):
+            if indice.esta_indisponivel(ministro.id, missa):
                 ministros_indisponiveis.append(ministro.nome)
                 continue
             nova = Escala(
@@ -119,6 +136,12 @@ def gerar_escala_auto(missa_id):
 
     selecionados = []
 
+    indice = AvailabilityIndex.carregar(
+        current_user.id_paroquia,
+        data_inicio=missa.data,
+        data_fim=missa.data,
+    )
+
     # ===============================
     # 1️⃣ ESCALA FIXA
     # ===============================
@@ -156,11 +179,11 @@ def gerar_escala_auto(missa_id):
             continue
 
         # verifica indisponibilidade
-        if esta_indisponivel(ministro.id, missa, current_user.id_paroquia):
+        if indice.esta_indisponivel(ministro.id, missa):
             continue
 
         # verifica disponibilidade (fixa ou por data)
-        if not esta_disponivel(ministro.id, missa, current_user.id_paroquia):
+        if not indice.esta_disponivel(ministro.id, missa):
             continue
         
         if ministro not in selecionados:
@@ -201,10 +224,10 @@ def gerar_escala_auto(missa_id):
             if conflito:
                 continue
 
-            if esta_indisponivel(ministro.id, missa, current_user.id_paroquia):
+            if indice.esta_indisponivel(ministro.id, missa):
                 continue
 
-            if not esta_disponivel(ministro.id, missa, current_user.id_paroquia):
+            if not indice.esta_disponivel(ministro.id, missa):
                 continue
 
             selecionados.append(ministro)
@@ -256,7 +279,7 @@ def gerar_escala_auto_inteligente(missa_id):
     considerar_periodos_anteriores = bool(
         request.form.get("considerar_periodos_anteriores")
     )
-    opcoes_geracao = _normalizar_opcoes_geracao(
+    opcoes_geracao = normalizar_opcoes_geracao(
         request.form.getlist("ordem_geracao")
     )
 
@@ -284,7 +307,7 @@ def gerar_escala_auto_inteligente(missa_id):
     return redirect(url_for("escala.visualizar_escala", missa_id=missa.id))
 
 
-from sqlalchemy import extract, func
+from sqlalchemy import func
 
 @escala_bp.route("/escala/visualizar/<int:missa_id>")
 @login_required
@@ -331,8 +354,7 @@ def visualizar_escala(missa_id):
         .join(Missa)
         .filter(
             Escala.id_paroquia == current_user.id_paroquia,
-            extract("month", Missa.data) == missa.data.month,
-            extract("year", Missa.data) == missa.data.year
+            filtro_mes(Missa.data, missa.data.month, missa.data.year)
         )
         .group_by(Escala.id_ministro)
         .all()
@@ -579,90 +601,26 @@ def gerar_mensal():
 def gerar_mensal_inteligente():
     return gerar_escala_inteligente()
 
-from sqlalchemy import extract
-
-
-def _normalizar_opcoes_geracao(opcoes):
-    if isinstance(opcoes, str):
-        opcoes = [opcoes]
-
-    permitidas = {
-        "equilibrada",
-        "casais_fim_semana",
-        "casais_semana",
-        "minimo_missas",
-        "semana_primeiro",
-        "fim_semana_primeiro",
-    }
-    normalizadas = []
-
-    for opcao in opcoes or []:
-        valor = (opcao or "").strip()
-        if valor and valor in permitidas and valor not in normalizadas:
-            normalizadas.append(valor)
-
-    return normalizadas or ["equilibrada"]
-
-
-def _ordenar_missas_para_geracao(missas, opcoes_geracao):
-    opcoes_geracao = _normalizar_opcoes_geracao(opcoes_geracao)
-
-    if "semana_primeiro" in opcoes_geracao:
-        return sorted(missas, key=lambda m: (m.data.weekday() in {5, 6}, m.data, m.horario or "", m.id))
-    if "fim_semana_primeiro" in opcoes_geracao:
-        return sorted(missas, key=lambda m: (m.data.weekday() not in {5, 6}, m.data, m.horario or "", m.id))
-    return sorted(missas, key=lambda m: (m.data.weekday() != 6, m.data, m.horario or "", m.id))
 
 def _executar_geracao_escala_inteligente(mes, ano, considerar_periodos_anteriores, opcoes_geracao):
-    from services.escala_inteligente_service import selecionar_ministros
-
-    opcoes_geracao = _normalizar_opcoes_geracao(opcoes_geracao)
-
-    missas_mes_subquery = db.session.query(Missa.id).filter(
-        Missa.id_paroquia == current_user.id_paroquia,
-        extract("month", Missa.data) == mes,
-        extract("year", Missa.data) == ano
-    ).subquery()
-
-    Escala.query.filter(
-        Escala.id_paroquia == current_user.id_paroquia,
-        Escala.id_missa.in_(missas_mes_subquery)
-    ).delete(synchronize_session=False)
-
-    missas_mes = Missa.query.filter(
-        Missa.id_paroquia == current_user.id_paroquia,
-        extract("month", Missa.data) == mes,
-        extract("year", Missa.data) == ano
-    ).order_by(Missa.data.asc(), Missa.horario.asc(), Missa.id.asc()).all()
-
-    for missa in _ordenar_missas_para_geracao(missas_mes, opcoes_geracao):
-        ministros = selecionar_ministros(
-            missa.qtd_ministros,
-            current_user.id_paroquia,
-            missa,
-            considerar_periodos_anteriores=considerar_periodos_anteriores,
-            modo_ordenacao=opcoes_geracao
-        )
-
-        for ministro in ministros:
-            nova = Escala(
-                id_missa=missa.id,
-                id_ministro=ministro.id,
-                id_paroquia=current_user.id_paroquia,
-                token=str(uuid.uuid4())
-            )
-            db.session.add(nova)
-            missa.escala_ref = nova
-            notificar_escala_criada(ministro, missa)
-
-    db.session.commit()
+    resultado = gerar_escala_mes(
+        current_user.id_paroquia,
+        mes,
+        ano,
+        considerar_periodos_anteriores=considerar_periodos_anteriores,
+        opcoes_geracao=opcoes_geracao,
+        notificar=True,
+    )
+    return resultado
 
 
 def _enviar_escala_mes_ministros(id_paroquia, mes, ano):
-    escalas_mes = Escala.query.join(Missa).filter(
+    # Vai para o mesmo resumo por ministro da geracao (se ainda na janela).
+    escalas_mes = Escala.query.join(Missa).options(
+        joinedload(Escala.ministro)
+    ).filter(
         Escala.id_paroquia == id_paroquia,
-        extract("month", Missa.data) == mes,
-        extract("year", Missa.data) == ano,
+        filtro_mes(Missa.data, mes, ano),
     ).all()
 
     por_ministro = defaultdict(list)
@@ -673,6 +631,7 @@ def _enviar_escala_mes_ministros(id_paroquia, mes, ano):
     enviados = 0
     sem_token = 0
     sem_link_publico = 0
+    eventos = []
 
     for ministro, lista in por_ministro.items():
         pendentes = [e for e in lista if e.confirmado is not True]
@@ -692,19 +651,26 @@ def _enviar_escala_mes_ministros(id_paroquia, mes, ano):
         )
 
         if ministro.firebase_token:
-            enviar_push(
-                ministro.firebase_token,
-                "Escala do Mes",
-                (
+            eventos.append({
+                "chave": chave_escala(ministro),
+                "token": ministro.firebase_token,
+                "usuario_id": ministro.id,
+                "linha": f"{len(pendentes)} escala(s) pendente(s) em {mes}/{ano} para confirmar ou recusar",
+                "titulo": "Escala do Mes",
+                "mensagem": (
                     f"Voce possui {len(pendentes)} escala(s) pendente(s) em {mes}/{ano}. "
                     f"Acesse para confirmar ou recusar: {link}"
                 ),
-                url=link,
-            )
+                "url": link,
+                "url_resumo": link,
+            })
             enviados += 1
         else:
             sem_token += 1
 
+    agrupar_pushes(eventos)
+    db.session.commit()
+
     return {
         "enviados": enviados,
         "sem_token": sem_token,
@@ -740,16 +706,23 @@ def gerar_escala_inteligente():
         enviar_escala_ministros = bool(
             request.form.get("enviar_escala_ministros")
         )
-        opcoes_geracao = _normalizar_opcoes_geracao(
+        opcoes_geracao = normalizar_opcoes_geracao(
             request.form.getlist("ordem_geracao")
         )
 
-        _executar_geracao_escala_inteligente(
+        resultado = _executar_geracao_escala_inteligente(
             mes=mes,
             ano=ano,
             considerar_periodos_anteriores=considerar_periodos_anteriores,
             opcoes_geracao=opcoes_geracao
         )
+        flash(
+            f"{resultado['mantidas']} escala(s) mantida(s), "
+            f"{len(resultado['criadas'])} nova(s) ou alterada(s), "
+            f"{len(resultado['removidas'])} ministro(s) removido(s)."
+        )
+        if "otimizada" in opcoes_geracao and resultado["metodo"] != "otimizada":
+            flash("A otimizacao excedeu o tempo limite; a escala foi gerada missa a missa.")
 
         if enviar_escala_ministros:
             resultado_envio = _enviar_escala_mes_ministros(
@@ -769,6 +742,51 @@ def gerar_escala_inteligente():
     return render_template("form_gerar_escala_inteligente.html")
 
 
+QTD_CONJUNTOS_SIMULACAO = 3
+
+
+@escala_bp.route("/simulacao_escala", methods=["GET", "POST"])
+@login_required
+@admin_required
+def simulacao_escala():
+    atuais = parametros_atuais()
+    conjuntos = [
+        {"nome": "Atual" if indice == 0 else f"Conjunto {indice + 1}", "pesos": dict(atuais)}
+        for indice in range(QTD_CONJUNTOS_SIMULACAO)
+    ]
+    resultado = None
+
+    if request.method == "POST":
+        mes = int(request.form["mes"])
+        ano = int(request.form["ano"])
+
+        for indice, conjunto in enumerate(conjuntos):
+            conjunto["nome"] = (request.form.get(f"nome_{indice}") or conjunto["nome"]).strip()
+            for chave in PARAMETROS_SIMULACAO:
+                valor = (request.form.get(f"peso_{indice}_{chave}") or "").strip()
+                if valor:
+                    conjunto["pesos"][chave] = valor
+
+        try:
+            resultado = simular_pesos(
+                current_user.id_paroquia,
+                mes,
+                ano,
+                conjuntos,
+                considerar_periodos_anteriores=bool(request.form.get("considerar_periodos_anteriores")),
+                modo_ordenacao=normalizar_opcoes_geracao(request.form.getlist("ordem_geracao")),
+            )
+        except ValueError as exc:
+            flash(str(exc))
+
+    return render_template(
+        "simulacao_escala.html",
+        parametros=list(PARAMETROS_SIMULACAO),
+        conjuntos=conjuntos,
+        resultado=resultado,
+    )
+
+
 @escala_bp.route("/gerar_mensal_super_inteligente", methods=["GET", "POST"])
 @login_required
 @admin_required
@@ -787,8 +805,7 @@ def pendencias_ministro(token_publico):
     escalas = Escala.query.join(Missa).filter(
         Escala.id_ministro == ministro.id,
         Escala.id_paroquia == ministro.id_paroquia,
-        extract("month", Missa.data) == mes,
-        extract("year", Missa.data) == ano,
+        filtro_mes(Missa.data, mes, ano),
     ).order_by(Missa.data.asc(), Missa.horario.asc()).all()
 
     return render_template(
@@ -822,10 +839,10 @@ def remover_ministro_escala(escala_id):
 
     excluir_pedidos_substituicao_da_escala(escala.id, current_user.id_paroquia)
     db.session.delete(escala)
-    db.session.commit()
 
-    # 🔔 envia notificação
+    # 🔔 envia notificação (outbox, no mesmo commit)
     notificar_escala_removida(ministro, missa)
+    db.session.commit()
 
     flash("Ministro removido da escala!")
     return redirect(url_for("escala.visualizar_escala", missa_id=missa_id))
@@ -877,67 +894,17 @@ def salvar_mensal():
     mes = int(request.form["mes"])
     ano = int(request.form["ano"])
 
-    cal = calendar.monthcalendar(ano, mes)
-
-    for semana in cal:
-        for dia_semana, dia in enumerate(semana):
-
-            if dia == 0:
-                continue
-
-            data_missa = date(ano, mes, dia)
-            semana_mes = (dia - 1) // 7 + 1
-
-            regras = EscalaFixa.query.filter_by(
-                id_paroquia=current_user.id_paroquia
-            ).all()
-
-            for regra in regras:
-
-                if regra.semana and regra.semana != semana_mes:
-                    continue
-
-                if regra.dia_semana is not None and regra.dia_semana != dia_semana:
-                    continue
-
-                missa = Missa.query.filter_by(
-                    data=data_missa,
-                    horario=regra.horario,
-                    id_paroquia=current_user.id_paroquia
-                ).first()
-
-                if not missa:
-                    missa = Missa(
-                        data=data_missa,
-                        horario=regra.horario,
-                        comunidade=regra.comunidade or "Matriz",
-                        qtd_ministros=1,
-                        id_paroquia=current_user.id_paroquia
-                    )
-                    db.session.add(missa)
-                    db.session.commit()
-
-                escala_existente = Escala.query.filter_by(
-                    id_missa=missa.id,
-                    id_ministro=regra.id_ministro
-                ).first()
-
-                if not escala_existente and not esta_indisponivel(
-                    regra.id_ministro,
-                    missa,
-                    current_user.id_paroquia
-                ):
-                    nova = Escala(
-                        id_missa=missa.id,
-                        id_ministro=regra.id_ministro,
-                        id_paroquia=current_user.id_paroquia,
-                        token=str(uuid.uuid4())
-                    )
-                    db.session.add(nova)
-
+    resultado = materializar_escala_fixa_mes(current_user.id_paroquia, mes, ano)
     db.session.commit()
 
-    flash("Escala mensal criada com sucesso!")
+    indisponiveis = sum(1 for _, _, motivo in resultado["ignoradas"] if motivo == "indisponivel")
+    flash(
+        "Escala mensal criada com sucesso! "
+        f"Missas criadas: {len(resultado['missas_criadas'])}. "
+        f"Escalas criadas: {len(resultado['escalas_criadas'])}. "
+        f"Ignoradas: {len(resultado['ignoradas']) - indisponiveis} ja escaladas, "
+        f"{indisponiveis} por indisponibilidade."
+    )
     return redirect(url_for("missas.missas"))
 
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
@@ -6,8 +6,9 @@ from collections import defaultdict
 import os
 from flask import Blueprint, render_template, request, url_for, send_file
 from flask_login import login_required, current_user
-from models import db, Ministro, Missa, Escala
+from models import Ministro, Missa, Escala
 from utils.auth import admin_required
+from utils.periodo_utils import filtro_periodo
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet
@@ -41,11 +42,11 @@ def estatisticas():
 
         if data_inicio:
             data_inicio_date = datetime.strptime(data_inicio, "%Y-%m-%d").date()
-            query = query.filter(db.func.date(Missa.data) >= data_inicio_date)
+            query = query.filter(filtro_periodo(Missa.data, data_inicio=data_inicio_date))
 
         if data_fim:
             data_fim_date = datetime.strptime(data_fim, "%Y-%m-%d").date()
-            query = query.filter(db.func.date(Missa.data) <= data_fim_date)
+            query = query.filter(filtro_periodo(Missa.data, data_fim=data_fim_date))
 
     escalas = query.order_by(Ministro.nome, Missa.data).all()
 
@@ -93,10 +94,10 @@ def estatisticas_pdf():
     )
 
     if data_inicio:
-        query = query.filter(db.func.date(Missa.data) >= data_inicio)
+        query = query.filter(filtro_periodo(Missa.data, data_inicio=datetime.strptime(data_inicio, "%Y-%m-%d").date()))
 
     if data_fim:
-        query = query.filter(db.func.date(Missa.data) <= data_fim)
+        query = query.filter(filtro_periodo(Missa.data, data_fim=datetime.strptime(data_fim, "%Y-%m-%d").date()))
 
     escalas = query.all()
 
@@ -138,11 +139,11 @@ def whatsapp_periodo():
 
     if data_inicio:
         data_inicio_date = datetime.strptime(data_inicio, "%Y-%m-%d").date()
-        query = query.filter(db.func.date(Missa.data) >= data_inicio_date)
+        query = query.filter(filtro_periodo(Missa.data, data_inicio=data_inicio_date))
 
     if data_fim:
         data_fim_date = datetime.strptime(data_fim, "%Y-%m-%d").date()
-        query = query.filter(db.func.date(Missa.data) <= data_fim_date)
+        query = query.filter(filtro_periodo(Missa.data, data_fim=data_fim_date))
 
     escalas = query.order_by(Ministro.nome, Missa.data).all()
 
@@ -230,11 +231,11 @@ def whatsapp_relatorio():
 
     if data_inicio:
         data_inicio_date = datetime.strptime(data_inicio, "%Y-%m-%d").date()
-        query = query.filter(db.func.date(Missa.data) >= data_inicio_date)
+        query = query.filter(filtro_periodo(Missa.data, data_inicio=data_inicio_date))
 
     if data_fim:
         data_fim_date = datetime.strptime(data_fim, "%Y-%m-%d").date()
-        query = query.filter(db.func.date(Missa.data) <= data_fim_date)
+        query = query.filter(filtro_periodo(Missa.data, data_fim=data_fim_date))
 
     escalas = query.order_by(Ministro.nome, Missa.data).all()
 
@@ -277,11 +278,11 @@ def whatsapp_relatorio_escala():
 
     if data_inicio:
         data_inicio_date = datetime.strptime(data_inicio, "%Y-%m-%d").date()
-        query = query.filter(db.func.date(Missa.data) >= data_inicio_date)
+        query = query.filter(filtro_periodo(Missa.data, data_inicio=data_inicio_date))
 
     if data_fim:
         data_fim_date = datetime.strptime(data_fim, "%Y-%m-%d").date()
-        query = query.filter(db.func.date(Missa.data) <= data_fim_date)
+        query = query.filter(filtro_periodo(Missa.data, data_fim=data_fim_date))
 
     escalas = query.order_by(Ministro.nome, Missa.data).all()
 
@@ -327,11 +328,11 @@ def whatsapp_auto():
 
     if data_inicio:
         data_inicio_date = datetime.strptime(data_inicio, "%Y-%m-%d").date()
-        query = query.filter(db.func.date(Missa.data) >= data_inicio_date)
+        query = query.filter(filtro_periodo(Missa.data, data_inicio=data_inicio_date))
 
     if data_fim:
         data_fim_date = datetime.strptime(data_fim, "%Y-%m-%d").date()
-        query = query.filter(db.func.date(Missa.data) <= data_fim_date)
+        query = query.filter(filtro_periodo(Missa.data, data_fim=data_fim_date))
 
     escalas = query.order_by(Ministro.nome, Missa.data).all()
 
@@ -387,11 +388,11 @@ def exportar_whatsapp():
 
     if data_inicio:
         data_inicio_date = datetime.strptime(data_inicio, "%Y-%m-%d").date()
-        query = query.filter(db.func.date(Missa.data) >= data_inicio_date)
+        query = query.filter(filtro_periodo(Missa.data, data_inicio=data_inicio_date))
 
     if data_fim:
         data_fim_date = datetime.strptime(data_fim, "%Y-%m-%d").date()
-        query = query.filter(db.func.date(Missa.data) <= data_fim_date)
+        query = query.filter(filtro_periodo(Missa.data, data_fim=data_fim_date))
 
     escalas = query.order_by(Ministro.nome, Missa.data).all()
 
@@ -1,5 +1,4 @@
 import re
-from collections import defaultdict
 from datetime import date, datetime
 
 from flask import Blueprint, abort, flash, redirect, render_template, request, url_for
@@ -14,6 +13,9 @@ from models import (
     Missa,
     db,
 )
+from services.disponibilidade_service import AvailabilityIndex
+from services.escala_planejamento_service import replanejar_indisponibilidade
+from services.notificacao_service import notificar_alteracoes_escala
 from utils.auth import admin_required
 
 
@@ -112,83 +114,34 @@ def _regra_indisponibilidade_fixa(ministro_id, dia_semana, horario):
     return None
 
 
-def _score_regra_fixa(regra, semana_ref, horario_ref):
-    if regra.dia_semana is None:
-        return -1
-    if regra.semana is not None and regra.semana != semana_ref:
-        return -1
-    if regra.horario is not None and regra.horario != horario_ref:
-        return -1
-
-    score = 10
-    if regra.semana is not None:
-        score += 4
-    if regra.horario is not None:
-        score += 2
-    return score
-
-
-def _score_regra_data(regra, horario_ref):
-    if regra.horario is not None and regra.horario != horario_ref:
-        return -1
-    return 100 if regra.horario is not None else 90
-
-
-def _resolver_status_missa(
-    ministro_id,
-    missa,
-    indisponibilidades_fixas_map,
-    disponibilidades_fixas_map,
-    indisponibilidades_data_map,
-    disponibilidades_data_map,
-):
-    semana_ref = _semana_do_mes(missa.data)
-    chave_fixa = (ministro_id, missa.data.weekday())
-    chave_data = (ministro_id, missa.data)
-
-    melhor_indisponivel = max(
-        (_score_regra_fixa(regra, semana_ref, missa.horario) for regra in indisponibilidades_fixas_map.get(chave_fixa, [])),
-        default=-1,
-    )
-    melhor_disponivel = max(
-        (_score_regra_fixa(regra, semana_ref, missa.horario) for regra in disponibilidades_fixas_map.get(chave_fixa, [])),
-        default=-1,
+def _replanejar_escalas(ministro_id, data_inicio=None, data_fim=None):
+    # Troca o ministro apenas nas escalas atingidas pela nova indisponibilidade.
+    resultado = replanejar_indisponibilidade(
+        current_user.id_paroquia,
+        int(ministro_id),
+        data_inicio=data_inicio,
+        data_fim=data_fim,
     )
+    notificar_alteracoes_escala(resultado["criadas"], resultado["removidas"])
+    db.session.commit()
+    return resultado
 
-    melhor_indisponivel = max(
-        melhor_indisponivel,
-        max(
-            (_score_regra_data(regra, missa.horario) for regra in indisponibilidades_data_map.get(chave_data, [])),
-            default=-1,
-        ),
-    )
-    melhor_disponivel = max(
-        melhor_disponivel,
-        max(
-            (_score_regra_data(regra, missa.horario) for regra in disponibilidades_data_map.get(chave_data, [])),
-            default=-1,
-        ),
-    )
 
-    if melhor_indisponivel >= melhor_disponivel and melhor_indisponivel >= 0:
-        return {
-            "status": "indisponivel",
-            "simbolo": "X",
-            "classe": "indisponivel",
-        }
+def _flash_replanejamento(resultado):
+    if resultado["criadas"]:
+        flash(f"{len(resultado['criadas'])} escala(s) ja existente(s) receberam substituto.")
+    if resultado["sem_substituto"]:
+        flash(
+            f"{len(resultado['sem_substituto'])} escala(s) continuam com o ministro "
+            "por falta de substituto disponivel."
+        )
 
-    if melhor_disponivel > melhor_indisponivel and melhor_disponivel >= 0:
-        return {
-            "status": "disponivel",
-            "simbolo": "✔",
-            "classe": "disponivel",
-        }
 
-    return {
-        "status": "neutro",
-        "simbolo": "•",
-        "classe": "neutro",
-    }
+STATUS_MAPA = {
+    "indisponivel": {"simbolo": "X", "classe": "indisponivel"},
+    "disponivel": {"simbolo": "✔", "classe": "disponivel"},
+    "neutro": {"simbolo": "•", "classe": "neutro"},
+}
 
 
 @indisp_bp.route("/indisponibilidade")
@@ -282,6 +235,7 @@ def nova_indisponibilidade():
             db.session.commit()
 
             flash("Indisponibilidade por data cadastrada com sucesso.")
+            _flash_replanejamento(_replanejar_escalas(ministro_id, data_ref, data_ref))
             return redirect(url_for("indisponibilidade.listar_indisponibilidade"))
 
         dias = [int(d) for d in request.form.getlist("dias_semana[]")]
@@ -319,6 +273,7 @@ def nova_indisponibilidade():
 
         db.session.commit()
         flash("Indisponibilidades cadastradas com sucesso.")
+        _flash_replanejamento(_replanejar_escalas(ministro_id))
         return redirect(url_for("indisponibilidade.listar_indisponibilidade"))
 
     return render_template("nova_indisponibilidade.html", ministros=ministros)
@@ -392,61 +347,21 @@ def mapa_disponibilidade():
             "comunidade": missa.comunidade,
         })
 
-    ministro_ids = [m.id for m in ministros]
-    indisponibilidades_fixas = IndisponibilidadeFixa.query.filter(
-        IndisponibilidadeFixa.id_paroquia == current_user.id_paroquia,
-        IndisponibilidadeFixa.id_ministro.in_(ministro_ids),
-    ).all() if ministro_ids else []
-    disponibilidades_fixas = DisponibilidadeFixa.query.filter(
-        DisponibilidadeFixa.id_paroquia == current_user.id_paroquia,
-        DisponibilidadeFixa.id_ministro.in_(ministro_ids),
-    ).all() if ministro_ids else []
-    indisponibilidades_data = Indisponibilidade.query.filter(
-        Indisponibilidade.id_paroquia == current_user.id_paroquia,
-        Indisponibilidade.id_ministro.in_(ministro_ids),
-        Indisponibilidade.data >= hoje,
-    ).all() if ministro_ids else []
-    disponibilidades_data = Disponibilidade.query.filter(
-        Disponibilidade.id_paroquia == current_user.id_paroquia,
-        Disponibilidade.id_ministro.in_(ministro_ids),
-        Disponibilidade.data >= hoje,
-    ).all() if ministro_ids else []
-
-    indisponibilidades_fixas_map = defaultdict(list)
-    disponibilidades_fixas_map = defaultdict(list)
-    indisponibilidades_data_map = defaultdict(list)
-    disponibilidades_data_map = defaultdict(list)
-
-    for regra in indisponibilidades_fixas:
-        indisponibilidades_fixas_map[(regra.id_ministro, regra.dia_semana)].append(regra)
-    for regra in disponibilidades_fixas:
-        disponibilidades_fixas_map[(regra.id_ministro, regra.dia_semana)].append(regra)
-    for regra in indisponibilidades_data:
-        indisponibilidades_data_map[(regra.id_ministro, regra.data)].append(regra)
-    for regra in disponibilidades_data:
-        disponibilidades_data_map[(regra.id_ministro, regra.data)].append(regra)
+    indice = AvailabilityIndex.carregar(
+        current_user.id_paroquia,
+        data_inicio=hoje,
+        ministro_ids=[m.id for m in ministros],
+    )
 
     mapa = []
     for ministro in ministros:
         celulas = []
         for coluna in colunas:
-            status = _resolver_status_missa(
-                ministro.id,
-                Missa(
-                    id=coluna["missa_id"],
-                    data=coluna["data"],
-                    horario=coluna["horario"],
-                    comunidade=coluna["comunidade"],
-                ),
-                indisponibilidades_fixas_map,
-                disponibilidades_fixas_map,
-                indisponibilidades_data_map,
-                disponibilidades_data_map,
-            )
+            status = indice.status(ministro.id, coluna["data"], coluna["horario"])
             celulas.append({
-                "simbolo": status["simbolo"],
-                "status": status["status"],
-                "classe": status["classe"],
+                "simbolo": STATUS_MAPA[status]["simbolo"],
+                "status": status,
+                "classe": STATUS_MAPA[status]["classe"],
                 "missa_id": coluna["missa_id"],
                 "data": coluna["data_label"],
                 "semana": coluna["semana"],
@@ -691,6 +606,15 @@ def toggle_indisponibilidade():
         status = "criado"
 
     db.session.commit()
+
+    if status == "criado":
+        resultado = _replanejar_escalas(ministro_id)
+        return {
+            "status": status,
+            "substituidas": len(resultado["criadas"]),
+            "sem_substituto": len(resultado["sem_substituto"]),
+        }
+
     return {"status": status}
 
 
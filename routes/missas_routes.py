@@ -4,6 +4,7 @@ from models import CasalMinisterio, db, Missa, Escala
 from datetime import datetime, date
 import calendar
 from utils.auth import admin_required
+from utils.periodo_utils import filtro_mes
 from services.paroquia_scope_service import get_missa_or_404
 from services.escala_imagem_service import gerar_imagem_calendario_escala
 from services.public_url_service import build_public_url
@@ -169,8 +170,7 @@ def calendario_missas():
         query = query.filter(Missa.data >= data_inicio, Missa.data <= data_fim)
     else:
         query = query.filter(
-            db.extract("month", Missa.data) == mes,
-            db.extract("year", Missa.data) == ano
+            filtro_mes(Missa.data, mes, ano)
         )
 
     missas = query.order_by(Missa.data.asc(), Missa.horario.asc(), Missa.id.asc()).all()
@@ -299,8 +299,7 @@ def calendario_missas_imagem():
 
     missas = Missa.query.filter(
         Missa.id_paroquia == current_user.id_paroquia,
-        db.extract("month", Missa.data) == mes,
-        db.extract("year", Missa.data) == ano
+        filtro_mes(Missa.data, mes, ano)
     ).all()
     missas_ids = [m.id for m in missas]
 
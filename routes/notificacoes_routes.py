@@ -1,19 +1,66 @@
-from flask import Blueprint, render_template
+from datetime import datetime
+
+from flask import Blueprint, jsonify, redirect, render_template, request, url_for
 from flask_login import login_required, current_user
-from models import Notificacao
+
+from services.notification_manager import NotificationManager
 
 notificacao_bp = Blueprint("notificacoes", __name__)
 
 
+def _ler_cursor(valor):
+    # "<criada_em ISO>_<id>", gerado por _montar_cursor.
+    try:
+        criada_em, notificacao_id = (valor or "").rsplit("_", 1)
+        return datetime.fromisoformat(criada_em), int(notificacao_id)
+    except ValueError:
+        return None
+
+
+def _montar_cursor(cursor):
+    if cursor is None:
+        return None
+    criada_em, notificacao_id = cursor
+    return f"{criada_em.isoformat()}_{notificacao_id}"
+
+
 @notificacao_bp.route("/notificacoes")
 @login_required
 def listar():
 
-    notificacoes = Notificacao.query.filter_by(
-        usuario_id=current_user.id
-    ).order_by(Notificacao.criada_em.desc()).all()
+    notificacoes, proximo = NotificationManager.listar(
+        current_user.id,
+        cursor=_ler_cursor(request.args.get("cursor"))
+    )
 
     return render_template(
         "notificacoes.html",
-        notificacoes=notificacoes
-    )
\ No newline at end of file
+        notificacoes=notificacoes,
+        proximo_cursor=_montar_cursor(proximo),
+        nao_lidas=NotificationManager.contar_nao_lidas(current_user.id)
+    )
+
+
+@notificacao_bp.route("/notificacoes/nao-lidas")
+@login_required
+def contar_nao_lidas():
+
+    return jsonify({"nao_lidas": NotificationManager.contar_nao_lidas(current_user.id)})
+
+
+@notificacao_bp.route("/notificacoes/<int:id>/lida", methods=["POST"])
+@login_required
+def marcar_lida(id):
+
+    NotificationManager.marcar_lida(id, usuario_id=current_user.id)
+
+    return redirect(request.referrer or url_for("notificacoes.listar"))
+
+
+@notificacao_bp.route("/notificacoes/marcar-todas", methods=["POST"])
+@login_required
+def marcar_todas_lidas():
+
+    NotificationManager.marcar_todas_lidas(current_user.id)
+
+    return redirect(url_for("notificacoes.listar"))
@@ -18,10 +18,11 @@ from models import (
 )
 
 from services.firebase_storage_service import upload_arquivo
-from services.firebase_service import enviar_push
+from services.notificacao_outbox_service import enfileirar_push
 from services.public_url_service import build_public_url
 from services.whatsapp_service import gerar_link_whatsapp_telefone
 from utils.auth import admin_required
+from utils.periodo_utils import filtro_ano
 
 
 presencas_bp = Blueprint("presencas", __name__)
@@ -266,7 +267,7 @@ def relatorio_presencas():
 
     reunioes_ano = ReuniaoFormacao.query.filter(
         ReuniaoFormacao.id_paroquia == current_user.id_paroquia,
-        extract("year", ReuniaoFormacao.data) == ano
+        filtro_ano(ReuniaoFormacao.data, ano)
     ).order_by(
         ReuniaoFormacao.data.asc(),
         ReuniaoFormacao.id.asc()
@@ -284,7 +285,7 @@ def relatorio_presencas():
         PresencaReuniao.id_paroquia == current_user.id_paroquia,
         ReuniaoFormacao.id_paroquia == current_user.id_paroquia,
         PresencaReuniao.presente.is_(True),
-        extract("year", ReuniaoFormacao.data) == ano
+        filtro_ano(ReuniaoFormacao.data, ano)
     ).all()
 
     presenca_map = defaultdict(set)
@@ -627,7 +628,7 @@ def enviar_push_confirmacao_reuniao(reuniao_id, ministro_id):
     link = _link_confirmacao_reuniao(reuniao, ministro)
     tipo = "Formacao" if reuniao.tipo == "formacao" else "Reuniao"
 
-    enviar_push(
+    enfileirar_push(
         ministro.firebase_token,
         f"Confirmacao de Presenca - {tipo}",
         (
@@ -635,7 +636,9 @@ def enviar_push_confirmacao_reuniao(reuniao_id, ministro_id):
             "Toque para abrir o link de confirmacao."
         ),
         url=link,
+        usuario_id=ministro.id,
     )
+    db.session.commit()
 
     flash(f"Push enviado para {ministro.nome}.")
     return redirect(url_for("presencas.links_confirmacao_reuniao", reuniao_id=reuniao.id))
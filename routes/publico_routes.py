@@ -1,9 +1,10 @@
 from flask import Blueprint, render_template, redirect, request, url_for, flash, send_file
 from flask_login import login_required, current_user, login_user, logout_user
-from models import db, Paroquia, Ministro, Missa, Escala, Indisponibilidade, EscalaFixa
+from models import Paroquia, Ministro, Missa, Escala, Indisponibilidade, EscalaFixa
 from datetime import datetime, date, timedelta
 import calendar, uuid, urllib.parse, base64, io
 from utils.auth import admin_required
+from utils.periodo_utils import filtro_mes
 from services.public_url_service import build_public_url
 import qrcode
 from io import BytesIO
@@ -41,8 +42,7 @@ def calendario_publico(token):
 
     missas = Missa.query.filter(
         Missa.id_paroquia == ministro.id_paroquia,
-        db.extract("month", Missa.data) == mes,
-        db.extract("year", Missa.data) == ano
+        filtro_mes(Missa.data, mes, ano)
     ).all()
 
     estrutura = {}
@@ -131,8 +131,7 @@ def calendario_paroquia(id):
 
     missas = Missa.query.filter(
         Missa.id_paroquia == id,
-        db.extract("month", Missa.data) == mes,
-        db.extract("year", Missa.data) == ano
+        filtro_mes(Missa.data, mes, ano)
     ).order_by(Missa.data.asc(), Missa.horario.asc(), Missa.id.asc()).all()
 
     estrutura = {}
@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for
 from flask_login import login_required
 from models import db, Paroquia, Ministro, Missa, Escala
+from services.job_run_service import resumo_jobs, ultimas_execucoes
 from utils.auth import superadmin_required
 
 superadmin_bp = Blueprint("superadmin", __name__)
@@ -54,3 +55,18 @@ def nova_paroquia():
     db.session.commit()
 
     return redirect(url_for("superadmin.painel_superadmin"))
+
+
+@superadmin_bp.route("/superadmin/jobs")
+@login_required
+@superadmin_required
+def painel_jobs():
+
+    job = request.args.get("job") or None
+
+    return render_template(
+        "superadmin_jobs.html",
+        resumo=resumo_jobs(),
+        execucoes=ultimas_execucoes(job=job),
+        job=job
+    )
@@ -1,22 +1,24 @@
 import logging
 
-from services.lembrete_missa_service import enviar_lembretes_missa
+from services.job_run_service import execucao_job
+from services.lembrete_missa_service import armar_proximo_lembrete, enviar_lembretes_missa, proximo_lembrete
 from services.notification_manager import NotificationManager
+from services.notificacao_outbox_service import drenar_outbox
 from services.whatsapp_service import enviar_lembretes_whatsapp
 
 from rifas.services import cancelar_pagamentos_expirados
 from contribuicoes.scheduler import registrar_agendamentos_contribuicoes
 from ofertas.services import importar_pix_automatico
 from extensions import db
-from datetime import datetime
 
 
 logger = logging.getLogger(__name__)
 
 
 def executar_lembretes_whatsapp_agendados(app):
-    with app.app_context():
+    with execucao_job(app, "lembretes_whatsapp_amanha") as execucao:
         resultado = enviar_lembretes_whatsapp()
+        execucao.itens = resultado["enviados"]
         logger.info(
             "Job WhatsApp concluido. data_alvo=%s enviados=%s ministros_sem_telefone=%s falhas=%s",
             resultado["data_alvo"],
@@ -26,31 +28,39 @@ def executar_lembretes_whatsapp_agendados(app):
         )
 
 
-def job_importar_ofertas(app):
+def executar_outbox_notificacoes(app):
+    with execucao_job(app, "outbox_notificacoes") as execucao:
+        resultado = drenar_outbox()
+        execucao.itens = resultado["lidas"]
+        if resultado["lidas"]:
+            logger.info(
+                "Outbox de notificacoes: enviadas=%s reagendadas=%s falhas=%s",
+                resultado["enviadas"],
+                resultado["reagendadas"],
+                resultado["falhas"],
+            )
 
-    with app.app_context():
 
-        print("###########################")
-        print("JOB IMPORTAÇÃO OFERTAS")
-        print(datetime.now())
-        print("###########################")
+def executar_limpeza_tokens_push(app):
+    with execucao_job(app, "limpar_tokens_push") as execucao:
+        execucao.itens = NotificationManager.limpar_tokens_inativos()
 
-        try:
 
-            total = importar_pix_automatico()
+def executar_retencao_notificacoes(app):
+    with execucao_job(app, "limpar_notificacoes") as execucao:
+        execucao.itens = NotificationManager.limpar_notificacoes_lidas()
 
-            db.session.commit()
 
-            print(
-                f"{total} PIX importados."
-            )
+def job_importar_ofertas(app):
 
-        except Exception as e:
+    with execucao_job(app, "importacao_ofertas") as execucao:
 
-            db.session.rollback()
+        total = importar_pix_automatico()
 
-            print(e)
+        db.session.commit()
 
+        execucao.itens = total
+        logger.info("%s PIX importados.", total)
 
 
 def registrar_agendamentos(scheduler, app):
@@ -61,12 +71,19 @@ def registrar_agendamentos(scheduler, app):
         enviar_lembretes_missa,
         trigger="interval",
         minutes=10,
-        args=[app],
+        args=[app, scheduler],
         max_instances=1,
         replace_existing=True,
         id="lembretes_missa",
     )
 
+    with app.app_context():
+        try:
+            armar_proximo_lembrete(scheduler, app, proximo_lembrete())
+        except Exception:
+            db.session.rollback()
+            logger.exception("Erro ao armar o proximo lembrete de missa")
+
     scheduler.add_job(
         executar_lembretes_whatsapp_agendados,
         trigger="cron",
@@ -79,12 +96,37 @@ def registrar_agendamentos(scheduler, app):
     )
 
     scheduler.add_job(
-        NotificationManager.limpar_tokens_inativos,
+        executar_outbox_notificacoes,
+        trigger="interval",
+        seconds=app.config.get("NOTIFICACAO_OUTBOX_INTERVALO", 30),
+        args=[app],
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True,
+        id="outbox_notificacoes",
+    )
+
+    scheduler.add_job(
+        executar_limpeza_tokens_push,
         trigger="interval",
         hours=24,
+        args=[app],
+        max_instances=1,
+        replace_existing=True,
         id="limpar_tokens_push",
     )
 
+    scheduler.add_job(
+        executar_retencao_notificacoes,
+        trigger="cron",
+        hour=3,
+        minute=30,
+        args=[app],
+        max_instances=1,
+        replace_existing=True,
+        id="limpar_notificacoes",
+    )
+
 # 🔥 👉 FALTA ISSO AQUI
     scheduler.add_job(
         executar_expiracao_rifas,
@@ -112,15 +154,8 @@ def registrar_agendamentos(scheduler, app):
     scheduler.start()
 
 def executar_expiracao_rifas(app):
-    with app.app_context():
-        logger.info("JOB RIFA INICIADO")
-        logger.info("JOB RIFA FINALIZADO")
-        try:
-            cancelar_pagamentos_expirados()
-            db.session.commit()
+    with execucao_job(app, "expirar_rifas") as execucao:
+        execucao.itens = cancelar_pagamentos_expirados()
+        db.session.commit()
 
-            logger.info("Expiração de rifas concluída com sucesso")
-
-        except Exception as e:
-            db.session.rollback()
-            logger.error(f"Erro ao expirar rifas: {str(e)}")
+        logger.info("Expiração de rifas concluída com sucesso")
@@ -1,3 +1,6 @@
+from collections import defaultdict
+
+from extensions import db
 from models import Disponibilidade, DisponibilidadeFixa, Indisponibilidade, IndisponibilidadeFixa
 
 
@@ -27,119 +30,151 @@ def _score_regra_data(regra, horario_ref):
     return 100 if regra.horario is not None else 90
 
 
-def resolver_status_missa(ministro_id, missa, id_paroquia):
-    semana_ref = semana_do_mes(missa.data)
-    dia_semana = missa.data.weekday()
-
-    indisponibilidades_fixas = IndisponibilidadeFixa.query.filter(
-        IndisponibilidadeFixa.id_ministro == ministro_id,
-        IndisponibilidadeFixa.id_paroquia == id_paroquia,
-        IndisponibilidadeFixa.dia_semana == dia_semana,
-    ).all()
-    disponibilidades_fixas = DisponibilidadeFixa.query.filter(
-        DisponibilidadeFixa.id_ministro == ministro_id,
-        DisponibilidadeFixa.id_paroquia == id_paroquia,
-        DisponibilidadeFixa.dia_semana == dia_semana,
-    ).all()
-    indisponibilidades_data = Indisponibilidade.query.filter(
-        Indisponibilidade.id_ministro == ministro_id,
-        Indisponibilidade.id_paroquia == id_paroquia,
-        Indisponibilidade.data == missa.data,
-    ).all()
-    disponibilidades_data = Disponibilidade.query.filter(
-        Disponibilidade.id_ministro == ministro_id,
-        Disponibilidade.id_paroquia == id_paroquia,
-        Disponibilidade.data == missa.data,
-    ).all()
-
-    melhor_indisponivel = max(
-        (_score_regra_fixa(regra, semana_ref, missa.horario) for regra in indisponibilidades_fixas),
-        default=-1,
-    )
-    melhor_disponivel = max(
-        (_score_regra_fixa(regra, semana_ref, missa.horario) for regra in disponibilidades_fixas),
-        default=-1,
-    )
-
-    melhor_indisponivel = max(
-        melhor_indisponivel,
-        max((_score_regra_data(regra, missa.horario) for regra in indisponibilidades_data), default=-1),
-    )
-    melhor_disponivel = max(
-        melhor_disponivel,
-        max((_score_regra_data(regra, missa.horario) for regra in disponibilidades_data), default=-1),
-    )
-
-    if melhor_indisponivel >= melhor_disponivel and melhor_indisponivel >= 0:
-        return "indisponivel"
-    if melhor_disponivel > melhor_indisponivel and melhor_disponivel >= 0:
-        return "disponivel"
-    return "neutro"
-
-
-def listar_ministros_indisponiveis(ministro_ids, missa, id_paroquia):
+class AvailabilityIndex:
+    """
+    Indice em memoria das regras de (in)disponibilidade de uma paroquia.
+
+    Carrega de uma vez as quatro tabelas de regras (fixas e por data) e guarda
+    as regras por (ministro, dia da semana) e (ministro, data). A resposta para
+    cada (ministro, data, horario) segue a mesma precedencia de
+    ``_score_regra_fixa`` / ``_score_regra_data`` e fica em cache.
+    """
+
+    def __init__(self, id_paroquia):
+        self.id_paroquia = id_paroquia
+        self._indisponiveis_fixas = defaultdict(list)
+        self._disponiveis_fixas = defaultdict(list)
+        self._indisponiveis_data = defaultdict(list)
+        self._disponiveis_data = defaultdict(list)
+        self._status_cache = {}
+
+    @classmethod
+    def carregar(cls, id_paroquia, data_inicio=None, data_fim=None, ministro_ids=None):
+        """Carrega as regras da paroquia; as regras por data ficam em [data_inicio, data_fim]."""
+        indice = cls(id_paroquia)
+
+        if ministro_ids is not None:
+            ministro_ids = list(ministro_ids)
+            if not ministro_ids:
+                return indice
+
+        def _filtrar(query, modelo, por_data):
+            query = query.filter(modelo.id_paroquia == id_paroquia)
+            if ministro_ids is not None:
+                query = query.filter(modelo.id_ministro.in_(ministro_ids))
+            if por_data and data_inicio:
+                query = query.filter(modelo.data >= data_inicio)
+            if por_data and data_fim:
+                query = query.filter(modelo.data <= data_fim)
+            return query
+
+        for modelo, destino in (
+            (IndisponibilidadeFixa, indice._indisponiveis_fixas),
+            (DisponibilidadeFixa, indice._disponiveis_fixas),
+        ):
+            regras = _filtrar(
+                db.session.query(modelo.id_ministro, modelo.semana, modelo.dia_semana, modelo.horario),
+                modelo,
+                por_data=False,
+            )
+            for regra in regras:
+                if regra.dia_semana is not None:
+                    destino[(regra.id_ministro, regra.dia_semana)].append(regra)
+
+        for modelo, destino in (
+            (Indisponibilidade, indice._indisponiveis_data),
+            (Disponibilidade, indice._disponiveis_data),
+        ):
+            regras = _filtrar(
+                db.session.query(modelo.id_ministro, modelo.data, modelo.horario),
+                modelo,
+                por_data=True,
+            )
+            for regra in regras:
+                destino[(regra.id_ministro, regra.data)].append(regra)
+
+        return indice
+
+    def _resolver(self, ministro_id, data, horario):
+        semana_ref = semana_do_mes(data)
+        chave_fixa = (ministro_id, data.weekday())
+        chave_data = (ministro_id, data)
+
+        melhor_indisponivel = max(
+            (_score_regra_fixa(regra, semana_ref, horario) for regra in self._indisponiveis_fixas.get(chave_fixa, ())),
+            default=-1,
+        )
+        melhor_disponivel = max(
+            (_score_regra_fixa(regra, semana_ref, horario) for regra in self._disponiveis_fixas.get(chave_fixa, ())),
+            default=-1,
+        )
+
+        melhor_indisponivel = max(
+            melhor_indisponivel,
+            max((_score_regra_data(regra, horario) for regra in self._indisponiveis_data.get(chave_data, ())), default=-1),
+        )
+        melhor_disponivel = max(
+            melhor_disponivel,
+            max((_score_regra_data(regra, horario) for regra in self._disponiveis_data.get(chave_data, ())), default=-1),
+        )
+
+        if melhor_indisponivel >= melhor_disponivel and melhor_indisponivel >= 0:
+            return "indisponivel"
+        if melhor_disponivel > melhor_indisponivel and melhor_disponivel >= 0:
+            return "disponivel"
+        return "neutro"
+
+    def status(self, ministro_id, data, horario):
+        chave = (ministro_id, data, horario)
+        status = self._status_cache.get(chave)
+        if status is None:
+            status = self._resolver(ministro_id, data, horario)
+            self._status_cache[chave] = status
+        return status
+
+    def status_missa(self, ministro_id, missa):
+        return self.status(ministro_id, missa.data, missa.horario)
+
+    def esta_indisponivel(self, ministro_id, missa):
+        return self.status_missa(ministro_id, missa) == "indisponivel"
+
+    def esta_disponivel(self, ministro_id, missa):
+        # Mesmo criterio de esta_disponivel: qualquer regra na data ou no dia da semana.
+        return bool(
+            self._disponiveis_data.get((ministro_id, missa.data))
+            or self._disponiveis_fixas.get((ministro_id, missa.data.weekday()))
+        )
+
+    def indisponiveis(self, ministro_ids, missa):
+        return {
+            ministro_id
+            for ministro_id in ministro_ids
+            if self.esta_indisponivel(ministro_id, missa)
+        }
+
+
+def resolver_status_missa(ministro_id, missa, id_paroquia, indice=None):
+    if indice is None:
+        indice = AvailabilityIndex.carregar(id_paroquia, missa.data, missa.data, [ministro_id])
+    return indice.status_missa(ministro_id, missa)
+
+
+def listar_ministros_indisponiveis(ministro_ids, missa, id_paroquia, indice=None):
     if not ministro_ids:
         return set()
 
-    semana_ref = semana_do_mes(missa.data)
-    dia_semana = missa.data.weekday()
-
-    indisponibilidades_fixas = IndisponibilidadeFixa.query.filter(
-        IndisponibilidadeFixa.id_ministro.in_(ministro_ids),
-        IndisponibilidadeFixa.id_paroquia == id_paroquia,
-        IndisponibilidadeFixa.dia_semana == dia_semana,
-    ).all()
-    disponibilidades_fixas = DisponibilidadeFixa.query.filter(
-        DisponibilidadeFixa.id_ministro.in_(ministro_ids),
-        DisponibilidadeFixa.id_paroquia == id_paroquia,
-        DisponibilidadeFixa.dia_semana == dia_semana,
-    ).all()
-    indisponibilidades_data = Indisponibilidade.query.filter(
-        Indisponibilidade.id_ministro.in_(ministro_ids),
-        Indisponibilidade.id_paroquia == id_paroquia,
-        Indisponibilidade.data == missa.data,
-    ).all()
-    disponibilidades_data = Disponibilidade.query.filter(
-        Disponibilidade.id_ministro.in_(ministro_ids),
-        Disponibilidade.id_paroquia == id_paroquia,
-        Disponibilidade.data == missa.data,
-    ).all()
-
-    melhor_indisponivel = {ministro_id: -1 for ministro_id in ministro_ids}
-    melhor_disponivel = {ministro_id: -1 for ministro_id in ministro_ids}
-
-    for regra in indisponibilidades_fixas:
-        score = _score_regra_fixa(regra, semana_ref, missa.horario)
-        if score > melhor_indisponivel.get(regra.id_ministro, -1):
-            melhor_indisponivel[regra.id_ministro] = score
-
-    for regra in disponibilidades_fixas:
-        score = _score_regra_fixa(regra, semana_ref, missa.horario)
-        if score > melhor_disponivel.get(regra.id_ministro, -1):
-            melhor_disponivel[regra.id_ministro] = score
-
-    for regra in indisponibilidades_data:
-        score = _score_regra_data(regra, missa.horario)
-        if score > melhor_indisponivel.get(regra.id_ministro, -1):
-            melhor_indisponivel[regra.id_ministro] = score
-
-    for regra in disponibilidades_data:
-        score = _score_regra_data(regra, missa.horario)
-        if score > melhor_disponivel.get(regra.id_ministro, -1):
-            melhor_disponivel[regra.id_ministro] = score
-
-    return {
-        ministro_id
-        for ministro_id in ministro_ids
-        if melhor_indisponivel.get(ministro_id, -1) >= melhor_disponivel.get(ministro_id, -1)
-        and melhor_indisponivel.get(ministro_id, -1) >= 0
-    }
-
-
-def esta_indisponivel(ministro_id, missa, id_paroquia):
-    return resolver_status_missa(ministro_id, missa, id_paroquia) == "indisponivel"
-
-def esta_disponivel(ministro_id, missa, paroquia_id):
+    if indice is None:
+        indice = AvailabilityIndex.carregar(id_paroquia, missa.data, missa.data, ministro_ids)
+    return indice.indisponiveis(ministro_ids, missa)
+
+
+def esta_indisponivel(ministro_id, missa, id_paroquia, indice=None):
+    return resolver_status_missa(ministro_id, missa, id_paroquia, indice=indice) == "indisponivel"
+
+def esta_disponivel(ministro_id, missa, paroquia_id, indice=None):
+
+    if indice is not None:
+        return indice.esta_disponivel(ministro_id, missa)
 
     # disponibilidade por data
     disp_data = Disponibilidade.query.filter_by(
@@ -1,50 +1,92 @@
+import heapq
 import uuid
-from sqlalchemy import extract
-from models import db, Missa, Escala, Ministro
-from services.disponibilidade_service import esta_indisponivel
+from collections import defaultdict
 
+from sqlalchemy import delete, insert
+
+from models import db, Missa, Escala, Ministro
+from services.disponibilidade_service import AvailabilityIndex
+from utils.periodo_utils import filtro_mes
 
-def gerar_escala_equilibrada_mes(mes, ano, paroquia_id, casais_juntos=True):
 
-    missas = Missa.query.filter(
+def _missas_do_mes(paroquia_id, mes, ano):
+    return Missa.query.filter(
         Missa.id_paroquia == paroquia_id,
-        extract("month", Missa.data) == mes,
-        extract("year", Missa.data) == ano
-    ).all()
+        filtro_mes(Missa.data, mes, ano)
+    ).order_by(Missa.data.asc(), Missa.horario.asc(), Missa.id.asc()).all()
 
-    ministros = Ministro.query.filter_by(
-        id_paroquia=paroquia_id
-    ).all()
 
-    contagem = {m.id: 0 for m in ministros}
+def _inserir_escalas(paroquia_id, pares):
+    if not pares:
+        return 0
 
-    for missa in missas:
+    db.session.execute(
+        insert(Escala),
+        [
+            {
+                "id_missa": id_missa,
+                "id_ministro": id_ministro,
+                "id_paroquia": paroquia_id,
+                "token": str(uuid.uuid4()),
+            }
+            for id_missa, id_ministro in pares
+        ],
+    )
+    return len(pares)
 
-        candidatos = []
 
-        for ministro in ministros:
+def gerar_escala_equilibrada_mes(mes, ano, paroquia_id, casais_juntos=True):
+    """
+    Distribui os ministros do mes priorizando quem tem menos escalas.
+
+    Os ministros ficam em um heap por (contagem, ordem de cadastro): cada
+    escolha custa O(log n) e os empates seguem a mesma ordem da lista
+    original. Indisponiveis sao retirados do heap so durante a missa em que
+    estao indisponiveis. Todas as escalas sao gravadas em um unico INSERT.
+    """
+    missas = _missas_do_mes(paroquia_id, mes, ano)
+
+    ministro_ids = [
+        ministro_id
+        for (ministro_id,) in db.session.query(Ministro.id).filter(
+            Ministro.id_paroquia == paroquia_id
+        ).order_by(Ministro.id.asc())
+    ]
+
+    indice = AvailabilityIndex.carregar(
+        paroquia_id,
+        data_inicio=min((m.data for m in missas), default=None),
+        data_fim=max((m.data for m in missas), default=None),
+        ministro_ids=ministro_ids,
+    )
+
+    fila = [(0, ordem, ministro_id) for ordem, ministro_id in enumerate(ministro_ids)]
+    heapq.heapify(fila)
+
+    pares = []
 
-            if esta_indisponivel(ministro.id, missa, paroquia_id):
-                continue
+    for missa in missas:
 
-            candidatos.append(ministro)
+        selecionados = []
+        adiados = []
 
-        candidatos.sort(key=lambda m: contagem[m.id])
+        while fila and len(selecionados) < (missa.qtd_ministros or 0):
+            item = heapq.heappop(fila)
 
-        selecionados = candidatos[:missa.qtd_ministros]
+            if indice.esta_indisponivel(item[2], missa):
+                adiados.append(item)
+                continue
 
-        for ministro in selecionados:
+            selecionados.append(item)
 
-            nova = Escala(
-                id_missa=missa.id,
-                id_ministro=ministro.id,
-                id_paroquia=paroquia_id,
-                token=str(uuid.uuid4())
-            )
+        for contagem, ordem, ministro_id in selecionados:
+            pares.append((missa.id, ministro_id))
+            heapq.heappush(fila, (contagem + 1, ordem, ministro_id))
 
-            db.session.add(nova)
+        for item in adiados:
+            heapq.heappush(fila, item)
 
-            contagem[ministro.id] += 1
+    _inserir_escalas(paroquia_id, pares)
 
     db.session.commit()
 
@@ -52,81 +94,81 @@ def semana_do_mes(data):
     return ((data.day - 1) // 7) + 1
 
 
-def copiar_escala_mes(mes_base, ano_base, mes_novo, ano_novo, paroquia_id):
-
-    from sqlalchemy import extract
-    from models import Missa, Escala
-    from services.disponibilidade_service import esta_indisponivel
-    import uuid
-
-    missas_base = Missa.query.filter(
-        Missa.id_paroquia == paroquia_id,
-        extract("month", Missa.data) == mes_base,
-        extract("year", Missa.data) == ano_base
-    ).all()
+def _chave_copia(missa):
+    return (
+        semana_do_mes(missa.data),
+        missa.data.weekday(),
+        missa.horario,
+        missa.comunidade,
+    )
 
-    missas_novas = Missa.query.filter(
-        Missa.id_paroquia == paroquia_id,
-        extract("month", Missa.data) == mes_novo,
-        extract("year", Missa.data) == ano_novo
-    ).all()
 
+def copiar_escala_mes(mes_base, ano_base, mes_novo, ano_novo, paroquia_id):
+    """
+    Copia as escalas de um mes base para as missas equivalentes do mes novo.
+
+    Missas equivalentes tem a mesma (semana do mes, dia da semana, horario,
+    comunidade); a 5a semana nao e copiada. As escalas das missas de destino
+    sao substituidas, pulando ministros indisponiveis na nova data.
+    """
+    missas_base = _missas_do_mes(paroquia_id, mes_base, ano_base)
+    missas_novas = _missas_do_mes(paroquia_id, mes_novo, ano_novo)
+
+    destinos_por_chave = {}
+    for missa in missas_novas:
+        destinos_por_chave.setdefault(_chave_copia(missa), missa)
+
+    # missa_base.id -> missa_destino; cada destino recebe so a primeira base.
+    destinos = {}
     missas_processadas = set()
 
     for missa_base in missas_base:
 
-        semana = semana_do_mes(missa_base.data)
-
-        if semana == 5:
+        if semana_do_mes(missa_base.data) == 5:
             continue
 
-        dia_semana = missa_base.data.weekday()
+        missa_destino = destinos_por_chave.get(_chave_copia(missa_base))
 
-        missa_destino = None
-
-        for missa in missas_novas:
-
-            if (
-                semana_do_mes(missa.data) == semana
-                and missa.data.weekday() == dia_semana
-                and missa.horario == missa_base.horario
-                and missa.comunidade == missa_base.comunidade
-            ):
-                missa_destino = missa
-                break
-
-        if not missa_destino:
-            continue
-
-        if missa_destino.id in missas_processadas:
+        if not missa_destino or missa_destino.id in missas_processadas:
             continue
 
         missas_processadas.add(missa_destino.id)
+        destinos[missa_base.id] = missa_destino
+
+    if not destinos:
+        db.session.commit()
+        return
+
+    escalados_por_missa = defaultdict(list)
+    for id_missa, id_ministro in db.session.query(Escala.id_missa, Escala.id_ministro).filter(
+        Escala.id_missa.in_(list(destinos))
+    ).order_by(Escala.id.asc()):
+        escalados_por_missa[id_missa].append(id_ministro)
+
+    indice = AvailabilityIndex.carregar(
+        paroquia_id,
+        data_inicio=min(m.data for m in destinos.values()),
+        data_fim=max(m.data for m in destinos.values()),
+        ministro_ids={id_ministro for ids in escalados_por_missa.values() for id_ministro in ids},
+    )
+
+    pares = []
+    for id_missa_base, missa_destino in destinos.items():
+        ids = escalados_por_missa.get(id_missa_base, [])
+        indisponiveis = indice.indisponiveis(ids, missa_destino)
+        pares.extend(
+            (missa_destino.id, id_ministro)
+            for id_ministro in ids
+            if id_ministro not in indisponiveis
+        )
+
+    db.session.execute(
+        delete(Escala).where(
+            Escala.id_missa.in_([missa.id for missa in destinos.values()])
+        ),
+        execution_options={"synchronize_session": False},
+    )
+
+    _inserir_escalas(paroquia_id, pares)
 
-        Escala.query.filter_by(
-            id_missa=missa_destino.id
-        ).delete(synchronize_session=False)
-
-        db.session.flush()
-
-        escalas_base = Escala.query.filter_by(
-            id_missa=missa_base.id
-        ).all()
-
-        for escala in escalas_base:
-
-            ministro = escala.ministro
-
-            if esta_indisponivel(ministro.id, missa_destino, paroquia_id):
-                continue
-
-            nova = Escala(
-                id_missa=missa_destino.id,
-                id_ministro=ministro.id,
-                id_paroquia=paroquia_id,
-                token=str(uuid.uuid4())
-            )
-
-            db.session.add(nova)
-
-    db.session.commit()
\ No newline at end of file
+    db.session.commit()
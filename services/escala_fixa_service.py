@@ -0,0 +1,141 @@
+import calendar
+import uuid
+from datetime import date
+
+from sqlalchemy import insert
+
+from extensions import db
+from models import Escala, EscalaFixa, Missa
+from services.disponibilidade_service import AvailabilityIndex
+from utils.periodo_utils import filtro_mes, intervalo_mes
+
+
+def _regra_vale_no_dia(regra, semana_mes, dia_semana):
+    if regra.semana and regra.semana != semana_mes:
+        return False
+    if regra.dia_semana is not None and regra.dia_semana != dia_semana:
+        return False
+    return True
+
+
+def expandir_regras_mes(regras, mes, ano):
+    """
+    Cruza as regras de escala fixa com o calendario do mes.
+
+    Retorna ``(data, regra)`` na ordem dos dias e, dentro do dia, na ordem
+    das regras recebidas.
+    """
+    ocorrencias = []
+    for dia in range(1, calendar.monthrange(ano, mes)[1] + 1):
+        data_missa = date(ano, mes, dia)
+        semana_mes = (dia - 1) // 7 + 1
+        dia_semana = data_missa.weekday()
+        for regra in regras:
+            if _regra_vale_no_dia(regra, semana_mes, dia_semana):
+                ocorrencias.append((data_missa, regra))
+    return ocorrencias
+
+
+def materializar_escala_fixa_mes(id_paroquia, mes, ano):
+    """
+    Cria as missas e escalas do mes a partir das regras de ``EscalaFixa``.
+
+    As regras sao lidas uma vez e expandidas em memoria. Missas sao
+    identificadas por (data, horario); as que faltam sao criadas com a
+    comunidade da primeira regra que as pediu. Escalas que ja existem ou de
+    ministros indisponiveis sao puladas. Nao faz commit: quem chama decide o
+    fim da transacao.
+
+    Retorna ``{"missas_criadas", "missas_existentes", "escalas_criadas",
+    "ignoradas"}``; ``ignoradas`` lista ``(missa, id_ministro, motivo)`` com
+    motivo ``"ja_escalado"`` ou ``"indisponivel"``.
+    """
+    regras = EscalaFixa.query.filter_by(
+        id_paroquia=id_paroquia
+    ).order_by(EscalaFixa.id.asc()).all()
+
+    resultado = {
+        "missas_criadas": [],
+        "missas_existentes": [],
+        "escalas_criadas": [],
+        "ignoradas": [],
+    }
+
+    ocorrencias = expandir_regras_mes(regras, mes, ano)
+    if not ocorrencias:
+        return resultado
+
+    inicio, _ = intervalo_mes(mes, ano)
+
+    missas = {}
+    for missa in Missa.query.filter(
+        Missa.id_paroquia == id_paroquia,
+        filtro_mes(Missa.data, mes, ano),
+    ).order_by(Missa.id.asc()):
+        missas.setdefault((missa.data, missa.horario), missa)
+
+    usadas = {}
+    for data_missa, regra in ocorrencias:
+        chave = (data_missa, regra.horario)
+        if chave in usadas:
+            continue
+
+        missa = missas.get(chave)
+        if missa is None:
+            missa = Missa(
+                data=data_missa,
+                horario=regra.horario,
+                comunidade=regra.comunidade or "Matriz",
+                qtd_ministros=1,
+                id_paroquia=id_paroquia,
+            )
+            missas[chave] = missa
+            resultado["missas_criadas"].append(missa)
+        else:
+            resultado["missas_existentes"].append(missa)
+        usadas[chave] = missa
+
+    if resultado["missas_criadas"]:
+        db.session.add_all(resultado["missas_criadas"])
+        db.session.flush()
+
+    missa_ids = [missa.id for missa in usadas.values()]
+    escalados = set(
+        db.session.query(Escala.id_missa, Escala.id_ministro).filter(
+            Escala.id_missa.in_(missa_ids)
+        )
+    )
+
+    indice = AvailabilityIndex.carregar(
+        id_paroquia,
+        data_inicio=inicio,
+        data_fim=ocorrencias[-1][0],
+        ministro_ids={regra.id_ministro for regra in regras},
+    )
+
+    novas = []
+    for data_missa, regra in ocorrencias:
+        missa = usadas[(data_missa, regra.horario)]
+        par = (missa.id, regra.id_ministro)
+
+        if par in escalados:
+            resultado["ignoradas"].append((missa, regra.id_ministro, "ja_escalado"))
+            continue
+
+        if indice.esta_indisponivel(regra.id_ministro, missa):
+            resultado["ignoradas"].append((missa, regra.id_ministro, "indisponivel"))
+            continue
+
+        escalados.add(par)
+        novas.append({
+            "id_missa": missa.id,
+            "id_ministro": regra.id_ministro,
+            "id_paroquia": id_paroquia,
+            "token": str(uuid.uuid4()),
+        })
+        resultado["escalas_criadas"].append((missa, regra.id_ministro))
+
+    if novas:
+        db.session.execute(insert(Escala), novas)
+
+    return resultado
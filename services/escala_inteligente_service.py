@@ -4,7 +4,7 @@ import random
 
 from flask import current_app
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import extract, or_
+from sqlalchemy import or_
 
 from models import (
     CasalMinisterio,
@@ -16,6 +16,7 @@ from models import (
     Ministro,
     Missa,
 )
+from services.ministro_metricas_service import historico_anterior_ao_mes, metricas_do_mes
 
 
 def _cfg(key, default):
@@ -212,61 +213,49 @@ def selecionar_ministros(qtd, id_paroquia, missa, considerar_periodos_anteriores
 
     disponibilidade_preferencial = disponibilidade_pontual.union(disponibilidade_fixa)
 
-    historico_query = Escala.query.join(Missa).with_entities(
+    # Meses anteriores vem agregados do modelo de leitura; apenas o mes da
+    # missa e a janela de 7/14 dias sao lidos diretamente das escalas.
+    inicio_mes = missa.data.replace(day=1)
+    historico_meses = {}
+    if considerar_periodos_anteriores:
+        historico_meses = historico_anterior_ao_mes(
+            id_paroquia,
+            missa.data.year,
+            missa.data.month,
+            ministro_ids,
+        )
+        inicio_recente = min(inicio_mes, inicio_14, inicio_7)
+    else:
+        inicio_recente = inicio_mes
+
+    recentes_rows = Escala.query.join(Missa).with_entities(
         Escala.id_ministro,
         Escala.confirmado,
         Missa.data,
     ).filter(
         Escala.id_paroquia == id_paroquia,
         Escala.id_ministro.in_(ministro_ids),
+        Missa.data >= inicio_recente,
         Missa.data < missa.data,
-    )
-
-    if not considerar_periodos_anteriores:
-        historico_query = historico_query.filter(
-            extract("month", Missa.data) == missa.data.month,
-            extract("year", Missa.data) == missa.data.year,
-        )
-
-    historico_rows = historico_query.all()
+    ).all()
 
     hist_por_ministro = defaultdict(list)
-    for ministro_id, confirmado, data in historico_rows:
+    for ministro_id, confirmado, data in recentes_rows:
         hist_por_ministro[ministro_id].append((data, confirmado))
 
-    escalas_mes_rows = Escala.query.join(Missa).with_entities(
-        Escala.id_ministro,
-        Escala.id,
-    ).filter(
-        Escala.id_paroquia == id_paroquia,
-        Escala.id_ministro.in_(ministro_ids),
-        extract("month", Missa.data) == missa.data.month,
-        extract("year", Missa.data) == missa.data.year,
-    ).all()
-
     escalas_mes_map = defaultdict(int)
-    for ministro_id, _ in escalas_mes_rows:
-        escalas_mes_map[ministro_id] += 1
-
-    escalas_domingo_mes_rows = Escala.query.join(Missa).with_entities(
-        Escala.id_ministro,
-        Escala.id,
-    ).filter(
-        Escala.id_paroquia == id_paroquia,
-        Escala.id_ministro.in_(ministro_ids),
-        extract("month", Missa.data) == missa.data.month,
-        extract("year", Missa.data) == missa.data.year,
-        extract("dow", Missa.data) == 0,
-    ).all()
-
     escalas_domingo_mes_map = defaultdict(int)
-    for ministro_id, _ in escalas_domingo_mes_rows:
-        escalas_domingo_mes_map[ministro_id] += 1
-
-    priorizados = []
-    restritos = []
-    score_map = {}
-    escalas_7_map = {}
+    for ministro_id, escalas, domingos in metricas_do_mes(
+        id_paroquia,
+        missa.data.year,
+        missa.data.month,
+        ministro_ids,
+    ):
+        escalas_mes_map[ministro_id] = escalas
+        escalas_domingo_mes_map[ministro_id] = domingos
+
+    candidatos = []
+    metricas_map = {}
 
     for ministro in ministros:
         ministro_id = ministro.id
@@ -278,12 +267,17 @@ def selecionar_ministros(qtd, id_paroquia, missa, considerar_periodos_anteriores
             continue
 
         hist = hist_por_ministro.get(ministro_id, [])
-        total_historico = len(hist)
-        confirmadas_historico = sum(1 for _, conf in hist if conf is True)
+        hist_mes = [(data, conf) for data, conf in hist if data >= inicio_mes]
+        total_anterior, confirmadas_anterior, ultima_anterior = historico_meses.get(
+            ministro_id, (0, 0, None)
+        )
+
+        total_historico = total_anterior + len(hist_mes)
+        confirmadas_historico = confirmadas_anterior + sum(1 for _, conf in hist_mes if conf is True)
         confiabilidade = (confirmadas_historico / total_historico) if total_historico else 1
 
-        if hist:
-            ultima_data = max(data for data, _ in hist)
+        if total_historico:
+            ultima_data = max(data for data, _ in hist) if hist else ultima_anterior
             dias_sem_servir = max((missa.data - ultima_data).days, 0)
             escalas_7_dias = sum(1 for data, _ in hist if data >= inicio_7)
             escalas_14_dias = sum(1 for data, _ in hist if data >= inicio_14)
@@ -292,7 +286,7 @@ def selecionar_ministros(qtd, id_paroquia, missa, considerar_periodos_anteriores
             escalas_7_dias = 0
             escalas_14_dias = 0
 
-        metricas = {
+        metricas_map[ministro_id] = {
             "dias_sem_servir": dias_sem_servir,
             "confiabilidade": confiabilidade,
             "escalas_mes": escalas_mes_map.get(ministro_id, 0),
@@ -301,6 +295,56 @@ def selecionar_ministros(qtd, id_paroquia, missa, considerar_periodos_anteriores
             "total_historico": total_historico,
             "disponivel_preferencial": 1 if ministro_id in disponibilidade_preferencial else 0,
         }
+        candidatos.append(ministro)
+
+    return selecionar_entre_candidatos(
+        qtd,
+        missa,
+        candidatos,
+        metricas_map,
+        escalas_domingo_mes_map,
+        _obter_pares_casal(id_paroquia),
+        modos,
+    )
+
+
+def selecionar_entre_candidatos(
+    qtd,
+    missa,
+    candidatos,
+    metricas_map,
+    escalas_domingo_mes_map,
+    casal_map,
+    modos,
+    rng=None,
+):
+    """
+    Ordena e escolhe os ministros de uma missa a partir de metricas ja calculadas.
+
+    Nao acessa o banco: ``candidatos`` ja vem sem conflitos e indisponiveis,
+    e ``metricas_map`` traz as metricas de cada candidato por id. E usada tanto
+    por ``selecionar_ministros`` quanto pelo planejamento mensal em memoria.
+    """
+    rng = rng or random
+
+    escalas_mes_map = {
+        ministro_id: metricas["escalas_mes"]
+        for ministro_id, metricas in metricas_map.items()
+    }
+    disponibilidade_preferencial = {
+        ministro_id
+        for ministro_id, metricas in metricas_map.items()
+        if metricas["disponivel_preferencial"]
+    }
+
+    priorizados = []
+    restritos = []
+    score_map = {}
+    escalas_7_map = {}
+
+    for ministro in candidatos:
+        ministro_id = ministro.id
+        metricas = metricas_map[ministro_id]
 
         score = _calcular_score(metricas)
         score_map[ministro_id] = score
@@ -318,8 +362,8 @@ def selecionar_ministros(qtd, id_paroquia, missa, considerar_periodos_anteriores
         else:
             priorizados.append(item)
 
-    random.shuffle(priorizados)
-    random.shuffle(restritos)
+    rng.shuffle(priorizados)
+    rng.shuffle(restritos)
     # Prioridade de ordenacao:
     # 1) disponibilidade declarada
     # 2) equilibrio mensal
@@ -332,7 +376,6 @@ def selecionar_ministros(qtd, id_paroquia, missa, considerar_periodos_anteriores
         restritos.sort(key=lambda x: (-x["disponivel_preferencial"], x["escalas_mes"], -x["score"]))
 
     domingo = missa.data.weekday() == 6
-    casal_map = _obter_pares_casal(id_paroquia)
 
     candidatos_ordenados = [x["ministro"] for x in priorizados] + [x["ministro"] for x in restritos]
     candidatos_por_id = {m.id: m for m in candidatos_ordenados}
@@ -569,6 +612,3 @@ def selecionar_ministros(qtd, id_paroquia, missa, considerar_periodos_anteriores
             selecionados_ids.add(ministro.id)
 
     return selecionados
-
-
-
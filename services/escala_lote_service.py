@@ -0,0 +1,139 @@
+import logging
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import current_app
+
+from extensions import db
+from models import Escala, Missa, Paroquia
+from services.escala_planejamento_service import gerar_escala_mes
+from utils.periodo_utils import filtro_mes
+
+
+logger = logging.getLogger(__name__)
+
+# App de cada processo do pool, criado no initializer (papel "web", sem scheduler).
+_APP_WORKER = None
+
+
+def _cfg(chave, padrao):
+    return current_app.config.get(chave, padrao)
+
+
+def _paroquia_tem_escalas(id_paroquia, mes, ano):
+    return db.session.query(Escala.id).join(Missa, Missa.id == Escala.id_missa).filter(
+        Escala.id_paroquia == id_paroquia,
+        filtro_mes(Missa.data, mes, ano),
+    ).first() is not None
+
+
+def gerar_escala_paroquia(id_paroquia, mes, ano, regerar=False, considerar_periodos_anteriores=True, opcoes_geracao="equilibrada"):
+    """
+    Gera a escala de uma paroquia para o lote, sem notificar ministros.
+
+    A semente depende apenas de (paroquia, mes, ano): repetir o comando com os
+    mesmos dados gera o mesmo plano e o diff nao altera nada. Meses que ja tem
+    escalas sao ignorados, a menos que ``regerar`` seja informado.
+    """
+    inicio = time.perf_counter()
+    resultado = {
+        "id_paroquia": id_paroquia,
+        "status": "gerada",
+        "criadas": 0,
+        "mantidas": 0,
+        "removidas": 0,
+        "vagas_em_aberto": 0,
+        "erro": None,
+    }
+
+    try:
+        if not regerar and _paroquia_tem_escalas(id_paroquia, mes, ano):
+            resultado["status"] = "ignorada"
+        else:
+            aplicado = gerar_escala_mes(
+                id_paroquia,
+                mes,
+                ano,
+                considerar_periodos_anteriores=considerar_periodos_anteriores,
+                opcoes_geracao=opcoes_geracao,
+                rng=random.Random(f"{id_paroquia}-{ano}-{mes}"),
+            )
+            resultado.update(
+                criadas=len(aplicado["criadas"]),
+                mantidas=aplicado["mantidas"],
+                removidas=len(aplicado["removidas"]),
+                vagas_em_aberto=aplicado["vagas_em_aberto"],
+            )
+    except Exception as exc:
+        db.session.rollback()
+        logger.exception("Falha ao gerar escala em lote para paroquia_id=%s", id_paroquia)
+        resultado["status"] = "falha"
+        resultado["erro"] = str(exc)
+
+    resultado["segundos"] = round(time.perf_counter() - inicio, 3)
+    return resultado
+
+
+def _inicializar_worker(config):
+    # Processo novo (spawn): monta um app proprio apontando para o mesmo banco.
+    global _APP_WORKER
+    from app import create_app
+
+    _APP_WORKER = create_app(config_override=config, papel="web")
+
+
+def _gerar_no_worker(id_paroquia, mes, ano, opcoes):
+    with _APP_WORKER.app_context():
+        try:
+            return gerar_escala_paroquia(id_paroquia, mes, ano, **opcoes)
+        finally:
+            db.session.remove()
+
+
+def gerar_escalas_lote(mes, ano, paroquia_ids=None, processos=None, **opcoes):
+    """
+    Gera a escala do mes para varias paroquias em paralelo.
+
+    Sem ``paroquia_ids``, considera todas as paroquias ativas. Por padrao
+    roda no proprio processo (``ESCALA_LOTE_PROCESSOS``, 1); com mais
+    processos o pool usa ``spawn``, porque o processo do ``flask`` ja tem as
+    threads do scheduler, e cada worker cria o proprio app e sessao. Falhas
+    sao registradas no resultado sem interromper as demais. Retorna a lista
+    de resultados por paroquia, na ordem dos ids.
+    """
+    consulta = Paroquia.query
+    if paroquia_ids:
+        consulta = consulta.filter(Paroquia.id.in_(paroquia_ids))
+    else:
+        consulta = consulta.filter(Paroquia.ativo.is_(True))
+    paroquias = {paroquia.id: paroquia.nome for paroquia in consulta.order_by(Paroquia.id.asc())}
+
+    ids = list(paroquias)
+    if processos is None:
+        processos = int(_cfg("ESCALA_LOTE_PROCESSOS", 1))
+    processos = max(1, min(processos, len(ids) or 1))
+
+    if processos == 1:
+        resultados = [gerar_escala_paroquia(id_paroquia, mes, ano, **opcoes) for id_paroquia in ids]
+    else:
+        config = {"SQLALCHEMY_DATABASE_URI": current_app.config["SQLALCHEMY_DATABASE_URI"]}
+        with ProcessPoolExecutor(
+            max_workers=processos,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_inicializar_worker,
+            initargs=(config,),
+        ) as pool:
+            resultados = list(pool.map(
+                _gerar_no_worker,
+                ids,
+                [mes] * len(ids),
+                [ano] * len(ids),
+                [opcoes] * len(ids),
+            ))
+
+    for resultado in resultados:
+        resultado["nome"] = paroquias.get(resultado["id_paroquia"])
+
+    return resultados
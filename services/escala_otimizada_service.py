@@ -0,0 +1,316 @@
+import heapq
+import logging
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from services.escala_inteligente_service import _calcular_score, _cfg
+
+
+logger = logging.getLogger(__name__)
+
+
+class TempoEsgotado(Exception):
+    pass
+
+
+# --------------------------------------------------
+# FLUXO DE CUSTO MINIMO
+# --------------------------------------------------
+class FluxoCustoMinimo:
+    """
+    Fluxo maximo de custo minimo por caminhos minimos sucessivos (Dijkstra
+    com potenciais). Os custos das arestas devem ser inteiros nao negativos.
+    """
+
+    def __init__(self):
+        self.adjacencia = defaultdict(list)
+        # Cada aresta: [destino, capacidade, custo, indice da reversa]
+        self.arestas = []
+
+    def adicionar(self, origem, destino, capacidade, custo):
+        if capacidade <= 0:
+            return
+        self.adjacencia[origem].append(len(self.arestas))
+        self.arestas.append([destino, capacidade, custo, len(self.arestas) + 1])
+        self.adjacencia[destino].append(len(self.arestas))
+        self.arestas.append([origem, 0, -custo, len(self.arestas) - 1])
+
+    def fluxo(self, indice):
+        # O fluxo de uma aresta e a capacidade acumulada na reversa.
+        return self.arestas[self.arestas[indice][3]][1]
+
+    def resolver(self, origem, destino, prazo=None):
+        """Retorna (fluxo, custo); levanta ``TempoEsgotado`` se passar do ``prazo``."""
+        potencial = defaultdict(int)
+        fluxo_total = 0
+        custo_total = 0
+
+        while True:
+            if prazo is not None and time.monotonic() > prazo:
+                raise TempoEsgotado()
+
+            distancia = {origem: 0}
+            anterior = {}
+            fila = [(0, 0, origem)]
+            sequencia = 1
+            while fila:
+                dist, _, no = heapq.heappop(fila)
+                if dist > distancia.get(no, dist):
+                    continue
+                for indice in self.adjacencia[no]:
+                    vizinho, capacidade, custo, _ = self.arestas[indice]
+                    if capacidade <= 0:
+                        continue
+                    nova = dist + custo + potencial[no] - potencial[vizinho]
+                    if nova < distancia.get(vizinho, nova + 1):
+                        distancia[vizinho] = nova
+                        anterior[vizinho] = indice
+                        heapq.heappush(fila, (nova, sequencia, vizinho))
+                        sequencia += 1
+
+            if destino not in distancia:
+                return fluxo_total, custo_total
+
+            for no, dist in distancia.items():
+                potencial[no] += dist
+
+            gargalo = None
+            no = destino
+            while no != origem:
+                aresta = self.arestas[anterior[no]]
+                gargalo = aresta[1] if gargalo is None else min(gargalo, aresta[1])
+                no = self.arestas[aresta[3]][0]
+
+            no = destino
+            while no != origem:
+                indice = anterior[no]
+                aresta = self.arestas[indice]
+                aresta[1] -= gargalo
+                self.arestas[aresta[3]][1] += gargalo
+                custo_total += gargalo * aresta[2]
+                no = self.arestas[aresta[3]][0]
+
+            fluxo_total += gargalo
+
+
+# --------------------------------------------------
+# MODELO DO MES
+# --------------------------------------------------
+def _semana_do_mes(data):
+    return ((data.day - 1) // 7) + 1
+
+
+def _custos_preferencia(planejador, missa, candidatos):
+    # Score estatico (antes de qualquer atribuicao do mes), em inteiros: o
+    # equilibrio do mes e as janelas curtas entram pelas arestas convexas.
+    data = missa.data
+    inicio_7 = data - timedelta(days=int(_cfg("ESCALA_JANELA_7_DIAS", 7)))
+    inicio_14 = data - timedelta(days=int(_cfg("ESCALA_JANELA_14_DIAS", 14)))
+    disponiveis = (
+        planejador._ids_por_data(planejador._disp_data, data, missa.horario)
+        | planejador._ids_por_regra_fixa(planejador._disp_fixa, data, missa.horario)
+    )
+    return {
+        ministro_id: -round(10 * _calcular_score(
+            planejador._metricas(ministro_id, data, inicio_7, inicio_14, ministro_id in disponiveis)
+        ))
+        for ministro_id in candidatos
+    }
+
+
+def montar_atribuicao(planejador, prazo=None):
+    """
+    Resolve o mes inteiro como um problema de atribuicao (missas x ministros).
+
+    Rede: origem -> ministro -> {domingos | semana do mes} -> dia -> missa ->
+    destino. As restricoes viram capacidades e custos:
+
+    - um ministro por dia (capacidade 1 no no do dia) e so candidatos
+      disponiveis ligados a cada missa;
+    - equilibrio mensal: a k-esima escala do ministro custa
+      ``ESCALA_OTIMIZADA_PESO_RODADA * (k - 1)``, o mesmo efeito das rodadas
+      da geracao gulosa;
+    - janela de 7 dias aproximada pela semana do mes: acima de
+      ``ESCALA_RESTRICAO_MAX_7_DIAS`` (descontando o historico recente) cada
+      escala paga ``ESCALA_OTIMIZADA_PESO_SEMANA``; domingo repetido paga
+      ``ESCALA_OTIMIZADA_PESO_DOMINGO``;
+    - o score inteligente de cada par (ministro, missa) desempata.
+
+    Casais sao aproximados depois, em ``_aproximar_casais``. Retorna
+    ``(atribuicoes, candidatos_por_missa)``, ambos por ``missa_id``, ou
+    levanta ``TempoEsgotado``.
+    """
+    peso_rodada = int(_cfg("ESCALA_OTIMIZADA_PESO_RODADA", 10000))
+    peso_semana = int(_cfg("ESCALA_OTIMIZADA_PESO_SEMANA", 3000))
+    peso_domingo = int(_cfg("ESCALA_OTIMIZADA_PESO_DOMINGO", 5000))
+    max_7_dias = int(_cfg("ESCALA_RESTRICAO_MAX_7_DIAS", 2))
+    janela_7 = int(_cfg("ESCALA_JANELA_7_DIAS", 7))
+
+    missas = [missa for missa in planejador.missas if (missa.qtd_ministros or 0) > 0]
+    ministro_ids = [ministro.id for ministro in planejador.ministros]
+    dias = sorted({missa.data for missa in missas})
+    semanas = sorted({_semana_do_mes(dia) for dia in dias})
+    domingos = [dia for dia in dias if dia.weekday() == 6]
+
+    candidatos_por_missa = {}
+    custos_por_missa = {}
+    for missa in missas:
+        indisponiveis = planejador.indisponiveis(missa)
+        candidatos = [ministro_id for ministro_id in ministro_ids if ministro_id not in indisponiveis]
+        candidatos_por_missa[missa.id] = candidatos
+        custos_por_missa[missa.id] = _custos_preferencia(planejador, missa, candidatos)
+
+    # Custos de preferencia podem ser negativos; o deslocamento e o mesmo para
+    # toda unidade de fluxo, entao nao muda qual atribuicao maxima e a melhor.
+    deslocamento = -min(
+        (custo for custos in custos_por_missa.values() for custo in custos.values()),
+        default=0,
+    )
+    deslocamento = max(deslocamento, 0)
+
+    rede = FluxoCustoMinimo()
+    origem, destino = "origem", "destino"
+    inicio_mes = planejador.inicio
+
+    for ministro_id in ministro_ids:
+        no_ministro = ("ministro", ministro_id)
+        for k in range(len(dias)):
+            rede.adicionar(origem, no_ministro, 1, peso_rodada * k)
+
+        if domingos:
+            no_domingos = ("domingos", ministro_id)
+            rede.adicionar(no_ministro, no_domingos, 1, 0)
+            rede.adicionar(no_ministro, no_domingos, len(domingos) - 1, peso_domingo)
+            for dia in domingos:
+                rede.adicionar(no_domingos, ("dia", ministro_id, dia), 1, 0)
+
+        recentes = planejador._hist_recentes.get(ministro_id, [])
+        ja_na_janela = sum(1 for data in recentes if data >= inicio_mes - timedelta(days=janela_7))
+        for semana in semanas:
+            dias_semana = [dia for dia in dias if _semana_do_mes(dia) == semana and dia.weekday() != 6]
+            if not dias_semana:
+                continue
+            no_semana = ("semana", ministro_id, semana)
+            livres = max(max_7_dias - (ja_na_janela if semana == 1 else 0), 0)
+            livres = min(livres, len(dias_semana))
+            rede.adicionar(no_ministro, no_semana, livres, 0)
+            rede.adicionar(no_ministro, no_semana, len(dias_semana) - livres, peso_semana)
+            for dia in dias_semana:
+                rede.adicionar(no_semana, ("dia", ministro_id, dia), 1, 0)
+
+    arestas_escala = {}
+    for missa in missas:
+        no_missa = ("missa", missa.id)
+        for ministro_id in candidatos_por_missa[missa.id]:
+            arestas_escala[(missa.id, ministro_id)] = len(rede.arestas)
+            rede.adicionar(
+                ("dia", ministro_id, missa.data),
+                no_missa,
+                1,
+                custos_por_missa[missa.id][ministro_id] + deslocamento,
+            )
+        rede.adicionar(no_missa, destino, missa.qtd_ministros, 0)
+
+    rede.resolver(origem, destino, prazo=prazo)
+
+    atribuicoes = defaultdict(list)
+    for (missa_id, ministro_id), indice in arestas_escala.items():
+        if rede.fluxo(indice):
+            atribuicoes[missa_id].append(ministro_id)
+    return atribuicoes, candidatos_por_missa
+
+
+def _aproximar_casais(planejador, atribuicoes, candidatos_por_missa):
+    """
+    Troca um ministro sem par pelo conjuge de quem ja esta na missa, quando o
+    conjuge esta livre no dia e tem menos escalas no mes que o substituido
+    (que continua com pelo menos uma).
+    """
+    if not planejador.casal_map:
+        return
+
+    missas_por_id = {missa.id: missa for missa in planejador.missas}
+    contagem = defaultdict(int)
+    ocupados = defaultdict(set)
+    for missa_id, ids in atribuicoes.items():
+        for ministro_id in ids:
+            contagem[ministro_id] += 1
+            ocupados[missas_por_id[missa_id].data].add(ministro_id)
+
+    for missa_id in sorted(atribuicoes, key=lambda i: (missas_por_id[i].data, missas_por_id[i].horario or "", i)):
+        missa = missas_por_id[missa_id]
+        ids = atribuicoes[missa_id]
+        candidatos = set(candidatos_por_missa.get(missa_id, ()))
+        limite = _fracao_casais(missa) * len(ids)
+
+        for ministro_id in list(ids):
+            if ministro_id not in ids:
+                continue
+            parceiro = planejador.casal_map.get(ministro_id)
+            if parceiro is None or parceiro in ids or parceiro not in candidatos:
+                continue
+            if parceiro in ocupados[missa.data]:
+                continue
+            if 2 * (_pares_na_missa(planejador.casal_map, ids) + 1) > max(limite, 2):
+                break
+
+            sozinhos = [
+                outro for outro in ids
+                if outro != ministro_id and planejador.casal_map.get(outro) not in ids
+                and contagem[outro] > max(contagem[parceiro], 1)
+            ]
+            if not sozinhos:
+                continue
+
+            saindo = max(sozinhos, key=lambda outro: (contagem[outro], outro))
+            ids[ids.index(saindo)] = parceiro
+            contagem[saindo] -= 1
+            contagem[parceiro] += 1
+            ocupados[missa.data].discard(saindo)
+            ocupados[missa.data].add(parceiro)
+
+
+def _fracao_casais(missa):
+    if missa.data.weekday() == 6:
+        return float(_cfg("ESCALA_CASAL_FRACAO_DOMINGO", 0.5))
+    return float(_cfg("ESCALA_CASAL_FRACAO_SEMANA", 0.4))
+
+
+def _pares_na_missa(casal_map, ids):
+    presentes = set(ids)
+    return sum(1 for ministro_id in presentes if casal_map.get(ministro_id) in presentes) // 2
+
+
+def planejar_otimizado(planejador, tempo_limite=None):
+    """
+    Preenche ``planejador.atribuicoes`` com a solucao do fluxo de custo minimo.
+
+    Retorna ``False`` (sem alterar o planejador) se o tempo limite
+    (``ESCALA_OTIMIZADA_TEMPO_LIMITE`` segundos, padrao) acabar antes da
+    solucao; quem chama segue com a geracao gulosa.
+    """
+    if tempo_limite is None:
+        tempo_limite = float(_cfg("ESCALA_OTIMIZADA_TEMPO_LIMITE", 5))
+    prazo = time.monotonic() + tempo_limite if tempo_limite > 0 else None
+
+    try:
+        atribuicoes, candidatos_por_missa = montar_atribuicao(planejador, prazo=prazo)
+    except TempoEsgotado:
+        logger.warning(
+            "Escala otimizada excedeu %.1fs (paroquia_id=%s, %s/%s); usando geracao gulosa.",
+            tempo_limite,
+            planejador.id_paroquia,
+            planejador.mes,
+            planejador.ano,
+        )
+        return False
+
+    _aproximar_casais(planejador, atribuicoes, candidatos_por_missa)
+
+    ministros_por_id = {ministro.id: ministro for ministro in planejador.ministros}
+    for missa in sorted(planejador.missas, key=lambda m: (m.data, m.horario or "", m.id)):
+        ids = sorted(atribuicoes.get(missa.id, []))
+        planejador.registrar(missa, [ministros_por_id[ministro_id] for ministro_id in ids])
+
+    return True
@@ -0,0 +1,752 @@
+import random
+import uuid
+from bisect import bisect_left, insort
+from collections import defaultdict, namedtuple
+from datetime import date, timedelta
+from itertools import product
+
+from sqlalchemy import delete, insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from extensions import db
+from models import (
+    Disponibilidade,
+    DisponibilidadeFixa,
+    Escala,
+    EscalaPlano,
+    Indisponibilidade,
+    IndisponibilidadeFixa,
+    Ministro,
+    Missa,
+)
+from services.escala_inteligente_service import (
+    _cfg,
+    _normalizar_modos,
+    _obter_pares_casal,
+    selecionar_entre_candidatos,
+)
+from services.escala_otimizada_service import planejar_otimizado
+from services.ministro_metricas_service import historico_anterior_ao_mes
+from services.pedido_substituicao_service import cancelar_pedidos_abertos_das_escalas
+from utils.periodo_utils import intervalo_mes
+
+
+OPCOES_GERACAO_PERMITIDAS = {
+    "equilibrada",
+    "casais_fim_semana",
+    "casais_semana",
+    "minimo_missas",
+    "semana_primeiro",
+    "fim_semana_primeiro",
+    "otimizada",
+}
+
+
+# Copias leves de Missa/Ministro usadas quando o planejador roda fora da sessao.
+MissaPlanejada = namedtuple("MissaPlanejada", "id data horario qtd_ministros")
+MinistroPlanejado = namedtuple("MinistroPlanejado", "id nome")
+
+_ESTADO_CARREGADO = (
+    "casal_map",
+    "_indisp_data",
+    "_indisp_fixa",
+    "_disp_data",
+    "_disp_fixa",
+    "_hist_total",
+    "_hist_confirmadas",
+    "_hist_ultima",
+    "_hist_recentes",
+)
+
+
+def normalizar_opcoes_geracao(opcoes):
+    if isinstance(opcoes, str):
+        opcoes = [opcoes]
+
+    normalizadas = []
+
+    for opcao in opcoes or []:
+        valor = (opcao or "").strip()
+        if valor and valor in OPCOES_GERACAO_PERMITIDAS and valor not in normalizadas:
+            normalizadas.append(valor)
+
+    return normalizadas or ["equilibrada"]
+
+
+def ordenar_missas_para_geracao(missas, opcoes_geracao):
+    opcoes_geracao = normalizar_opcoes_geracao(opcoes_geracao)
+
+    if "semana_primeiro" in opcoes_geracao:
+        return sorted(missas, key=lambda m: (m.data.weekday() in {5, 6}, m.data, m.horario or "", m.id))
+    if "fim_semana_primeiro" in opcoes_geracao:
+        return sorted(missas, key=lambda m: (m.data.weekday() not in {5, 6}, m.data, m.horario or "", m.id))
+    return sorted(missas, key=lambda m: (m.data.weekday() != 6, m.data, m.horario or "", m.id))
+
+
+def _semana_do_mes(data):
+    return ((data.day - 1) // 7) + 1
+
+
+def _chaves_regra_fixa(data, horario):
+    # Uma regra fixa vale quando cada campo e nulo ou igual ao da missa.
+    return product(
+        (_semana_do_mes(data), None),
+        (data.weekday(), None),
+        (horario, None),
+    )
+
+
+class PlanejadorEscalaMes:
+    """
+    Gera a escala inteligente de um mes inteiro em memoria.
+
+    Carrega uma unica vez as missas do mes, os ministros, as regras de
+    (in)disponibilidade, os casais e o historico necessario para o score.
+    A cada missa atribuida, os contadores (mes, domingos, janelas de 7/14 dias,
+    conflito no mesmo dia) sao atualizados no proprio planejador, sem voltar ao
+    banco. A selecao usa ``selecionar_entre_candidatos``, a mesma regra de
+    ``selecionar_ministros``.
+
+    O planejador assume que as escalas do mes ja foram removidas (ou nao
+    existem): o historico considerado e apenas o anterior ao inicio do mes.
+    """
+
+    def __init__(
+        self,
+        id_paroquia,
+        mes,
+        ano,
+        considerar_periodos_anteriores=True,
+        modo_ordenacao="equilibrada",
+        rng=None,
+    ):
+        self.id_paroquia = id_paroquia
+        self.mes = mes
+        self.ano = ano
+        self.considerar_periodos_anteriores = considerar_periodos_anteriores
+        self.opcoes_geracao = normalizar_opcoes_geracao(modo_ordenacao)
+        self.modos = _normalizar_modos(self.opcoes_geracao) or {"equilibrada"}
+        self.rng = rng or random
+        self.inicio, self.fim = intervalo_mes(mes, ano)
+
+        self.missas = []
+        self.ministros = []
+        self.casal_map = {}
+        self.atribuicoes = {}
+        self.metodo = None
+
+        self._indisp_data = defaultdict(set)
+        self._indisp_fixa = defaultdict(set)
+        self._disp_data = defaultdict(set)
+        self._disp_fixa = defaultdict(set)
+
+        self._hist_total = defaultdict(int)
+        self._hist_confirmadas = defaultdict(int)
+        self._hist_ultima = {}
+        self._hist_recentes = defaultdict(list)
+
+        self._datas_mes = defaultdict(list)
+        self._domingos_mes = defaultdict(int)
+        self._ocupados_por_data = defaultdict(set)
+
+    # --------------------------------------------------
+    # CARGA
+    # --------------------------------------------------
+    def carregar(self):
+        self.missas = Missa.query.filter(
+            Missa.id_paroquia == self.id_paroquia,
+            Missa.data >= self.inicio,
+            Missa.data < self.fim,
+        ).order_by(Missa.data.asc(), Missa.horario.asc(), Missa.id.asc()).all()
+
+        self.ministros = Ministro.query.filter_by(id_paroquia=self.id_paroquia).all()
+        self.casal_map = _obter_pares_casal(self.id_paroquia)
+
+        self._carregar_regras()
+        if self.considerar_periodos_anteriores:
+            self._carregar_historico()
+
+        return self
+
+    def _carregar_regras(self):
+        for ministro_id, data, horario in db.session.query(
+            Indisponibilidade.id_ministro,
+            Indisponibilidade.data,
+            Indisponibilidade.horario,
+        ).filter(
+            Indisponibilidade.id_paroquia == self.id_paroquia,
+            Indisponibilidade.data >= self.inicio,
+            Indisponibilidade.data < self.fim,
+        ):
+            self._indisp_data[(data, horario)].add(ministro_id)
+
+        for ministro_id, semana, dia_semana, horario in db.session.query(
+            IndisponibilidadeFixa.id_ministro,
+            IndisponibilidadeFixa.semana,
+            IndisponibilidadeFixa.dia_semana,
+            IndisponibilidadeFixa.horario,
+        ).filter(IndisponibilidadeFixa.id_paroquia == self.id_paroquia):
+            self._indisp_fixa[(semana, dia_semana, horario)].add(ministro_id)
+
+        try:
+            for ministro_id, data, horario in db.session.query(
+                Disponibilidade.id_ministro,
+                Disponibilidade.data,
+                Disponibilidade.horario,
+            ).filter(
+                Disponibilidade.id_paroquia == self.id_paroquia,
+                Disponibilidade.data >= self.inicio,
+                Disponibilidade.data < self.fim,
+            ):
+                self._disp_data[(data, horario)].add(ministro_id)
+
+            for ministro_id, semana, dia_semana, horario in db.session.query(
+                DisponibilidadeFixa.id_ministro,
+                DisponibilidadeFixa.semana,
+                DisponibilidadeFixa.dia_semana,
+                DisponibilidadeFixa.horario,
+            ).filter(DisponibilidadeFixa.id_paroquia == self.id_paroquia):
+                self._disp_fixa[(semana, dia_semana, horario)].add(ministro_id)
+        except SQLAlchemyError:
+            self._disp_data.clear()
+            self._disp_fixa.clear()
+
+    def _carregar_historico(self):
+        # Agregado de todo o historico anterior ao mes: total, confirmadas e ultima data.
+        agregados = historico_anterior_ao_mes(self.id_paroquia, self.ano, self.mes)
+        for ministro_id, (total, confirmadas, ultima) in agregados.items():
+            self._hist_total[ministro_id] = total
+            self._hist_confirmadas[ministro_id] = confirmadas
+            self._hist_ultima[ministro_id] = ultima
+
+        # Janela curta antes do mes, para as contagens de 7/14 dias no inicio do mes.
+        janela = max(int(_cfg("ESCALA_JANELA_7_DIAS", 7)), int(_cfg("ESCALA_JANELA_14_DIAS", 14)))
+        recentes = db.session.query(Escala.id_ministro, Missa.data).join(
+            Missa, Missa.id == Escala.id_missa
+        ).filter(
+            Escala.id_paroquia == self.id_paroquia,
+            Missa.data >= self.inicio - timedelta(days=janela),
+            Missa.data < self.inicio,
+        )
+
+        for ministro_id, data in recentes:
+            self._hist_recentes[ministro_id].append(data)
+
+        for datas in self._hist_recentes.values():
+            datas.sort()
+
+    def exportar_estado(self):
+        """
+        Retorna uma copia serializavel (pickle) do que foi carregado, para
+        planejar fora da sessao do banco, por exemplo em outro processo.
+        """
+        estado = {
+            "id_paroquia": self.id_paroquia,
+            "mes": self.mes,
+            "ano": self.ano,
+            "considerar_periodos_anteriores": self.considerar_periodos_anteriores,
+            "opcoes_geracao": list(self.opcoes_geracao),
+            "missas": [
+                MissaPlanejada(missa.id, missa.data, missa.horario, missa.qtd_ministros)
+                for missa in self.missas
+            ],
+            "ministros": [MinistroPlanejado(ministro.id, ministro.nome) for ministro in self.ministros],
+        }
+        for nome in _ESTADO_CARREGADO:
+            estado[nome] = getattr(self, nome)
+        return estado
+
+    @classmethod
+    def de_estado(cls, estado, rng=None):
+        """Recria um planejador ja carregado a partir de ``exportar_estado``."""
+        planejador = cls(
+            estado["id_paroquia"],
+            estado["mes"],
+            estado["ano"],
+            considerar_periodos_anteriores=estado["considerar_periodos_anteriores"],
+            modo_ordenacao=estado["opcoes_geracao"],
+            rng=rng,
+        )
+        planejador.missas = list(estado["missas"])
+        planejador.ministros = list(estado["ministros"])
+        for nome in _ESTADO_CARREGADO:
+            setattr(planejador, nome, estado[nome])
+        return planejador
+
+    # --------------------------------------------------
+    # SELECAO
+    # --------------------------------------------------
+    def _ids_por_data(self, regras, data, horario):
+        return regras.get((data, None), set()) | regras.get((data, horario), set())
+
+    def _ids_por_regra_fixa(self, regras, data, horario):
+        ids = set()
+        for chave in _chaves_regra_fixa(data, horario):
+            ids |= regras.get(chave, set())
+        return ids
+
+    def indisponiveis(self, missa):
+        return (
+            self._ids_por_data(self._indisp_data, missa.data, missa.horario)
+            | self._ids_por_regra_fixa(self._indisp_fixa, missa.data, missa.horario)
+        )
+
+    def _metricas(self, ministro_id, data, inicio_7, inicio_14, disponivel):
+        datas_mes = self._datas_mes.get(ministro_id, [])
+        recentes = self._hist_recentes.get(ministro_id, [])
+
+        # Somente o que aconteceu antes da missa entra no historico.
+        anteriores_mes = bisect_left(datas_mes, data)
+        total_historico = self._hist_total.get(ministro_id, 0) + anteriores_mes
+        confirmadas = self._hist_confirmadas.get(ministro_id, 0)
+        confiabilidade = (confirmadas / total_historico) if total_historico else 1
+
+        if anteriores_mes:
+            ultima_data = datas_mes[anteriores_mes - 1]
+        else:
+            ultima_data = self._hist_ultima.get(ministro_id)
+
+        if ultima_data is not None:
+            dias_sem_servir = max((data - ultima_data).days, 0)
+            escalas_7_dias = (
+                anteriores_mes - bisect_left(datas_mes, inicio_7)
+                + len(recentes) - bisect_left(recentes, inicio_7)
+            )
+            escalas_14_dias = (
+                anteriores_mes - bisect_left(datas_mes, inicio_14)
+                + len(recentes) - bisect_left(recentes, inicio_14)
+            )
+        else:
+            dias_sem_servir = 999
+            escalas_7_dias = 0
+            escalas_14_dias = 0
+
+        return {
+            "dias_sem_servir": dias_sem_servir,
+            "confiabilidade": confiabilidade,
+            "escalas_mes": len(datas_mes),
+            "escalas_7_dias": escalas_7_dias,
+            "escalas_14_dias": escalas_14_dias,
+            "total_historico": total_historico,
+            "disponivel_preferencial": 1 if disponivel else 0,
+        }
+
+    def selecionar(self, missa, qtd=None):
+        qtd = missa.qtd_ministros if qtd is None else qtd
+        if not self.ministros or not qtd or qtd <= 0:
+            return []
+
+        data = missa.data
+        inicio_7 = data - timedelta(days=int(_cfg("ESCALA_JANELA_7_DIAS", 7)))
+        inicio_14 = data - timedelta(days=int(_cfg("ESCALA_JANELA_14_DIAS", 14)))
+
+        conflito_ids = self._ocupados_por_data.get(data, set())
+        indisponiveis = self.indisponiveis(missa)
+        disponiveis = (
+            self._ids_por_data(self._disp_data, data, missa.horario)
+            | self._ids_por_regra_fixa(self._disp_fixa, data, missa.horario)
+        )
+
+        candidatos = []
+        metricas_map = {}
+        for ministro in self.ministros:
+            if ministro.id in conflito_ids or ministro.id in indisponiveis:
+                continue
+            metricas_map[ministro.id] = self._metricas(
+                ministro.id, data, inicio_7, inicio_14, ministro.id in disponiveis
+            )
+            candidatos.append(ministro)
+
+        return selecionar_entre_candidatos(
+            qtd,
+            missa,
+            candidatos,
+            metricas_map,
+            self._domingos_mes,
+            self.casal_map,
+            self.modos,
+            rng=self.rng,
+        )
+
+    def registrar(self, missa, ministros):
+        atribuidos = self.atribuicoes.setdefault(missa.id, [])
+        for ministro in ministros:
+            insort(self._datas_mes[ministro.id], missa.data)
+            if missa.data.weekday() == 6:
+                self._domingos_mes[ministro.id] += 1
+            self._ocupados_por_data[missa.data].add(ministro.id)
+            atribuidos.append(ministro)
+
+    def remover(self, missa, ministro_id):
+        atribuidos = self.atribuicoes.get(missa.id, [])
+        for indice, ministro in enumerate(atribuidos):
+            if ministro.id == ministro_id:
+                del atribuidos[indice]
+                break
+        else:
+            return
+
+        datas = self._datas_mes[ministro_id]
+        posicao = bisect_left(datas, missa.data)
+        if posicao < len(datas) and datas[posicao] == missa.data:
+            del datas[posicao]
+        if missa.data.weekday() == 6:
+            self._domingos_mes[ministro_id] -= 1
+        if missa.data not in datas:
+            self._ocupados_por_data[missa.data].discard(ministro_id)
+
+    def carregar_escalas_atuais(self):
+        """
+        Registra as escalas ja gravadas no mes como se tivessem sido planejadas,
+        para que ajustes pontuais usem os mesmos contadores da geracao mensal.
+        """
+        missas_por_id = {missa.id: missa for missa in self.missas}
+        ministros_por_id = {ministro.id: ministro for ministro in self.ministros}
+
+        for id_missa, id_ministro in db.session.query(Escala.id_missa, Escala.id_ministro).filter(
+            Escala.id_paroquia == self.id_paroquia,
+            Escala.id_missa.in_(missas_por_id.keys()),
+        ).order_by(Escala.id.asc()):
+            if id_ministro in ministros_por_id:
+                self.registrar(missas_por_id[id_missa], [ministros_por_id[id_ministro]])
+
+        return self
+
+    def planejar(self):
+        """
+        Planeja o mes. Com a opcao ``"otimizada"``, resolve o mes inteiro como
+        um problema de atribuicao; se o tempo limite acabar, segue com a
+        geracao gulosa missa a missa. ``self.metodo`` indica o que foi usado.
+        """
+        if "otimizada" in self.opcoes_geracao and planejar_otimizado(self):
+            self.metodo = "otimizada"
+            return self.atribuicoes
+
+        self.metodo = "gulosa"
+        for missa in ordenar_missas_para_geracao(self.missas, self.opcoes_geracao):
+            self.registrar(missa, self.selecionar(missa))
+        return self.atribuicoes
+
+    def vagas_em_aberto(self):
+        return sum(
+            max((missa.qtd_ministros or 0) - len(self.atribuicoes.get(missa.id, [])), 0)
+            for missa in self.missas
+        )
+
+    # --------------------------------------------------
+    # PERSISTENCIA
+    # --------------------------------------------------
+    def salvar(self):
+        """
+        Insere todas as escalas planejadas em um unico INSERT em lote.
+
+        Retorna as tuplas (missa, ministro, escala) para quem precisar notificar;
+        as escalas retornadas nao ficam anexadas a sessao.
+        """
+        missas_por_id = {missa.id: missa for missa in self.missas}
+        criadas = []
+
+        for missa_id, ministros in self.atribuicoes.items():
+            missa = missas_por_id[missa_id]
+            for ministro in ministros:
+                escala = _nova_escala(self.id_paroquia, missa.id, ministro.id)
+                criadas.append((missa, ministro, escala))
+
+        if criadas:
+            db.session.execute(
+                insert(Escala),
+                [
+                    {
+                        "id_missa": escala.id_missa,
+                        "id_ministro": escala.id_ministro,
+                        "id_paroquia": escala.id_paroquia,
+                        "confirmado": escala.confirmado,
+                        "presente": escala.presente,
+                        "notificacao_enviada": escala.notificacao_enviada,
+                        "token": escala.token,
+                    }
+                    for _, _, escala in criadas
+                ],
+            )
+
+        return criadas
+
+    def salvar_plano(self):
+        """
+        Grava as atribuicoes na area de staging (``escala_plano``) do mes,
+        substituindo um plano anterior ainda nao aplicado.
+        """
+        descartar_plano(self.id_paroquia, self.mes, self.ano)
+
+        itens = [
+            {
+                "id_paroquia": self.id_paroquia,
+                "ano": self.ano,
+                "mes": self.mes,
+                "id_missa": missa_id,
+                "id_ministro": ministro.id,
+            }
+            for missa_id, ministros in self.atribuicoes.items()
+            for ministro in ministros
+        ]
+        if itens:
+            db.session.execute(insert(EscalaPlano), itens)
+
+        return len(itens)
+
+
+# --------------------------------------------------
+# APLICACAO DO PLANO (DIFF)
+# --------------------------------------------------
+def descartar_plano(id_paroquia, mes, ano):
+    db.session.execute(
+        delete(EscalaPlano).where(
+            EscalaPlano.id_paroquia == id_paroquia,
+            EscalaPlano.ano == ano,
+            EscalaPlano.mes == mes,
+        )
+    )
+
+
+def _nova_escala(id_paroquia, id_missa, id_ministro):
+    return Escala(
+        id_missa=id_missa,
+        id_ministro=id_ministro,
+        id_paroquia=id_paroquia,
+        confirmado=False,
+        presente=False,
+        notificacao_enviada=False,
+        token=str(uuid.uuid4()),
+    )
+
+
+def _reatribuir(escala, ministro):
+    # Reaproveita a linha para outro ministro: token novo e confirmacao zerada.
+    # Os pedidos abertos do ministro anterior sao cancelados por quem chama
+    # (``cancelar_pedidos_abertos_das_escalas``), depois do flush.
+    escala.id_ministro = ministro.id
+    escala.ministro = ministro
+    escala.token = str(uuid.uuid4())
+    escala.confirmado = False
+    escala.presente = False
+    escala.notificacao_enviada = False
+    return escala
+
+
+def aplicar_plano_mes(id_paroquia, mes, ano):
+    """
+    Aplica o plano em staging do mes comparando-o com as escalas atuais.
+
+    Por missa, atribuicoes iguais ao plano sao mantidas (token e confirmacao
+    preservados); cada ministro que sai tem sua linha reaproveitada por um que
+    entra (UPDATE com token novo, pedidos de substituicao abertos cancelados)
+    e o excedente vira DELETE ou INSERT. O plano e descartado ao final.
+    Nao faz commit.
+
+    Retorna um dict com ``mantidas`` (quantidade), ``criadas`` (lista de
+    ``(missa, ministro, escala)``; as inseridas ficam fora da sessao) e ``removidas``
+    (lista de ``(missa, ministro)``), para notificar apenas o que mudou.
+    """
+    inicio, fim = intervalo_mes(mes, ano)
+
+    planejado = defaultdict(list)
+    for id_missa, id_ministro in db.session.query(
+        EscalaPlano.id_missa,
+        EscalaPlano.id_ministro,
+    ).filter(
+        EscalaPlano.id_paroquia == id_paroquia,
+        EscalaPlano.ano == ano,
+        EscalaPlano.mes == mes,
+    ).order_by(EscalaPlano.id.asc()):
+        if id_ministro not in planejado[id_missa]:
+            planejado[id_missa].append(id_ministro)
+
+    atuais = defaultdict(list)
+    for escala in Escala.query.join(Missa, Missa.id == Escala.id_missa).filter(
+        Escala.id_paroquia == id_paroquia,
+        Missa.data >= inicio,
+        Missa.data < fim,
+    ).order_by(Escala.id.asc()):
+        atuais[escala.id_missa].append(escala)
+
+    missa_ids = set(planejado) | set(atuais)
+    missas = {
+        missa.id: missa
+        for missa in Missa.query.filter(Missa.id.in_(missa_ids))
+    } if missa_ids else {}
+
+    ministro_ids = {id_ministro for ids in planejado.values() for id_ministro in ids}
+    ministros = {
+        ministro.id: ministro
+        for ministro in Ministro.query.filter(Ministro.id.in_(ministro_ids))
+    } if ministro_ids else {}
+
+    mantidas = 0
+    criadas = []
+    removidas = []
+    remover_ids = []
+    reatribuidas_ids = []
+    inserir = []
+
+    for id_missa in sorted(missa_ids):
+        missa = missas.get(id_missa)
+        plano_ids = planejado.get(id_missa, [])
+
+        manter = set()
+        saindo = []
+        for escala in atuais.get(id_missa, []):
+            if escala.id_ministro in plano_ids and escala.id_ministro not in manter:
+                manter.add(escala.id_ministro)
+            else:
+                saindo.append(escala)
+        entrando = [id_ministro for id_ministro in plano_ids if id_ministro not in manter]
+        mantidas += len(manter)
+
+        for escala, id_ministro in zip(saindo, entrando):
+            removidas.append((missa, escala.ministro))
+            criadas.append((missa, ministros[id_ministro], _reatribuir(escala, ministros[id_ministro])))
+            reatribuidas_ids.append(escala.id)
+
+        for escala in saindo[len(entrando):]:
+            removidas.append((missa, escala.ministro))
+            remover_ids.append(escala.id)
+
+        for id_ministro in entrando[len(saindo):]:
+            escala = _nova_escala(id_paroquia, id_missa, id_ministro)
+            inserir.append(escala)
+            criadas.append((missa, ministros[id_ministro], escala))
+
+    db.session.flush()
+    cancelar_pedidos_abertos_das_escalas(reatribuidas_ids)
+
+    if remover_ids:
+        Escala.query.filter(Escala.id.in_(remover_ids)).delete(synchronize_session=False)
+
+    if inserir:
+        db.session.execute(
+            insert(Escala),
+            [
+                {
+                    "id_missa": escala.id_missa,
+                    "id_ministro": escala.id_ministro,
+                    "id_paroquia": escala.id_paroquia,
+                    "confirmado": escala.confirmado,
+                    "presente": escala.presente,
+                    "notificacao_enviada": escala.notificacao_enviada,
+                    "token": escala.token,
+                }
+                for escala in inserir
+            ],
+        )
+
+    descartar_plano(id_paroquia, mes, ano)
+
+    return {
+        "mantidas": mantidas,
+        "criadas": criadas,
+        "removidas": removidas,
+    }
+
+
+def gerar_escala_mes(
+    id_paroquia,
+    mes,
+    ano,
+    considerar_periodos_anteriores=True,
+    opcoes_geracao="equilibrada",
+    rng=None,
+    notificar=False,
+):
+    """
+    Gera a escala inteligente do mes: planeja em memoria, grava o plano no
+    staging (commit) e aplica so a diferenca em uma transacao curta (commit).
+
+    Com ``notificar``, os pushes dos ministros incluidos e removidos entram na
+    outbox dentro da mesma transacao da diferenca (precisa de contexto de
+    requisicao para montar os links).
+
+    Retorna o dict de ``aplicar_plano_mes`` acrescido de ``vagas_em_aberto``
+    e ``metodo`` (``"otimizada"`` ou ``"gulosa"``).
+    """
+    planejador = PlanejadorEscalaMes(
+        id_paroquia,
+        mes,
+        ano,
+        considerar_periodos_anteriores=considerar_periodos_anteriores,
+        modo_ordenacao=opcoes_geracao,
+        rng=rng,
+    ).carregar()
+    planejador.planejar()
+    planejador.salvar_plano()
+    db.session.commit()
+
+    resultado = aplicar_plano_mes(id_paroquia, mes, ano)
+    if notificar:
+        from services.notificacao_service import notificar_alteracoes_escala
+
+        notificar_alteracoes_escala(resultado["criadas"], resultado["removidas"])
+    db.session.commit()
+
+    resultado["vagas_em_aberto"] = planejador.vagas_em_aberto()
+    resultado["metodo"] = planejador.metodo
+    return resultado
+
+
+# --------------------------------------------------
+# REPLANEJAMENTO PONTUAL
+# --------------------------------------------------
+def replanejar_indisponibilidade(id_paroquia, id_ministro, data_inicio=None, data_fim=None):
+    """
+    Substitui o ministro nas escalas em que ficou indisponivel.
+
+    Considera apenas as escalas dele a partir de ``data_inicio`` (hoje, por
+    padrao) ate ``data_fim``. Para cada mes afetado, o planejador e carregado
+    com as escalas atuais e o substituto e escolhido com as mesmas regras de
+    score e balanceamento da geracao mensal. So as linhas afetadas mudam
+    (novo ministro e token novo) e os pedidos de substituicao abertos delas
+    sao cancelados. Nao faz commit.
+
+    Retorna um dict com ``criadas`` (``(missa, ministro, escala)``), ``removidas``
+    (``(missa, ministro)``) e ``sem_substituto`` (``(missa, ministro)`` mantidos
+    por falta de candidato).
+    """
+    data_inicio = data_inicio or date.today()
+
+    consulta = Escala.query.join(Missa, Missa.id == Escala.id_missa).filter(
+        Escala.id_paroquia == id_paroquia,
+        Escala.id_ministro == id_ministro,
+        Missa.data >= data_inicio,
+    )
+    if data_fim is not None:
+        consulta = consulta.filter(Missa.data <= data_fim)
+
+    por_mes = defaultdict(list)
+    for escala in consulta.order_by(Missa.data.asc(), Missa.horario.asc(), Escala.id.asc()):
+        por_mes[(escala.missa.data.year, escala.missa.data.month)].append(escala)
+
+    resultado = {"criadas": [], "removidas": [], "sem_substituto": []}
+
+    for (ano, mes), escalas in sorted(por_mes.items()):
+        planejador = PlanejadorEscalaMes(id_paroquia, mes, ano).carregar().carregar_escalas_atuais()
+        missas_por_id = {missa.id: missa for missa in planejador.missas}
+
+        for escala in escalas:
+            missa = missas_por_id.get(escala.id_missa)
+            if missa is None or id_ministro not in planejador.indisponiveis(missa):
+                continue
+
+            planejador.remover(missa, id_ministro)
+            escolhidos = planejador.selecionar(missa, qtd=1)
+            if not escolhidos:
+                planejador.registrar(missa, [escala.ministro])
+                resultado["sem_substituto"].append((missa, escala.ministro))
+                continue
+
+            novo = escolhidos[0]
+            planejador.registrar(missa, [novo])
+            resultado["removidas"].append((missa, escala.ministro))
+            resultado["criadas"].append((missa, novo, _reatribuir(escala, novo)))
+
+    db.session.flush()
+    cancelar_pedidos_abertos_das_escalas([escala.id for _, _, escala in resultado["criadas"]])
+    return resultado
@@ -0,0 +1,243 @@
+import multiprocessing
+import random
+import statistics
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import Flask
+
+from services.escala_inteligente_service import _cfg
+from services.escala_planejamento_service import PlanejadorEscalaMes
+
+
+# Parametros de config que podem variar na simulacao: (tipo, padrao usado em _cfg).
+PARAMETROS_SIMULACAO = {
+    "ESCALA_SCORE_DIAS_SEM_SERVIR_PESO": (float, 2.8),
+    "ESCALA_SCORE_CONFIABILIDADE_PESO": (float, 10),
+    "ESCALA_SCORE_ESCALAS_MES_PESO": (float, 5),
+    "ESCALA_SCORE_ESCALAS_7_DIAS_PESO": (float, 12),
+    "ESCALA_SCORE_ESCALAS_14_DIAS_PESO": (float, 4),
+    "ESCALA_SCORE_TOTAL_HISTORICO_PESO": (float, 0.15),
+    "ESCALA_SCORE_DISPONIBILIDADE_PESO": (float, 8),
+    "ESCALA_LIMITE_DIAS_SEM_SERVIR": (int, 45),
+    "ESCALA_RESTRICAO_DIAS_RECENTES": (int, 3),
+    "ESCALA_RESTRICAO_MAX_7_DIAS": (int, 2),
+    "ESCALA_CASAL_FRACAO_DOMINGO": (float, 0.5),
+    "ESCALA_CASAL_FRACAO_SEMANA": (float, 0.4),
+    "ESCALA_META_MENSAL_POR_MINISTRO": (int, 2),
+    "ESCALA_BALANCEAMENTO_MENSAL_TOLERANCIA": (int, 0),
+}
+
+# Usados durante o planejamento, mas fixos: a carga do historico depende deles.
+PARAMETROS_FIXOS = {
+    "ESCALA_JANELA_7_DIAS": 7,
+    "ESCALA_JANELA_14_DIAS": 14,
+}
+
+MAX_CONJUNTOS = 8
+
+
+def parametros_atuais():
+    return {chave: tipo(_cfg(chave, padrao)) for chave, (tipo, padrao) in PARAMETROS_SIMULACAO.items()}
+
+
+def normalizar_conjuntos(conjuntos):
+    """
+    Valida os conjuntos de pesos recebidos (lista de ``{"nome", "pesos"}``).
+
+    Parametros omitidos herdam o valor atual da config. Levanta ``ValueError``
+    para chaves desconhecidas ou valores invalidos.
+    """
+    if not conjuntos:
+        raise ValueError("Informe pelo menos um conjunto de pesos.")
+    if not isinstance(conjuntos, list):
+        raise ValueError("conjuntos deve ser uma lista de objetos {nome, pesos}.")
+    if len(conjuntos) > MAX_CONJUNTOS:
+        raise ValueError(f"Maximo de {MAX_CONJUNTOS} conjuntos por simulacao.")
+
+    base = parametros_atuais()
+    normalizados = []
+
+    for indice, conjunto in enumerate(conjuntos, start=1):
+        if not isinstance(conjunto, dict):
+            raise ValueError(f"Conjunto {indice} deve ser um objeto {{nome, pesos}}.")
+        recebidos = conjunto.get("pesos") or {}
+        if not isinstance(recebidos, dict):
+            raise ValueError(f"pesos do conjunto {indice} deve ser um objeto.")
+
+        nome = str(conjunto.get("nome") or f"Conjunto {indice}").strip()
+        pesos = dict(base)
+
+        for chave, valor in recebidos.items():
+            if chave not in PARAMETROS_SIMULACAO:
+                raise ValueError(f"Parametro desconhecido: {chave}")
+            if valor in (None, ""):
+                continue
+            tipo = PARAMETROS_SIMULACAO[chave][0]
+            try:
+                pesos[chave] = tipo(valor)
+            except (TypeError, ValueError):
+                raise ValueError(f"Valor invalido para {chave}: {valor}")
+
+        normalizados.append({"nome": nome, "pesos": pesos})
+
+    return normalizados
+
+
+# --------------------------------------------------
+# METRICAS
+# --------------------------------------------------
+def _percentil(valores, fracao):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    posicao = max(0, min(len(ordenados) - 1, int(round(fracao * (len(ordenados) - 1)))))
+    return ordenados[posicao]
+
+
+def _resumo(valores):
+    if not valores:
+        return {"min": None, "p50": None, "p90": None, "max": None, "media": None}
+    return {
+        "min": min(valores),
+        "p50": _percentil(valores, 0.5),
+        "p90": _percentil(valores, 0.9),
+        "max": max(valores),
+        "media": round(statistics.fmean(valores), 2),
+    }
+
+
+def metricas_equidade(planejador):
+    """Indicadores de equidade de um planejamento ja executado em memoria."""
+    por_ministro = Counter()
+    domingos = Counter()
+    datas_por_ministro = {}
+    casais_juntos = 0
+    casais_separados = 0
+
+    missas_por_id = {missa.id: missa for missa in planejador.missas}
+    for missa_id, ministros in planejador.atribuicoes.items():
+        missa = missas_por_id[missa_id]
+        ids = {ministro.id for ministro in ministros}
+
+        for ministro_id in ids:
+            por_ministro[ministro_id] += 1
+            datas_por_ministro.setdefault(ministro_id, []).append(missa.data)
+            if missa.data.weekday() == 6:
+                domingos[ministro_id] += 1
+
+            parceiro = planejador.casal_map.get(ministro_id)
+            if parceiro is None:
+                continue
+            if parceiro in ids:
+                # Cada casal completo e visto duas vezes (uma por conjuge).
+                if ministro_id < parceiro:
+                    casais_juntos += 1
+            else:
+                casais_separados += 1
+
+    escalas = [por_ministro.get(ministro.id, 0) for ministro in planejador.ministros]
+
+    intervalos = []
+    for ministro_id, datas in datas_por_ministro.items():
+        anterior = planejador._hist_ultima.get(ministro_id)
+        for data in sorted(datas):
+            if anterior is not None:
+                intervalos.append((data - anterior).days)
+            anterior = data
+
+    casais_total = casais_juntos + casais_separados
+    return {
+        "escalas_por_ministro": {
+            **_resumo(escalas),
+            "desvio_padrao": round(statistics.pstdev(escalas), 3) if escalas else None,
+            "sem_escala": sum(1 for qtd in escalas if qtd == 0),
+        },
+        "repeticoes_domingo": {
+            "ministros": sum(1 for qtd in domingos.values() if qtd > 1),
+            "excedentes": sum(qtd - 1 for qtd in domingos.values() if qtd > 1),
+        },
+        "casais": {
+            "juntos": casais_juntos,
+            "separados": casais_separados,
+            "percentual_juntos": round(100 * casais_juntos / casais_total, 1) if casais_total else None,
+        },
+        "vagas_em_aberto": planejador.vagas_em_aberto(),
+        "dias_sem_servir": _resumo(intervalos),
+    }
+
+
+# --------------------------------------------------
+# EXECUCAO
+# --------------------------------------------------
+def _simular_conjunto(estado, config, semente):
+    # Roda em outro processo: um app minimo so para _cfg enxergar os pesos.
+    app = Flask(__name__)
+    app.config.update(config)
+    with app.app_context():
+        planejador = PlanejadorEscalaMes.de_estado(estado, rng=random.Random(semente))
+        planejador.planejar()
+        return metricas_equidade(planejador)
+
+
+def simular_pesos(
+    id_paroquia,
+    mes,
+    ano,
+    conjuntos,
+    considerar_periodos_anteriores=True,
+    modo_ordenacao="equilibrada",
+    semente=None,
+    processos=None,
+):
+    """
+    Planeja o mes uma vez para cada conjunto de pesos, sem gravar nada.
+
+    Os dados sao lidos do banco uma unica vez; cada conjunto roda com a
+    mesma semente, para que as diferencas venham so dos pesos. Por padrao
+    roda no proprio processo (``ESCALA_SIMULACAO_PROCESSOS``, 1); com mais
+    processos o pool usa ``spawn``, porque a chamada vem de uma requisicao
+    web com threads do scheduler e da eleicao de lider no processo.
+
+    Retorna ``{"semente", "resultados"}``, com os resultados
+    (``{"nome", "pesos", "metricas"}``) na ordem dos conjuntos.
+    """
+    conjuntos = normalizar_conjuntos(conjuntos)
+    semente = random.randrange(1 << 30) if semente is None else semente
+
+    estado = PlanejadorEscalaMes(
+        id_paroquia,
+        mes,
+        ano,
+        considerar_periodos_anteriores=considerar_periodos_anteriores,
+        modo_ordenacao=modo_ordenacao,
+    ).carregar().exportar_estado()
+
+    if processos is None:
+        processos = int(_cfg("ESCALA_SIMULACAO_PROCESSOS", 1))
+    processos = max(1, min(processos, len(conjuntos)))
+
+    fixos = {chave: _cfg(chave, padrao) for chave, padrao in PARAMETROS_FIXOS.items()}
+    configs = [{**fixos, **conjunto["pesos"]} for conjunto in conjuntos]
+
+    if processos == 1:
+        metricas = [_simular_conjunto(estado, config, semente) for config in configs]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=processos,
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as pool:
+            metricas = list(pool.map(
+                _simular_conjunto,
+                [estado] * len(configs),
+                configs,
+                [semente] * len(configs),
+            ))
+
+    return {
+        "semente": semente,
+        "resultados": [
+            {"nome": conjunto["nome"], "pesos": conjunto["pesos"], "metricas": resultado}
+            for conjunto, resultado in zip(conjuntos, metricas)
+        ],
+    }
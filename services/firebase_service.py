@@ -31,40 +31,50 @@ def iniciar_firebase():
         logger.exception("Erro ao iniciar Firebase: %s", e)
 
 
-def enviar_push(token, titulo, mensagem, url=None):
-
-    if not firebase_ativo:
-        logger.warning("Firebase nao ativo")
-        return
-
-    try:
-
-        data_payload = {
-            "title": titulo,
-            "body": mensagem
-        }
-
-        if url:
-            data_payload["url"] = url
-
-        message = messaging.Message(
-
-            data=data_payload,
-
-            android=messaging.AndroidConfig(
-                priority="high"
-            ),
-
-            token=token
+# Limite de tokens por chamada do FCM.
+MULTICAST_MAX_TOKENS = 500
+
+
+def token_nao_registrado(erro):
+    if isinstance(erro, messaging.UnregisteredError):
+        return True
+    texto = str(erro)
+    return "registration-token-not-registered" in texto or "NotRegistered" in texto
+
+
+def entregar_push_multicast(tokens, titulo, mensagem, url=None):
+    """
+    Envia a mesma mensagem para varios tokens com ``send_each_for_multicast``,
+    em blocos de ``MULTICAST_MAX_TOKENS``.
+
+    Retorna uma lista alinhada com ``tokens``: ``None`` para sucesso ou a
+    excecao devolvida pelo FCM para aquele token.
+    """
+    data_payload = {
+        "title": titulo,
+        "body": mensagem
+    }
+
+    if url:
+        data_payload["url"] = url
+
+    erros = []
+    for inicio in range(0, len(tokens), MULTICAST_MAX_TOKENS):
+        bloco = tokens[inicio:inicio + MULTICAST_MAX_TOKENS]
+        resposta = messaging.send_each_for_multicast(
+            messaging.MulticastMessage(
+                data=data_payload,
+                android=messaging.AndroidConfig(priority="high"),
+                tokens=bloco,
+            )
+        )
+        erros.extend(
+            None if item.success else item.exception
+            for item in resposta.responses
         )
 
-        messaging.send(message)
-
-        logger.info("Push enviado")
+    return erros
 
-    except Exception as e:
-        logger.exception("Erro push: %s", e)
-        
 
 from firebase_admin import messaging
 from models import Ministro
@@ -3,8 +3,13 @@ import uuid
 from firebase_admin import storage
 from werkzeug.utils import secure_filename
 
+from services import firebase_service
+
 
 def upload_arquivo(file):
+    # O processo web nao inicia o Firebase no boot; sobe no primeiro upload.
+    if not firebase_service.firebase_ativo:
+        firebase_service.iniciar_firebase()
     nome_original = secure_filename(file.filename)
     nome = str(uuid.uuid4()) + "_" + nome_original
     bucket = storage.bucket()
@@ -0,0 +1,224 @@
+"""
+Historico de execucoes dos jobs do scheduler (tabela ``job_runs``).
+
+Cada job roda dentro de ``execucao_job(app, nome)``: a linha nasce como
+``executando`` e termina como ``sucesso`` ou ``erro``, com duracao e itens
+processados. Uma execucao que comeca com outra do mesmo job ainda em
+andamento fica marcada como ``sobreposto``; execucoes que o APScheduler pulou
+(``max_instances`` ou misfire) viram linhas ``ignorado`` pelo listener de
+``registrar_listener_jobs``.
+
+As linhas sao gravadas em uma conexao propria, fora da sessao do job: o
+rollback de um job com erro nao apaga o registro da execucao.
+"""
+import logging
+import math
+import os
+import socket
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
+from flask import current_app
+from sqlalchemy import delete, insert, select, update
+
+from extensions import db
+from models import ExecucaoJob
+
+
+logger = logging.getLogger(__name__)
+
+STATUS_EXECUTANDO = "executando"
+STATUS_SUCESSO = "sucesso"
+STATUS_ERRO = "erro"
+STATUS_IGNORADO = "ignorado"
+
+_PROCESSO = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _cfg(chave, padrao):
+    return current_app.config.get(chave, padrao)
+
+
+class Execucao:
+    """Execucao em andamento; o job preenche ``itens``."""
+
+    def __init__(self, nome, id=None, sobreposto=False):
+        self.nome = nome
+        self.id = id
+        self.sobreposto = sobreposto
+        self.itens = None
+        self.iniciado_em = datetime.utcnow()
+        self._relogio = time.monotonic()
+
+
+def _iniciar(nome):
+    execucao = Execucao(nome)
+    desde = execucao.iniciado_em - timedelta(hours=_cfg("JOB_RUNS_SOBREPOSICAO_HORAS", 6))
+    try:
+        with db.engine.begin() as conexao:
+            execucao.sobreposto = conexao.execute(
+                select(ExecucaoJob.id).where(
+                    ExecucaoJob.job == nome,
+                    ExecucaoJob.status == STATUS_EXECUTANDO,
+                    ExecucaoJob.iniciado_em >= desde,
+                ).limit(1)
+            ).first() is not None
+            execucao.id = conexao.execute(
+                insert(ExecucaoJob).values(
+                    job=nome,
+                    processo=_PROCESSO,
+                    iniciado_em=execucao.iniciado_em,
+                    status=STATUS_EXECUTANDO,
+                    sobreposto=execucao.sobreposto,
+                )
+            ).inserted_primary_key[0]
+    except Exception:
+        logger.warning("Nao foi possivel registrar o inicio do job %s", nome, exc_info=True)
+
+    if execucao.sobreposto:
+        logger.warning("Job %s iniciado com outra execucao em andamento", nome)
+    return execucao
+
+
+def _finalizar(execucao, status, erro=None):
+    if execucao.id is None:
+        return
+    try:
+        with db.engine.begin() as conexao:
+            conexao.execute(
+                update(ExecucaoJob).where(ExecucaoJob.id == execucao.id).values(
+                    finalizado_em=datetime.utcnow(),
+                    duracao_segundos=round(time.monotonic() - execucao._relogio, 3),
+                    itens=execucao.itens,
+                    status=status,
+                    erro=(str(erro) or erro.__class__.__name__)[:2000] if erro is not None else None,
+                )
+            )
+    except Exception:
+        logger.warning("Nao foi possivel registrar o fim do job %s", execucao.nome, exc_info=True)
+
+
+@contextmanager
+def execucao_job(app, nome):
+    """
+    Roda o corpo dentro do contexto da app e registra a execucao.
+
+    Excecoes do corpo sao registradas, logadas e nao se propagam (a sessao
+    leva rollback), como os jobs ja faziam com seus ``try/except``.
+    """
+    with app.app_context():
+        execucao = _iniciar(nome)
+        try:
+            yield execucao
+        except Exception as exc:
+            db.session.rollback()
+            logger.exception("Erro no job %s", nome)
+            _finalizar(execucao, STATUS_ERRO, erro=exc)
+        else:
+            _finalizar(execucao, STATUS_SUCESSO)
+
+
+def registrar_ignorada(nome, sobreposto=False, motivo=None):
+    agora = datetime.utcnow()
+    with db.engine.begin() as conexao:
+        conexao.execute(
+            insert(ExecucaoJob).values(
+                job=nome,
+                processo=_PROCESSO,
+                iniciado_em=agora,
+                finalizado_em=agora,
+                status=STATUS_IGNORADO,
+                erro=motivo,
+                sobreposto=sobreposto,
+            )
+        )
+
+
+def registrar_listener_jobs(scheduler, app):
+    """
+    Grava em ``job_runs`` as execucoes puladas pelo scheduler.
+
+    Chamar uma vez por scheduler: ``parar_scheduler`` nao remove listeners,
+    entao registrar de novo a cada lideranca duplicaria as linhas.
+    """
+
+    def _ao_pular(evento):
+        sobreposto = evento.code == EVENT_JOB_MAX_INSTANCES
+        motivo = "execucao anterior ainda em andamento" if sobreposto else "horario perdido (misfire)"
+        try:
+            with app.app_context():
+                registrar_ignorada(evento.job_id, sobreposto=sobreposto, motivo=motivo)
+        except Exception:
+            logger.warning("Nao foi possivel registrar o job %s pulado", evento.job_id, exc_info=True)
+
+    scheduler.add_listener(_ao_pular, EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED)
+
+
+# --------------------------------------------------
+# LEITURA E LIMPEZA
+# --------------------------------------------------
+def percentil(valores, p):
+    """Percentil pelo metodo do posto mais proximo; ``valores`` ordenados."""
+    if not valores:
+        return None
+    posicao = max(math.ceil(p / 100 * len(valores)) - 1, 0)
+    return valores[posicao]
+
+
+def resumo_jobs(dias=None, agora=None):
+    """
+    Estatisticas por job nos ultimos ``dias``.
+
+    Retorna dicts com ``job``, ``execucoes``, ``erros``, ``ignoradas``,
+    ``sobrepostas``, ``itens``, ``p50``, ``p95``, ``maximo`` (segundos) e a
+    ultima execucao, ordenados pelo p95 decrescente.
+    """
+    agora = agora or datetime.utcnow()
+    dias = dias or _cfg("JOB_RUNS_JANELA_DIAS", 7)
+
+    por_job = defaultdict(list)
+    for execucao in ExecucaoJob.query.filter(
+        ExecucaoJob.iniciado_em >= agora - timedelta(days=dias)
+    ).order_by(ExecucaoJob.iniciado_em.asc()):
+        por_job[execucao.job].append(execucao)
+
+    resumo = []
+    for job, execucoes in por_job.items():
+        duracoes = sorted(
+            e.duracao_segundos for e in execucoes
+            if e.duracao_segundos is not None and e.status != STATUS_IGNORADO
+        )
+        resumo.append({
+            "job": job,
+            "execucoes": sum(1 for e in execucoes if e.status != STATUS_IGNORADO),
+            "erros": sum(1 for e in execucoes if e.status == STATUS_ERRO),
+            "ignoradas": sum(1 for e in execucoes if e.status == STATUS_IGNORADO),
+            "sobrepostas": sum(1 for e in execucoes if e.sobreposto),
+            "itens": sum(e.itens or 0 for e in execucoes),
+            "p50": percentil(duracoes, 50),
+            "p95": percentil(duracoes, 95),
+            "maximo": duracoes[-1] if duracoes else None,
+            "ultima": execucoes[-1],
+        })
+
+    resumo.sort(key=lambda item: (item["p95"] is None, -(item["p95"] or 0), item["job"]))
+    return resumo
+
+
+def ultimas_execucoes(limite=50, job=None):
+    consulta = ExecucaoJob.query
+    if job:
+        consulta = consulta.filter(ExecucaoJob.job == job)
+    return consulta.order_by(ExecucaoJob.iniciado_em.desc(), ExecucaoJob.id.desc()).limit(limite).all()
+
+
+def limpar_execucoes(dias=None, agora=None):
+    """Apaga execucoes iniciadas ha mais de ``dias``. Nao faz commit."""
+    agora = agora or datetime.utcnow()
+    dias = dias or _cfg("JOB_RUNS_RETENCAO_DIAS", 30)
+    return db.session.execute(
+        delete(ExecucaoJob).where(ExecucaoJob.iniciado_em < agora - timedelta(days=dias))
+    ).rowcount
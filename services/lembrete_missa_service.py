@@ -1,22 +1,359 @@
-#from flask import current_app
-from datetime import datetime, timedelta
-from models import Missa, Escala
+"""
+Lembretes de missa por push.
+
+O momento do lembrete de cada escala (``Escala.lembrete_em``, em UTC) e
+calculado uma vez, quando a escala e criada, troca de missa ou de ministro,
+ou quando a missa muda de data/horario; os eventos da sessao no fim deste
+modulo cuidam disso, inclusive para ``insert(Escala)`` em lote.
+
+O envio le so as escalas vencidas pelo indice ``(lembrete_enviado,
+lembrete_em)``, enfileira os pushes na outbox e marca ``lembrete_enviado``.
+O scheduler arma um job de data unica para o proximo ``lembrete_em``; o job
+de intervalo de ``lembretes_missa`` rearma o disparo para pegar escalas
+criadas por outros processos.
+"""
+import logging
+import re
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from flask import current_app
+from sqlalchemy import case, event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Escala, Missa
+from services.job_run_service import execucao_job
+from services.notificacao_outbox_service import enfileirar_pushes
+from services.notification_manager import NotificationManager
 from services.substituicao_automatica_service import verificar_substituicoes_automaticas
 
-def enviar_lembretes_missa(app):
 
-    with app.app_context():
+logger = logging.getLogger(__name__)
+
+JOB_PROXIMO_LEMBRETE = "lembrete_missa_proximo"
+
+# Chave em Session.info com as missas cujas escalas precisam de lembrete_em.
+_PENDENTES = "lembretes_missa_pendentes"
+
+_HORARIO = re.compile(r"^\s*(\d{1,2})\s*(?:[:hH.]\s*(\d{2})?)?")
+
+
+def _cfg(chave, padrao):
+    return current_app.config.get(chave, padrao)
+
+
+def _fuso():
+    return ZoneInfo(_cfg("SCHEDULER_TIMEZONE", "America/Sao_Paulo") or "America/Sao_Paulo")
+
+
+def hora_da_missa(horario):
+    """Converte ``"19:00"``, ``"19h"``, ``"7h30"``... em ``time``; ``None`` se invalido."""
+    encontrado = _HORARIO.match(horario or "")
+    if not encontrado:
+        return None
+    hora, minuto = int(encontrado.group(1)), int(encontrado.group(2) or 0)
+    if hora > 23 or minuto > 59:
+        return None
+    return time(hora, minuto)
+
+
+def inicio_da_missa(data, horario):
+    """Inicio da missa em UTC (sem tzinfo, como o resto do banco)."""
+    hora = hora_da_missa(horario)
+    if data is None or hora is None:
+        return None
+    local = datetime.combine(data, hora).replace(tzinfo=_fuso())
+    return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def calcular_lembrete_em(data, horario):
+    inicio = inicio_da_missa(data, horario)
+    if inicio is None:
+        return None
+    return inicio - timedelta(minutes=_cfg("LEMBRETE_MISSA_ANTECEDENCIA_MINUTOS", 60))
+
+
+# --------------------------------------------------
+# AGENDAMENTO
+# --------------------------------------------------
+def agendar_lembretes(missa_ids, session=None, reiniciar=False):
+    """
+    Preenche ``lembrete_em`` das escalas das missas informadas.
+
+    Por padrao so toca escalas ainda sem lembrete (novas ou que trocaram de
+    ministro), com um UPDATE para todas as missas. Com ``reiniciar`` (missa
+    mudou de horario) recalcula todas e volta ``lembrete_enviado`` para falso
+    onde o momento mudou. Nao faz commit.
+    """
+    session = session or db.session
+    missa_ids = {id_missa for id_missa in missa_ids if id_missa is not None}
+    if not missa_ids:
+        return
+
+    momentos = {
+        id_missa: calcular_lembrete_em(data, horario)
+        for id_missa, data, horario in session.execute(
+            select(Missa.id, Missa.data, Missa.horario).where(Missa.id.in_(missa_ids))
+        )
+    }
+    momentos = {id_missa: momento for id_missa, momento in momentos.items() if momento is not None}
+    if not momentos:
+        return
+
+    # UPDATE pela tabela (Core) para nao passar pelos eventos de escala em lote.
+    tabela = Escala.__table__
+
+    if not reiniciar:
+        session.execute(
+            tabela.update()
+            .where(tabela.c.id_missa.in_(momentos.keys()), tabela.c.lembrete_em.is_(None))
+            .values(lembrete_em=case(momentos, value=tabela.c.id_missa), lembrete_enviado=False)
+        )
+        return
+
+    for id_missa, momento in momentos.items():
+        session.execute(
+            tabela.update()
+            .where(
+                tabela.c.id_missa == id_missa,
+                (tabela.c.lembrete_em.is_(None)) | (tabela.c.lembrete_em != momento),
+            )
+            .values(lembrete_em=momento, lembrete_enviado=False)
+        )
+
+
+def reagendar_lembretes(agora=None):
+    """
+    Recalcula ``lembrete_em`` das escalas de missas de hoje em diante.
+
+    Usado depois da migracao e quando ``LEMBRETE_MISSA_ANTECEDENCIA_MINUTOS``
+    muda. Lembretes que ja deveriam ter saido ficam como enviados. Nao faz
+    commit. Retorna o numero de missas processadas.
+    """
+    agora = agora or datetime.utcnow()
+    hoje = agora.replace(tzinfo=timezone.utc).astimezone(_fuso()).date()
+
+    missa_ids = [
+        id_missa for (id_missa,) in db.session.execute(
+            select(Missa.id).where(
+                Missa.data >= hoje,
+                Missa.id.in_(select(Escala.id_missa)),
+            )
+        )
+    ]
+    agendar_lembretes(missa_ids, reiniciar=True)
+
+    tabela = Escala.__table__
+    db.session.execute(
+        tabela.update()
+        .where(tabela.c.lembrete_enviado.is_(False), tabela.c.lembrete_em <= agora)
+        .values(lembrete_enviado=True)
+    )
+    return len(missa_ids)
+
+
+# --------------------------------------------------
+# ENVIO
+# --------------------------------------------------
+def processar_lembretes_vencidos(agora=None, limite=None):
+    """
+    Enfileira os lembretes vencidos e faz commit.
+
+    Le ate ``limite`` escalas com ``lembrete_enviado`` falso e
+    ``lembrete_em <= agora`` (``FOR UPDATE SKIP LOCKED``), busca os tokens de
+    todos os ministros em uma consulta e grava um INSERT na outbox por missa.
+    Escalas de missas que ja comecaram sao marcadas sem push.
+
+    Retorna ``{"lidas", "enviadas", "expiradas"}``.
+    """
+    agora = agora or datetime.utcnow()
+    limite = limite or _cfg("LEMBRETE_MISSA_LOTE", 500)
+    resultado = {"lidas": 0, "enviadas": 0, "expiradas": 0}
+
+    linhas = db.session.execute(
+        select(
+            Escala.id,
+            Escala.id_ministro,
+            Missa.id,
+            Missa.data,
+            Missa.horario,
+            Missa.comunidade,
+        )
+        .join(Missa, Missa.id == Escala.id_missa)
+        .where(Escala.lembrete_enviado.is_(False), Escala.lembrete_em <= agora)
+        .order_by(Escala.lembrete_em.asc(), Escala.id.asc())
+        .limit(limite)
+        .with_for_update(skip_locked=True, of=Escala.__table__)
+    ).all()
+
+    resultado["lidas"] = len(linhas)
+    if not linhas:
+        return resultado
+
+    por_missa = defaultdict(set)
+    missas = {}
+    for escala_id, id_ministro, id_missa, data, horario, comunidade in linhas:
+        inicio = inicio_da_missa(data, horario)
+        if inicio is None or inicio <= agora or id_ministro is None:
+            resultado["expiradas"] += 1
+            continue
+        por_missa[id_missa].add(id_ministro)
+        missas[id_missa] = (horario, comunidade)
+
+    if por_missa:
+        destinos = defaultdict(list)
+        for usuario_id, token in NotificationManager.destinos_push(
+            {id_ministro for ministros in por_missa.values() for id_ministro in ministros}
+        ):
+            destinos[usuario_id].append(token)
+
+        for id_missa, ministros in por_missa.items():
+            horario, comunidade = missas[id_missa]
+            resultado["enviadas"] += enfileirar_pushes(
+                [(id_ministro, token) for id_ministro in ministros for token in destinos.get(id_ministro, [])],
+                "Lembrete de Escala",
+                f"Você tem escala hoje às {horario} - {comunidade}",
+                url="/minhas-escalas",
+            )
+
+    tabela = Escala.__table__
+    db.session.execute(
+        tabela.update()
+        .where(tabela.c.id.in_([linha[0] for linha in linhas]))
+        .values(lembrete_enviado=True)
+    )
+    db.session.commit()
+    return resultado
+
+
+def proximo_lembrete():
+    """Menor ``lembrete_em`` ainda nao enviado (consulta no indice)."""
+    return db.session.query(func.min(Escala.lembrete_em)).filter(
+        Escala.lembrete_enviado.is_(False),
+        Escala.lembrete_em.isnot(None),
+    ).scalar()
+
+
+def armar_proximo_lembrete(scheduler, app, momento):
+    """Agenda ``disparar_lembretes`` para ``momento`` (UTC), ou desarma."""
+    if momento is None:
+        if scheduler.get_job(JOB_PROXIMO_LEMBRETE) is not None:
+            scheduler.remove_job(JOB_PROXIMO_LEMBRETE)
+        return
+
+    scheduler.add_job(
+        disparar_lembretes,
+        trigger="date",
+        run_date=max(momento, datetime.utcnow()).replace(tzinfo=timezone.utc),
+        args=[app, scheduler],
+        max_instances=1,
+        misfire_grace_time=None,
+        replace_existing=True,
+        id=JOB_PROXIMO_LEMBRETE,
+    )
+
+
+def _enviar_vencidos():
+    limite = _cfg("LEMBRETE_MISSA_LOTE", 500)
+    lidas = 0
+    while True:
+        resultado = processar_lembretes_vencidos(limite=limite)
+        lidas += resultado["lidas"]
+        if resultado["lidas"] < limite:
+            return lidas
+
+
+def _rearmar(scheduler, app):
+    if scheduler is not None:
+        armar_proximo_lembrete(scheduler, app, proximo_lembrete())
+
+
+def disparar_lembretes(app, scheduler=None):
+    with execucao_job(app, JOB_PROXIMO_LEMBRETE) as execucao:
+        execucao.itens = _enviar_vencidos()
+        _rearmar(scheduler, app)
+
+
+def enviar_lembretes_missa(app, scheduler=None):
+
+    with execucao_job(app, "lembretes_missa") as execucao:
         # 🔥 verificar substituições automáticas
-        verificar_substituicoes_automaticas()
+        substituicoes = verificar_substituicoes_automaticas()
+
+        execucao.itens = substituicoes["lidos"] + _enviar_vencidos()
+        _rearmar(scheduler, app)
+
+
+# --------------------------------------------------
+# EVENTOS DA SESSAO
+# --------------------------------------------------
+def _pendentes(session):
+    return session.info.setdefault(_PENDENTES, {"novas": set(), "movidas": set()})
+
+
+def _alterou(obj, atributos):
+    estado = inspect(obj)
+    return any(estado.attrs[nome].history.has_changes() for nome in atributos)
+
+
+@event.listens_for(Session, "before_flush")
+def _reiniciar_lembretes_alterados(session, flush_context, instances):
+    for obj in session.dirty:
+        if obj in session.new or inspect(obj).key is None:
+            continue
+        if isinstance(obj, Escala) and _alterou(obj, ("id_missa", "id_ministro")):
+            # Outro ministro (ou outra missa): o lembrete e recalculado e sai de novo.
+            obj.lembrete_em = None
+            obj.lembrete_enviado = False
+        elif isinstance(obj, Missa) and _alterou(obj, ("data", "horario")):
+            _pendentes(session)["movidas"].add(obj.id)
+
+
+@event.listens_for(Session, "after_flush")
+def _coletar_escalas_sem_lembrete(session, flush_context):
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Escala) or obj.id_missa is None:
+            continue
+        # So o que esta carregado: atributo expirado nao e lido do banco aqui.
+        if obj.__dict__.get("lembrete_em") is None and (obj in session.new or "lembrete_em" in obj.__dict__):
+            _pendentes(session)["novas"].add(obj.id_missa)
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _agendar_lembretes_pendentes(session, flush_context):
+    pendentes = session.info.pop(_PENDENTES, None)
+    if not pendentes:
+        return
+
+    if pendentes["movidas"]:
+        agendar_lembretes(pendentes["movidas"], session=session, reiniciar=True)
+    agendar_lembretes(pendentes["novas"] - pendentes["movidas"], session=session)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _descartar_lembretes_pendentes(session, previous_transaction):
+    session.info.pop(_PENDENTES, None)
+
 
-        agora = datetime.now()
-        limite = agora + timedelta(hours=1)
+@event.listens_for(Session, "do_orm_execute")
+def _agendar_lembretes_em_lote(orm_execute_state):
+    # ``insert(Escala)`` em lote nao passa pelo flush.
+    if not orm_execute_state.is_insert:
+        return None
 
-        missas = Missa.query.filter(
-            Missa.data == agora.date()
-        ).all()
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not Escala:
+        return None
 
-        for missa in missas:
+    parametros = orm_execute_state.parameters or []
+    if isinstance(parametros, dict):
+        parametros = [parametros]
 
-            # restante do código
-            pass
\ No newline at end of file
+    resultado = orm_execute_state.invoke_statement()
+    agendar_lembretes(
+        {linha.get("id_missa") for linha in parametros},
+        session=orm_execute_state.session,
+    )
+    return resultado
@@ -0,0 +1,374 @@
+import calendar
+import re
+from collections import defaultdict
+from datetime import date, datetime
+
+from sqlalchemy import and_, delete, event, func, insert, inspect, or_, select
+from sqlalchemy.orm import Session
+
+from extensions import db
+from models import Escala, MinistroMetricas, Missa
+
+
+# Chave em Session.info com as escalas alteradas no flush corrente.
+_PENDENTES = "ministro_metricas_pendentes"
+
+
+def _mes_de(data):
+    return data.year, data.month
+
+
+def _novo_acumulado():
+    return {"escalas": 0, "confirmadas": 0, "domingos": 0, "ultima_data": None}
+
+
+def _acumular(acumulado, data, confirmado):
+    acumulado["escalas"] += 1
+    if confirmado is True:
+        acumulado["confirmadas"] += 1
+    if data.weekday() == 6:
+        acumulado["domingos"] += 1
+    if acumulado["ultima_data"] is None or data > acumulado["ultima_data"]:
+        acumulado["ultima_data"] = data
+
+
+def _linhas_metricas(acumulados):
+    agora = datetime.utcnow()
+    return [
+        {
+            "id_paroquia": id_paroquia,
+            "id_ministro": id_ministro,
+            "ano": ano,
+            "mes": mes,
+            "escalas": valores["escalas"],
+            "confirmadas": valores["confirmadas"],
+            "domingos": valores["domingos"],
+            "ultima_data": valores["ultima_data"],
+            "atualizado_em": agora,
+        }
+        for (id_paroquia, id_ministro, ano, mes), valores in acumulados.items()
+    ]
+
+
+# --------------------------------------------------
+# ATUALIZACAO
+# --------------------------------------------------
+def recalcular_metricas(chaves, session=None):
+    """
+    Recalcula os contadores de cada (id_paroquia, id_ministro, ano, mes).
+
+    Cada mes afetado e recontado a partir das escalas, o que mantem o modelo
+    correto mesmo quando a alteracao veio de um DELETE/INSERT em lote.
+    """
+    session = session or db.session
+
+    por_mes = defaultdict(set)
+    for id_paroquia, id_ministro, ano, mes in chaves:
+        if id_paroquia is None or id_ministro is None:
+            continue
+        por_mes[(id_paroquia, ano, mes)].add(id_ministro)
+
+    for (id_paroquia, ano, mes), ministro_ids in por_mes.items():
+        inicio = date(ano, mes, 1)
+        fim = date(ano, mes, calendar.monthrange(ano, mes)[1])
+
+        acumulados = {}
+        for id_ministro, confirmado, data in session.execute(
+            select(Escala.id_ministro, Escala.confirmado, Missa.data)
+            .join(Missa, Missa.id == Escala.id_missa)
+            .where(
+                Escala.id_paroquia == id_paroquia,
+                Escala.id_ministro.in_(ministro_ids),
+                Missa.data >= inicio,
+                Missa.data <= fim,
+            )
+        ):
+            chave = (id_paroquia, id_ministro, ano, mes)
+            _acumular(acumulados.setdefault(chave, _novo_acumulado()), data, confirmado)
+
+        session.execute(
+            delete(MinistroMetricas).where(
+                MinistroMetricas.id_paroquia == id_paroquia,
+                MinistroMetricas.id_ministro.in_(ministro_ids),
+                MinistroMetricas.ano == ano,
+                MinistroMetricas.mes == mes,
+            )
+        )
+        if acumulados:
+            session.execute(insert(MinistroMetricas), _linhas_metricas(acumulados))
+
+
+def reconstruir_metricas(id_paroquia=None, session=None):
+    """
+    Apaga e recria o modelo de leitura a partir de todas as escalas.
+
+    Retorna a quantidade de linhas (ministro x mes) gravadas.
+    """
+    session = session or db.session
+
+    remocao = delete(MinistroMetricas)
+    consulta = select(
+        Escala.id_paroquia,
+        Escala.id_ministro,
+        Escala.confirmado,
+        Missa.data,
+    ).join(Missa, Missa.id == Escala.id_missa).where(
+        Escala.id_paroquia.isnot(None),
+        Escala.id_ministro.isnot(None),
+    )
+
+    if id_paroquia is not None:
+        remocao = remocao.where(MinistroMetricas.id_paroquia == id_paroquia)
+        consulta = consulta.where(Escala.id_paroquia == id_paroquia)
+
+    acumulados = {}
+    for paroquia_id, id_ministro, confirmado, data in session.execute(consulta):
+        chave = (paroquia_id, id_ministro) + _mes_de(data)
+        _acumular(acumulados.setdefault(chave, _novo_acumulado()), data, confirmado)
+
+    session.execute(remocao)
+    if acumulados:
+        session.execute(insert(MinistroMetricas), _linhas_metricas(acumulados))
+
+    return len(acumulados)
+
+
+# --------------------------------------------------
+# LEITURA
+# --------------------------------------------------
+def historico_anterior_ao_mes(id_paroquia, ano, mes, ministro_ids=None):
+    """
+    Totais por ministro de todos os meses anteriores a ``mes/ano``.
+
+    Retorna ``{id_ministro: (total, confirmadas, ultima_data)}`` com uma unica
+    consulta agregada sobre ``ministro_metricas``.
+    """
+    consulta = db.session.query(
+        MinistroMetricas.id_ministro,
+        func.sum(MinistroMetricas.escalas),
+        func.sum(MinistroMetricas.confirmadas),
+        func.max(MinistroMetricas.ultima_data),
+    ).filter(
+        MinistroMetricas.id_paroquia == id_paroquia,
+        or_(
+            MinistroMetricas.ano < ano,
+            and_(MinistroMetricas.ano == ano, MinistroMetricas.mes < mes),
+        ),
+    )
+
+    if ministro_ids is not None:
+        consulta = consulta.filter(MinistroMetricas.id_ministro.in_(ministro_ids))
+
+    return {
+        id_ministro: (int(total or 0), int(confirmadas or 0), ultima)
+        for id_ministro, total, confirmadas, ultima in consulta.group_by(MinistroMetricas.id_ministro)
+    }
+
+
+def metricas_do_mes(id_paroquia, ano, mes, ministro_ids=None):
+    """Retorna ``(id_ministro, escalas, domingos)`` de cada ministro no mes."""
+    consulta = db.session.query(
+        MinistroMetricas.id_ministro,
+        MinistroMetricas.escalas,
+        MinistroMetricas.domingos,
+    ).filter(
+        MinistroMetricas.id_paroquia == id_paroquia,
+        MinistroMetricas.ano == ano,
+        MinistroMetricas.mes == mes,
+    )
+
+    if ministro_ids is not None:
+        consulta = consulta.filter(MinistroMetricas.id_ministro.in_(ministro_ids))
+
+    return consulta.all()
+
+
+# --------------------------------------------------
+# EVENTOS DA SESSAO
+# --------------------------------------------------
+def _pendentes(session):
+    return session.info.setdefault(_PENDENTES, {"meses": set(), "missas": set(), "missas_movidas": {}})
+
+
+def _registrar_escala(pendentes, escala):
+    missa = escala.__dict__.get("missa")
+    if missa is not None and missa.id == escala.id_missa and missa.data is not None:
+        pendentes["meses"].add((escala.id_paroquia, escala.id_ministro) + _mes_de(missa.data))
+    else:
+        pendentes["missas"].add((escala.id_paroquia, escala.id_ministro, escala.id_missa))
+
+
+def _alterou(obj, atributos):
+    estado = inspect(obj)
+    return any(estado.attrs[nome].history.has_changes() for nome in atributos)
+
+
+@event.listens_for(Session, "before_flush")
+def _coletar_valores_anteriores(session, flush_context, instances):
+    # Os valores anteriores de escalas e missas alteradas sao lidos do banco:
+    # o historico do atributo nao os traz quando o objeto estava expirado.
+    escala_ids = set()
+    missas_movidas = {}
+    for obj in session.dirty:
+        if obj in session.new or inspect(obj).key is None:
+            continue
+        if isinstance(obj, Escala) and _alterou(obj, ("id_paroquia", "id_ministro", "id_missa", "confirmado")):
+            escala_ids.add(obj.id)
+        elif isinstance(obj, Missa) and _alterou(obj, ("data",)):
+            missas_movidas[obj.id] = obj.data
+
+    if not escala_ids and not missas_movidas:
+        return
+
+    pendentes = _pendentes(session)
+    with session.no_autoflush:
+        if escala_ids:
+            pendentes["meses"].update(_chaves_afetadas(session, Escala.id.in_(escala_ids)))
+
+        if missas_movidas:
+            for id_missa, data_antiga in session.execute(
+                select(Missa.id, Missa.data).where(Missa.id.in_(missas_movidas.keys()))
+            ):
+                datas = pendentes["missas_movidas"].setdefault(id_missa, set())
+                datas.update(d for d in (data_antiga, missas_movidas[id_missa]) if d is not None)
+
+
+@event.listens_for(Session, "after_flush")
+def _coletar_alteracoes(session, flush_context):
+    pendentes = None
+
+    for obj in list(session.new) + list(session.deleted) + list(session.dirty):
+        if not isinstance(obj, Escala):
+            continue
+        if obj in session.dirty and not _alterou(obj, ("id_paroquia", "id_ministro", "id_missa", "confirmado")):
+            continue
+        pendentes = pendentes or _pendentes(session)
+        _registrar_escala(pendentes, obj)
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _aplicar_alteracoes(session, flush_context):
+    pendentes = session.info.pop(_PENDENTES, None)
+    if not pendentes:
+        return
+
+    chaves = set(pendentes["meses"])
+
+    missa_ids = {id_missa for _, _, id_missa in pendentes["missas"] if id_missa is not None}
+    if missa_ids:
+        datas = dict(session.execute(select(Missa.id, Missa.data).where(Missa.id.in_(missa_ids))).all())
+        for id_paroquia, id_ministro, id_missa in pendentes["missas"]:
+            if datas.get(id_missa) is not None:
+                chaves.add((id_paroquia, id_ministro) + _mes_de(datas[id_missa]))
+
+    movidas = pendentes["missas_movidas"]
+    if movidas:
+        for id_paroquia, id_ministro, id_missa in session.execute(
+            select(Escala.id_paroquia, Escala.id_ministro, Escala.id_missa).where(
+                Escala.id_missa.in_(movidas.keys())
+            )
+        ):
+            for data in movidas[id_missa]:
+                chaves.add((id_paroquia, id_ministro) + _mes_de(data))
+
+    if chaves:
+        recalcular_metricas(chaves, session=session)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _descartar_alteracoes(session, previous_transaction):
+    session.info.pop(_PENDENTES, None)
+
+
+def _chaves_afetadas(session, criterio):
+    return {
+        (id_paroquia, id_ministro) + _mes_de(data)
+        for id_paroquia, id_ministro, data in session.execute(
+            select(Escala.id_paroquia, Escala.id_ministro, Missa.data)
+            .join(Missa, Missa.id == Escala.id_missa)
+            .where(criterio)
+        )
+    }
+
+
+# Colunas de Escala que entram na contagem; UPDATEs em lote sem elas
+# (ex.: notificacao_enviada, lembrete_enviado) nao recontam nada.
+_COLUNAS_DAS_METRICAS = {"id_paroquia", "id_ministro", "id_missa", "confirmado"}
+
+
+# Atribuicao do SET no SQL compilado: ``coluna=valor``. Comparacoes do WHERE
+# saem com espacos e tabela (``escala.coluna = :p``) e nao casam.
+_ATRIBUICAO_SET = re.compile(r'(?<![\w."])"?(\w+)"?=')
+
+
+def _update_altera_metricas(orm_execute_state):
+    # UPDATE em lote por chave primaria: as colunas vem nos parametros e
+    # entram no SET via column_keys.
+    parametros = orm_execute_state.parameters or []
+    if isinstance(parametros, dict):
+        parametros = [parametros]
+    chaves = sorted({chave for linha in parametros for chave in linha})
+
+    sql = orm_execute_state.statement.compile(column_keys=chaves or None).string
+    colunas = set(_ATRIBUICAO_SET.findall(sql))
+    # Sem nenhuma atribuicao reconhecida, reconta por seguranca.
+    if not colunas:
+        return True
+    return bool(colunas & _COLUNAS_DAS_METRICAS)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _acompanhar_operacoes_em_lote(orm_execute_state):
+    # INSERT/UPDATE/DELETE em lote nao passam pelo flush; os meses afetados
+    # sao identificados aqui, antes e depois da instrucao.
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not Escala:
+        return None
+
+    if orm_execute_state.is_update and not _update_altera_metricas(orm_execute_state):
+        return None
+
+    session = orm_execute_state.session
+
+    if orm_execute_state.is_insert:
+        parametros = orm_execute_state.parameters or []
+        if isinstance(parametros, dict):
+            parametros = [parametros]
+
+        resultado = orm_execute_state.invoke_statement()
+
+        chaves_missa = {
+            (linha.get("id_paroquia"), linha.get("id_ministro"), linha.get("id_missa"))
+            for linha in parametros
+        }
+        missa_ids = {id_missa for _, _, id_missa in chaves_missa if id_missa is not None}
+        if missa_ids:
+            datas = dict(session.execute(select(Missa.id, Missa.data).where(Missa.id.in_(missa_ids))).all())
+            recalcular_metricas(
+                [
+                    (id_paroquia, id_ministro) + _mes_de(datas[id_missa])
+                    for id_paroquia, id_ministro, id_missa in chaves_missa
+                    if datas.get(id_missa) is not None
+                ],
+                session=session,
+            )
+        return resultado
+
+    criterio = orm_execute_state.statement.whereclause
+    if criterio is None:
+        criterio = Escala.id.isnot(None)
+
+    escala_ids = [row[0] for row in session.execute(select(Escala.id).where(criterio))]
+    if not escala_ids:
+        return None
+
+    chaves = _chaves_afetadas(session, Escala.id.in_(escala_ids))
+    resultado = orm_execute_state.invoke_statement()
+    if orm_execute_state.is_update:
+        chaves |= _chaves_afetadas(session, Escala.id.in_(escala_ids))
+
+    recalcular_metricas(chaves, session=session)
+    return resultado
@@ -0,0 +1,281 @@
+"""
+Outbox de notificacoes push.
+
+Quem altera escalas grava o push em ``notificacao_outbox`` na mesma transacao
+(``enfileirar_push`` nao faz commit) e a requisicao termina no commit. O
+envio fica com ``processar_outbox``, chamado pelo scheduler e pelo comando
+``flask notificacoes processar``: le um lote de pendentes vencidos, envia em
+multicast, reagenda as falhas com espera exponencial e marca como ``falha``
+o que esgotou as tentativas ou tem token nao registrado.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import insert
+
+from extensions import db
+from models import NotificacaoOutbox, PushToken
+from services import firebase_service
+
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDENTE = "pendente"
+STATUS_ENVIADA = "enviada"
+STATUS_FALHA = "falha"
+
+
+def _cfg(chave, padrao):
+    return current_app.config.get(chave, padrao)
+
+
+def enfileirar_push(token, titulo, mensagem, url=None, usuario_id=None):
+    """Adiciona um push a outbox na sessao atual. Nao faz commit."""
+    if not token:
+        return None
+
+    item = NotificacaoOutbox(
+        canal="push",
+        destino=token,
+        usuario_id=usuario_id,
+        titulo=titulo,
+        mensagem=mensagem,
+        url=url,
+        status=STATUS_PENDENTE,
+        tentativas=0,
+        proxima_tentativa_em=datetime.utcnow(),
+    )
+    db.session.add(item)
+    return item
+
+
+def enfileirar_pushes(destinos, titulo, mensagem, url=None):
+    """
+    Versao em lote de ``enfileirar_push``: ``destinos`` e uma lista de
+    ``(usuario_id, token)``. Grava tudo em um unico INSERT. Nao faz commit.
+    """
+    agora = datetime.utcnow()
+    linhas = [
+        {
+            "canal": "push",
+            "destino": token,
+            "usuario_id": usuario_id,
+            "titulo": titulo,
+            "mensagem": mensagem,
+            "url": url,
+            "status": STATUS_PENDENTE,
+            "tentativas": 0,
+            "proxima_tentativa_em": agora,
+            "criada_em": agora,
+        }
+        for usuario_id, token in destinos
+        if token
+    ]
+    if linhas:
+        db.session.execute(insert(NotificacaoOutbox), linhas)
+    return len(linhas)
+
+
+def _mensagem_resumo(itens):
+    return "Sua escala foi atualizada:\n" + "\n".join(f"- {linha}" for linha in itens)
+
+
+def agrupar_pushes(eventos, agora=None):
+    """
+    Enfileira eventos de escala juntando os de mesma ``chave`` em um push.
+
+    Cada evento e um dict com ``chave``, ``token``, ``usuario_id``,
+    ``linha`` (item do resumo), ``titulo``/``mensagem``/``url`` (usados se o
+    push tiver um so item; ``mensagem`` pode ser uma funcao, chamada so
+    nesse caso) e ``url_resumo`` (usado no resumo). Um push
+    pendente da mesma chave criado ha menos de
+    ``ESCALA_NOTIFICACAO_JANELA_SEGUNDOS`` recebe os novos itens; senao nasce
+    um push novo que so sai quando a janela fecha. Uma consulta para todas as
+    chaves. Nao faz commit.
+
+    Retorna o numero de pushes novos.
+    """
+    agora = agora or datetime.utcnow()
+    janela = timedelta(seconds=_cfg("ESCALA_NOTIFICACAO_JANELA_SEGUNDOS", 120))
+
+    grupos = {}
+    for evento in eventos:
+        if not evento.get("token"):
+            continue
+        grupo = grupos.setdefault(evento["chave"], {"eventos": [], "token": evento["token"]})
+        grupo["eventos"].append(evento)
+
+    if not grupos:
+        return 0
+
+    existentes = {}
+    for item in NotificacaoOutbox.query.filter(
+        NotificacaoOutbox.chave_agrupamento.in_(list(grupos)),
+        NotificacaoOutbox.status == STATUS_PENDENTE,
+        NotificacaoOutbox.tentativas == 0,
+        NotificacaoOutbox.proxima_tentativa_em > agora,
+    ).order_by(NotificacaoOutbox.id.asc()).with_for_update():
+        existentes[(item.chave_agrupamento, item.destino)] = item
+
+    novos = 0
+    for chave, grupo in grupos.items():
+        eventos_grupo = grupo["eventos"]
+        linhas = [evento["linha"] for evento in eventos_grupo]
+        url_resumo = next(
+            (evento.get("url_resumo") for evento in reversed(eventos_grupo) if evento.get("url_resumo")),
+            None,
+        )
+
+        item = existentes.get((chave, grupo["token"]))
+        if item is not None:
+            item.itens = list(item.itens or []) + linhas
+            item.titulo = "Escala Atualizada"
+            item.mensagem = _mensagem_resumo(item.itens)
+            item.url = url_resumo or item.url
+            continue
+
+        if len(eventos_grupo) == 1:
+            evento = eventos_grupo[0]
+            titulo, mensagem, url = evento["titulo"], evento["mensagem"], evento.get("url")
+            if callable(mensagem):
+                mensagem = mensagem()
+        else:
+            titulo, mensagem, url = "Escala Atualizada", _mensagem_resumo(linhas), url_resumo
+
+        db.session.add(NotificacaoOutbox(
+            canal="push",
+            destino=grupo["token"],
+            usuario_id=eventos_grupo[0].get("usuario_id"),
+            titulo=titulo,
+            mensagem=mensagem,
+            url=url,
+            chave_agrupamento=chave,
+            itens=linhas,
+            status=STATUS_PENDENTE,
+            tentativas=0,
+            proxima_tentativa_em=agora + janela,
+        ))
+        novos += 1
+
+    return novos
+
+
+def _espera(tentativas):
+    base = _cfg("NOTIFICACAO_OUTBOX_BACKOFF_SEGUNDOS", 30)
+    maximo = _cfg("NOTIFICACAO_OUTBOX_BACKOFF_MAXIMO", 3600)
+    return timedelta(seconds=min(base * 2 ** (tentativas - 1), maximo))
+
+
+def _lote_por_token(enviar):
+    # Adapta um envio individual ao formato de ``entregar_push_multicast``.
+    def enviar_lote(tokens, titulo, mensagem, url=None):
+        erros = []
+        for token in tokens:
+            try:
+                enviar(token, titulo, mensagem, url=url)
+                erros.append(None)
+            except Exception as exc:
+                erros.append(exc)
+        return erros
+    return enviar_lote
+
+
+def processar_outbox(limite=None, enviar=None, agora=None, enviar_lote=None):
+    """
+    Envia um lote de pushes pendentes e faz commit.
+
+    As linhas sao lidas com ``FOR UPDATE SKIP LOCKED`` (ignorado no SQLite),
+    entao dois workers nao pegam o mesmo item. Itens com o mesmo titulo,
+    mensagem e url saem juntos em um multicast do FCM. ``enviar_lote`` recebe
+    ``(tokens, titulo, mensagem, url=...)`` e devolve um erro (ou ``None``)
+    por token; ``enviar`` e a alternativa token a token, que levanta excecao
+    na falha. O padrao e o Firebase; sem Firebase ativo nada e consumido.
+
+    Retorna ``{"lidas", "enviadas", "reagendadas", "falhas"}``.
+    """
+    resultado = {"lidas": 0, "enviadas": 0, "reagendadas": 0, "falhas": 0}
+
+    if enviar is not None:
+        enviar_lote = _lote_por_token(enviar)
+    elif enviar_lote is None:
+        if not firebase_service.firebase_ativo:
+            logger.warning("Firebase nao ativo; outbox de notificacoes nao processada")
+            return resultado
+        enviar_lote = firebase_service.entregar_push_multicast
+
+    agora = agora or datetime.utcnow()
+    limite = limite or _cfg("NOTIFICACAO_OUTBOX_LOTE", 500)
+    max_tentativas = _cfg("NOTIFICACAO_OUTBOX_MAX_TENTATIVAS", 5)
+
+    itens = NotificacaoOutbox.query.filter(
+        NotificacaoOutbox.status == STATUS_PENDENTE,
+        NotificacaoOutbox.proxima_tentativa_em <= agora,
+    ).order_by(
+        NotificacaoOutbox.proxima_tentativa_em.asc(),
+        NotificacaoOutbox.id.asc(),
+    ).limit(limite).with_for_update(skip_locked=True).all()
+
+    resultado["lidas"] = len(itens)
+
+    grupos = defaultdict(list)
+    for item in itens:
+        grupos[(item.titulo, item.mensagem, item.url)].append(item)
+
+    tokens_invalidos = set()
+
+    for (titulo, mensagem, url), grupo in grupos.items():
+        try:
+            erros = enviar_lote([item.destino for item in grupo], titulo, mensagem, url=url)
+        except Exception as exc:
+            erros = [exc] * len(grupo)
+
+        for item, erro in zip(grupo, erros):
+            item.tentativas = (item.tentativas or 0) + 1
+
+            if erro is None:
+                item.status = STATUS_ENVIADA
+                item.enviada_em = datetime.utcnow()
+                item.ultimo_erro = None
+                resultado["enviadas"] += 1
+                continue
+
+            item.ultimo_erro = (str(erro) or erro.__class__.__name__)[:1000]
+
+            if firebase_service.token_nao_registrado(erro):
+                tokens_invalidos.add(item.destino)
+                item.status = STATUS_FALHA
+            elif item.tentativas >= max_tentativas:
+                item.status = STATUS_FALHA
+            else:
+                item.proxima_tentativa_em = agora + _espera(item.tentativas)
+                resultado["reagendadas"] += 1
+                continue
+
+            resultado["falhas"] += 1
+            logger.warning("Push da outbox id=%s descartado: %s", item.id, item.ultimo_erro)
+
+    if tokens_invalidos:
+        PushToken.query.filter(
+            PushToken.token.in_(tokens_invalidos)
+        ).update({"ativo": False}, synchronize_session=False)
+
+    db.session.commit()
+    return resultado
+
+
+def drenar_outbox(max_lotes=None, enviar=None, enviar_lote=None):
+    """Processa lotes enquanto vierem cheios, ate ``max_lotes``."""
+    max_lotes = max_lotes or _cfg("NOTIFICACAO_OUTBOX_MAX_LOTES", 20)
+    limite = _cfg("NOTIFICACAO_OUTBOX_LOTE", 500)
+    total = {"lidas": 0, "enviadas": 0, "reagendadas": 0, "falhas": 0}
+
+    for _ in range(max_lotes):
+        resultado = processar_outbox(limite=limite, enviar=enviar, enviar_lote=enviar_lote)
+        for chave, valor in resultado.items():
+            total[chave] += valor
+        if resultado["lidas"] < limite:
+            break
+
+    return total
@@ -1,50 +1,108 @@
 import logging
 
-from services.firebase_service import enviar_push
+from services.notificacao_outbox_service import agrupar_pushes, enfileirar_push
+from services.public_url_service import build_public_url
 from services.whatsapp_service import gerar_link_whatsapp, montar_mensagem_escala
 
 
 logger = logging.getLogger(__name__)
 
 
-def notificar_escala_criada(ministro, missa):
+def chave_escala(ministro):
+    return f"escala:{ministro.id}"
+
+
+def _link_calendario(ministro):
+    if not getattr(ministro, "token_publico", None):
+        return None
+    try:
+        return build_public_url("publico.calendario_publico", token=ministro.token_publico)
+    except RuntimeError:
+        # Fora de requisicao e sem PUBLIC_BASE_URL/SERVER_NAME (jobs).
+        return None
+
+
+def _linha_missa(prefixo, missa):
+    return f"{prefixo}: {missa.data.strftime('%d/%m')} {missa.horario} - {missa.comunidade}"
+
+
+def _evento_escala_criada(ministro, missa):
     escala = getattr(missa, "escala_ref", None)
     url = None
     if escala and getattr(escala, "token", None):
         from flask import url_for
         url = url_for("escala.checkin_publico_localizacao", token=escala.token, _external=True)
-    mensagem = montar_mensagem_escala(ministro, missa, escala=escala)
 
+    return {
+        "chave": chave_escala(ministro),
+        "token": ministro.firebase_token,
+        "usuario_id": ministro.id,
+        "linha": _linha_missa("Nova", missa),
+        "titulo": "Nova Escala",
+        "mensagem": lambda: montar_mensagem_escala(ministro, missa, escala=escala),
+        "url": url,
+        "url_resumo": _link_calendario(ministro),
+    }
+
+
+def _evento_escala_removida(ministro, missa):
+    data = missa.data.strftime("%d/%m/%Y")
+    return {
+        "chave": chave_escala(ministro),
+        "token": ministro.firebase_token,
+        "usuario_id": ministro.id,
+        "linha": _linha_missa("Removida", missa),
+        "titulo": "Escala Alterada",
+        "mensagem": (
+            "Voce foi removido da escala.\n"
+            f"Data: {data}\n"
+            f"Horario: {missa.horario}\n"
+            f"Comunidade: {missa.comunidade}"
+        ),
+        "url_resumo": _link_calendario(ministro),
+    }
+
+
+def notificar_escala_criada(ministro, missa):
     if ministro.firebase_token:
-        enviar_push(
-            ministro.firebase_token,
-            "Nova Escala",
-            mensagem,
-            url=url,
-        )
+        agrupar_pushes([_evento_escala_criada(ministro, missa)])
 
     return gerar_link_whatsapp(ministro, missa)
 
 
 def notificar_escala_removida(ministro, missa):
-    data = missa.data.strftime("%d/%m/%Y")
-
-    titulo = "Escala Alterada"
-    mensagem = (
-        "Voce foi removido da escala.\n"
-        f"Data: {data}\n"
-        f"Horario: {missa.horario}\n"
-        f"Comunidade: {missa.comunidade}"
-    )
-
     if ministro.firebase_token:
-        enviar_push(ministro.firebase_token, titulo, mensagem)
+        agrupar_pushes([_evento_escala_removida(ministro, missa)])
 
     link = gerar_link_whatsapp(ministro, missa)
     logger.info("Link WhatsApp remocao gerado para ministro_id=%s", getattr(ministro, "id", None))
     return link
 
 
+def notificar_alteracoes_escala(criadas, removidas):
+    """
+    Notifica os ministros incluidos (``(missa, ministro, escala)``) e removidos
+    (``(missa, ministro)``) de uma escala. Os pushes vao para a outbox: chame
+    antes do commit que grava a alteracao.
+
+    Cada ministro recebe um unico push com todas as suas alteracoes (somadas
+    a um resumo ainda pendente na janela de agrupamento, se houver).
+    """
+    eventos = [
+        _evento_escala_removida(ministro, missa)
+        for missa, ministro in removidas
+        if ministro.firebase_token
+    ]
+
+    for missa, ministro, escala in criadas:
+        if not ministro.firebase_token:
+            continue
+        missa.escala_ref = escala
+        eventos.append(_evento_escala_criada(ministro, missa))
+
+    return agrupar_pushes(eventos)
+
+
 def notificar_confirmacao(admin, ministro, missa):
     if not admin.firebase_token:
         return
@@ -57,4 +115,4 @@ def notificar_confirmacao(admin, ministro, missa):
         f"Horario: {missa.horario}"
     )
 
-    enviar_push(admin.firebase_token, titulo, mensagem)
+    enfileirar_push(admin.firebase_token, titulo, mensagem, usuario_id=admin.id)
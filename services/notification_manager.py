@@ -1,8 +1,11 @@
 from extensions import db
-from datetime import datetime
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, case, delete, func, insert, or_, select, update
 
 from models import PushToken, Ministro,Notificacao
-from services.firebase_service import enviar_push
+from services.notificacao_outbox_service import enfileirar_pushes
 
 
 class NotificationManager:
@@ -17,100 +20,224 @@ class NotificationManager:
     @staticmethod
     def enviar(usuario_id, titulo, mensagem, url="/"):
 
-        # salva no histórico
-        notificacao = Notificacao(
-            usuario_id=usuario_id,
+        NotificationManager.enviar_para_ids(
+            [usuario_id],
             titulo=titulo,
             mensagem=mensagem,
-            criada_em=datetime.utcnow()
+            url=url
         )
 
-        db.session.add(notificacao)
-        db.session.commit()
+    # --------------------------------------------------
+    # ENVIAR PARA VÁRIOS USUÁRIOS
+    # --------------------------------------------------
+    @staticmethod
+    def enviar_para_varios(usuarios, titulo, mensagem, url="/"):
 
-        # busca tokens ativos
-        tokens = PushToken.query.filter_by(
-            usuario_id=usuario_id,
-            ativo=True
-        ).all()
+        return NotificationManager.enviar_para_ids(
+            [usuario.id for usuario in usuarios],
+            titulo=titulo,
+            mensagem=mensagem,
+            url=url
+        )
 
-        for token_obj in tokens:
+    # --------------------------------------------------
+    # NOTIFICAÇÃO PARA TODOS OS MINISTROS
+    # --------------------------------------------------
+    @staticmethod
+    def enviar_para_todos(titulo, mensagem, url="/"):
 
-            try:
+        ids = [
+            ministro_id
+            for (ministro_id,) in db.session.query(Ministro.id).filter(
+                Ministro.notificacoes_ativas.is_(True)
+            )
+        ]
 
-                enviar_push(
-                    token=token_obj.token,
-                    titulo=titulo,
-                    mensagem=mensagem,
-                    url=url
-                )
+        return NotificationManager.enviar_para_ids(
+            ids,
+            titulo=titulo,
+            mensagem=mensagem,
+            url=url
+        )
+
+    # --------------------------------------------------
+    # ENVIO EM LOTE
+    # --------------------------------------------------
+    @staticmethod
+    def destinos_push(usuario_ids):
+        """
+        ``(usuario_id, token)`` de todos os tokens ativos dos usuarios, em uma
+        consulta: ``push_tokens`` ativos mais o ``firebase_token`` do ministro.
+        Tokens repetidos aparecem uma vez.
+        """
+
+        consulta = select(PushToken.usuario_id, PushToken.token).where(
+            PushToken.usuario_id.in_(usuario_ids),
+            PushToken.ativo.is_(True)
+        ).union_all(
+            select(Ministro.id, Ministro.firebase_token).where(
+                Ministro.id.in_(usuario_ids),
+                Ministro.firebase_token.isnot(None),
+                Ministro.firebase_token != ""
+            )
+        )
+
+        destinos = {}
+        for usuario_id, token in db.session.execute(consulta):
+            destinos.setdefault(token, usuario_id)
 
-            except Exception as e:
+        return [(usuario_id, token) for token, usuario_id in destinos.items()]
 
-                erro = str(e)
+    @staticmethod
+    def enviar_para_ids(usuario_ids, titulo, mensagem, url="/"):
+        """
+        Grava o historico e enfileira os pushes de varios usuarios com um
+        INSERT em ``notificacoes``, uma consulta de tokens, um INSERT na
+        outbox e um commit. O worker da outbox envia em multicast.
+        """
+
+        usuario_ids = list(dict.fromkeys(usuario_ids))
+        if not usuario_ids:
+            return 0
+
+        agora = datetime.utcnow()
+
+        db.session.execute(
+            insert(Notificacao),
+            [
+                {
+                    "usuario_id": usuario_id,
+                    "titulo": titulo,
+                    "mensagem": mensagem,
+                    "lida": False,
+                    "criada_em": agora
+                }
+                for usuario_id in usuario_ids
+            ]
+        )
 
-                # token inválido
-                if "registration-token-not-registered" in erro:
-                    token_obj.ativo = False
+        NotificationManager._somar_nao_lidas(usuario_ids, 1)
+
+        enfileirar_pushes(
+            NotificationManager.destinos_push(usuario_ids),
+            titulo,
+            mensagem,
+            url=url
+        )
 
         db.session.commit()
 
+        return len(usuario_ids)
+
     # --------------------------------------------------
-    # ENVIAR PARA VÁRIOS USUÁRIOS
+    # CONTADOR DE NOTIFICAÇÕES
     # --------------------------------------------------
     @staticmethod
-    def enviar_para_varios(usuarios, titulo, mensagem, url="/"):
+    def _somar_nao_lidas(usuario_ids, quantidade):
+        """
+        Ajusta ``Ministro.notificacoes_nao_lidas`` com um UPDATE atomico
+        (sem ler o valor antes); nunca fica negativo. Nao faz commit.
+        """
+
+        contador = Ministro.notificacoes_nao_lidas
+
+        db.session.execute(
+            update(Ministro)
+            .where(Ministro.id.in_(usuario_ids))
+            .values(notificacoes_nao_lidas=case(
+                (contador + quantidade > 0, contador + quantidade),
+                else_=0
+            ))
+            .execution_options(synchronize_session=False)
+        )
 
-        for usuario in usuarios:
+    @staticmethod
+    def contar_nao_lidas(usuario_id):
 
-            NotificationManager.enviar(
-                usuario_id=usuario.id,
-                titulo=titulo,
-                mensagem=mensagem,
-                url=url
-            )
+        return db.session.execute(
+            select(Ministro.notificacoes_nao_lidas).where(Ministro.id == usuario_id)
+        ).scalar() or 0
 
-    # --------------------------------------------------
-    # NOTIFICAÇÃO PARA TODOS OS MINISTROS
-    # --------------------------------------------------
     @staticmethod
-    def enviar_para_todos(titulo, mensagem, url="/"):
+    def recontar_nao_lidas():
+        """Refaz os contadores a partir de ``notificacoes``. Nao faz commit."""
 
-        ministros = Ministro.query.filter_by(
-            notificacoes_ativas=True
-        ).all()
+        nao_lidas = select(func.count(Notificacao.id)).where(
+            Notificacao.usuario_id == Ministro.id,
+            Notificacao.lida.is_(False)
+        ).scalar_subquery()
 
-        for ministro in ministros:
-
-            NotificationManager.enviar(
-                usuario_id=ministro.id,
-                titulo=titulo,
-                mensagem=mensagem,
-                url=url
-            )
+        return db.session.execute(
+            update(Ministro)
+            .values(notificacoes_nao_lidas=nao_lidas)
+            .execution_options(synchronize_session=False)
+        ).rowcount
 
     # --------------------------------------------------
-    # CONTADOR DE NOTIFICAÇÕES
+    # LISTAGEM
     # --------------------------------------------------
     @staticmethod
-    def contar_nao_lidas(usuario_id):
+    def listar(usuario_id, cursor=None, limite=None):
+        """
+        Pagina o historico do usuario do mais novo para o mais antigo por
+        chave ``(criada_em, id)``, no indice ``ix_notificacoes_usuario_criada``.
 
-        return Notificacao.query.filter_by(
-            usuario_id=usuario_id,
-            lida=False
-        ).count()
+        ``cursor`` e o ``(criada_em, id)`` do ultimo item da pagina anterior.
+        Retorna ``(notificacoes, proximo_cursor)``; o cursor e ``None`` na
+        ultima pagina.
+        """
+
+        limite = limite or current_app.config.get("NOTIFICACAO_PAGINA", 20)
+
+        consulta = Notificacao.query.filter(
+            Notificacao.usuario_id == usuario_id
+        )
+
+        if cursor:
+            criada_em, notificacao_id = cursor
+            consulta = consulta.filter(or_(
+                Notificacao.criada_em < criada_em,
+                and_(Notificacao.criada_em == criada_em, Notificacao.id < notificacao_id)
+            ))
+
+        notificacoes = consulta.order_by(
+            Notificacao.criada_em.desc(),
+            Notificacao.id.desc()
+        ).limit(limite + 1).all()
+
+        if len(notificacoes) <= limite:
+            return notificacoes, None
+
+        notificacoes = notificacoes[:limite]
+        ultima = notificacoes[-1]
+        return notificacoes, (ultima.criada_em, ultima.id)
 
     # --------------------------------------------------
     # MARCAR COMO LIDA
     # --------------------------------------------------
     @staticmethod
-    def marcar_lida(notificacao_id):
+    def marcar_lida(notificacao_id, usuario_id=None):
+
+        consulta = update(Notificacao).where(
+            Notificacao.id == notificacao_id,
+            Notificacao.lida.is_(False)
+        )
 
-        notificacao = Notificacao.query.get(notificacao_id)
+        if usuario_id is not None:
+            consulta = consulta.where(Notificacao.usuario_id == usuario_id)
 
-        if notificacao:
-            notificacao.lida = True
-            db.session.commit()
+        # So quem de fato trocou lida de falso para verdadeiro desconta.
+        marcada = db.session.execute(
+            consulta.values(lida=True)
+            .returning(Notificacao.usuario_id)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+
+        if marcada is not None:
+            NotificationManager._somar_nao_lidas([marcada], -1)
+
+        db.session.commit()
+        return marcada is not None
 
     # --------------------------------------------------
     # MARCAR TODAS COMO LIDAS
@@ -118,12 +245,54 @@ class NotificationManager:
     @staticmethod
     def marcar_todas_lidas(usuario_id):
 
-        Notificacao.query.filter_by(
+        marcadas = Notificacao.query.filter_by(
             usuario_id=usuario_id,
             lida=False
-        ).update({"lida": True})
+        ).update({"lida": True}, synchronize_session=False)
+
+        if marcadas:
+            NotificationManager._somar_nao_lidas([usuario_id], -marcadas)
 
         db.session.commit()
+        return marcadas
+
+    # --------------------------------------------------
+    # RETENÇÃO
+    # --------------------------------------------------
+    @staticmethod
+    def limpar_notificacoes_lidas(dias=None, lote=None, agora=None):
+        """
+        Apaga notificacoes lidas criadas ha mais de ``dias`` em lotes de
+        ``lote`` linhas, com um commit por lote. Nao lidas ficam (o contador
+        continua certo). Retorna o total apagado.
+        """
+
+        dias = dias or current_app.config.get("NOTIFICACAO_RETENCAO_DIAS", 90)
+        lote = lote or current_app.config.get("NOTIFICACAO_RETENCAO_LOTE", 1000)
+        limite = (agora or datetime.utcnow()) - timedelta(days=dias)
+
+        total = 0
+
+        while True:
+
+            ids = db.session.execute(
+                select(Notificacao.id).where(
+                    Notificacao.lida.is_(True),
+                    Notificacao.criada_em < limite
+                ).order_by(Notificacao.criada_em.asc()).limit(lote)
+            ).scalars().all()
+
+            if not ids:
+                break
+
+            db.session.execute(delete(Notificacao).where(Notificacao.id.in_(ids)))
+            db.session.commit()
+            total += len(ids)
+
+            if len(ids) < lote:
+                break
+
+        return total
 
     # --------------------------------------------------
     # LIMPAR TOKENS INVÁLIDOS
@@ -131,8 +300,9 @@ class NotificationManager:
     @staticmethod
     def limpar_tokens_inativos():
 
-        PushToken.query.filter_by(
+        removidos = PushToken.query.filter_by(
             ativo=False
         ).delete()
 
         db.session.commit()
+        return removidos
@@ -1,7 +1,8 @@
-from datetime import datetime
+from collections import defaultdict
+from datetime import datetime, timedelta
 import uuid
 
-from flask import url_for
+from flask import current_app, url_for
 from sqlalchemy.exc import SQLAlchemyError
 
 from models import (
@@ -11,8 +12,8 @@ from models import (
     Missa,
     db,
 )
-from services.disponibilidade_service import esta_indisponivel
-from services.firebase_service import enviar_push
+from services.disponibilidade_service import AvailabilityIndex, esta_indisponivel
+from services.notificacao_outbox_service import enfileirar_push
 from services.notificacao_service import notificar_escala_criada
 from services.whatsapp_service import gerar_link_whatsapp_telefone, montar_mensagem_substituicao
 
@@ -24,6 +25,19 @@ def excluir_pedidos_substituicao_da_escala(escala_id, id_paroquia):
     ).delete()
 
 
+def cancelar_pedidos_abertos_das_escalas(escala_ids):
+    """Cancela os pedidos abertos de escalas que trocaram de ministro. Nao faz commit."""
+    if not escala_ids:
+        return 0
+    return PedidoSubstituicao.query.filter(
+        PedidoSubstituicao.id_escala.in_(escala_ids),
+        PedidoSubstituicao.status == "aberto",
+    ).update(
+        {"status": "cancelado", "respondido_em": datetime.utcnow()},
+        synchronize_session="fetch",
+    )
+
+
 def _tem_conflito(ministro_id, missa, id_paroquia, ignorar_escala_id=None):
     query = db.session.query(Escala).join(Missa).filter(
         Escala.id_ministro == ministro_id,
@@ -33,44 +47,86 @@ def _tem_conflito(ministro_id, missa, id_paroquia, ignorar_escala_id=None):
     if ignorar_escala_id:
         query = query.filter(Escala.id != ignorar_escala_id)
     return query.first() is not None
-def _elegiveis_para_substituicao(escala):
 
-    missa = escala.missa
 
-    ministros = Ministro.query.filter_by(
-        id_paroquia=escala.id_paroquia,
-        comunidade=missa.comunidade,   # 🔥 FILTRO NOVO
-        pode_logar=True
-    ).all()
+class ElegibilidadeSubstituicao:
+    """
+    Elegiveis para substituir varias escalas de uma paroquia em uma passada.
+
+    Carrega de uma vez os ministros das comunidades das missas, as escalas da
+    paroquia nos dias dessas missas (conflitos) e um ``AvailabilityIndex`` do
+    periodo. ``registrar`` atualiza os conflitos quando uma escala troca de
+    ministro, para o mesmo substituto nao ser usado duas vezes no mesmo dia.
+    """
+
+    def __init__(self, id_paroquia):
+        self.id_paroquia = id_paroquia
+        self._ministros = defaultdict(list)
+        self._ocupados = defaultdict(set)
+        self._indice = AvailabilityIndex(id_paroquia)
+
+    @classmethod
+    def carregar(cls, id_paroquia, escalas):
+        elegibilidade = cls(id_paroquia)
+        missas = [escala.missa for escala in escalas if escala.missa is not None]
+        if not missas:
+            return elegibilidade
+
+        for ministro in Ministro.query.filter(
+            Ministro.id_paroquia == id_paroquia,
+            Ministro.comunidade.in_({missa.comunidade for missa in missas}),
+            Ministro.pode_logar.is_(True),
+        ).order_by(Ministro.id.asc()):
+            elegibilidade._ministros[ministro.comunidade].append(ministro)
+
+        datas = {missa.data for missa in missas}
+        for escala_id, id_ministro, data in db.session.query(
+            Escala.id, Escala.id_ministro, Missa.data
+        ).join(Missa, Missa.id == Escala.id_missa).filter(
+            Escala.id_paroquia == id_paroquia,
+            Missa.data.in_(datas),
+        ):
+            elegibilidade._ocupados[(id_ministro, data)].add(escala_id)
 
-    elegiveis = []
+        elegibilidade._indice = AvailabilityIndex.carregar(
+            id_paroquia,
+            data_inicio=min(datas),
+            data_fim=max(datas),
+            ministro_ids={m.id for ministros in elegibilidade._ministros.values() for m in ministros},
+        )
+        return elegibilidade
 
-    for ministro in ministros:
+    def elegiveis(self, escala):
+        missa = escala.missa
+        elegiveis = []
 
-        # não pode ser o mesmo ministro
-        if ministro.id == escala.id_ministro:
-            continue
+        for ministro in self._ministros.get(missa.comunidade, ()):
 
-        # conflito de escala no mesmo dia
-        if _tem_conflito(
-            ministro_id=ministro.id,
-            missa=missa,
-            id_paroquia=escala.id_paroquia,
-            ignorar_escala_id=escala.id
-        ):
-            continue
+            # não pode ser o mesmo ministro
+            if ministro.id == escala.id_ministro:
+                continue
 
-        # indisponibilidade
-        if esta_indisponivel(
-            ministro.id,
-            missa,
-            escala.id_paroquia
-        ):
-            continue
+            # conflito de escala no mesmo dia
+            if self._ocupados.get((ministro.id, missa.data), set()) - {escala.id}:
+                continue
+
+            # indisponibilidade
+            if self._indice.esta_indisponivel(ministro.id, missa):
+                continue
+
+            elegiveis.append(ministro)
+
+        return elegiveis
 
-        elegiveis.append(ministro)
+    def registrar(self, escala, id_ministro):
+        data = escala.missa.data
+        self._ocupados[(escala.id_ministro, data)].discard(escala.id)
+        self._ocupados[(id_ministro, data)].add(escala.id)
+
+
+def _elegiveis_para_substituicao(escala):
+    return ElegibilidadeSubstituicao.carregar(escala.id_paroquia, [escala]).elegiveis(escala)
 
-    return elegiveis
 
 def criar_pedido_substituicao(escala):
     pedido_aberto = PedidoSubstituicao.query.filter_by(
@@ -87,6 +143,9 @@ def criar_pedido_substituicao(escala):
         id_paroquia=escala.id_paroquia,
         id_ministro_solicitante=escala.id_ministro,
         status="aberto",
+        vence_em=datetime.utcnow() + timedelta(
+            minutes=current_app.config.get("SUBSTITUICAO_AUTOMATICA_MINUTOS", 10)
+        ),
     )
     db.session.add(pedido)
     db.session.commit()
@@ -114,11 +173,12 @@ def criar_pedido_substituicao(escala):
         )
 
         if ministro.firebase_token:
-            enviar_push(
+            enfileirar_push(
                 ministro.firebase_token,
                 "Pedido de Substituicao",
                 mensagem,
                 url=link,
+                usuario_id=ministro.id,
             )
             enviados += 1
 
@@ -129,6 +189,7 @@ def criar_pedido_substituicao(escala):
                 "link": gerar_link_whatsapp_telefone(ministro.telefone, mensagem),
             })
 
+    db.session.commit()
     return pedido, enviados, links_whatsapp
 
 
@@ -178,12 +239,13 @@ def aceitar_substituicao(pedido_token, ministro_token_publico):
         pedido.status = "aceito"
         pedido.respondido_em = datetime.utcnow()
 
+        escala.missa.escala_ref = escala
+        notificar_escala_criada(ministro, escala.missa)
+
         db.session.commit()
     except SQLAlchemyError:
         db.session.rollback()
         return False, "Falha ao aceitar substituicao."
 
-    escala.missa.escala_ref = escala
-    notificar_escala_criada(ministro, escala.missa)
     return True, "Substituicao aceita com sucesso."
 
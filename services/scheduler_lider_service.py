@@ -0,0 +1,214 @@
+"""
+Eleicao do processo que roda o scheduler.
+
+Cada worker do gunicorn chama ``create_app``; sem coordenacao, todos subiam
+um ``BackgroundScheduler`` e os jobs rodavam uma vez por worker. Aqui cada
+processo e candidato: quem consegue a trava vira lider e inicia os jobs, os
+demais tentam de novo a cada ``SCHEDULER_LIDER_INTERVALO`` segundos.
+
+No Postgres a trava e um ``pg_try_advisory_lock`` em uma conexao propria,
+fora do pool; se o processo morre a conexao cai e o banco solta a trava. No
+SQLite (desenvolvimento e testes) e um ``flock`` em um arquivo, que o sistema
+operacional solta quando o processo termina.
+"""
+import atexit
+import logging
+import os
+import threading
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+logger = logging.getLogger(__name__)
+
+
+class TravaAdvisoryPostgres:
+    def __init__(self, url, chave, connect_args=None):
+        self.chave = chave
+        self._engine = create_engine(url, poolclass=NullPool, connect_args=connect_args or {})
+        self._conexao = None
+
+    def tentar(self):
+        conexao = self._engine.connect()
+        try:
+            obtida = conexao.execute(
+                text("SELECT pg_try_advisory_lock(:chave)"), {"chave": self.chave}
+            ).scalar()
+            conexao.commit()
+        except Exception:
+            conexao.close()
+            raise
+
+        if not obtida:
+            conexao.close()
+            return False
+
+        self._conexao = conexao
+        return True
+
+    def ativa(self):
+        if self._conexao is None:
+            return False
+        try:
+            self._conexao.execute(text("SELECT 1"))
+            self._conexao.commit()
+            return True
+        except Exception:
+            logger.warning("Conexao da trava do scheduler perdida", exc_info=True)
+            self._fechar()
+            return False
+
+    def liberar(self):
+        if self._conexao is None:
+            return
+        try:
+            self._conexao.execute(text("SELECT pg_advisory_unlock(:chave)"), {"chave": self.chave})
+            self._conexao.commit()
+        except Exception:
+            logger.warning("Falha ao liberar a trava do scheduler", exc_info=True)
+        self._fechar()
+
+    def _fechar(self):
+        try:
+            self._conexao.close()
+        except Exception:
+            pass
+        self._conexao = None
+
+
+class TravaArquivo:
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._arquivo = None
+
+    def tentar(self):
+        if fcntl is None:
+            return True
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.caminho)), exist_ok=True)
+        arquivo = open(self.caminho, "a+")
+        try:
+            fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            arquivo.close()
+            return False
+
+        arquivo.seek(0)
+        arquivo.truncate()
+        arquivo.write(str(os.getpid()))
+        arquivo.flush()
+        self._arquivo = arquivo
+        return True
+
+    def ativa(self):
+        return fcntl is None or self._arquivo is not None
+
+    def liberar(self):
+        if self._arquivo is None:
+            return
+        try:
+            fcntl.flock(self._arquivo.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._arquivo.close()
+            self._arquivo = None
+
+
+def criar_trava(app):
+    uri = app.config["SQLALCHEMY_DATABASE_URI"]
+    if uri.startswith(("postgresql://", "postgresql+")):
+        opcoes = app.config.get("SQLALCHEMY_ENGINE_OPTIONS") or {}
+        return TravaAdvisoryPostgres(
+            uri,
+            app.config.get("SCHEDULER_LIDER_CHAVE", 1397180741),
+            connect_args=opcoes.get("connect_args"),
+        )
+
+    caminho = app.config.get("SCHEDULER_LOCK_ARQUIVO") or os.path.join(app.instance_path, "scheduler.lock")
+    return TravaArquivo(caminho)
+
+
+def parar_scheduler(scheduler):
+    scheduler.remove_all_jobs()
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
+
+
+class EleicaoScheduler:
+    """
+    Mantem o scheduler rodando em exatamente um processo.
+
+    ``iniciar`` e chamado ao assumir a lideranca e ``parar`` ao perde-la
+    (conexao da trava caiu). ``verificar`` faz uma rodada; ``iniciar_thread``
+    repete as rodadas em uma thread daemon.
+    """
+
+    def __init__(self, trava, iniciar, parar, intervalo=30):
+        self.trava = trava
+        self.iniciar = iniciar
+        self.parar = parar
+        self.intervalo = intervalo
+        self.lider = False
+        self._encerrar = threading.Event()
+        self._thread = None
+
+    def verificar(self):
+        if self.lider:
+            if self.trava.ativa():
+                return True
+            logger.warning("Lideranca do scheduler perdida (pid=%s); parando jobs", os.getpid())
+            self.lider = False
+            self.parar()
+            return False
+
+        try:
+            obtida = self.trava.tentar()
+        except Exception:
+            logger.exception("Erro ao disputar a lideranca do scheduler")
+            return False
+
+        if obtida:
+            logger.info("Processo pid=%s assumiu o scheduler", os.getpid())
+            self.lider = True
+            try:
+                self.iniciar()
+            except Exception:
+                logger.exception("Erro ao iniciar o scheduler; liberando a lideranca")
+                self.lider = False
+                self.trava.liberar()
+        return self.lider
+
+    def _executar(self):
+        while not self._encerrar.wait(self.intervalo):
+            self.verificar()
+
+    def iniciar_thread(self):
+        self.verificar()
+        self._thread = threading.Thread(target=self._executar, name="scheduler-lider", daemon=True)
+        self._thread.start()
+        atexit.register(self.encerrar)
+        return self
+
+    def encerrar(self):
+        self._encerrar.set()
+        if self.lider:
+            self.lider = False
+            self.parar()
+            self.trava.liberar()
+
+
+def iniciar_scheduler_com_lider(scheduler, app, registrar):
+    """Disputa a lideranca e, quando lider, chama ``registrar(scheduler, app)``."""
+    eleicao = EleicaoScheduler(
+        criar_trava(app),
+        iniciar=lambda: registrar(scheduler, app),
+        parar=lambda: parar_scheduler(scheduler),
+        intervalo=app.config.get("SCHEDULER_LIDER_INTERVALO", 30),
+    )
+    app.extensions["scheduler_lider"] = eleicao
+    return eleicao.iniciar_thread()
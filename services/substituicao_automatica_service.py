@@ -1,58 +1,123 @@
+"""
+Substituicao automatica de pedidos nao atendidos.
+
+Cada ``PedidoSubstituicao`` nasce com ``vence_em`` (criacao mais
+``SUBSTITUICAO_AUTOMATICA_MINUTOS``). ``processar_substituicoes_vencidas`` le
+so os pedidos abertos vencidos pelo indice ``(status, vence_em)``, calcula
+os elegiveis de todos os pedidos de uma paroquia com uma
+``ElegibilidadeSubstituicao`` e faz um commit por lote. Pedido sem elegivel
+volta para a fila com ``SUBSTITUICAO_AUTOMATICA_RETENTATIVA_MINUTOS``.
+"""
+from collections import defaultdict
 from datetime import datetime, timedelta
 
+from flask import current_app
+
 from models import PedidoSubstituicao, Escala, db
-from services.pedido_substituicao_service import _elegiveis_para_substituicao
-from services.firebase_service import enviar_push
-from services.notificacao_service import notificar_escala_criada
+from services.pedido_substituicao_service import ElegibilidadeSubstituicao
+from services.notificacao_outbox_service import enfileirar_push
+from services.notificacao_service import notificar_alteracoes_escala
+
 
+def _cfg(chave, padrao):
+    return current_app.config.get(chave, padrao)
 
-def verificar_substituicoes_automaticas():
 
-    limite = datetime.utcnow() - timedelta(minutes=10)
+def processar_substituicoes_vencidas(agora=None, limite=None):
+    """
+    Aplica a substituicao automatica em um lote de pedidos vencidos.
+
+    Retorna ``{"lidos", "substituidos", "sem_elegiveis", "cancelados"}``.
+    """
+    agora = agora or datetime.utcnow()
+    limite = limite or _cfg("SUBSTITUICAO_AUTOMATICA_LOTE", 200)
+    retentativa = timedelta(minutes=_cfg("SUBSTITUICAO_AUTOMATICA_RETENTATIVA_MINUTOS", 30))
+    resultado = {"lidos": 0, "substituidos": 0, "sem_elegiveis": 0, "cancelados": 0}
 
     pedidos = PedidoSubstituicao.query.filter(
         PedidoSubstituicao.status == "aberto",
-        PedidoSubstituicao.criado_em <= limite
-    ).all()
-
+        PedidoSubstituicao.vence_em <= agora,
+    ).order_by(
+        PedidoSubstituicao.vence_em.asc(),
+        PedidoSubstituicao.id.asc(),
+    ).limit(limite).with_for_update(skip_locked=True).all()
+
+    resultado["lidos"] = len(pedidos)
+    if not pedidos:
+        return resultado
+
+    escalas = {
+        escala.id: escala
+        for escala in Escala.query.filter(Escala.id.in_({p.id_escala for p in pedidos}))
+    }
+
+    por_paroquia = defaultdict(list)
     for pedido in pedidos:
-
-        escala = db.session.get(Escala, pedido.id_escala)
-
-        if not escala:
+        escala = escalas.get(pedido.id_escala)
+        if not escala or escala.missa is None:
             pedido.status = "cancelado"
+            resultado["cancelados"] += 1
             continue
+        por_paroquia[escala.id_paroquia].append((pedido, escala))
 
-        # verifica elegíveis
-        candidatos = _elegiveis_para_substituicao(escala)
+    criadas = []
+    for id_paroquia, itens in por_paroquia.items():
+        elegibilidade = ElegibilidadeSubstituicao.carregar(id_paroquia, [escala for _, escala in itens])
 
-        if not candidatos:
-            continue
+        for pedido, escala in itens:
+
+            # verifica elegíveis
+            candidatos = elegibilidade.elegiveis(escala)
+
+            if not candidatos:
+                pedido.vence_em = agora + retentativa
+                resultado["sem_elegiveis"] += 1
+                continue
+
+            substituto = candidatos[0]
+
+            # aplica substituição
+            elegibilidade.registrar(escala, substituto.id)
+            escala.id_ministro = substituto.id
+            escala.confirmado = False
+            escala.presente = False
+
+            pedido.status = "automatico"
+            pedido.id_ministro_aceite = substituto.id
+            pedido.respondido_em = agora
+
+            # push (outbox, no mesmo commit da substituicao)
+            if substituto.firebase_token:
+
+                enfileirar_push(
+                    substituto.firebase_token,
+                    "Substituição automática",
+                    f"Você foi escalado automaticamente para "
+                    f"{escala.missa.data.strftime('%d/%m')} "
+                    f"às {escala.missa.horario}",
+                    usuario_id=substituto.id,
+                )
 
-        substituto = candidatos[0]
+            criadas.append((escala.missa, substituto, escala))
+            resultado["substituidos"] += 1
 
-        # aplica substituição
-        escala.id_ministro = substituto.id
-        escala.confirmado = False
-        escala.presente = False
+    # notificação interna, agrupada por ministro
+    if criadas:
+        notificar_alteracoes_escala(criadas, [])
 
-        pedido.status = "automatico"
-        pedido.id_ministro_aceite = substituto.id
-        pedido.respondido_em = datetime.utcnow()
+    db.session.commit()
+    return resultado
 
-        # commit
-        db.session.commit()
 
-        # push
-        if substituto.firebase_token:
+def verificar_substituicoes_automaticas(max_lotes=20):
+    limite = _cfg("SUBSTITUICAO_AUTOMATICA_LOTE", 200)
+    total = {"lidos": 0, "substituidos": 0, "sem_elegiveis": 0, "cancelados": 0}
 
-            enviar_push(
-                substituto.firebase_token,
-                "Substituição automática",
-                f"Você foi escalado automaticamente para "
-                f"{escala.missa.data.strftime('%d/%m')} "
-                f"às {escala.missa.horario}"
-            )
+    for _ in range(max_lotes):
+        resultado = processar_substituicoes_vencidas(limite=limite)
+        for chave, valor in resultado.items():
+            total[chave] += valor
+        if resultado["lidos"] < limite:
+            break
 
-        # notificação interna
-        notificar_escala_criada(substituto, escala.missa)
\ No newline at end of file
+    return total
@@ -4,8 +4,8 @@ from datetime import date, datetime
 from flask import url_for
 
 from models import Escala, Ministro, Missa, Substituicao, db
-from services.disponibilidade_service import esta_indisponivel
-from services.firebase_service import enviar_push
+from services.disponibilidade_service import AvailabilityIndex, esta_indisponivel
+from services.notificacao_outbox_service import enfileirar_push
 from services.notificacao_service import notificar_escala_criada
 from services.whatsapp_service import (
     gerar_link_whatsapp_telefone,
@@ -106,6 +106,13 @@ def buscar_ministros_disponiveis(missa, ministro_original_id):
         pode_logar=True,
     ).order_by(Ministro.nome.asc()).all()
 
+    indice = AvailabilityIndex.carregar(
+        missa.id_paroquia,
+        data_inicio=missa.data,
+        data_fim=missa.data,
+        ministro_ids=[m.id for m in ministros],
+    )
+
     disponiveis = []
     for ministro in ministros:
         if ministro.id == ministro_original_id:
@@ -114,7 +121,7 @@ def buscar_ministros_disponiveis(missa, ministro_original_id):
             continue
         if _tem_conflito_no_dia(ministro.id, missa):
             continue
-        if esta_indisponivel(ministro.id, missa, missa.id_paroquia):
+        if indice.esta_indisponivel(ministro.id, missa):
             continue
 
         pendencia = pendencias_por_ministro.get(ministro.id)
@@ -165,6 +172,11 @@ def buscar_ministros_troca(missa, ministro_original_id):
         Ministro.nome.asc(),
     ).all()
 
+    indice = AvailabilityIndex.carregar(
+        missa.id_paroquia,
+        data_inicio=min(date.today(), missa.data),
+    )
+
     trocas = []
     for escala_candidata in escalas_candidatas:
         ministro_candidato = escala_candidata.ministro
@@ -177,11 +189,11 @@ def buscar_ministros_troca(missa, ministro_original_id):
             continue
         if _tem_conflito_no_dia(ministro_original_id, missa_candidata, ignorar_escala_id=escala_original.id):
             continue
-        if esta_indisponivel(ministro_original_id, missa_candidata, missa.id_paroquia):
+        if indice.esta_indisponivel(ministro_original_id, missa_candidata):
             continue
         if _tem_conflito_no_dia(ministro_candidato.id, missa, ignorar_escala_id=escala_candidata.id):
             continue
-        if esta_indisponivel(ministro_candidato.id, missa, missa.id_paroquia):
+        if indice.esta_indisponivel(ministro_candidato.id, missa):
             continue
 
         pendencia = pendencias_por_missa.get((missa_candidata.id, ministro_candidato.id))
@@ -254,12 +266,14 @@ def solicitar_substituicao(missa, ministro_original, ministro_substituto):
     )
 
     if ministro_substituto.firebase_token:
-        enviar_push(
+        enfileirar_push(
             ministro_substituto.firebase_token,
             "Convite de Substituicao",
             mensagem,
             url=painel_url,
+            usuario_id=ministro_substituto.id,
         )
+        db.session.commit()
 
     whatsapp_link = gerar_link_whatsapp_telefone(
         ministro_substituto.telefone,
@@ -320,12 +334,14 @@ def solicitar_troca(missa, ministro_original, missa_troca, ministro_troca):
     )
 
     if ministro_troca.firebase_token:
-        enviar_push(
+        enfileirar_push(
             ministro_troca.firebase_token,
             "Convite de Troca",
             mensagem,
             url=painel_url,
+            usuario_id=ministro_troca.id,
         )
+        db.session.commit()
 
     whatsapp_link = gerar_link_whatsapp_telefone(
         ministro_troca.telefone,
@@ -403,14 +419,13 @@ def _processar_resposta_troca(substituicao, acao):
     substituicao.status = "confirmado"
     substituicao.data_resposta = datetime.utcnow()
     _cancelar_outras_pendencias(substituicao)
-    db.session.commit()
 
-    escala_origem.missa.escala_ref = escala_origem
-    escala_troca.missa.escala_ref = escala_troca
-    if escala_origem.ministro:
-        notificar_escala_criada(escala_origem.ministro, escala_origem.missa)
-    if escala_troca.ministro:
-        notificar_escala_criada(escala_troca.ministro, escala_troca.missa)
+    for escala in (escala_origem, escala_troca):
+        ministro = db.session.get(Ministro, escala.id_ministro)
+        if ministro:
+            escala.missa.escala_ref = escala
+            notificar_escala_criada(ministro, escala.missa)
+    db.session.commit()
 
     return True, (
         "Troca efetuada com sucesso. "
@@ -464,11 +479,12 @@ def processar_resposta_substituicao(substituicao, acao):
     substituicao.status = "confirmado"
     substituicao.data_resposta = datetime.utcnow()
     _cancelar_outras_pendencias(substituicao)
-    db.session.commit()
 
-    escala.missa.escala_ref = escala
-    if escala.ministro:
-        notificar_escala_criada(escala.ministro, escala.missa)
+    ministro = db.session.get(Ministro, escala.id_ministro)
+    if ministro:
+        escala.missa.escala_ref = escala
+        notificar_escala_criada(ministro, escala.missa)
+    db.session.commit()
 
     return True, (
         "Substituicao efetuada com sucesso. "
@@ -82,10 +82,10 @@ def substituir_ministro(escala):
     )
 
     db.session.add(nova)
-    db.session.commit()
 
     missa.escala_ref = nova
     notificar_escala_criada(escolhido, missa)
+    db.session.commit()
 
     return True
 
@@ -1,15 +1,19 @@
 import logging
 import os
 import re
+import threading
+import time
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
 from collections import defaultdict
 from datetime import date, datetime, timedelta
 from zoneinfo import ZoneInfo
 
 import requests
+import requests.adapters
 from flask import current_app, has_app_context
-from sqlalchemy import or_
+from sqlalchemy import or_, update
 from sqlalchemy.exc import SQLAlchemyError
 
 from extensions import db
@@ -208,10 +212,72 @@ def normalizar_numero_whatsapp(numero, codigo_pais="55"):
     return apenas_digitos
 
 
-def _whatsapp_request_payload(numero_formatado, payload):
-    token = _get_config_value("WHATSAPP_TOKEN")
-    phone_number_id = _get_config_value("PHONE_NUMBER_ID")
-    graph_version = _get_config_value("WHATSAPP_GRAPH_VERSION", "v19.0")
+_sessao_http = None
+_sessao_http_tamanho = 0
+_sessao_http_lock = threading.Lock()
+
+
+def _sessao_whatsapp(tamanho=None):
+    """
+    Session HTTP compartilhada, com pool do tamanho da concorrencia de envio.
+
+    O envio em lote passa ``tamanho`` antes de abrir as threads, na thread
+    com app context; as threads de envio so reaproveitam a session. Um
+    ``tamanho`` maior que o pool atual cria uma session nova.
+    """
+    global _sessao_http, _sessao_http_tamanho
+    if _sessao_http is not None and (tamanho is None or tamanho <= _sessao_http_tamanho):
+        return _sessao_http
+
+    with _sessao_http_lock:
+        if _sessao_http is None or (tamanho is not None and tamanho > _sessao_http_tamanho):
+            if tamanho is None:
+                tamanho = max(int(_get_config_value("WHATSAPP_CONCORRENCIA", 4) or 1), 1)
+            sessao = requests.Session()
+            adaptador = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=tamanho)
+            sessao.mount("https://", adaptador)
+            _sessao_http = sessao
+            _sessao_http_tamanho = tamanho
+    return _sessao_http
+
+
+def _config_envio_whatsapp():
+    # Lido na thread da requisicao/job: as threads de envio nao tem app context.
+    return {
+        "token": _get_config_value("WHATSAPP_TOKEN"),
+        "phone_number_id": _get_config_value("PHONE_NUMBER_ID"),
+        "graph_version": _get_config_value("WHATSAPP_GRAPH_VERSION", "v19.0"),
+        "timeout": (
+            float(_get_config_value("WHATSAPP_TIMEOUT_CONEXAO", 5)),
+            float(_get_config_value("WHATSAPP_TIMEOUT_LEITURA", 15)),
+        ),
+    }
+
+
+class LimitadorTaxa:
+    """Libera no maximo ``por_segundo`` chamadas por segundo entre threads."""
+
+    def __init__(self, por_segundo):
+        self.intervalo = 1.0 / por_segundo if por_segundo and por_segundo > 0 else 0.0
+        self._proximo = 0.0
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        if not self.intervalo:
+            return
+        with self._lock:
+            agora = time.monotonic()
+            vez = max(self._proximo, agora)
+            self._proximo = vez + self.intervalo
+        if vez > agora:
+            time.sleep(vez - agora)
+
+
+def _whatsapp_request_payload(numero_formatado, payload, config=None):
+    config = config or _config_envio_whatsapp()
+    token = config["token"]
+    phone_number_id = config["phone_number_id"]
+    graph_version = config["graph_version"]
 
     if not token or not phone_number_id:
         logger.warning("WhatsApp não configurado — envio ignorado")
@@ -228,7 +294,7 @@ def _whatsapp_request_payload(numero_formatado, payload):
         "Content-Type": "application/json",
     }
 
-    response = requests.post(url, headers=headers, json=payload, timeout=30)
+    response = _sessao_whatsapp().post(url, headers=headers, json=payload, timeout=config["timeout"])
     logger.info(
         "Resposta WhatsApp Cloud API. numero=%s status=%s tipo=%s",
         numero_formatado,
@@ -258,12 +324,15 @@ def _whatsapp_request_payload(numero_formatado, payload):
     }
 
 
-def enviar_whatsapp_cloud(numero, mensagem):
+def _numero_envio(numero):
     numero_formatado = normalizar_numero_whatsapp(numero)
     if not numero_formatado:
         raise ValueError("Numero de telefone invalido para envio via WhatsApp.")
+    return numero_formatado
 
-    payload = {
+
+def montar_payload_texto(numero_formatado, mensagem):
+    return {
         "messaging_product": "whatsapp",
         "to": numero_formatado,
         "type": "text",
@@ -272,7 +341,11 @@ def enviar_whatsapp_cloud(numero, mensagem):
             "body": mensagem,
         },
     }
-    return _whatsapp_request_payload(numero_formatado, payload)
+
+
+def enviar_whatsapp_cloud(numero, mensagem):
+    numero_formatado = _numero_envio(numero)
+    return _whatsapp_request_payload(numero_formatado, montar_payload_texto(numero_formatado, mensagem))
 
 
 def _template_body_component(parametros):
@@ -298,10 +371,7 @@ def montar_parametros_template_lembrete(ministro, escalas):
     return [nome, data_label, resumo[:1024] or "Escala disponivel", link]
 
 
-def enviar_whatsapp_cloud_template(numero, template_name, parametros=None, language=None):
-    numero_formatado = normalizar_numero_whatsapp(numero)
-    if not numero_formatado:
-        raise ValueError("Numero de telefone invalido para envio via WhatsApp.")
+def montar_payload_template(numero_formatado, template_name, parametros=None, language=None):
     if not template_name:
         raise ValueError("Template do WhatsApp nao configurado.")
 
@@ -331,41 +401,68 @@ def enviar_whatsapp_cloud_template(numero, template_name, parametros=None, langu
     if componentes:
         payload["template"]["components"] = componentes
 
+    return payload
+
+
+def enviar_whatsapp_cloud_template(numero, template_name, parametros=None, language=None):
+    numero_formatado = _numero_envio(numero)
+    payload = montar_payload_template(numero_formatado, template_name, parametros=parametros, language=language)
     return _whatsapp_request_payload(numero_formatado, payload)
 
 
-def enviar_whatsapp_lembrete(ministro, escalas):
+def _paroquia_das_escalas(escalas):
+    if not escalas:
+        return None
+    primeira_escala = escalas[0]
+    id_paroquia = getattr(primeira_escala, "id_paroquia", None)
+    if id_paroquia is None and getattr(primeira_escala, "missa", None):
+        id_paroquia = getattr(primeira_escala.missa, "id_paroquia", None)
+    return id_paroquia
+
+
+def preparar_lembrete_whatsapp(ministro, escalas, observacoes_ativas=None):
+    """
+    Monta o envio do lembrete sem chamar a API.
+
+    Retorna ``(numero_formatado, payload, extras)``; ``extras`` sao as chaves
+    acrescentadas a resposta (``modo``, ``template_name``...). Toda leitura
+    de banco e de config acontece aqui, na thread que chama.
+    """
     modo = (_get_config_value("WHATSAPP_SEND_MODE", "template") or "template").strip().lower()
     template_name = (_get_config_value("WHATSAPP_TEMPLATE_NAME") or "").strip()
-    id_paroquia = None
-    if escalas:
-        primeira_escala = escalas[0]
-        id_paroquia = getattr(primeira_escala, "id_paroquia", None)
-        if id_paroquia is None and getattr(primeira_escala, "missa", None):
-            id_paroquia = getattr(primeira_escala.missa, "id_paroquia", None)
 
-    observacoes_ativas = listar_textos_observacoes_ativas(id_paroquia=id_paroquia)
+    if observacoes_ativas is None:
+        observacoes_ativas = listar_textos_observacoes_ativas(id_paroquia=_paroquia_das_escalas(escalas))
+
+    numero_formatado = _numero_envio(ministro.telefone)
 
     if modo == "template" and not observacoes_ativas:
         if not template_name:
             raise RuntimeError("WHATSAPP_TEMPLATE_NAME nao configurado para envio automatico por template.")
         parametros = montar_parametros_template_lembrete(ministro, escalas)
-        resposta = enviar_whatsapp_cloud_template(
-            ministro.telefone,
+        payload = montar_payload_template(
+            numero_formatado,
             template_name=template_name,
             parametros=parametros,
             language=_get_config_value("WHATSAPP_TEMPLATE_LANGUAGE", "pt_BR"),
         )
-        resposta["modo"] = "template"
-        resposta["template_name"] = template_name
-        resposta["parametros_template"] = deepcopy(parametros)
-        return resposta
+        return numero_formatado, payload, {
+            "modo": "template",
+            "template_name": template_name,
+            "parametros_template": deepcopy(parametros),
+        }
 
     mensagem = montar_mensagem_unificada(ministro, escalas)
-    resposta = enviar_whatsapp_cloud(ministro.telefone, mensagem)
-    resposta["modo"] = "text"
+    extras = {"modo": "text"}
     if observacoes_ativas:
-        resposta["observacoes_aplicadas"] = len(observacoes_ativas)
+        extras["observacoes_aplicadas"] = len(observacoes_ativas)
+    return numero_formatado, montar_payload_texto(numero_formatado, mensagem), extras
+
+
+def enviar_whatsapp_lembrete(ministro, escalas):
+    numero_formatado, payload, extras = preparar_lembrete_whatsapp(ministro, escalas)
+    resposta = _whatsapp_request_payload(numero_formatado, payload)
+    resposta.update(extras)
     return resposta
 
 
@@ -401,7 +498,55 @@ def agrupar_escalas_por_ministro(escalas):
     return ministros
 
 
+def _detalhe_erro_api(ministro):
+    return {
+        "ministro_id": ministro.id,
+        "nome": ministro.nome,
+        "numero": ministro.telefone,
+        "status": "erro_api",
+    }
+
+
+def _enviar_lotes_whatsapp(envios, config):
+    """
+    Envia ``[(numero, payload), ...]`` com ate ``WHATSAPP_CONCORRENCIA``
+    chamadas simultaneas e no maximo ``WHATSAPP_MENSAGENS_POR_SEGUNDO``.
+
+    Retorna, na mesma ordem, a resposta da API ou a excecao levantada.
+    """
+    if not envios:
+        return []
+
+    concorrencia = max(int(_get_config_value("WHATSAPP_CONCORRENCIA", 4) or 1), 1)
+    limitador = LimitadorTaxa(float(_get_config_value("WHATSAPP_MENSAGENS_POR_SEGUNDO", 20) or 0))
+    # Criada aqui, com a config do app; as threads de envio nao tem app context.
+    _sessao_whatsapp(concorrencia)
+
+    def enviar(envio):
+        numero_formatado, payload = envio
+        limitador.aguardar()
+        try:
+            return _whatsapp_request_payload(numero_formatado, payload, config=config)
+        except Exception as exc:
+            return exc
+
+    if concorrencia == 1 or len(envios) == 1:
+        return [enviar(envio) for envio in envios]
+
+    with ThreadPoolExecutor(max_workers=min(concorrencia, len(envios))) as executor:
+        return list(executor.map(enviar, envios))
+
+
 def enviar_lembretes_whatsapp(data_alvo=None, id_paroquia=None, forcar_envio=False):
+    """
+    Envia o lembrete do dia ``data_alvo`` (amanha, por padrao) a cada
+    ministro escalado.
+
+    As mensagens sao montadas antes, na thread atual; depois saem em paralelo
+    pela session compartilhada, respeitando o limite de mensagens por segundo.
+    ``notificacao_enviada`` e marcado em um UPDATE para todas as escalas
+    enviadas, com um commit.
+    """
     if data_alvo is None:
         data_alvo = _hoje_local() + timedelta(days=1)
 
@@ -422,6 +567,10 @@ def enviar_lembretes_whatsapp(data_alvo=None, id_paroquia=None, forcar_envio=Fal
         "detalhes": [],
     }
 
+    # Um item por ministro, na ordem original; "detalhe" fica None ate o envio.
+    itens = []
+    observacoes_por_paroquia = {}
+
     for lista_escalas in escalas_por_ministro.values():
         ministro = lista_escalas[0].ministro
 
@@ -432,11 +581,11 @@ def enviar_lembretes_whatsapp(data_alvo=None, id_paroquia=None, forcar_envio=Fal
                 ministro.nome,
             )
             resultado["ministros_sem_telefone"] += 1
-            resultado["detalhes"].append({
+            itens.append({"detalhe": {
                 "ministro_id": ministro.id,
                 "nome": ministro.nome,
                 "status": "sem_telefone",
-            })
+            }})
             continue
 
         pendentes = [
@@ -447,62 +596,113 @@ def enviar_lembretes_whatsapp(data_alvo=None, id_paroquia=None, forcar_envio=Fal
             continue
 
         try:
-            resposta_api = enviar_whatsapp_lembrete(ministro, pendentes)
+            id_paroquia_escala = _paroquia_das_escalas(pendentes)
+            if id_paroquia_escala not in observacoes_por_paroquia:
+                observacoes_por_paroquia[id_paroquia_escala] = listar_textos_observacoes_ativas(
+                    id_paroquia=id_paroquia_escala
+                )
+            numero_formatado, payload, extras = preparar_lembrete_whatsapp(
+                ministro,
+                pendentes,
+                observacoes_ativas=observacoes_por_paroquia[id_paroquia_escala],
+            )
         except Exception:
             logger.exception(
-                "Falha no envio do WhatsApp. ministro_id=%s nome=%s telefone=%s",
+                "Falha ao montar o WhatsApp. ministro_id=%s nome=%s telefone=%s",
                 ministro.id,
                 ministro.nome,
                 ministro.telefone,
             )
-            resultado["falhas"] += 1
-            resultado["detalhes"].append({
-                "ministro_id": ministro.id,
-                "nome": ministro.nome,
-                "numero": ministro.telefone,
-                "status": "erro_api",
-            })
+            itens.append({"detalhe": _detalhe_erro_api(ministro)})
             continue
 
-        try:
-            for escala in pendentes:
-                escala.notificacao_enviada = True
-            db.session.commit()
-        except SQLAlchemyError:
-            db.session.rollback()
-            logger.exception(
-                "WhatsApp enviado, mas nao foi possivel marcar notificacao_enviada. ministro_id=%s nome=%s",
+        itens.append({
+            "ministro": ministro,
+            "pendentes": pendentes,
+            "envio": (numero_formatado, payload),
+            "extras": extras,
+            "detalhe": None,
+        })
+
+    a_enviar = [item for item in itens if item["detalhe"] is None]
+    respostas = _enviar_lotes_whatsapp(
+        [item["envio"] for item in a_enviar],
+        _config_envio_whatsapp(),
+    )
+
+    escala_ids = []
+    for item, resposta_api in zip(a_enviar, respostas):
+        ministro = item["ministro"]
+        if isinstance(resposta_api, Exception):
+            logger.error(
+                "Falha no envio do WhatsApp. ministro_id=%s nome=%s telefone=%s erro=%s",
                 ministro.id,
                 ministro.nome,
+                ministro.telefone,
+                resposta_api,
             )
-            resultado["falhas"] += 1
-            resultado["detalhes"].append({
-                "ministro_id": ministro.id,
-                "nome": ministro.nome,
-                "numero": resposta_api["numero"],
-                "status": "erro_persistencia",
-            })
+            item["detalhe"] = _detalhe_erro_api(ministro)
             continue
 
-        logger.info(
-            "WhatsApp enviado com sucesso. ministro_id=%s nome=%s numero=%s status_api=%s escalas=%s modo=%s",
-            ministro.id,
-            ministro.nome,
-            resposta_api["numero"],
-            resposta_api["status_code"],
-            len(pendentes),
-            resposta_api.get("modo", resposta_api.get("tipo_envio", "text")),
-        )
-        resultado["enviados"] += 1
-        resultado["detalhes"].append({
+        resposta_api.update(item["extras"])
+        item["enviado"] = {
             "ministro_id": ministro.id,
             "nome": ministro.nome,
             "numero": resposta_api["numero"],
             "status": "enviado",
             "status_api": resposta_api["status_code"],
-            "escalas": len(pendentes),
+            "escalas": len(item["pendentes"]),
             "modo": resposta_api.get("modo", resposta_api.get("tipo_envio", "text")),
             "template_name": resposta_api.get("template_name", ""),
-        })
+        }
+        escala_ids.extend(escala.id for escala in item["pendentes"])
+
+    persistido = True
+    if escala_ids:
+        try:
+            db.session.execute(
+                update(Escala)
+                .where(Escala.id.in_(escala_ids))
+                .values(notificacao_enviada=True),
+                execution_options={"synchronize_session": False},
+            )
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            persistido = False
+            logger.exception(
+                "WhatsApp enviado, mas nao foi possivel marcar notificacao_enviada. escalas=%s",
+                len(escala_ids),
+            )
+
+    for item in itens:
+        if item["detalhe"] is None:
+            enviado = item["enviado"]
+
+            if persistido:
+                logger.info(
+                    "WhatsApp enviado com sucesso. ministro_id=%s nome=%s numero=%s status_api=%s escalas=%s modo=%s",
+                    enviado["ministro_id"],
+                    enviado["nome"],
+                    enviado["numero"],
+                    enviado["status_api"],
+                    enviado["escalas"],
+                    enviado["modo"],
+                )
+                item["detalhe"] = enviado
+            else:
+                item["detalhe"] = {
+                    "ministro_id": enviado["ministro_id"],
+                    "nome": enviado["nome"],
+                    "numero": enviado["numero"],
+                    "status": "erro_persistencia",
+                }
+
+        status = item["detalhe"]["status"]
+        if status == "enviado":
+            resultado["enviados"] += 1
+        elif status in {"erro_api", "erro_persistencia"}:
+            resultado["falhas"] += 1
+        resultado["detalhes"].append(item["detalhe"])
 
     return resultado
@@ -1,5 +1,7 @@
 ﻿import os
-from datetime import date
+import uuid
+from collections import namedtuple
+from datetime import date, timedelta
 from pathlib import Path
 
 import pytest
@@ -11,7 +13,22 @@ os.environ.setdefault("PIX_PROVIDER", "mock")
 
 from app import create_app
 from extensions import db
-from models import Ministro, Paroquia, RifaCampanha
+from models import (
+    CasalMinisterio,
+    Disponibilidade,
+    DisponibilidadeFixa,
+    Escala,
+    Indisponibilidade,
+    IndisponibilidadeFixa,
+    Ministro,
+    Missa,
+    Paroquia,
+    RifaCampanha,
+)
+
+
+# Paroquia do cenario de geracao de escala e o mes gerado.
+ParoquiaEscala = namedtuple("ParoquiaEscala", "id mes ano")
 
 
 @pytest.fixture
@@ -69,3 +86,64 @@ def app():
 @pytest.fixture
 def client(app):
     return app.test_client()
+
+
+def _popular_paroquia(mes, ano):
+    paroquia = Paroquia.query.first()
+    ministros = []
+    for indice in range(18):
+        ministro = Ministro(nome=f"Ministro {indice:02d}", id_paroquia=paroquia.id)
+        db.session.add(ministro)
+        ministros.append(ministro)
+    db.session.flush()
+
+    db.session.add_all([
+        CasalMinisterio(id_ministro_1=ministros[0].id, id_ministro_2=ministros[1].id, id_paroquia=paroquia.id),
+        CasalMinisterio(id_ministro_1=ministros[2].id, id_ministro_2=ministros[3].id, id_paroquia=paroquia.id),
+        IndisponibilidadeFixa(id_ministro=ministros[4].id, id_paroquia=paroquia.id, dia_semana=6),
+        IndisponibilidadeFixa(id_ministro=ministros[5].id, id_paroquia=paroquia.id, semana=2, horario="19:00"),
+        Indisponibilidade(id_ministro=ministros[6].id, id_paroquia=paroquia.id, data=date(ano, mes, 8)),
+        DisponibilidadeFixa(id_ministro=ministros[7].id, id_paroquia=paroquia.id, dia_semana=2),
+        Disponibilidade(id_ministro=ministros[8].id, id_paroquia=paroquia.id, data=date(ano, mes, 15), horario="07:00"),
+    ])
+
+    # Historico do mes anterior, com parte das escalas confirmadas.
+    for dia in range(1, 28, 3):
+        missa = Missa(data=date(ano, mes - 1, dia), horario="19:00", comunidade="Matriz", qtd_ministros=3, id_paroquia=paroquia.id)
+        db.session.add(missa)
+        db.session.flush()
+        for offset in range(3):
+            ministro = ministros[(dia + offset) % len(ministros)]
+            db.session.add(Escala(
+                id_missa=missa.id,
+                id_ministro=ministro.id,
+                id_paroquia=paroquia.id,
+                confirmado=offset != 1,
+                token=str(uuid.uuid4()),
+            ))
+
+    dia = date(ano, mes, 1)
+    while dia.month == mes:
+        if dia.weekday() == 6:
+            horarios = [("07:00", 4), ("19:00", 4)]
+        elif dia.weekday() in (2, 4):
+            horarios = [("19:00", 2)]
+        else:
+            horarios = []
+        for horario, qtd in horarios:
+            db.session.add(Missa(data=dia, horario=horario, comunidade="Matriz", qtd_ministros=qtd, id_paroquia=paroquia.id))
+        dia += timedelta(days=1)
+
+    db.session.commit()
+    return paroquia
+
+
+@pytest.fixture
+def paroquia_escala(app):
+    """
+    Paroquia com 18 ministros, casais, indisponibilidades, historico em
+    fevereiro e as missas de marco de 2026 ainda sem escala.
+    """
+    with app.app_context():
+        paroquia = _popular_paroquia(3, 2026)
+        return ParoquiaEscala(paroquia.id, 3, 2026)
@@ -0,0 +1,32 @@
+from benchmarks.executar import CASOS, executar_benchmarks
+from benchmarks.paroquia_sintetica import gerar_paroquia_sintetica
+from models import Escala, Missa
+
+PEQUENA = {"ministros": 12, "missas_mes": 6, "casais": 2, "regras_fixas": 4, "regras_data": 4, "anos_historico": 1}
+
+
+def _assinatura(id_paroquia):
+    missas = [
+        (m.data, m.horario, m.comunidade, m.qtd_ministros)
+        for m in Missa.query.filter_by(id_paroquia=id_paroquia).order_by(Missa.id)
+    ]
+    return missas, Escala.query.filter_by(id_paroquia=id_paroquia).count()
+
+
+def test_paroquia_sintetica_e_deterministica(app):
+    with app.app_context():
+        primeira = _assinatura(gerar_paroquia_sintetica(3, 2026, **PEQUENA))
+        segunda = _assinatura(gerar_paroquia_sintetica(3, 2026, **PEQUENA))
+
+    assert primeira == segunda
+    # 12 meses de historico + mes alvo + mes seguinte.
+    assert len(primeira[0]) == 14 * PEQUENA["missas_mes"]
+
+
+def test_executar_benchmarks_gera_relatorio():
+    relatorio = executar_benchmarks(parametros=PEQUENA, repeticoes=1)
+
+    assert [r["caso"] for r in relatorio["resultados"]] == list(CASOS)
+    for resultado in relatorio["resultados"]:
+        assert resultado["consultas"] > 0
+        assert resultado["memoria_pico_kb"] > 0
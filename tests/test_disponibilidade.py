@@ -0,0 +1,44 @@
+from datetime import date
+
+from extensions import db
+from models import (
+    Disponibilidade,
+    DisponibilidadeFixa,
+    Indisponibilidade,
+    IndisponibilidadeFixa,
+    Ministro,
+    Missa,
+    Paroquia,
+)
+from services.disponibilidade_service import AvailabilityIndex, resolver_status_missa
+
+
+def test_indice_respeita_precedencia_das_regras(app):
+    with app.app_context():
+        paroquia = Paroquia.query.first()
+        ministro = Ministro(nome="Ana", id_paroquia=paroquia.id)
+        db.session.add(ministro)
+        db.session.flush()
+
+        domingo = date(2026, 3, 8)  # segundo domingo do mes
+        db.session.add_all([
+            IndisponibilidadeFixa(id_ministro=ministro.id, id_paroquia=paroquia.id, dia_semana=6),
+            DisponibilidadeFixa(id_ministro=ministro.id, id_paroquia=paroquia.id, dia_semana=6, semana=2),
+            Indisponibilidade(id_ministro=ministro.id, id_paroquia=paroquia.id, data=domingo, horario="19:00"),
+            Disponibilidade(id_ministro=ministro.id, id_paroquia=paroquia.id, data=date(2026, 3, 15)),
+        ])
+        db.session.commit()
+
+        indice = AvailabilityIndex.carregar(paroquia.id, date(2026, 3, 1), date(2026, 3, 31))
+
+        casos = {
+            (domingo, "07:00"): "disponivel",       # fixa com semana vence fixa sem semana
+            (domingo, "19:00"): "indisponivel",     # regra por data vence regra fixa
+            (date(2026, 3, 1), "07:00"): "indisponivel",
+            (date(2026, 3, 15), "07:00"): "disponivel",
+            (date(2026, 3, 10), "19:00"): "neutro",
+        }
+        for (data, horario), esperado in casos.items():
+            assert indice.status(ministro.id, data, horario) == esperado
+            missa = Missa(data=data, horario=horario, id_paroquia=paroquia.id)
+            assert resolver_status_missa(ministro.id, missa, paroquia.id) == esperado
@@ -0,0 +1,71 @@
+from collections import Counter
+from datetime import date
+
+from models import Escala, Ministro, Missa
+from services.disponibilidade_service import AvailabilityIndex
+from services.escala_equilibrada_service import copiar_escala_mes, gerar_escala_equilibrada_mes, semana_do_mes
+
+
+def _missas(id_paroquia, mes, ano):
+    return Missa.query.filter(
+        Missa.id_paroquia == id_paroquia,
+        Missa.data >= date(ano, mes, 1),
+        Missa.data < date(ano, mes + 1, 1),
+    ).order_by(Missa.data.asc(), Missa.horario.asc(), Missa.id.asc()).all()
+
+
+def _escalados(missa):
+    return sorted(e.id_ministro for e in Escala.query.filter_by(id_missa=missa.id))
+
+
+def test_equilibrada_segue_a_ordenacao_por_contagem(app, paroquia_escala):
+    with app.app_context():
+        paroquia = paroquia_escala
+        missas = _missas(paroquia.id, paroquia.mes, paroquia.ano)
+        ministros = Ministro.query.filter_by(id_paroquia=paroquia.id).order_by(Ministro.id.asc()).all()
+        indice = AvailabilityIndex.carregar(paroquia.id, missas[0].data, missas[-1].data)
+
+        # Versao direta: reordena todos os disponiveis a cada missa.
+        contagem = Counter()
+        esperado = {}
+        for missa in missas:
+            candidatos = [m for m in ministros if not indice.esta_indisponivel(m.id, missa)]
+            candidatos.sort(key=lambda m: contagem[m.id])
+            esperado[missa.id] = sorted(m.id for m in candidatos[:missa.qtd_ministros])
+            contagem.update(esperado[missa.id])
+
+        gerar_escala_equilibrada_mes(paroquia.mes, paroquia.ano, paroquia.id)
+
+        assert {missa.id: _escalados(missa) for missa in missas} == esperado
+        assert max(contagem.values()) - min(contagem[m.id] for m in ministros) <= 1
+
+
+def test_copiar_escala_usa_missa_equivalente(app, paroquia_escala):
+    with app.app_context():
+        paroquia = paroquia_escala
+        base = _missas(paroquia.id, paroquia.mes - 1, paroquia.ano)
+        novas = _missas(paroquia.id, paroquia.mes, paroquia.ano)
+        indice = AvailabilityIndex.carregar(paroquia.id, novas[0].data, novas[-1].data)
+
+        esperado = {}
+        for missa_base in base:
+            if semana_do_mes(missa_base.data) == 5:
+                continue
+            destino = next((
+                missa for missa in novas
+                if semana_do_mes(missa.data) == semana_do_mes(missa_base.data)
+                and missa.data.weekday() == missa_base.data.weekday()
+                and missa.horario == missa_base.horario
+                and missa.comunidade == missa_base.comunidade
+            ), None)
+            if destino and destino.id not in esperado:
+                esperado[destino.id] = sorted(
+                    id_ministro for id_ministro in _escalados(missa_base)
+                    if not indice.esta_indisponivel(id_ministro, destino)
+                )
+
+        assert esperado
+        copiar_escala_mes(paroquia.mes - 1, paroquia.ano, paroquia.mes, paroquia.ano, paroquia.id)
+
+        copiadas = {missa.id: _escalados(missa) for missa in novas if _escalados(missa)}
+        assert copiadas == {id_missa: ids for id_missa, ids in esperado.items() if ids}
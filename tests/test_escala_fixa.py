@@ -0,0 +1,42 @@
+from datetime import date
+
+from extensions import db
+from models import Escala, EscalaFixa, Indisponibilidade, Ministro, Missa, Paroquia
+from services.escala_fixa_service import materializar_escala_fixa_mes
+
+
+def test_materializar_escala_fixa_e_idempotente(app):
+    with app.app_context():
+        paroquia = Paroquia.query.first()
+        ministros = [Ministro(nome=f"Fixo {i}", id_paroquia=paroquia.id) for i in range(3)]
+        db.session.add_all(ministros)
+        db.session.flush()
+
+        db.session.add_all([
+            # Todo domingo as 07:00, na matriz.
+            EscalaFixa(id_ministro=ministros[0].id, id_paroquia=paroquia.id, dia_semana=6, horario="07:00"),
+            # 2o domingo as 07:00 e toda quarta as 19:00.
+            EscalaFixa(id_ministro=ministros[1].id, id_paroquia=paroquia.id, semana=2, dia_semana=6, horario="07:00"),
+            EscalaFixa(id_ministro=ministros[2].id, id_paroquia=paroquia.id, dia_semana=2, horario="19:00", comunidade="Capela"),
+            Indisponibilidade(id_ministro=ministros[0].id, id_paroquia=paroquia.id, data=date(2026, 3, 15)),
+            # Missa ja cadastrada: deve ser reaproveitada.
+            Missa(data=date(2026, 3, 1), horario="07:00", comunidade="Matriz", qtd_ministros=2, id_paroquia=paroquia.id),
+        ])
+        db.session.commit()
+
+        resultado = materializar_escala_fixa_mes(paroquia.id, 3, 2026)
+        db.session.commit()
+
+        # Marco/2026: 5 domingos e 4 quartas; o domingo 01/03 ja existia.
+        assert len(resultado["missas_criadas"]) == 8
+        assert len(resultado["missas_existentes"]) == 1
+        assert len(resultado["escalas_criadas"]) == 5 - 1 + 1 + 4
+        assert [(m.data, motivo) for m, _, motivo in resultado["ignoradas"]] == [(date(2026, 3, 15), "indisponivel")]
+        assert Missa.query.filter_by(comunidade="Capela").count() == 4
+
+        segundo = materializar_escala_fixa_mes(paroquia.id, 3, 2026)
+        db.session.commit()
+
+        assert segundo["missas_criadas"] == []
+        assert segundo["escalas_criadas"] == []
+        assert Escala.query.count() == 9
@@ -0,0 +1,28 @@
+from models import Escala
+
+
+def _tokens():
+    return {(e.id_missa, e.id_ministro): e.token for e in Escala.query.all()}
+
+
+def test_gerar_lote_pode_ser_repetido(app, paroquia_escala):
+    with app.app_context():
+        historico = len(_tokens())
+
+    runner = app.test_cli_runner()
+    argumentos = ["escala", "gerar-lote", "--mes", str(paroquia_escala.mes), "--ano", str(paroquia_escala.ano), "--processos", "1"]
+
+    primeira = runner.invoke(args=argumentos)
+    assert primeira.exit_code == 0, primeira.output
+    assert "gerada" in primeira.output
+    with app.app_context():
+        geradas = _tokens()
+        assert len(geradas) > historico
+
+    segunda = runner.invoke(args=argumentos)
+    assert "ignorada" in segunda.output
+
+    terceira = runner.invoke(args=argumentos + ["--regerar"])
+    assert terceira.exit_code == 0, terceira.output
+    with app.app_context():
+        assert _tokens() == geradas
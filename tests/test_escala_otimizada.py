@@ -0,0 +1,72 @@
+import random
+from collections import Counter
+
+from services.escala_otimizada_service import FluxoCustoMinimo
+from services.escala_planejamento_service import PlanejadorEscalaMes
+
+
+def _planejar(paroquia, opcoes):
+    planejador = PlanejadorEscalaMes(paroquia.id, paroquia.mes, paroquia.ano, modo_ordenacao=opcoes, rng=random.Random(7)).carregar()
+    planejador.planejar()
+    return planejador
+
+
+def _contagem(planejador):
+    contagem = Counter({ministro.id: 0 for ministro in planejador.ministros})
+    for ministros in planejador.atribuicoes.values():
+        contagem.update(ministro.id for ministro in ministros)
+    return contagem
+
+
+def test_fluxo_custo_minimo_escolhe_atribuicao_mais_barata():
+    rede = FluxoCustoMinimo()
+    for pessoa in ("a", "b"):
+        rede.adicionar("s", pessoa, 1, 0)
+    arestas = {}
+    for pessoa, tarefa, custo in (("a", 1, 1), ("a", 2, 2), ("b", 1, 1), ("b", 2, 5)):
+        arestas[(pessoa, tarefa)] = len(rede.arestas)
+        rede.adicionar(pessoa, tarefa, 1, custo)
+    for tarefa in (1, 2):
+        rede.adicionar(tarefa, "t", 1, 0)
+
+    assert rede.resolver("s", "t") == (2, 3)
+    assert {chave for chave, indice in arestas.items() if rede.fluxo(indice)} == {("a", 2), ("b", 1)}
+
+
+def test_modo_otimizado_respeita_restricoes_e_equilibra(app, paroquia_escala):
+    with app.app_context():
+        paroquia = paroquia_escala
+        gulosa = _planejar(paroquia, ["equilibrada"])
+        otimizada = _planejar(paroquia, ["equilibrada", "otimizada"])
+
+        assert gulosa.metodo == "gulosa"
+        assert otimizada.metodo == "otimizada"
+
+        missas = {missa.id: missa for missa in otimizada.missas}
+        por_dia = Counter()
+        for missa_id, ministros in otimizada.atribuicoes.items():
+            missa = missas[missa_id]
+            ids = [ministro.id for ministro in ministros]
+            assert len(ids) == len(set(ids)) <= missa.qtd_ministros
+            assert not set(ids) & otimizada.indisponiveis(missa)
+            por_dia.update((missa.data, ministro_id) for ministro_id in ids)
+
+        assert max(por_dia.values()) == 1
+        assert otimizada.vagas_em_aberto() <= gulosa.vagas_em_aberto()
+
+        contagem_gulosa = _contagem(gulosa)
+        contagem_otimizada = _contagem(otimizada)
+        assert (
+            max(contagem_otimizada.values()) - min(contagem_otimizada.values())
+            <= max(contagem_gulosa.values()) - min(contagem_gulosa.values())
+        )
+
+
+def test_modo_otimizado_volta_para_guloso_sem_tempo(app, paroquia_escala):
+    app.config["ESCALA_OTIMIZADA_TEMPO_LIMITE"] = 1e-9
+    with app.app_context():
+        paroquia = paroquia_escala
+        planejador = _planejar(paroquia, ["otimizada"])
+
+        assert planejador.metodo == "gulosa"
+        assert planejador.vagas_em_aberto() == _planejar(paroquia, ["equilibrada"]).vagas_em_aberto()
@@ -0,0 +1,197 @@
+import random
+import uuid
+from datetime import date
+
+from extensions import db
+from models import Escala, EscalaPlano, Indisponibilidade, Missa, PedidoSubstituicao
+from services.escala_inteligente_service import selecionar_ministros
+from services.escala_planejamento_service import (
+    PlanejadorEscalaMes,
+    aplicar_plano_mes,
+    normalizar_opcoes_geracao,
+    ordenar_missas_para_geracao,
+    replanejar_indisponibilidade,
+)
+
+
+def _gerar_por_missa(paroquia, opcoes, considerar):
+    id_paroquia = paroquia.id
+    missas = Missa.query.filter(
+        Missa.id_paroquia == id_paroquia,
+        Missa.data >= date(paroquia.ano, paroquia.mes, 1),
+        Missa.data < date(paroquia.ano, paroquia.mes + 1, 1),
+    ).order_by(Missa.data.asc(), Missa.horario.asc(), Missa.id.asc()).all()
+
+    resultado = {}
+    for missa in ordenar_missas_para_geracao(missas, opcoes):
+        ministros = selecionar_ministros(
+            missa.qtd_ministros,
+            id_paroquia,
+            missa,
+            considerar_periodos_anteriores=considerar,
+            modo_ordenacao=normalizar_opcoes_geracao(opcoes),
+        )
+        resultado[missa.id] = [m.id for m in ministros]
+        for ministro in ministros:
+            db.session.add(Escala(id_missa=missa.id, id_ministro=ministro.id, id_paroquia=id_paroquia, token=str(uuid.uuid4())))
+        db.session.flush()
+
+    db.session.rollback()
+    return resultado
+
+
+def test_planejador_reproduz_selecionar_ministros(app, paroquia_escala):
+    with app.app_context():
+        paroquia = paroquia_escala
+
+        for opcoes in (["equilibrada"], ["minimo_missas", "casais_semana"], ["casais_fim_semana", "semana_primeiro"]):
+            for considerar in (True, False):
+                random.seed(2026)
+                esperado = _gerar_por_missa(paroquia, opcoes, considerar)
+
+                random.seed(2026)
+                planejador = PlanejadorEscalaMes(
+                    paroquia.id,
+                    paroquia.mes,
+                    paroquia.ano,
+                    considerar_periodos_anteriores=considerar,
+                    modo_ordenacao=opcoes,
+                ).carregar()
+                obtido = {
+                    missa_id: [m.id for m in ministros]
+                    for missa_id, ministros in planejador.planejar().items()
+                }
+
+                assert obtido == esperado
+
+
+def test_planejador_salva_em_lote(app, paroquia_escala):
+    with app.app_context():
+        paroquia = paroquia_escala
+
+        planejador = PlanejadorEscalaMes(paroquia.id, paroquia.mes, paroquia.ano, rng=random.Random(1)).carregar()
+        planejador.planejar()
+        criadas = planejador.salvar()
+        db.session.commit()
+
+        total = Escala.query.join(Missa).filter(Missa.data >= date(paroquia.ano, paroquia.mes, 1)).count()
+        assert total == len(criadas) > 0
+        assert planejador.vagas_em_aberto() == 0
+
+
+def _escalas_do_mes(paroquia):
+    return {
+        (escala.id_missa, escala.id_ministro): (escala.token, escala.confirmado)
+        for escala in Escala.query.join(Missa).filter(Missa.data >= date(paroquia.ano, paroquia.mes, 1)).all()
+    }
+
+
+def _gerar_plano(paroquia, semente):
+    planejador = PlanejadorEscalaMes(paroquia.id, paroquia.mes, paroquia.ano, rng=random.Random(semente)).carregar()
+    planejador.planejar()
+    planejador.salvar_plano()
+    db.session.commit()
+    return {
+        (missa_id, ministro.id)
+        for missa_id, ministros in planejador.atribuicoes.items()
+        for ministro in ministros
+    }
+
+
+def test_aplicar_plano_altera_somente_o_que_mudou(app, paroquia_escala):
+    with app.app_context():
+        paroquia = paroquia_escala
+
+        _gerar_plano(paroquia, 1)
+        aplicar_plano_mes(paroquia.id, paroquia.mes, paroquia.ano)
+        db.session.commit()
+
+        escala = Escala.query.join(Missa).filter(Missa.data >= date(paroquia.ano, paroquia.mes, 1)).first()
+        escala.confirmado = True
+        db.session.commit()
+        antes = _escalas_do_mes(paroquia)
+
+        # Mesmo plano: nada e reescrito.
+        _gerar_plano(paroquia, 1)
+        resultado = aplicar_plano_mes(paroquia.id, paroquia.mes, paroquia.ano)
+        db.session.commit()
+        assert resultado["mantidas"] == len(antes)
+        assert resultado["criadas"] == resultado["removidas"] == []
+        assert _escalas_do_mes(paroquia) == antes
+
+        # Cada escala tem um pedido de substituicao aberto do ministro atual.
+        for escala in Escala.query.join(Missa).filter(Missa.data >= date(paroquia.ano, paroquia.mes, 1)):
+            db.session.add(PedidoSubstituicao(
+                token=f"pedido-{escala.id}",
+                id_escala=escala.id,
+                id_paroquia=paroquia.id,
+                id_ministro_solicitante=escala.id_ministro,
+                status="aberto",
+            ))
+        db.session.commit()
+
+        # Plano diferente: so as atribuicoes novas recebem token novo.
+        planejado = _gerar_plano(paroquia, 7)
+        resultado = aplicar_plano_mes(paroquia.id, paroquia.mes, paroquia.ano)
+        db.session.commit()
+        depois = _escalas_do_mes(paroquia)
+
+        # Escala reaproveitada por outro ministro nao carrega o pedido do anterior.
+        for pedido in PedidoSubstituicao.query.all():
+            escala = db.session.get(Escala, pedido.id_escala)
+            if escala is None:
+                continue
+            esperado = "aberto" if escala.id_ministro == pedido.id_ministro_solicitante else "cancelado"
+            assert pedido.status == esperado
+        assert any(p.status == "cancelado" for p in PedidoSubstituicao.query.all())
+
+        assert set(depois) == planejado
+        for chave in set(depois) & set(antes):
+            assert depois[chave] == antes[chave]
+        assert len(resultado["criadas"]) == len(set(depois) - set(antes))
+        assert len(resultado["removidas"]) == len(set(antes) - set(depois))
+        assert EscalaPlano.query.count() == 0
+
+
+def test_replanejar_troca_apenas_escalas_afetadas(app, paroquia_escala):
+    with app.app_context():
+        paroquia = paroquia_escala
+        planejador = PlanejadorEscalaMes(paroquia.id, paroquia.mes, paroquia.ano, rng=random.Random(3)).carregar()
+        planejador.planejar()
+        planejador.salvar()
+        db.session.commit()
+
+        domingo = date(paroquia.ano, paroquia.mes, 22)
+        alvo = Escala.query.join(Missa).filter(Missa.data == domingo).first()
+        ministro_id = alvo.id_ministro
+        db.session.add(Indisponibilidade(id_ministro=ministro_id, id_paroquia=paroquia.id, data=domingo))
+        # O ministro ja tinha pedido substituto para a escala; outro pedido segue aberto.
+        outra = Escala.query.join(Missa).filter(Missa.data != domingo, Escala.id_ministro != ministro_id).first()
+        pedidos = [
+            PedidoSubstituicao(token=f"pedido-{e.id}", id_escala=e.id, id_paroquia=paroquia.id,
+                               id_ministro_solicitante=e.id_ministro, status="aberto")
+            for e in (alvo, outra)
+        ]
+        db.session.add_all(pedidos)
+        db.session.commit()
+        antes = _escalas_do_mes(paroquia)
+
+        resultado = replanejar_indisponibilidade(paroquia.id, ministro_id, data_inicio=date(paroquia.ano, paroquia.mes, 1))
+        db.session.commit()
+        depois = _escalas_do_mes(paroquia)
+
+        afetadas = {chave for chave in antes if chave[1] == ministro_id and chave[0] in {
+            m.id for m in Missa.query.filter_by(data=domingo)
+        }}
+        assert len(resultado["criadas"]) == len(afetadas) > 0
+        assert len(depois) == len(antes)
+        assert set(antes) - set(depois) == afetadas
+        for chave in set(antes) - afetadas:
+            assert depois[chave] == antes[chave]
+
+        escalados_no_dia = [
+            e.id_ministro for e in Escala.query.join(Missa).filter(Missa.data == domingo)
+        ]
+        assert ministro_id not in escalados_no_dia
+        assert [p.status for p in pedidos] == ["cancelado", "aberto"]
+        assert len(escalados_no_dia) == len(set(escalados_no_dia))
@@ -0,0 +1,46 @@
+from models import Escala
+from services.escala_simulacao_service import simular_pesos
+
+
+def test_simulacao_compara_pesos_sem_gravar(app, paroquia_escala):
+    with app.app_context():
+        paroquia = paroquia_escala
+        total_escalas = Escala.query.count()
+
+        conjuntos = [
+            {"nome": "Atual"},
+            {"nome": "Sem meta", "pesos": {"ESCALA_META_MENSAL_POR_MINISTRO": 1, "ESCALA_SCORE_ESCALAS_MES_PESO": 0}},
+        ]
+        em_pool = simular_pesos(paroquia.id, paroquia.mes, paroquia.ano, conjuntos, semente=11, processos=2)
+        em_linha = simular_pesos(paroquia.id, paroquia.mes, paroquia.ano, conjuntos, semente=11, processos=1)
+
+        assert em_pool == em_linha
+        assert [item["nome"] for item in em_pool["resultados"]] == ["Atual", "Sem meta"]
+        atual = em_pool["resultados"][0]["metricas"]
+        assert atual["vagas_em_aberto"] == 0
+        assert atual["escalas_por_ministro"]["max"] >= atual["escalas_por_ministro"]["min"]
+        assert atual["casais"]["juntos"] + atual["casais"]["separados"] > 0
+        assert Escala.query.count() == total_escalas
+
+
+def test_api_simulacao_valida_parametros(app, client):
+    client.post("/login", data={"login": "admin@teste.com", "senha": "123456"})
+
+    resposta = client.post("/api/escala/simulacao", json={
+        "mes": 3,
+        "ano": 2026,
+        "conjuntos": [{"pesos": {"ESCALA_INEXISTENTE": 1}}],
+    })
+
+    assert resposta.status_code == 400
+    assert "ESCALA_INEXISTENTE" in resposta.get_json()["erro"]
+
+
+def test_api_simulacao_rejeita_conjuntos_mal_formados(app, client):
+    client.post("/login", data={"login": "admin@teste.com", "senha": "123456"})
+
+    for conjuntos in ([1], [{"pesos": [1, 2]}], {"nome": "Atual"}):
+        resposta = client.post("/api/escala/simulacao", json={"mes": 3, "ano": 2026, "conjuntos": conjuntos})
+
+        assert resposta.status_code == 400
+        assert "conjunto" in resposta.get_json()["erro"].lower()
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import ExecucaoJob, Ministro
+from services.job_run_service import execucao_job, limpar_execucoes, percentil, registrar_ignorada, resumo_jobs
+
+
+def test_execucoes_registram_duracao_erro_e_sobreposicao(app):
+    with execucao_job(app, "importacao_ofertas") as execucao:
+        execucao.itens = 3
+
+    with execucao_job(app, "importacao_ofertas"):
+        raise RuntimeError("gateway fora")
+
+    with execucao_job(app, "expirar_rifas"):
+        # Outra execucao do mesmo job comeca antes desta terminar.
+        with execucao_job(app, "expirar_rifas") as interna:
+            assert interna.sobreposto is True
+
+    with app.app_context():
+        registrar_ignorada("expirar_rifas", sobreposto=True)
+
+        ofertas = ExecucaoJob.query.filter_by(job="importacao_ofertas").order_by(ExecucaoJob.id).all()
+        assert [(e.status, e.itens, e.erro) for e in ofertas] == [
+            ("sucesso", 3, None),
+            ("erro", None, "gateway fora"),
+        ]
+        assert all(e.duracao_segundos is not None and e.finalizado_em for e in ofertas)
+
+        resumo = {r["job"]: r for r in resumo_jobs()}
+        assert resumo["importacao_ofertas"]["erros"] == 1
+        assert (resumo["expirar_rifas"]["execucoes"], resumo["expirar_rifas"]["ignoradas"]) == (2, 1)
+        assert resumo["expirar_rifas"]["sobrepostas"] == 2
+
+
+def test_percentis_limpeza_e_pagina(app, client):
+    assert percentil([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 50) == 5
+    assert percentil([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 95) == 10
+    assert percentil([], 95) is None
+
+    with app.app_context():
+        agora = datetime.utcnow()
+        db.session.add_all([
+            ExecucaoJob(job="antigo", iniciado_em=agora - timedelta(days=40), status="sucesso"),
+            ExecucaoJob(job="recente", iniciado_em=agora, status="sucesso", duracao_segundos=1.5),
+        ])
+        superadmin = Ministro.query.filter_by(tipo="admin").first()
+        superadmin.tipo = "superadmin"
+        db.session.commit()
+
+        assert limpar_execucoes(30) == 1
+        db.session.commit()
+        assert [e.job for e in ExecucaoJob.query.all()] == ["recente"]
+
+    client.post("/login", data={"login": "admin@teste.com", "senha": "123456"})
+    resposta = client.get("/superadmin/jobs")
+    assert resposta.status_code == 200
+    assert b"recente" in resposta.data
@@ -0,0 +1,77 @@
+from datetime import date, datetime
+
+from sqlalchemy import insert
+
+from extensions import db
+from models import Escala, Ministro, Missa, NotificacaoOutbox
+from services.lembrete_missa_service import processar_lembretes_vencidos, proximo_lembrete
+
+
+def _missa(admin, dia, horario="19:00"):
+    missa = Missa(data=dia, horario=horario, comunidade="Matriz", qtd_ministros=2, id_paroquia=admin.id_paroquia)
+    db.session.add(missa)
+    db.session.flush()
+    return missa
+
+
+def test_lembrete_calculado_ao_criar_e_ao_mudar(app):
+    with app.app_context():
+        admin = Ministro.query.filter_by(tipo="admin").first()
+        missa = _missa(admin, date(2026, 11, 8))
+        escala = Escala(id_missa=missa.id, id_ministro=admin.id, id_paroquia=admin.id_paroquia)
+        db.session.add(escala)
+        db.session.commit()
+
+        # 19:00 em Sao Paulo (UTC-3), uma hora antes, em UTC.
+        assert escala.lembrete_em == datetime(2026, 11, 8, 21, 0)
+        assert escala.lembrete_enviado is False
+
+        escala.lembrete_enviado = True
+        db.session.commit()
+
+        missa.horario = "7h30"
+        db.session.commit()
+        db.session.refresh(escala)
+        assert (escala.lembrete_em, escala.lembrete_enviado) == (datetime(2026, 11, 8, 9, 30), False)
+
+        escala.lembrete_enviado = True
+        db.session.commit()
+        outro = Ministro(nome="Outro", id_paroquia=admin.id_paroquia)
+        db.session.add(outro)
+        db.session.flush()
+        escala.id_ministro = outro.id
+        db.session.commit()
+        db.session.refresh(escala)
+        assert (escala.lembrete_em, escala.lembrete_enviado) == (datetime(2026, 11, 8, 9, 30), False)
+
+        missa_lote = _missa(admin, date(2026, 11, 9), horario="10:00")
+        db.session.execute(insert(Escala), [{
+            "id_missa": missa_lote.id,
+            "id_ministro": admin.id,
+            "id_paroquia": admin.id_paroquia,
+            "token": "lote-1",
+        }])
+        db.session.commit()
+        assert Escala.query.filter_by(token="lote-1").one().lembrete_em == datetime(2026, 11, 9, 12, 0)
+
+
+def test_processa_so_lembretes_vencidos(app):
+    with app.app_context():
+        admin = Ministro.query.filter_by(tipo="admin").first()
+        admin.firebase_token = "tok-admin"
+        escala = Escala(id_missa=_missa(admin, date(2026, 11, 8)).id, id_ministro=admin.id, id_paroquia=admin.id_paroquia)
+        passada = Escala(id_missa=_missa(admin, date(2026, 11, 1)).id, id_ministro=admin.id, id_paroquia=admin.id_paroquia)
+        db.session.add_all([escala, passada])
+        db.session.commit()
+
+        assert processar_lembretes_vencidos(agora=datetime(2026, 11, 1, 20, 0))["lidas"] == 0
+        assert proximo_lembrete() == datetime(2026, 11, 1, 21, 0)
+
+        # A missa do dia 1 ja comecou: marcada sem push.
+        resultado = processar_lembretes_vencidos(agora=datetime(2026, 11, 8, 21, 0))
+        assert resultado == {"lidas": 2, "enviadas": 1, "expiradas": 1}
+
+        item = NotificacaoOutbox.query.one()
+        assert (item.destino, item.mensagem) == ("tok-admin", "Você tem escala hoje às 19:00 - Matriz")
+        assert proximo_lembrete() is None
+        assert processar_lembretes_vencidos(agora=datetime(2026, 11, 8, 21, 30))["lidas"] == 0
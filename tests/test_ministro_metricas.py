@@ -0,0 +1,112 @@
+import uuid
+from datetime import date
+
+from sqlalchemy import insert
+
+from extensions import db
+from models import Escala, Ministro, MinistroMetricas, Missa, Paroquia
+from services.ministro_metricas_service import historico_anterior_ao_mes, reconstruir_metricas
+
+
+def _snapshot():
+    return {
+        (m.id_ministro, m.ano, m.mes): (m.escalas, m.confirmadas, m.domingos, m.ultima_data)
+        for m in MinistroMetricas.query.all()
+    }
+
+
+def test_metricas_acompanham_alteracoes_das_escalas(app):
+    with app.app_context():
+        paroquia = Paroquia.query.first()
+        ana = Ministro(nome="Ana", id_paroquia=paroquia.id)
+        beto = Ministro(nome="Beto", id_paroquia=paroquia.id)
+        domingo = Missa(data=date(2026, 3, 1), horario="07:00", id_paroquia=paroquia.id)
+        quarta = Missa(data=date(2026, 3, 4), horario="19:00", id_paroquia=paroquia.id)
+        abril = Missa(data=date(2026, 4, 5), horario="07:00", id_paroquia=paroquia.id)
+        db.session.add_all([ana, beto, domingo, quarta, abril])
+        db.session.flush()
+
+        escala = Escala(id_missa=domingo.id, id_ministro=ana.id, id_paroquia=paroquia.id)
+        db.session.add(escala)
+        db.session.add(Escala(id_missa=quarta.id, id_ministro=ana.id, id_paroquia=paroquia.id))
+        db.session.commit()
+        assert _snapshot()[(ana.id, 2026, 3)] == (2, 0, 1, date(2026, 3, 4))
+
+        escala.confirmado = True
+        db.session.commit()
+        assert _snapshot()[(ana.id, 2026, 3)][1] == 1
+
+        # INSERT em lote e troca de data da missa.
+        db.session.execute(insert(Escala), [
+            {"id_missa": abril.id, "id_ministro": beto.id, "id_paroquia": paroquia.id, "token": str(uuid.uuid4())},
+        ])
+        quarta.data = date(2026, 4, 8)
+        db.session.commit()
+        assert _snapshot()[(ana.id, 2026, 4)] == (1, 0, 0, date(2026, 4, 8))
+        assert historico_anterior_ao_mes(paroquia.id, 2026, 5) == {
+            ana.id: (2, 1, date(2026, 4, 8)),
+            beto.id: (1, 0, date(2026, 4, 5)),
+        }
+
+        # DELETE em lote e pelo ORM.
+        Escala.query.filter_by(id_missa=abril.id).delete(synchronize_session=False)
+        db.session.delete(escala)
+        db.session.commit()
+
+        esperado = _snapshot()
+        assert (ana.id, 2026, 3) not in esperado
+        assert (beto.id, 2026, 4) not in esperado
+
+        reconstruir_metricas(paroquia.id)
+        db.session.commit()
+        assert _snapshot() == esperado
+
+
+def test_comando_reconstruir_metricas(app):
+    with app.app_context():
+        paroquia = Paroquia.query.first()
+        ministro_id = Ministro.query.first().id
+        missa = Missa(data=date(2026, 2, 10), horario="19:00", id_paroquia=paroquia.id)
+        db.session.add(missa)
+        db.session.flush()
+        db.session.add(Escala(id_missa=missa.id, id_ministro=ministro_id, id_paroquia=paroquia.id, confirmado=True))
+        db.session.commit()
+        MinistroMetricas.query.delete()
+        db.session.commit()
+
+    resultado = app.test_cli_runner().invoke(args=["metricas", "reconstruir"])
+
+    assert resultado.exit_code == 0
+    with app.app_context():
+        assert _snapshot() == {(ministro_id, 2026, 2): (1, 1, 0, date(2026, 2, 10))}
+
+
+def test_update_em_lote_so_reconta_colunas_das_metricas(app):
+    with app.app_context():
+        paroquia = Paroquia.query.first()
+        outra = Paroquia(nome="Outra")
+        ana = Ministro(nome="Ana", id_paroquia=paroquia.id)
+        domingo = Missa(data=date(2026, 3, 1), horario="07:00", id_paroquia=paroquia.id)
+        db.session.add_all([outra, ana, domingo])
+        db.session.flush()
+        db.session.add(Escala(id_missa=domingo.id, id_ministro=ana.id, id_paroquia=paroquia.id))
+        # Linha do mesmo ministro e mes em outra paroquia.
+        db.session.add(MinistroMetricas(id_paroquia=outra.id, id_ministro=ana.id, ano=2026, mes=3, escalas=5))
+        db.session.commit()
+
+        MinistroMetricas.query.filter_by(id_paroquia=paroquia.id).update({"escalas": 99})
+        db.session.commit()
+
+        Escala.query.filter_by(id_ministro=ana.id).update({"notificacao_enviada": True}, synchronize_session=False)
+        db.session.commit()
+        assert MinistroMetricas.query.filter_by(id_paroquia=paroquia.id).one().escalas == 99
+
+        Escala.query.filter_by(id_ministro=ana.id).update({"confirmado": True}, synchronize_session=False)
+        db.session.commit()
+        linhas = {m.id_paroquia: (m.escalas, m.confirmadas) for m in MinistroMetricas.query.all()}
+        assert linhas == {paroquia.id: (1, 1), outra.id: (5, 0)}
+
+        # SET com expressao, sem parametro: tambem reconta.
+        Escala.query.filter_by(id_ministro=ana.id).update({Escala.confirmado: ~Escala.confirmado}, synchronize_session=False)
+        db.session.commit()
+        assert MinistroMetricas.query.filter_by(id_paroquia=paroquia.id).one().confirmadas == 0
@@ -0,0 +1,105 @@
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import Ministro, NotificacaoOutbox, PushToken
+from services.notificacao_outbox_service import processar_outbox
+from services.notification_manager import NotificationManager
+
+
+def _ministro_com_tokens(*tokens):
+    ministro = Ministro.query.filter_by(tipo="admin").first()
+    for token in tokens:
+        db.session.add(PushToken(usuario_id=ministro.id, token=token, ativo=True))
+    db.session.commit()
+    return ministro
+
+
+def test_enviar_grava_na_outbox_sem_chamar_o_firebase(app, monkeypatch):
+    def falhar(*args, **kwargs):
+        raise AssertionError("push enviado dentro da requisicao")
+
+    monkeypatch.setattr("firebase_admin.messaging.send", falhar)
+    monkeypatch.setattr("firebase_admin.messaging.send_each_for_multicast", falhar)
+    with app.app_context():
+        ministro = _ministro_com_tokens("tok-a", "tok-b")
+
+        NotificationManager.enviar(ministro.id, "Aviso", "Mensagem", url="/escalas")
+
+        itens = NotificacaoOutbox.query.order_by(NotificacaoOutbox.id).all()
+        assert [(i.destino, i.status, i.url) for i in itens] == [
+            ("tok-a", "pendente", "/escalas"),
+            ("tok-b", "pendente", "/escalas"),
+        ]
+
+
+def test_processar_outbox_reagenda_e_descarta(app):
+    app.config.update(NOTIFICACAO_OUTBOX_MAX_TENTATIVAS=2, NOTIFICACAO_OUTBOX_BACKOFF_SEGUNDOS=60)
+    enviados = []
+
+    def enviar(token, titulo, mensagem, url=None):
+        if token == "tok-instavel":
+            raise RuntimeError("timeout")
+        if token == "tok-removido":
+            raise RuntimeError("registration-token-not-registered")
+        enviados.append(token)
+
+    with app.app_context():
+        ministro = _ministro_com_tokens("tok-ok", "tok-instavel", "tok-removido")
+        NotificationManager.enviar(ministro.id, "Aviso", "Mensagem")
+
+        agora = datetime.utcnow() + timedelta(seconds=1)
+        resultado = processar_outbox(enviar=enviar, agora=agora)
+        assert resultado == {"lidas": 3, "enviadas": 1, "reagendadas": 1, "falhas": 1}
+        assert enviados == ["tok-ok"]
+
+        status = {i.destino: i for i in NotificacaoOutbox.query.all()}
+        assert status["tok-ok"].status == "enviada"
+        assert status["tok-removido"].status == "falha"
+        assert status["tok-instavel"].status == "pendente"
+        assert status["tok-instavel"].proxima_tentativa_em == agora + timedelta(seconds=60)
+        assert not PushToken.query.filter_by(token="tok-removido").one().ativo
+
+        # Antes do fim da espera nada e lido; depois, a 2a falha esgota as tentativas.
+        assert processar_outbox(enviar=enviar, agora=agora)["lidas"] == 0
+        resultado = processar_outbox(enviar=enviar, agora=agora + timedelta(seconds=61))
+        assert resultado["falhas"] == 1
+        item = NotificacaoOutbox.query.filter_by(destino="tok-instavel").one()
+        assert (item.status, item.tentativas, item.ultimo_erro) == ("falha", 2, "timeout")
+
+
+def test_envio_em_massa_usa_um_insert_e_multicast(app, monkeypatch):
+    from firebase_admin import messaging
+    from services import firebase_service
+
+    chamadas = []
+
+    class Resposta:
+        def __init__(self, token):
+            self.success = token != "tok-2"
+            self.exception = None if self.success else messaging.UnregisteredError("nao registrado")
+
+    def send_each_for_multicast(mensagem):
+        chamadas.append(list(mensagem.tokens))
+        return type("Lote", (), {"responses": [Resposta(t) for t in mensagem.tokens]})()
+
+    monkeypatch.setattr(messaging, "send_each_for_multicast", send_each_for_multicast)
+    monkeypatch.setattr(firebase_service, "MULTICAST_MAX_TOKENS", 2)
+
+    with app.app_context():
+        admin = _ministro_com_tokens("tok-0")
+        outros = [Ministro(nome=f"M{i}", firebase_token=f"tok-{i}", id_paroquia=admin.id_paroquia) for i in (1, 2)]
+        db.session.add_all(outros)
+        db.session.flush()
+        # Token inativo fica de fora; o mesmo token em push_tokens e no ministro sai uma vez.
+        db.session.add(PushToken(usuario_id=admin.id, token="tok-inativo", ativo=False))
+        db.session.add(PushToken(usuario_id=outros[0].id, token="tok-1", ativo=True))
+        db.session.commit()
+
+        assert NotificationManager.enviar_para_todos("Aviso", "Para todos") == 3
+        assert NotificacaoOutbox.query.count() == 3
+
+        resultado = processar_outbox(enviar_lote=firebase_service.entregar_push_multicast)
+
+        assert resultado == {"lidas": 3, "enviadas": 2, "reagendadas": 0, "falhas": 1}
+        assert sorted(len(bloco) for bloco in chamadas) == [1, 2]
+        assert NotificacaoOutbox.query.filter_by(destino="tok-2").one().status == "falha"
@@ -0,0 +1,43 @@
+from collections import Counter
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import Ministro, NotificacaoOutbox
+from services.escala_planejamento_service import gerar_escala_mes
+from services.notificacao_service import notificar_escala_removida
+
+
+def test_geracao_do_mes_gera_um_resumo_por_ministro(app, paroquia_escala):
+    with app.app_context():
+        paroquia = paroquia_escala
+        Ministro.query.filter_by(id_paroquia=paroquia.id).update({"firebase_token": Ministro.nome})
+        db.session.commit()
+
+        with app.test_request_context():
+            resultado = gerar_escala_mes(paroquia.id, paroquia.mes, paroquia.ano, notificar=True)
+
+            por_ministro = Counter(ministro.id for _, ministro, _ in resultado["criadas"])
+            itens = NotificacaoOutbox.query.all()
+            assert sorted(item.usuario_id for item in itens) == sorted(por_ministro)
+            assert max(por_ministro.values()) > 1
+            for item in itens:
+                assert len(item.itens) == por_ministro[item.usuario_id]
+                assert item.proxima_tentativa_em > datetime.utcnow()
+                if len(item.itens) > 1:
+                    assert item.titulo == "Escala Atualizada"
+                    assert item.mensagem.count("\n- Nova: ") == len(item.itens)
+
+            # Dentro da janela, a alteracao seguinte entra no mesmo push.
+            missa, ministro, _ = resultado["criadas"][0]
+            notificar_escala_removida(ministro, missa)
+            db.session.commit()
+            item = NotificacaoOutbox.query.filter_by(usuario_id=ministro.id).one()
+            assert item.itens[-1].startswith("Removida: ")
+            assert len(item.itens) == por_ministro[ministro.id] + 1
+
+            # Com a janela fechada, nasce outro push.
+            item.proxima_tentativa_em = datetime.utcnow() - timedelta(seconds=1)
+            db.session.commit()
+            notificar_escala_removida(ministro, missa)
+            db.session.commit()
+            assert NotificacaoOutbox.query.filter_by(usuario_id=ministro.id).count() == 2
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+from extensions import db
+from models import Ministro, Notificacao
+from services.notification_manager import NotificationManager
+
+
+def test_contador_de_nao_lidas_acompanha_envio_e_leitura(app):
+    with app.app_context():
+        admin = Ministro.query.filter_by(tipo="admin").first()
+        outro = Ministro(nome="Outro", id_paroquia=admin.id_paroquia)
+        db.session.add(outro)
+        db.session.commit()
+
+        NotificationManager.enviar_para_ids([admin.id, outro.id], "Aviso", "Um")
+        NotificationManager.enviar(admin.id, "Aviso", "Dois")
+        assert NotificationManager.contar_nao_lidas(admin.id) == 2
+        assert NotificationManager.contar_nao_lidas(outro.id) == 1
+
+        primeira = Notificacao.query.filter_by(usuario_id=admin.id).order_by(Notificacao.id).first()
+        # De outro usuario nao marca; marcar duas vezes desconta uma.
+        assert NotificationManager.marcar_lida(primeira.id, usuario_id=outro.id) is False
+        assert NotificationManager.marcar_lida(primeira.id) is True
+        assert NotificationManager.marcar_lida(primeira.id) is False
+        assert NotificationManager.contar_nao_lidas(admin.id) == 1
+
+        assert NotificationManager.marcar_todas_lidas(admin.id) == 1
+        assert NotificationManager.contar_nao_lidas(admin.id) == 0
+        assert NotificationManager.contar_nao_lidas(outro.id) == 1
+
+        Ministro.query.update({"notificacoes_nao_lidas": 7})
+        NotificationManager.recontar_nao_lidas()
+        assert [NotificationManager.contar_nao_lidas(m) for m in (admin.id, outro.id)] == [0, 1]
+
+
+def test_paginacao_por_chave_e_retencao(app, client):
+    with app.app_context():
+        admin = Ministro.query.filter_by(tipo="admin").first()
+        base = datetime(2026, 1, 1, 12, 0)
+        db.session.add_all([
+            Notificacao(usuario_id=admin.id, titulo=f"N{i}", mensagem="-", lida=i < 3,
+                        criada_em=base + timedelta(days=i // 2))
+            for i in range(5)
+        ])
+        db.session.commit()
+
+        pagina, cursor = NotificationManager.listar(admin.id, limite=2)
+        titulos = [n.titulo for n in pagina]
+        while cursor:
+            pagina, cursor = NotificationManager.listar(admin.id, cursor=cursor, limite=2)
+            titulos += [n.titulo for n in pagina]
+        assert titulos == ["N4", "N3", "N2", "N1", "N0"]
+
+        # Apaga so as lidas antigas, em lotes de 2.
+        removidas = NotificationManager.limpar_notificacoes_lidas(dias=30, lote=2, agora=base + timedelta(days=60))
+        assert removidas == 3
+        assert sorted(n.titulo for n in Notificacao.query.all()) == ["N3", "N4"]
+
+    client.post("/login", data={"login": "admin@teste.com", "senha": "123456"})
+    resposta = client.get("/notificacoes")
+    assert resposta.status_code == 200
+    assert b"N4" in resposta.data
@@ -0,0 +1,31 @@
+import pytest
+
+from app import create_app
+
+
+def _regras(app):
+    return {regra.rule for regra in app.url_map.iter_rules()}
+
+
+def test_papel_web_nao_inicia_servicos_de_fundo():
+    app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"}, papel="web")
+
+    assert app.config["SGME_PAPEL"] == "web"
+    assert "scheduler_lider" not in app.extensions
+    assert "/health" in _regras(app)
+
+
+def test_papel_worker_nao_monta_o_dash(monkeypatch):
+    montados = []
+    monkeypatch.setattr("app.init_financeiro_dash", montados.append)
+
+    create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"}, papel="worker")
+    assert montados == []
+
+    web = create_app({"TESTING": True, "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:"}, papel="web")
+    assert montados == [web]
+
+
+def test_papel_invalido():
+    with pytest.raises(ValueError):
+        create_app({"TESTING": True}, papel="batch")
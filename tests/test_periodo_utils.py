@@ -0,0 +1,28 @@
+from datetime import date, datetime
+
+from extensions import db
+from models import Missa, Paroquia
+from utils.periodo_utils import filtro_mes, filtro_periodo, intervalo_mes
+
+
+def test_intervalo_mes_e_semiaberto():
+    assert intervalo_mes(2, 2028) == (date(2028, 2, 1), date(2028, 3, 1))
+    assert intervalo_mes(12, 2026) == (date(2026, 12, 1), date(2027, 1, 1))
+
+
+def test_filtros_de_periodo_respeitam_os_limites(app):
+    with app.app_context():
+        paroquia = Paroquia.query.first()
+        for dia in (date(2026, 11, 30), date(2026, 12, 1), date(2026, 12, 31), date(2027, 1, 1)):
+            db.session.add(Missa(data=dia, horario="19:00", id_paroquia=paroquia.id))
+        db.session.commit()
+
+        dezembro = Missa.query.filter(filtro_mes(Missa.data, 12, 2026)).order_by(Missa.data).all()
+        assert [m.data for m in dezembro] == [date(2026, 12, 1), date(2026, 12, 31)]
+
+        periodo = Missa.query.filter(
+            filtro_periodo(Missa.data, datetime(2026, 11, 30, 15, 0), date(2026, 12, 1))
+        ).order_by(Missa.data).all()
+        assert [m.data for m in periodo] == [date(2026, 11, 30), date(2026, 12, 1)]
+
+        assert Missa.query.filter(filtro_periodo(Missa.data)).count() == 4
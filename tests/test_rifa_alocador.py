@@ -0,0 +1,68 @@
+import base64
+
+from extensions import db
+from models import Rifa, RifaCampanha
+from rifas import alocador, services
+from rifas.alocador import alocar_numeros, dividir_em_shards, limpar_cache_mapas, mapa_disponibilidade
+
+
+def _numeros(bitmap, inicio, tamanho):
+    dados = base64.b64decode(bitmap)
+    return [inicio + i for i in range(tamanho) if dados[i >> 3] & (0x80 >> (i & 7))]
+
+
+def _campanha_com(app, quantidade):
+    app.config.update(RIFA_ALOCACAO_SHARDS=4, RIFA_ALOCACAO_SHARD_MINIMO=50)
+    campanha = RifaCampanha.query.first()
+    campanha.quantidade_total = quantidade
+    services._ensure_inventory(campanha=campanha)
+    db.session.commit()
+    return campanha
+
+
+def test_alocacao_comeca_no_shard_sorteado_e_da_a_volta(app, monkeypatch):
+    with app.app_context():
+        campanha = _campanha_com(app, 200)
+        assert dividir_em_shards(60001, 60200) == [
+            (60001, 60050), (60051, 60100), (60101, 60150), (60151, 60200),
+        ]
+        # Campanha pequena fica em um shard so.
+        assert dividir_em_shards(60001, 60030) == [(60001, 60030)]
+
+        monkeypatch.setattr(alocador.random, "randrange", lambda n: 2)
+        assert [l.numero for l in alocar_numeros(campanha.id, 3)] == [60101, 60102, 60103]
+
+        # Ultimo shard quase cheio: completa no primeiro.
+        Rifa.query.filter(Rifa.numero.between(60151, 60198)).update({"status": "bloco"})
+        db.session.commit()
+        monkeypatch.setattr(alocador.random, "randrange", lambda n: 3)
+        assert [l.numero for l in alocar_numeros(campanha.id, 4)] == [60001, 60002, 60199, 60200]
+
+
+def test_mapa_de_disponibilidade_em_cache_por_versao(app, client):
+    limpar_cache_mapas()
+    with app.app_context():
+        app.config["RIFA_MAPA_CACHE_SEGUNDOS"] = 0
+        campanha = _campanha_com(app, 30)
+        rifas = Rifa.query.filter(Rifa.numero.in_([60002, 60005, 60010])).all()
+        rifas[0].status = "pago"
+        rifas[1].status = "reservado"
+        rifas[2].status = "pago"
+        db.session.commit()
+
+        mapa = mapa_disponibilidade(campanha.id)
+        assert (mapa["inicio"], mapa["fim"], mapa["total_livres"]) == (60001, 60030, 27)
+        assert _numeros(mapa["vendidos"], 60001, 30) == [60002, 60010]
+        assert 60005 not in _numeros(mapa["livres"], 60001, 30)
+        # Sem mudanca no estoque o mesmo mapa e reaproveitado.
+        assert mapa_disponibilidade(campanha.id) is mapa
+
+        rifas[1].status = "disponivel"
+        db.session.commit()
+        novo = mapa_disponibilidade(campanha.id)
+        assert novo["versao"] != mapa["versao"] and novo["total_livres"] == 28
+
+    resposta = client.get("/rifas/mapa")
+    assert resposta.status_code == 200
+    assert resposta.get_json()["total_vendidos"] == 2
+    assert client.get("/rifas/mapa", headers={"If-None-Match": resposta.headers["ETag"]}).status_code == 304
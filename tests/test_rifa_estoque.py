@@ -0,0 +1,105 @@
+import uuid
+
+from extensions import db
+from models import PagamentoRifa, Rifa, RifaCampanha, RifaEstoque
+from rifas import services
+from rifas.estoque import reconstruir_estoque
+from rifas.payments import PixCharge
+from rifas.services import cancelar_pagamento, confirm_payment, get_public_page_data, purchase_rifas
+
+
+class GatewayFalso:
+    def create_charge(self, **kwargs):
+        return PixCharge(external_id=uuid.uuid4().hex, qr_code_base64="", copia_cola_pix="pix", raw_response={})
+
+
+def _contadores(campanha_id):
+    estoque = db.session.get(RifaEstoque, campanha_id, populate_existing=True)
+    return (estoque.criados, estoque.livres, estoque.reservados, estoque.pagos)
+
+
+def _comprar(quantidade):
+    return purchase_rifas(
+        nome="Maria",
+        telefone="11987654321",
+        email="maria@teste.com",
+        endereco="Rua A",
+        vendedor="",
+        quantidade_rifas=quantidade,
+        cpf="52998224725",
+    )
+
+
+def test_contadores_acompanham_compra_confirmacao_e_cancelamento(app, monkeypatch):
+    monkeypatch.setattr(services, "get_pix_gateway", lambda: GatewayFalso())
+
+    with app.app_context():
+        campanha = RifaCampanha.query.first()
+
+        primeira = _comprar(3)
+        assert _contadores(campanha.id) == (30, 27, 3, 0)
+        assert primeira.numeros == [60001, 60002, 60003]
+
+        segunda = _comprar(2)
+        confirm_payment(pagamento_id=primeira.pagamento_id)
+        assert _contadores(campanha.id) == (30, 25, 2, 3)
+
+        cancelar_pagamento(pagamento_id=segunda.pagamento_id)
+        assert _contadores(campanha.id) == (30, 27, 0, 3)
+        assert get_public_page_data()["disponiveis"] == 27
+        assert get_public_page_data()["vendidos"] == 3
+
+        # Aumentar a campanha cria so os numeros que faltam, depois do ultimo.
+        campanha.quantidade_total = 32
+        services._ensure_inventory(campanha=campanha)
+        db.session.commit()
+        assert _contadores(campanha.id) == (32, 29, 0, 3)
+        assert db.session.scalar(db.select(db.func.max(Rifa.numero))) == 60032
+
+
+def test_reconciliar_reconstroi_contadores_e_cria_linhas(app, monkeypatch):
+    monkeypatch.setattr(services, "get_pix_gateway", lambda: GatewayFalso())
+
+    with app.app_context():
+        campanha = RifaCampanha.query.first()
+        resultado = _comprar(4)
+        confirm_payment(pagamento_id=resultado.pagamento_id)
+
+        RifaEstoque.query.update({"livres": 0, "pagos": 99, "proximo_numero": 1})
+        nova = RifaCampanha(titulo="Outra", data_sorteio=campanha.data_sorteio, valor_rifa=5, quantidade_total=5, ativa=False)
+        db.session.add(nova)
+        db.session.commit()
+
+        assert reconstruir_estoque() == 2
+        db.session.commit()
+
+        assert _contadores(campanha.id) == (30, 26, 0, 4)
+        # Nova campanha continua a numeracao global.
+        assert db.session.get(RifaEstoque, nova.id).proximo_numero == 60031
+        assert db.session.get(RifaEstoque, campanha.id).proximo_numero == 60031
+        assert PagamentoRifa.query.count() == 1
+
+
+def test_ampliar_campanha_antiga_segue_a_numeracao_global(app):
+    with app.app_context():
+        antiga = RifaCampanha.query.first()
+        antiga.quantidade_total = 3
+        services._ensure_inventory(campanha=antiga)
+        nova = RifaCampanha(titulo="Outra", data_sorteio=antiga.data_sorteio, valor_rifa=5, quantidade_total=3, ativa=False)
+        db.session.add(nova)
+        db.session.flush()
+        services._ensure_inventory(campanha=nova)
+
+        antiga.quantidade_total = 5
+        services._ensure_inventory(campanha=antiga)
+        db.session.commit()
+
+        def numeros(campanha):
+            return db.session.scalars(
+                db.select(Rifa.numero).where(Rifa.campanha_id == campanha.id).order_by(Rifa.numero)
+            ).all()
+
+        assert numeros(antiga) == [60001, 60002, 60003, 60007, 60008]
+        assert numeros(nova) == [60004, 60005, 60006]
+        assert _contadores(antiga.id) == (5, 5, 0, 0)
+        assert db.session.get(RifaEstoque, antiga.id).proximo_numero == 60009
@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from extensions import db
+from models import PagamentoRifa, Rifa, RifaEstoque
+from rifas import services
+from rifas.payments import PixCharge
+from rifas.services import RifaError, cancelar_pagamentos_expirados, purchase_rifas
+
+
+class GatewayFalso:
+    def __init__(self, falhar=False):
+        self.falhar = falhar
+        self.transacao_aberta = None
+        self.reservadas = None
+
+    def create_charge(self, *, amount, payer_name, payer_email, description, payer_document=None):
+        # A reserva ja foi gravada e a sessao nao tem transacao aberta.
+        self.transacao_aberta = db.session().in_transaction()
+        with db.engine.connect() as conexao:
+            self.reservadas = conexao.execute(
+                db.select(db.func.count(Rifa.id)).where(Rifa.status == "reservado", Rifa.reserva_id.isnot(None))
+            ).scalar()
+        if self.falhar:
+            raise RuntimeError("gateway fora do ar")
+        return PixCharge(external_id="E" * 30, qr_code_base64="", copia_cola_pix="pix-copia-cola", raw_response={})
+
+
+def _comprar(quantidade=3):
+    return purchase_rifas(
+        nome="Maria",
+        telefone="11987654321",
+        email="maria@teste.com",
+        endereco="Rua A",
+        vendedor="",
+        quantidade_rifas=quantidade,
+        cpf="52998224725",
+    )
+
+
+def test_cobranca_criada_fora_da_transacao_e_anexada(app, monkeypatch):
+    gateway = GatewayFalso()
+    monkeypatch.setattr(services, "get_pix_gateway", lambda: gateway)
+
+    with app.app_context():
+        resultado = _comprar()
+
+        assert (gateway.transacao_aberta, gateway.reservadas) == (False, 3)
+        pagamento = db.session.get(PagamentoRifa, resultado.pagamento_id)
+        rifas = Rifa.query.filter_by(pagamento_id=pagamento.id).order_by(Rifa.numero).all()
+        assert [r.numero for r in rifas] == resultado.numeros
+        assert all(r.status == "reservado" and r.reserva_id is None for r in rifas)
+
+
+def test_falha_no_gateway_libera_a_reserva(app, monkeypatch):
+    monkeypatch.setattr(services, "get_pix_gateway", lambda: GatewayFalso(falhar=True))
+
+    with app.app_context():
+        with pytest.raises(RuntimeError):
+            _comprar()
+
+        assert Rifa.query.filter(Rifa.status != "disponivel").count() == 0
+        assert PagamentoRifa.query.count() == 0
+
+
+def _expirar_reserva_durante_a_cobranca(gateway, monkeypatch, esgotar=False):
+    def expirar_antes(**kwargs):
+        # Simula o job liberando a reserva enquanto o gateway responde.
+        db.session.execute(db.update(Rifa).values(reservado_ate=datetime.utcnow() - timedelta(minutes=1)))
+        db.session.commit()
+        assert cancelar_pagamentos_expirados() == 2
+        if esgotar:
+            Rifa.query.filter_by(status="disponivel").update({"status": "bloco"})
+            db.session.commit()
+        return GatewayFalso.create_charge(gateway, **kwargs)
+
+    monkeypatch.setattr(gateway, "create_charge", expirar_antes)
+    monkeypatch.setattr(services, "get_pix_gateway", lambda: gateway)
+
+
+def test_reserva_expirada_recebe_outros_numeros(app, monkeypatch):
+    _expirar_reserva_durante_a_cobranca(GatewayFalso(), monkeypatch)
+
+    with app.app_context():
+        resultado = _comprar(quantidade=2)
+
+        pagamento = db.session.get(PagamentoRifa, resultado.pagamento_id)
+        rifas = Rifa.query.filter_by(pagamento_id=pagamento.id).order_by(Rifa.numero).all()
+        assert pagamento.status == "pendente"
+        assert [r.numero for r in rifas] == resultado.numeros
+        assert len(rifas) == 2 and all(r.status == "reservado" for r in rifas)
+        estoque = db.session.get(RifaEstoque, pagamento.campanha_id, populate_existing=True)
+        assert (estoque.livres, estoque.reservados) == (28, 2)
+
+
+def test_reserva_expirada_sem_numeros_mantem_cobranca_cancelada(app, monkeypatch):
+    _expirar_reserva_durante_a_cobranca(GatewayFalso(), monkeypatch, esgotar=True)
+
+    with app.app_context():
+        with pytest.raises(RifaError):
+            _comprar(quantidade=2)
+
+        # O txid da cobranca criada continua registrado.
+        pagamento = PagamentoRifa.query.one()
+        assert (pagamento.status, pagamento.txid) == ("cancelado", "E" * 30)
+        assert Rifa.query.filter(Rifa.status.in_(["reservado", "pago"])).count() == 0
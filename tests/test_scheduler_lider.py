@@ -0,0 +1,31 @@
+from services.scheduler_lider_service import EleicaoScheduler, TravaArquivo
+
+
+def _eleicao(caminho, eventos, nome):
+    return EleicaoScheduler(
+        TravaArquivo(caminho),
+        iniciar=lambda: eventos.append(("iniciar", nome)),
+        parar=lambda: eventos.append(("parar", nome)),
+    )
+
+
+def test_apenas_um_processo_assume_e_outro_substitui(tmp_path):
+    caminho = str(tmp_path / "scheduler.lock")
+    eventos = []
+    primeiro = _eleicao(caminho, eventos, "a")
+    segundo = _eleicao(caminho, eventos, "b")
+
+    assert primeiro.verificar() is True
+    assert segundo.verificar() is False
+    assert segundo.verificar() is False
+    assert eventos == [("iniciar", "a")]
+
+    # O lider cai: a trava e solta e o reserva assume na rodada seguinte.
+    primeiro.encerrar()
+    assert segundo.verificar() is True
+    assert eventos == [("iniciar", "a"), ("parar", "a"), ("iniciar", "b")]
+
+    # Se a trava se perde, o lider para os jobs.
+    segundo.trava.liberar()
+    assert segundo.verificar() is False
+    assert eventos[-1] == ("parar", "b")
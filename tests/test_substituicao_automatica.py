@@ -0,0 +1,71 @@
+from datetime import date, datetime, timedelta
+
+from extensions import db
+from models import Escala, Indisponibilidade, Ministro, Missa, PedidoSubstituicao
+from services.substituicao_automatica_service import processar_substituicoes_vencidas
+
+
+def _pedido(escala, vence_em):
+    pedido = PedidoSubstituicao(
+        token=f"pedido-{escala.id}",
+        id_escala=escala.id,
+        id_paroquia=escala.id_paroquia,
+        id_ministro_solicitante=escala.id_ministro,
+        status="aberto",
+        vence_em=vence_em,
+    )
+    db.session.add(pedido)
+    return pedido
+
+
+def test_processa_so_pedidos_vencidos_em_lote(app):
+    with app.app_context():
+        admin = Ministro.query.filter_by(tipo="admin").first()
+        paroquia = admin.id_paroquia
+        ministros = [
+            Ministro(nome=nome, comunidade="Matriz", pode_logar=True, id_paroquia=paroquia)
+            for nome in ("Ana", "Bia", "Caio", "Duda", "Eva")
+        ]
+        db.session.add_all(ministros)
+        ana, bia, caio, duda, eva = ministros
+
+        dia = date(2026, 11, 8)
+        manha = Missa(data=dia, horario="08:00", comunidade="Matriz", id_paroquia=paroquia)
+        noite = Missa(data=dia, horario="19:00", comunidade="Matriz", id_paroquia=paroquia)
+        capela = Missa(data=dia, horario="10:00", comunidade="Capela", id_paroquia=paroquia)
+        db.session.add_all([manha, noite, capela])
+        db.session.flush()
+
+        escalas = [
+            Escala(id_missa=manha.id, id_ministro=ana.id, id_paroquia=paroquia),
+            Escala(id_missa=noite.id, id_ministro=bia.id, id_paroquia=paroquia),
+            Escala(id_missa=capela.id, id_ministro=eva.id, id_paroquia=paroquia),
+        ]
+        db.session.add_all(escalas)
+        # Caio esta indisponivel no dia.
+        db.session.add(Indisponibilidade(id_ministro=caio.id, data=dia, id_paroquia=paroquia))
+        db.session.flush()
+
+        agora = datetime(2026, 11, 1, 12, 0)
+        vencido_1 = _pedido(escalas[0], agora - timedelta(minutes=1))
+        vencido_2 = _pedido(escalas[1], agora - timedelta(minutes=5))
+        futuro = _pedido(escalas[2], agora + timedelta(minutes=5))
+        db.session.commit()
+
+        resultado = processar_substituicoes_vencidas(agora=agora)
+
+        assert resultado == {"lidos": 2, "substituidos": 2, "sem_elegiveis": 0, "cancelados": 0}
+        # O mais antigo leva Duda, que deixa de estar livre no dia; Bia, que
+        # saiu da missa da noite, fica livre para a da manha.
+        assert (vencido_2.status, vencido_2.id_ministro_aceite) == ("automatico", duda.id)
+        assert (vencido_1.status, vencido_1.id_ministro_aceite) == ("automatico", bia.id)
+        assert db.session.get(Escala, escalas[1].id).id_ministro == duda.id
+        assert futuro.status == "aberto"
+
+        # Ninguem serve na Capela: sem elegiveis o pedido volta para a fila em vez de ser relido a cada rodada.
+        futuro.vence_em = agora
+        db.session.commit()
+        resultado = processar_substituicoes_vencidas(agora=agora)
+        assert resultado["sem_elegiveis"] == 1
+        assert futuro.vence_em == agora + timedelta(minutes=30)
+        assert processar_substituicoes_vencidas(agora=agora)["lidos"] == 0
@@ -0,0 +1,83 @@
+import threading
+from datetime import date
+
+from extensions import db
+from models import Escala, Ministro, Missa
+from services import whatsapp_service
+from services.whatsapp_service import LimitadorTaxa, enviar_lembretes_whatsapp
+
+
+DATA = date(2026, 11, 8)
+
+
+def _popular(id_paroquia):
+    missa = Missa(data=DATA, horario="08:00", comunidade="Matriz", qtd_ministros=4, id_paroquia=id_paroquia)
+    db.session.add(missa)
+    ministros = [
+        Ministro(nome="Ana", telefone="11911110001", id_paroquia=id_paroquia),
+        Ministro(nome="Bia", telefone="11911110002", id_paroquia=id_paroquia),
+        Ministro(nome="Caio", telefone=None, id_paroquia=id_paroquia),
+        Ministro(nome="Davi", telefone="11911110004", id_paroquia=id_paroquia),
+    ]
+    db.session.add_all(ministros)
+    db.session.flush()
+    for indice, ministro in enumerate(ministros):
+        db.session.add(Escala(id_missa=missa.id, id_ministro=ministro.id, id_paroquia=id_paroquia, token=f"t{indice}"))
+    db.session.commit()
+    return ministros
+
+
+def test_lembretes_em_paralelo_marcam_enviadas_em_lote(app, monkeypatch):
+    app.config.update(
+        WHATSAPP_SEND_MODE="text",
+        WHATSAPP_CONCORRENCIA=3,
+        WHATSAPP_MENSAGENS_POR_SEGUNDO=0,
+    )
+    threads = set()
+
+    def enviar(numero, payload, config=None):
+        threads.add(threading.get_ident())
+        if numero.endswith("0002"):
+            raise RuntimeError("timeout")
+        return {"status_code": 200, "body": {}, "numero": numero, "tipo_envio": payload["type"]}
+
+    monkeypatch.setattr(whatsapp_service, "_whatsapp_request_payload", enviar)
+    monkeypatch.setattr(whatsapp_service, "_sessao_http", None)
+    monkeypatch.setattr(whatsapp_service, "_sessao_http_tamanho", 0)
+
+    with app.app_context():
+        admin = Ministro.query.filter_by(tipo="admin").first()
+        ministros = _popular(admin.id_paroquia)
+
+        resultado = enviar_lembretes_whatsapp(data_alvo=DATA, id_paroquia=admin.id_paroquia)
+
+        assert (resultado["enviados"], resultado["falhas"], resultado["ministros_sem_telefone"]) == (2, 1, 1)
+        assert [(d["nome"], d["status"]) for d in resultado["detalhes"]] == [
+            ("Ana", "enviado"),
+            ("Bia", "erro_api"),
+            ("Caio", "sem_telefone"),
+            ("Davi", "enviado"),
+        ]
+        assert resultado["detalhes"][0]["modo"] == "text"
+        assert threading.get_ident() not in threads
+        # Pool da session com a concorrencia da config do app, nao do ambiente.
+        assert whatsapp_service._sessao_http_tamanho == 3
+
+        enviadas = {
+            e.id_ministro: bool(e.notificacao_enviada)
+            for e in Escala.query.filter(Escala.id_ministro.in_([m.id for m in ministros]))
+        }
+        assert enviadas == {ministros[0].id: True, ministros[1].id: False, ministros[2].id: False, ministros[3].id: True}
+
+
+def test_limitador_espaca_as_chamadas(monkeypatch):
+    relogio = [100.0]
+    esperas = []
+    monkeypatch.setattr(whatsapp_service.time, "monotonic", lambda: relogio[0])
+    monkeypatch.setattr(whatsapp_service.time, "sleep", esperas.append)
+
+    limitador = LimitadorTaxa(4)
+    for _ in range(3):
+        limitador.aguardar()
+
+    assert esperas == [0.25, 0.5]
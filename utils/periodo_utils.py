@@ -0,0 +1,60 @@
+"""
+Filtros de periodo que aproveitam indices.
+
+``extract("month", coluna) == mes`` e ``func.date(coluna)`` escondem a coluna
+dentro de uma funcao e o banco nao usa o indice. Aqui todo periodo vira um
+intervalo semiaberto ``coluna >= inicio AND coluna < fim``, que serve tanto
+para colunas ``Date`` quanto ``DateTime``.
+"""
+import calendar
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import and_, true
+
+
+def intervalo_mes(mes, ano):
+    inicio = date(ano, mes, 1)
+    fim = inicio + timedelta(days=calendar.monthrange(ano, mes)[1])
+    return inicio, fim
+
+
+def intervalo_ano(ano):
+    return date(ano, 1, 1), date(ano + 1, 1, 1)
+
+
+def _como_data(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    return valor
+
+
+def filtro_intervalo(coluna, inicio=None, fim=None):
+    """``inicio <= coluna < fim``; limites ``None`` sao ignorados."""
+    condicoes = []
+    if inicio is not None:
+        condicoes.append(coluna >= inicio)
+    if fim is not None:
+        condicoes.append(coluna < fim)
+    return and_(*condicoes) if condicoes else true()
+
+
+def filtro_mes(coluna, mes, ano):
+    return filtro_intervalo(coluna, *intervalo_mes(int(mes), int(ano)))
+
+
+def filtro_ano(coluna, ano):
+    return filtro_intervalo(coluna, *intervalo_ano(int(ano)))
+
+
+def filtro_periodo(coluna, data_inicio=None, data_fim=None):
+    """
+    Filtro por datas inclusivas, como chegam dos formularios: ``data_fim``
+    inteiro entra no periodo (vira ``coluna < data_fim + 1 dia``).
+    """
+    data_inicio = _como_data(data_inicio)
+    data_fim = _como_data(data_fim)
+    return filtro_intervalo(
+        coluna,
+        data_inicio,
+        data_fim + timedelta(days=1) if data_fim is not None else None,
+    )
@@ -0,0 +1,43 @@
+"""
+Processo dedicado aos jobs em segundo plano.
+
+    SGME_PAPEL=web gunicorn app:app    # web: so requisicoes
+    python -m worker                   # jobs agendados e outbox de notificacoes
+
+Sobe a aplicacao com ``SGME_PAPEL=worker``: Firebase, Cloudinary e o
+scheduler (``registrar_agendamentos`` e os jobs de contribuicoes, que incluem
+a drenagem da outbox), sem o Dash do financeiro. Com mais de uma replica, a
+eleicao de ``scheduler_lider_service`` garante um unico processo rodando os
+jobs.
+"""
+import logging
+import os
+import signal
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    os.environ["SGME_PAPEL"] = "worker"
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    from app import app
+
+    encerrar = threading.Event()
+    for sinal in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sinal, lambda *_: encerrar.set())
+
+    logger.info("Worker SGME iniciado (pid=%s)", os.getpid())
+    while not encerrar.wait(1):
+        pass
+
+    eleicao = app.extensions.get("scheduler_lider")
+    if eleicao is not None:
+        eleicao.encerrar()
+    logger.info("Worker SGME encerrado")
+
+
+if __name__ == "__main__":
+    main()